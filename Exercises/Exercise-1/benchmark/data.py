@@ -0,0 +1,30 @@
+import io
+import random
+import zipfile
+
+TRIP_COLUMNS = ["trip_id", "start_time", "end_time", "bikeid", "tripduration", "from_station_id", "from_station_name",
+                "to_station_id", "to_station_name", "usertype", "gender", "birthyear"]
+
+
+def generate_trips_csv(n_rows: int, seed: int = 0):
+    rng = random.Random(seed)
+    lines = [",".join(TRIP_COLUMNS)]
+    for trip_id in range(n_rows):
+        from_station, to_station = rng.randrange(600), rng.randrange(600)
+        lines.append(f"{trip_id},2019-01-01 00:{trip_id % 60:02d}:00,2019-01-01 01:{trip_id % 60:02d}:00,"
+                     f"{rng.randrange(6000)},{rng.uniform(60, 3600):.1f},{from_station},Station {from_station},"
+                     f"{to_station},Station {to_station},{rng.choice(['Subscriber', 'Customer'])},"
+                     f"{rng.choice(['Male', 'Female', ''])},{rng.randrange(1940, 2005)}")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def generate_divvy_zips(n_files: int, rows_per_file: int):
+    files = {}
+    for i in range(n_files):
+        name = f"Divvy_Trips_{2018 + i // 4}_Q{i % 4 + 1}"
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(f"{name}.csv", generate_trips_csv(rows_per_file, seed=i))
+            archive.writestr(f"__MACOSX/._{name}.csv", b"\x00" * 128)
+        files[f"{name}.zip"] = out.getvalue()
+    return files
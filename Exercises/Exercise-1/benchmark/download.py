@@ -0,0 +1,71 @@
+import argparse
+import io
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import requests
+
+from benchmark.data import generate_divvy_zips
+from src.download.server import *
+from src.download.utils import *
+
+
+def download_serially(uris: list, download_dir: str):
+    # the straightforward solution: one file at a time, each zip held in memory and unzipped from there
+    for uri in uris:
+        response = requests.get(uri)
+        if response.status_code != 200:
+            continue
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            for name in archive.namelist():
+                if is_csv_member(name):
+                    with open(os.path.join(download_dir, os.path.basename(name)), "wb") as out:
+                        out.write(archive.read(name))
+
+
+def timed(download, uris: list):
+    download_dir = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        download(uris, download_dir)
+        secs = time.perf_counter() - start
+        assert len([name for name in os.listdir(download_dir) if name.endswith(".csv")]) == len(uris) - 1
+        return secs
+    finally:
+        shutil.rmtree(download_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the concurrent downloader against serial downloads")
+    parser.add_argument("--files", type=int, default=16)
+    parser.add_argument("--rows", type=int, default=50_000, help="rows per csv")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response starts")
+    parser.add_argument("--mbps", type=float, default=20, help="bandwidth cap per connection, in MB/s")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    files = generate_divvy_zips(args.files, args.rows)
+    total_mb = sum(len(data) for data in files.values()) / 1e6
+    with FileServer(files, latency=args.latency, bytes_per_second=args.mbps * 1e6) as server:
+        # plus one dead uri, as in main.py
+        uris = [server.url(name) for name in files.keys()] + [server.url("Divvy_Trips_2220_Q1.zip")]
+        print(f"{args.files} zips, {total_mb:.1f}MB, {args.latency * 1000:.0f}ms latency, "
+              f"{args.mbps:.0f}MB/s per connection")
+        serial_secs = timed(download_serially, uris)
+        print(f"{'connections':>12} {'seconds':>9} {'vs serial':>10}")
+        print(f"{'serial':>12} {serial_secs:>9.3f} {1:>9.2f}x")
+        for connections in args.connections:
+            def download(uris, download_dir):
+                with Downloader(download_dir, connections=connections) as downloader:
+                    results = downloader.download_all(uris)
+                assert [result.ok for result in results].count(False) == 1
+
+            secs = timed(download, uris)
+            print(f"{connections:>12} {secs:>9.3f} {serial_secs / secs:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
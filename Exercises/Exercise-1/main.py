@@ -1,4 +1,6 @@
-import requests
+import os
+
+from src.download.utils import *
 
 download_uris = [
     "https://divvy-tripdata.s3.amazonaws.com/Divvy_Trips_2018_Q4.zip",
@@ -10,10 +12,15 @@ download_uris = [
     "https://divvy-tripdata.s3.amazonaws.com/Divvy_Trips_2220_Q1.zip",
 ]
 
+download_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloads")
+connections = 4
+
 
 def main():
-    # your code here
-    pass
+    with Downloader(download_dir, connections=connections) as downloader:
+        results = downloader.download_all(download_uris)
+    for result in results:
+        print(result)
 
 
 if __name__ == "__main__":
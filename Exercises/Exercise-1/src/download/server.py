@@ -0,0 +1,129 @@
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RANGE_HEADER = re.compile(r"^bytes=(\d+)-(\d*)$")
+
+
+class FileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body: bool):
+        server = self.server.file_server
+        name = self.path.lstrip("/")
+        range_header = self.headers.get("Range")
+        server.record_request(name, range_header)
+        if server.latency > 0:
+            time.sleep(server.latency)
+        if name not in server.files:
+            self.send_error(404)
+            return
+
+        body = server.files[name]
+        start, end = 0, len(body)
+        match = RANGE_HEADER.match(range_header) if range_header is not None else None
+        if match is not None:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) + 1, len(body)) if match.group(2) else len(body)
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        if not send_body:
+            return
+
+        cut_at = server.take_interruption(name)
+        if cut_at is not None:
+            end = min(end, start + cut_at)
+            self.close_connection = True
+        self.send_body(body, start, end)
+
+    def send_body(self, body: bytes, start: int, end: int):
+        server = self.server.file_server
+        chunk_size = server.chunk_size
+        started = time.perf_counter()
+        for offset in range(start, end, chunk_size):
+            self.wfile.write(body[offset:min(offset + chunk_size, end)])
+            if server.bytes_per_second is not None:
+                # per connection, like a server that caps each client's share of its bandwidth
+                ahead = (offset + chunk_size - start) / server.bytes_per_second - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+
+class FileServer:
+    # a local stand-in for the Divvy bucket: serves in-memory files over HTTP with Range support, and can add
+    # latency, cap each connection's bandwidth and cut responses off part way through
+    def __init__(self, files: dict, latency: float = 0.0, bytes_per_second: float = None, chunk_size: int = 64 * 1024):
+        self.files = files
+        self.latency = latency
+        self.bytes_per_second = bytes_per_second
+        self.chunk_size = chunk_size
+        self.requests = []
+        self.interruptions = {}
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, name: str):
+        return f"{self.base_url}/{name}"
+
+    def interrupt(self, name: str, after_bytes: int, times: int = 1):
+        # the next `times` responses for name are cut off after after_bytes
+        with self.lock:
+            self.interruptions[name] = [after_bytes] * times
+
+    def take_interruption(self, name: str):
+        with self.lock:
+            pending = self.interruptions.get(name)
+            return pending.pop() if pending else None
+
+    def record_request(self, name: str, range_header: str):
+        with self.lock:
+            self.requests.append((name, range_header))
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), FileRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.file_server = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
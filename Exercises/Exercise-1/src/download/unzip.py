@@ -0,0 +1,242 @@
+import os
+import struct
+import zipfile
+import zlib
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+LOCAL_HEADER_SIG = 0x04034b50
+DATA_DESCRIPTOR_SIG = 0x08074b50
+# the central directory (or the end record of an empty archive) follows the last member
+CENTRAL_DIR_SIGS = (0x02014b50, 0x06054b50)
+
+ENCRYPTED_FLAG = 0x1
+DATA_DESCRIPTOR_FLAG = 0x8
+UTF8_FLAG = 0x800
+
+STORED = 0
+DEFLATED = 8
+
+
+class UnsupportedZipError(Exception):
+    # the member can't be extracted before the whole archive is on disk; callers fall back to extract_members
+    pass
+
+
+def is_csv_member(name: str):
+    return name.lower().endswith(".csv") and not name.startswith("__MACOSX/")
+
+
+def member_path(out_dir: str, name: str):
+    # members are written flat into out_dir, so nothing in the archive can point outside it
+    return os.path.join(out_dir, os.path.basename(name))
+
+
+def remove_part(part_path: str):
+    if os.path.exists(part_path):
+        os.remove(part_path)
+
+
+def extract_members(zip_path: str, out_dir: str, member_filter=is_csv_member, chunk_size: int = 1 << 20):
+    extracted = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for info in archive.infolist():
+            if info.is_dir() or not member_filter(info.filename):
+                continue
+            path = member_path(out_dir, info.filename)
+            # zipfile only checks the CRC once the member has been read to the end, so it is written to a part
+            # file that is renamed once it has passed
+            try:
+                with archive.open(info) as member, open(path + ".part", "wb") as out:
+                    while chunk := member.read(chunk_size):
+                        out.write(chunk)
+            except BaseException:
+                remove_part(path + ".part")
+                raise
+            os.replace(path + ".part", path)
+            extracted.append(path)
+    return extracted
+
+
+class StreamingUnzip:
+    # extracts members from a zip as its bytes arrive, by walking the local file headers rather than waiting for the
+    # central directory at the end of the archive; only the bytes not yet consumed are held in memory
+    def __init__(self, out_dir: str, member_filter=is_csv_member):
+        self.out_dir = out_dir
+        self.member_filter = member_filter
+        self.buffer = bytearray()
+        self.extracted = []
+        self.done = False
+        self.member = None
+
+    def feed(self, chunk: bytes):
+        if self.done:
+            return
+        self.buffer += chunk
+        try:
+            while not self.done:
+                if self.member is None:
+                    if not self.read_header():
+                        return
+                elif self.member.in_data:
+                    if not self.read_data():
+                        return
+                elif not self.read_descriptor():
+                    return
+        except BaseException:
+            # a member that fails part way through leaves nothing behind
+            self.abort()
+            raise
+
+    def close(self):
+        if self.member is not None:
+            self.member.abort()
+        if not self.done:
+            raise zipfile.BadZipFile("Archive ended before the central directory")
+        return self.extracted
+
+    def abort(self):
+        if self.member is not None:
+            self.member.abort()
+            self.member = None
+
+    def read_header(self):
+        if len(self.buffer) < 4:
+            return False
+        signature = struct.unpack_from("<I", self.buffer)[0]
+        if signature in CENTRAL_DIR_SIGS:
+            self.done = True
+            self.buffer = bytearray()
+            return False
+        if signature != LOCAL_HEADER_SIG:
+            raise zipfile.BadZipFile(f"Bad local file header signature: {signature:#x}")
+        if len(self.buffer) < LOCAL_HEADER.size:
+            return False
+        _, _, flags, method, _, _, crc, compressed_size, size, name_len, extra_len = \
+            LOCAL_HEADER.unpack_from(self.buffer)
+        header_len = LOCAL_HEADER.size + name_len + extra_len
+        if len(self.buffer) < header_len:
+            return False
+        raw_name = bytes(self.buffer[LOCAL_HEADER.size:LOCAL_HEADER.size + name_len])
+        extra = bytes(self.buffer[LOCAL_HEADER.size + name_len:header_len])
+        del self.buffer[:header_len]
+
+        name = raw_name.decode("utf-8" if flags & UTF8_FLAG else "cp437")
+        zip64_fields = zip64_extra(extra)
+        zip64 = zip64_fields is not None
+        if compressed_size == 0xFFFFFFFF:
+            if not zip64:
+                raise zipfile.BadZipFile(f"Missing zip64 extra field for {name}")
+            # the zip64 field lists the uncompressed size first, but only when that overflowed too
+            compressed_size = zip64_fields[1 if size == 0xFFFFFFFF else 0]
+        if flags & ENCRYPTED_FLAG:
+            raise UnsupportedZipError(f"{name} is encrypted")
+        if method not in (STORED, DEFLATED):
+            raise UnsupportedZipError(f"{name} uses compression method {method}")
+        if flags & DATA_DESCRIPTOR_FLAG:
+            if method == STORED:
+                raise UnsupportedZipError(f"{name} is stored without its size in the local header")
+            compressed_size = None
+        path = None
+        if not name.endswith("/") and self.member_filter(name):
+            path = member_path(self.out_dir, name)
+        self.member = ZipMember(name, path, method, crc, compressed_size, flags & DATA_DESCRIPTOR_FLAG, zip64)
+        return True
+
+    def read_data(self):
+        member = self.member
+        if len(self.buffer) == 0 and not member.at_end():
+            return False
+        consumed = member.write(self.buffer)
+        del self.buffer[:consumed]
+        if not member.at_end():
+            return False
+        member.in_data = False
+        if not member.has_descriptor:
+            self.finish_member()
+        return True
+
+    def read_descriptor(self):
+        member = self.member
+        sizes_len = 16 if member.zip64 else 8
+        if len(self.buffer) < 4:
+            return False
+        has_signature = struct.unpack_from("<I", self.buffer)[0] == DATA_DESCRIPTOR_SIG
+        descriptor_len = 4 + sizes_len + (4 if has_signature else 0)
+        if len(self.buffer) < descriptor_len:
+            return False
+        member.crc = struct.unpack_from("<I", self.buffer, 4 if has_signature else 0)[0]
+        del self.buffer[:descriptor_len]
+        self.finish_member()
+        return True
+
+    def finish_member(self):
+        path = self.member.close()
+        if path is not None:
+            self.extracted.append(path)
+        self.member = None
+
+
+class ZipMember:
+    def __init__(self, name: str, path: str, method: int, crc: int, compressed_size: int, has_descriptor: bool,
+                 zip64: bool):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.crc = crc
+        # None until the end of the deflate stream when the sizes come in a data descriptor after the data
+        self.remaining = compressed_size
+        self.has_descriptor = has_descriptor
+        self.zip64 = zip64
+        self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == DEFLATED else None
+        self.actual_crc = 0
+        # written to a part file that only takes the member's name once its CRC has passed
+        self.out = open(path + ".part", "wb") if path is not None else None
+        self.in_data = True
+
+    def at_end(self):
+        if self.decompressor is not None and self.decompressor.eof:
+            return True
+        return self.remaining == 0
+
+    def write(self, buffer: bytearray):
+        data = buffer if self.remaining is None else buffer[:self.remaining]
+        if self.decompressor is None:
+            output = bytes(data)
+            consumed = len(data)
+        else:
+            output = self.decompressor.decompress(data)
+            consumed = len(data) - len(self.decompressor.unused_data)
+        if self.remaining is not None:
+            self.remaining -= consumed
+            if self.remaining == 0 and self.decompressor is not None and not self.decompressor.eof:
+                raise zipfile.BadZipFile(f"Compressed data for {self.name} ended early")
+        self.actual_crc = zlib.crc32(output, self.actual_crc)
+        if self.out is not None:
+            self.out.write(output)
+        return consumed
+
+    def close(self):
+        if self.actual_crc != self.crc:
+            self.abort()
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {self.name!r}")
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+            os.replace(self.path + ".part", self.path)
+        return self.path
+
+    def abort(self):
+        if self.out is not None:
+            self.out.close()
+            remove_part(self.path + ".part")
+            self.out = None
+
+
+def zip64_extra(extra: bytes):
+    offset = 0
+    while offset + 4 <= len(extra):
+        header_id, data_len = struct.unpack_from("<HH", extra, offset)
+        if header_id == 0x0001:
+            return struct.unpack_from(f"<{data_len // 8}Q", extra, offset + 4)
+        offset += 4 + data_len
+    return None
@@ -0,0 +1,191 @@
+import os
+import queue
+import time
+import zipfile
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from .unzip import *
+
+
+class DownloadError(Exception):
+    err_str = "Could not download {uri}: {reason}"
+
+    def __init__(self, uri: str, reason: str):
+        self.uri = uri
+        self.reason = reason
+        super().__init__(self.err_str.format(uri=uri, reason=reason))
+
+
+def filename_from_uri(uri: str):
+    name = os.path.basename(urlsplit(uri).path)
+    if name == "":
+        raise ValueError(f"No file name in uri: {uri}")
+    return name
+
+
+class DownloadResult:
+    def __init__(self, uri: str):
+        self.uri = uri
+        self.zip_path = None
+        self.csv_paths = []
+        self.bytes_downloaded = 0
+        self.resumed_from = 0
+        self.attempts = 0
+        self.seconds = 0.0
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        if not self.ok:
+            return f"{self.uri}: failed ({self.error})"
+        resumed = f", resumed at {self.resumed_from} bytes" if self.resumed_from > 0 else ""
+        return (f"{self.uri}: {self.bytes_downloaded} bytes in {self.seconds:.3f}s{resumed} -> "
+                f"{', '.join(os.path.basename(path) for path in self.csv_paths)}")
+
+
+class Downloader:
+    # fetches uris on a bounded pool of connections, streaming each response to disk in chunks while the csv
+    # members are extracted from it; interrupted downloads carry on from the bytes already on disk with a Range request
+    def __init__(self, download_dir: str, connections: int = 4, chunk_size: int = 1 << 16, timeout: float = 30,
+                 retries: int = 2, extract: bool = True, keep_zip: bool = False, member_filter=is_csv_member):
+        if connections < 1:
+            raise ValueError("connections must be at least 1")
+        self.download_dir = download_dir
+        self.connections = connections
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.retries = retries
+        self.extract = extract
+        self.keep_zip = keep_zip
+        self.member_filter = member_filter
+        # one session per connection: a session keeps its connection alive between files, but isn't thread-safe
+        self.sessions = queue.Queue()
+        for _ in range(connections):
+            self.sessions.put(Downloader.new_session())
+
+    @staticmethod
+    def new_session():
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def close(self):
+        while not self.sessions.empty():
+            self.sessions.get().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def download_all(self, uris: list):
+        os.makedirs(self.download_dir, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            return list(executor.map(self.download, uris))
+
+    def download(self, uri: str):
+        result = DownloadResult(uri)
+        start = time.perf_counter()
+        session = self.sessions.get()
+        try:
+            result.zip_path = os.path.join(self.download_dir, filename_from_uri(uri))
+            self.fetch(session, uri, result)
+        except (DownloadError, ValueError, zipfile.BadZipFile, zlib.error, requests.RequestException, OSError) as err:
+            # any one uri failing, whether the server, the archive or the local disk, leaves the others to carry on
+            result.error = str(err) or type(err).__name__
+        finally:
+            self.sessions.put(session)
+            result.seconds = time.perf_counter() - start
+        return result
+
+    def fetch(self, session: requests.Session, uri: str, result: DownloadResult):
+        part_path = result.zip_path + ".part"
+        while True:
+            result.attempts += 1
+            unzip = StreamingUnzip(self.download_dir, self.member_filter) if self.extract else None
+            try:
+                unzip = self.stream_to_disk(session, uri, part_path, unzip, result)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as err:
+                if unzip is not None:
+                    unzip.abort()
+                if result.attempts > self.retries:
+                    raise DownloadError(uri, f"{type(err).__name__} after {result.attempts} attempts")
+        os.replace(part_path, result.zip_path)
+        if self.extract:
+            if unzip is None or not unzip.done:
+                # the archive can't be read as it streams, so it's read back from disk instead
+                result.csv_paths = extract_members(result.zip_path, self.download_dir, self.member_filter)
+            else:
+                result.csv_paths = unzip.close()
+            if not self.keep_zip:
+                os.remove(result.zip_path)
+                result.zip_path = None
+
+    def stream_to_disk(self, session: requests.Session, uri: str, part_path: str, unzip: StreamingUnzip,
+                       result: DownloadResult):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset > 0 else {}
+        with session.get(uri, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # nothing left to fetch: the part file is already complete
+                response_offset = offset
+            elif response.status_code >= 400:
+                # dead uris fail straight away, without reading a body or retrying
+                raise DownloadError(uri, f"HTTP {response.status_code} {response.reason}")
+            elif response.status_code == 206:
+                response_offset = content_range_start(response)
+            else:
+                response_offset = 0
+            if response_offset != offset and response_offset != 0:
+                raise DownloadError(uri, f"asked for bytes from {offset}, got them from {response_offset}")
+            if response_offset > 0 and result.resumed_from == 0:
+                result.resumed_from = response_offset
+
+            if unzip is not None and response_offset > 0:
+                unzip = self.replay(part_path, unzip)
+            with open(part_path, "ab" if response_offset > 0 else "wb") as out:
+                if response.status_code == 416:
+                    return unzip
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    out.write(chunk)
+                    result.bytes_downloaded += len(chunk)
+                    unzip = self.feed(unzip, chunk)
+        return unzip
+
+    def replay(self, part_path: str, unzip: StreamingUnzip):
+        # the extracted members of an interrupted download are rebuilt from the bytes already on disk
+        with open(part_path, "rb") as part:
+            while (chunk := part.read(self.chunk_size)) and unzip is not None:
+                unzip = self.feed(unzip, chunk)
+        return unzip
+
+    @staticmethod
+    def feed(unzip: StreamingUnzip, chunk: bytes):
+        if unzip is None:
+            return None
+        try:
+            unzip.feed(chunk)
+            return unzip
+        except UnsupportedZipError:
+            unzip.abort()
+            return None
+
+
+def content_range_start(response: requests.Response):
+    content_range = response.headers.get("Content-Range", "")
+    try:
+        return int(content_range.split(" ")[1].split("-")[0])
+    except (IndexError, ValueError):
+        raise DownloadError(response.url, f"unexpected Content-Range: {content_range!r}")
@@ -0,0 +1,121 @@
+import io
+import os
+import tempfile
+import unittest
+import zipfile
+import zlib
+
+from download.unzip import *
+
+
+class UnseekableBuffer(io.RawIOBase):
+    # zipfile writes data descriptors, rather than going back to fill in the sizes, when it can't seek
+    def __init__(self):
+        self.data = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.data += b
+        return len(b)
+
+
+def make_zip(members: dict, compression: int = zipfile.ZIP_DEFLATED, seekable: bool = True, force_zip64=False):
+    out = io.BytesIO() if seekable else UnseekableBuffer()
+    with zipfile.ZipFile(out, "w", compression=compression) as archive:
+        for name, content in members.items():
+            with archive.open(name, "w", force_zip64=force_zip64) as member:
+                member.write(content)
+    return out.getvalue() if seekable else bytes(out.data)
+
+
+CSV = "".join(f"{i},station_{i % 7},{i * 1.5}\n" for i in range(20_000)).encode()
+
+
+class TestStreamingUnzip(unittest.TestCase):
+    def setUp(self):
+        self.out_dir = tempfile.mkdtemp()
+
+    def unzip(self, data: bytes, chunk_size: int = 1000):
+        unzip = StreamingUnzip(self.out_dir)
+        for offset in range(0, len(data), chunk_size):
+            unzip.feed(data[offset:offset + chunk_size])
+        return unzip.close()
+
+    def read(self, name: str):
+        with open(os.path.join(self.out_dir, name), "rb") as f:
+            return f.read()
+
+    def test_deflated(self):
+        data = make_zip({"trips.csv": CSV, "__MACOSX/._trips.csv": b"junk", "notes.txt": b"notes"})
+        self.assertEqual(self.unzip(data), [os.path.join(self.out_dir, "trips.csv")])
+        self.assertEqual(self.read("trips.csv"), CSV)
+        self.assertEqual(sorted(os.listdir(self.out_dir)), ["trips.csv"])
+
+    def test_stored(self):
+        data = make_zip({"a.csv": CSV, "b.csv": b""}, compression=zipfile.ZIP_STORED)
+        self.assertEqual(len(self.unzip(data, chunk_size=7)), 2)
+        self.assertEqual(self.read("a.csv"), CSV)
+        self.assertEqual(self.read("b.csv"), b"")
+
+    def test_data_descriptor(self):
+        data = make_zip({"a.csv": CSV, "dir/b.csv": CSV[:100]}, seekable=False)
+        self.unzip(data)
+        self.assertEqual(self.read("a.csv"), CSV)
+        self.assertEqual(self.read("b.csv"), CSV[:100])
+
+    def test_zip64_data_descriptor(self):
+        data = make_zip({"a.csv": CSV}, seekable=False, force_zip64=True)
+        self.unzip(data, chunk_size=1 << 16)
+        self.assertEqual(self.read("a.csv"), CSV)
+
+    def test_stored_data_descriptor_unsupported(self):
+        data = make_zip({"a.csv": CSV}, compression=zipfile.ZIP_STORED, seekable=False)
+        with self.assertRaises(UnsupportedZipError):
+            self.unzip(data)
+
+    def test_truncated(self):
+        data = make_zip({"a.csv": CSV})
+        with self.assertRaises(zipfile.BadZipFile):
+            self.unzip(data[:len(data) // 2])
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+    def test_bad_crc(self):
+        data = bytearray(make_zip({"a.csv": CSV}, compression=zipfile.ZIP_STORED))
+        data[100] ^= 0xFF
+        with self.assertRaises(zipfile.BadZipFile):
+            self.unzip(bytes(data))
+
+    def test_corrupt_member_removed(self):
+        # a member that fails part way through leaves neither the csv nor its part file
+        data = bytearray(make_zip({"a.csv": CSV, "b.csv": CSV}))
+        data[200:260] = b"\xff" * 60
+        with self.assertRaises((zipfile.BadZipFile, zlib.error)):
+            self.unzip(bytes(data))
+        self.assertEqual(os.listdir(self.out_dir), [])
+
+    def test_not_a_zip(self):
+        with self.assertRaises(zipfile.BadZipFile):
+            self.unzip(b"<html>not found</html>")
+
+    def test_extract_members(self):
+        zip_path = os.path.join(self.out_dir, "a.zip")
+        with open(zip_path, "wb") as f:
+            f.write(make_zip({"a.csv": CSV, "notes.txt": b"notes"}, compression=zipfile.ZIP_STORED, seekable=False))
+        self.assertEqual(extract_members(zip_path, self.out_dir), [os.path.join(self.out_dir, "a.csv")])
+        self.assertEqual(self.read("a.csv"), CSV)
+
+    def test_extract_members_bad_crc(self):
+        zip_path = os.path.join(self.out_dir, "a.zip")
+        data = bytearray(make_zip({"a.csv": CSV}, compression=zipfile.ZIP_STORED))
+        data[100] ^= 0xFF
+        with open(zip_path, "wb") as f:
+            f.write(data)
+        with self.assertRaises(zipfile.BadZipFile):
+            extract_members(zip_path, self.out_dir)
+        self.assertEqual(os.listdir(self.out_dir), ["a.zip"])
+
+
+if __name__ == '__main__':
+    unittest.main()
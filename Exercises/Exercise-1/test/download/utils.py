@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+import zipfile
+
+from download.server import *
+from download.utils import *
+from test.download.unzip import CSV, make_zip
+
+
+class TestDownloader(unittest.TestCase):
+    def setUp(self):
+        self.files = {
+            "Divvy_Trips_2019_Q1.zip": make_zip({"Divvy_Trips_2019_Q1.csv": CSV, "__MACOSX/._x": b"junk"}),
+            "Divvy_Trips_2019_Q2.zip": make_zip({"Divvy_Trips_2019_Q2.csv": CSV[:5000]}, seekable=False),
+            "stored.zip": make_zip({"stored.csv": CSV}, compression=zipfile.ZIP_STORED, seekable=False),
+        }
+        self.server = FileServer(self.files).start()
+        self.download_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def download(self, names: list, **kwargs):
+        with Downloader(self.download_dir, chunk_size=1024, **kwargs) as downloader:
+            return downloader.download_all([self.server.url(name) for name in names])
+
+    def read(self, name: str):
+        with open(os.path.join(self.download_dir, name), "rb") as f:
+            return f.read()
+
+    def test_filename_from_uri(self):
+        self.assertEqual(filename_from_uri("https://divvy-tripdata.s3.amazonaws.com/Divvy_Trips_2018_Q4.zip?x=1"),
+                         "Divvy_Trips_2018_Q4.zip")
+        with self.assertRaises(ValueError):
+            filename_from_uri("https://divvy-tripdata.s3.amazonaws.com/")
+
+    def test_download_all(self):
+        results = self.download(list(self.files.keys()), connections=2)
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual([[os.path.basename(path) for path in result.csv_paths] for result in results],
+                         [["Divvy_Trips_2019_Q1.csv"], ["Divvy_Trips_2019_Q2.csv"], ["stored.csv"]])
+        self.assertEqual(sorted(os.listdir(self.download_dir)),
+                         ["Divvy_Trips_2019_Q1.csv", "Divvy_Trips_2019_Q2.csv", "stored.csv"])
+        self.assertEqual(self.read("Divvy_Trips_2019_Q1.csv"), CSV)
+        self.assertEqual(self.read("Divvy_Trips_2019_Q2.csv"), CSV[:5000])
+        self.assertEqual(self.read("stored.csv"), CSV)
+
+    def test_keep_zip(self):
+        results = self.download(["Divvy_Trips_2019_Q1.zip"], keep_zip=True)
+        self.assertEqual(self.read("Divvy_Trips_2019_Q1.zip"), self.files["Divvy_Trips_2019_Q1.zip"])
+        self.assertEqual(results[0].zip_path, os.path.join(self.download_dir, "Divvy_Trips_2019_Q1.zip"))
+
+    def test_no_extract(self):
+        self.download(["Divvy_Trips_2019_Q1.zip"], extract=False)
+        self.assertEqual(os.listdir(self.download_dir), ["Divvy_Trips_2019_Q1.zip"])
+
+    def test_dead_uri(self):
+        results = self.download(["Divvy_Trips_2220_Q1.zip", "Divvy_Trips_2019_Q1.zip"], retries=5)
+        self.assertFalse(results[0].ok)
+        self.assertIn("HTTP 404", results[0].error)
+        self.assertEqual(results[0].attempts, 1)
+        self.assertTrue(results[1].ok)
+        self.assertEqual([name for name, _ in self.server.requests].count("Divvy_Trips_2220_Q1.zip"), 1)
+
+    def test_resume(self):
+        self.server.interrupt("Divvy_Trips_2019_Q1.zip", 10_000)
+        result = self.download(["Divvy_Trips_2019_Q1.zip"])[0]
+        self.assertTrue(result.ok)
+        self.assertEqual(result.attempts, 2)
+        self.assertGreater(result.resumed_from, 0)
+        self.assertEqual(self.server.requests[-1], ("Divvy_Trips_2019_Q1.zip", f"bytes={result.resumed_from}-"))
+        self.assertEqual(self.read("Divvy_Trips_2019_Q1.csv"), CSV)
+
+    def test_resume_existing_part(self):
+        data = self.files["Divvy_Trips_2019_Q1.zip"]
+        with open(os.path.join(self.download_dir, "Divvy_Trips_2019_Q1.zip.part"), "wb") as f:
+            f.write(data[:3000])
+        result = self.download(["Divvy_Trips_2019_Q1.zip"])[0]
+        self.assertEqual(result.resumed_from, 3000)
+        self.assertEqual(result.bytes_downloaded, len(data) - 3000)
+        self.assertEqual(self.read("Divvy_Trips_2019_Q1.csv"), CSV)
+
+    def test_resume_complete_part(self):
+        data = self.files["Divvy_Trips_2019_Q1.zip"]
+        with open(os.path.join(self.download_dir, "Divvy_Trips_2019_Q1.zip.part"), "wb") as f:
+            f.write(data)
+        result = self.download(["Divvy_Trips_2019_Q1.zip"])[0]
+        self.assertEqual(result.bytes_downloaded, 0)
+        self.assertEqual(self.read("Divvy_Trips_2019_Q1.csv"), CSV)
+
+    def test_retries_exhausted(self):
+        self.server.interrupt("Divvy_Trips_2019_Q1.zip", 10, times=3)
+        result = self.download(["Divvy_Trips_2019_Q1.zip"], retries=1)[0]
+        self.assertFalse(result.ok)
+        self.assertEqual(result.attempts, 2)
+        self.assertNotIn("Divvy_Trips_2019_Q1.csv", os.listdir(self.download_dir))
+
+    def test_corrupt_zip(self):
+        self.server.files["Divvy_Trips_2019_Q1.zip"] = b"not a zip" * 100
+        result = self.download(["Divvy_Trips_2019_Q1.zip"])[0]
+        self.assertFalse(result.ok)
+
+    def test_local_error(self):
+        # the finished zip can't be moved into place, and the other uri still downloads
+        os.mkdir(os.path.join(self.download_dir, "Divvy_Trips_2019_Q1.zip"))
+        results = self.download(["Divvy_Trips_2019_Q1.zip", "stored.zip"])
+        self.assertFalse(results[0].ok)
+        self.assertTrue(results[1].ok)
+
+
+if __name__ == '__main__':
+    unittest.main()
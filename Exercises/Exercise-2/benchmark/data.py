@@ -0,0 +1,14 @@
+import datetime
+import random
+
+
+def generate_listing_rows(n_rows: int, seed: int = 0):
+    # (station file, last modified, size) rows like the NOAA listing's, spread over a few days, in name order
+    rng = random.Random(seed)
+    start = datetime.datetime(2022, 2, 5)
+    rows = []
+    for i in range(n_rows):
+        modified = start + datetime.timedelta(minutes=rng.randrange(5 * 24 * 60))
+        size = rng.choice([f"{rng.randrange(1, 999)}K", f"{rng.uniform(1, 9):.1f}M"])
+        rows.append((f"{720000 + i:06d}{rng.randrange(10000, 99999)}.csv", f"{modified:%Y-%m-%d %H:%M}", size))
+    return sorted(rows)
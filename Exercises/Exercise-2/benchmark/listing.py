@@ -0,0 +1,80 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import requests
+
+from benchmark.data import generate_listing_rows
+from src.scrape.listing import *
+from src.scrape.server import *
+
+
+def find_naively(url: str, timestamp: str):
+    # the whole page downloaded, parsed and scanned on every run
+    response = requests.get(url)
+    rows = parse_listing([response.text])
+    return [name for name, modified, _ in rows if modified == timestamp]
+
+
+def timed(find, runs: int):
+    start = time.perf_counter()
+    for _ in range(runs):
+        names = find()
+    return (time.perf_counter() - start) / runs, names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time finding a file in a directory listing by last modified time, "
+                                                 "cold and warm")
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds before each response starts")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rows = generate_listing_rows(args.rows)
+    timestamp = rows[len(rows) // 2][1]
+    tmp_dir = tempfile.mkdtemp()
+    index_path = os.path.join(tmp_dir, "listing_index.json")
+    try:
+        with ListingServer(rows, latency=args.latency) as server:
+            print(f"{args.rows} rows, {len(server.body) / 1e6:.1f}MB listing, {args.latency * 1000:.0f}ms latency")
+            seconds, expected = timed(lambda: find_naively(server.url, timestamp), args.runs)
+            print(f"{'naive':>20}: {seconds * 1000:8.1f}ms per run")
+
+            def cold():
+                if os.path.exists(index_path):
+                    os.remove(index_path)
+                with ListingScraper(server.url, index_path) as scraper:
+                    return scraper.find(timestamp)
+
+            def warm(max_age: float):
+                with ListingScraper(server.url, index_path, max_age=max_age) as scraper:
+                    return scraper.find(timestamp)
+
+            for name, find in [("cold", cold), ("warm, revalidated", lambda: warm(0)),
+                               ("warm, within max_age", lambda: warm(3600))]:
+                seconds, names = timed(find, args.runs)
+                assert names == expected
+                print(f"{name:>20}: {seconds * 1000:8.1f}ms per run")
+
+            # lookups against an index already in memory
+            index = ListingScraper(server.url, index_path, max_age=3600).index()
+            timestamps = [rows[i * len(rows) // args.lookups][1] for i in range(args.lookups)]
+            start = time.perf_counter()
+            for lookup_timestamp in timestamps:
+                index.lookup(lookup_timestamp)
+            bisect_seconds = (time.perf_counter() - start) / len(timestamps)
+            start = time.perf_counter()
+            for lookup_timestamp in timestamps[:100]:
+                [name for name, modified, _ in rows if modified == lookup_timestamp]
+            scan_seconds = (time.perf_counter() - start) / 100
+            print(f"{'lookup':>20}: {bisect_seconds * 1e6:.2f}us bisect, {scan_seconds * 1e6:.0f}us scanning the rows")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,32 @@
-import requests
+import os
+
 import pandas
 
+from src.scrape.listing import *
+
+listing_url = LISTING_URL
+last_modified = "2022-02-07 14:03"
+download_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "downloads")
+# the parsed listing, revalidated with a conditional request on later runs rather than parsed again
+index_path = os.path.join(download_dir, "listing_index.json")
+
+
+def hottest_records(csv_path: str):
+    data = pandas.read_csv(csv_path, low_memory=False)
+    # readings flagged as suspect carry an "s" ("23s"), and missing ones can be "*" or "M"
+    temperature = pandas.to_numeric(data["HourlyDryBulbTemperature"].astype(str).str.rstrip("s"), errors="coerce")
+    return data[temperature == temperature.max()]
+
 
 def main():
-    # your code here
-    pass
+    with ListingScraper(listing_url, index_path) as scraper:
+        names = scraper.find(last_modified)
+        print(scraper.stats)
+        if len(names) == 0:
+            print(f"No file was last modified at {last_modified}")
+            return
+        for name in names:
+            print(hottest_records(scraper.download(name, download_dir)).to_string())
 
 
 if __name__ == "__main__":
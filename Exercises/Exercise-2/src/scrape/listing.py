@@ -0,0 +1,219 @@
+import bisect
+import json
+import os
+import time
+
+from html.parser import HTMLParser
+from urllib.parse import unquote, urljoin
+
+import requests
+
+LISTING_URL = "https://www.ncei.noaa.gov/data/local-climatological-data/access/2021/"
+
+
+class ScrapeError(Exception):
+    err_str = "Could not fetch {url}: {reason}"
+
+    def __init__(self, url: str, reason: str):
+        self.url = url
+        self.reason = reason
+        super().__init__(self.err_str.format(url=url, reason=reason))
+
+
+class ListingParser(HTMLParser):
+    # the (file name, last modified, size) rows of an Apache style directory listing, parsed as the page is fed in:
+    # a row is kept as soon as its </tr> is seen, so the page itself is never held in memory. A row looks like
+    # <tr><td><a href="01001099999.csv">01001099999.csv</a></td><td align="right">2022-02-07 14:03  </td>
+    # <td align="right">4.1M</td><td>&nbsp;</td></tr>
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.href = None
+        self.cells = None
+        self.cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "tr":
+            self.href, self.cells, self.cell = None, [], None
+        elif tag == "td" and self.cells is not None:
+            self.cell = []
+        elif tag == "a" and self.cells is not None and self.href is None:
+            self.href = dict(attrs).get("href")
+
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "td" and self.cell is not None:
+            self.cells.append("".join(self.cell).strip())
+            self.cell = None
+        elif tag == "tr" and self.cells is not None:
+            self.end_row()
+            self.cells = None
+
+    def end_row(self):
+        # the header, the parent directory and subdirectories have no file to point at
+        if self.href is None or self.href.endswith("/") or self.href.startswith(("?", "/")) or len(self.cells) < 3:
+            return
+        self.rows.append((unquote(self.href), self.cells[1], self.cells[2]))
+
+
+def parse_listing(chunks):
+    # chunks of the page's text, e.g. a streamed response's iter_content(decode_unicode=True)
+    parser = ListingParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+    return parser.rows
+
+
+class ListingIndex:
+    # a listing's rows sorted by last modified, for lookups by timestamp in O(log n), plus the validators to
+    # revalidate it with
+    def __init__(self, url: str, rows: list, etag: str = None, last_modified: str = None, presorted: bool = False):
+        self.url = url
+        if not presorted:
+            rows = sorted(rows, key=lambda row: (row[1], row[0]))
+        self.names = [row[0] for row in rows]
+        self.modified = [row[1] for row in rows]
+        self.sizes = [row[2] for row in rows]
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, timestamp: str):
+        # the (name, size) of every file last modified at timestamp ("2022-02-07 14:03")
+        start = bisect.bisect_left(self.modified, timestamp)
+        end = bisect.bisect_right(self.modified, timestamp, lo=start)
+        return [(self.names[i], self.sizes[i]) for i in range(start, end)]
+
+    def to_json(self):
+        return {"url": self.url, "etag": self.etag, "last_modified": self.last_modified,
+                "rows": [list(row) for row in zip(self.names, self.modified, self.sizes)]}
+
+    @staticmethod
+    def from_json(data: dict):
+        # saved in order, so loading it doesn't sort again
+        return ListingIndex(data["url"], data["rows"], data["etag"], data["last_modified"], presorted=True)
+
+
+class ScrapeStats:
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        # of the listing pages parsed, decoded
+        self.chars = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        return (f"{self.requests} listing requests ({self.not_modified} not modified), {self.chars} chars parsed, "
+                f"{self.rows} rows in {self.seconds:.3f}s")
+
+
+class ListingScraper:
+    # finds files in a directory listing by their last modified time. The listing is parsed into a ListingIndex kept
+    # at index_path, and later runs revalidate it with If-None-Match / If-Modified-Since instead of fetching and
+    # parsing the page again; only a 200 replaces it. Within max_age seconds of the index being written it is used
+    # without asking at all
+    def __init__(self, url: str = LISTING_URL, index_path: str = None, max_age: float = 0, timeout: float = 30,
+                 chunk_size: int = 1 << 16, session: requests.Session = None):
+        self.url = url
+        self.index_path = index_path
+        self.max_age = max_age
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+        self.session = session or requests.Session()
+        self.stats = ScrapeStats()
+        self.cached = None
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def load_index(self):
+        if self.index_path is None or not os.path.exists(self.index_path):
+            return None
+        with open(self.index_path) as f:
+            index = ListingIndex.from_json(json.load(f))
+        return index if index.url == self.url else None
+
+    def save_index(self, index: ListingIndex):
+        if self.index_path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        part_path = self.index_path + ".part"
+        with open(part_path, "w") as f:
+            json.dump(index.to_json(), f)
+        os.replace(part_path, self.index_path)
+
+    def index(self):
+        start = time.perf_counter()
+        try:
+            return self.refresh()
+        finally:
+            self.stats.seconds += time.perf_counter() - start
+
+    def refresh(self):
+        index = self.cached or self.load_index()
+        if index is not None and self.max_age > 0 and self.index_path is not None and \
+                time.time() - os.path.getmtime(self.index_path) < self.max_age:
+            self.cached = index
+            return index
+
+        headers = {}
+        if index is not None and index.etag is not None:
+            headers["If-None-Match"] = index.etag
+        if index is not None and index.last_modified is not None:
+            headers["If-Modified-Since"] = index.last_modified
+        self.stats.requests += 1
+        with self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 304 and index is not None:
+                self.stats.not_modified += 1
+                if self.index_path is not None:
+                    # restarts the max_age clock
+                    os.utime(self.index_path)
+                self.cached = index
+                return index
+            if response.status_code != 200:
+                raise ScrapeError(self.url, f"HTTP {response.status_code} {response.reason}")
+            response.encoding = response.encoding or "utf-8"
+            rows = parse_listing(self.counted(response.iter_content(self.chunk_size, decode_unicode=True)))
+        self.stats.rows += len(rows)
+        index = ListingIndex(self.url, rows, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        self.save_index(index)
+        self.cached = index
+        return index
+
+    def counted(self, chunks):
+        for chunk in chunks:
+            self.stats.chars += len(chunk)
+            yield chunk
+
+    def find(self, timestamp: str):
+        return [name for name, _ in self.index().lookup(timestamp)]
+
+    def file_url(self, name: str):
+        return urljoin(self.url, name)
+
+    def download(self, name: str, download_dir: str):
+        # streamed to a part file, renamed once complete
+        os.makedirs(download_dir, exist_ok=True)
+        path = os.path.join(download_dir, os.path.basename(name))
+        part_path = path + ".part"
+        with self.session.get(self.file_url(name), stream=True, timeout=self.timeout) as response:
+            if response.status_code != 200:
+                raise ScrapeError(self.file_url(name), f"HTTP {response.status_code} {response.reason}")
+            with open(part_path, "wb") as out:
+                for chunk in response.iter_content(self.chunk_size):
+                    out.write(chunk)
+        os.replace(part_path, path)
+        return path
@@ -0,0 +1,128 @@
+import hashlib
+import html
+import threading
+import time
+
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def listing_html(path: str, rows: list):
+    # an Apache style index page for (name, last modified, size) rows, like the NOAA one
+    lines = ["<!DOCTYPE HTML PUBLIC \"-//W3C//DTD HTML 3.2 Final//EN\">",
+             f"<html>\n<head>\n<title>Index of {path}</title>\n</head>\n<body>\n<h1>Index of {path}</h1>\n<table>",
+             "<tr><th><a href=\"?C=N;O=D\">Name</a></th><th><a href=\"?C=M;O=A\">Last modified</a></th>"
+             "<th><a href=\"?C=S;O=A\">Size</a></th><th><a href=\"?C=D;O=A\">Description</a></th></tr>",
+             "<tr><th colspan=\"4\"><hr></th></tr>",
+             "<tr><td><a href=\"/data/local-climatological-data/access/\">Parent Directory</a></td><td>&nbsp;</td>"
+             "<td align=\"right\">  - </td><td>&nbsp;</td></tr>"]
+    for name, modified, size in rows:
+        lines.append(f"<tr><td><a href=\"{html.escape(name)}\">{html.escape(name)}</a></td>"
+                     f"<td align=\"right\">{modified}  </td><td align=\"right\">{size}</td><td>&nbsp;</td></tr>")
+    lines.append("<tr><th colspan=\"4\"><hr></th></tr>\n</table>\n</body></html>\n")
+    return "\n".join(lines).encode()
+
+
+class ListingRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.listing_server
+        path = self.path.split("?")[0]
+        server.record_request(path, self.headers.get("If-None-Match"), self.headers.get("If-Modified-Since"))
+        if server.latency > 0:
+            time.sleep(server.latency)
+        if path == server.path:
+            self.send_listing(server)
+        elif path.startswith(server.path) and path[len(server.path):] in server.files:
+            self.send_body(server.files[path[len(server.path):]], "text/csv")
+        else:
+            self.send_error(404)
+
+    def send_listing(self, server):
+        with server.lock:
+            body, etag, modified = server.body, server.etag, server.modified
+        if self.not_modified(etag, modified):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(modified, usegmt=True))
+            self.end_headers()
+            return
+        self.send_body(body, "text/html;charset=UTF-8",
+                       {"ETag": etag, "Last-Modified": formatdate(modified, usegmt=True)})
+
+    def not_modified(self, etag: str, modified: float):
+        # If-None-Match wins when both are sent, as in RFC 9110
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is not None:
+            try:
+                return int(modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def send_body(self, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ListingServer:
+    # a local stand-in for the NOAA directory: serves a listing page for rows at path, answering conditional
+    # requests with 304 until set_rows changes it, and the files in files under the same path
+    def __init__(self, rows: list, files: dict = None, path: str = "/data/local-climatological-data/access/2021/",
+                 latency: float = 0.0):
+        self.path = path
+        self.files = files or {}
+        self.latency = latency
+        self.requests = []
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.thread = None
+        self.set_rows(rows)
+
+    def set_rows(self, rows: list, modified: float = None):
+        body = listing_html(self.path, rows)
+        with self.lock:
+            self.body = body
+            self.etag = f"\"{hashlib.sha1(body).hexdigest()}\""
+            self.modified = modified if modified is not None else time.time()
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def record_request(self, path: str, if_none_match: str, if_modified_since: str):
+        with self.lock:
+            self.requests.append((path, if_none_match, if_modified_since))
+
+    def start(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), ListingRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.listing_server = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from scrape.listing import *
+from scrape.server import *
+
+ROWS = [("01001099999.csv", "2022-02-07 14:03", "4.1M"), ("01001499999.csv", "2022-02-07 14:02", "120K"),
+        ("01002099999.csv", "2022-02-07 14:03", "3.3M"), ("01008099999.csv", "2022-02-07 14:04", "1.0M"),
+        ("a b&c.csv", "2022-02-07 14:05", "10K")]
+
+
+class TestListingParser(unittest.TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_listing([listing_html("/2021/", ROWS).decode()]), ROWS)
+
+    def test_chunked(self):
+        # a tag or an entity cut in half between chunks
+        page = listing_html("/2021/", ROWS).decode()
+        self.assertEqual(parse_listing(page[i:i + 7] for i in range(0, len(page), 7)), ROWS)
+
+
+class TestListingIndex(unittest.TestCase):
+    def test_lookup(self):
+        index = ListingIndex("http://x/", ROWS)
+        self.assertEqual(index.lookup("2022-02-07 14:03"), [("01001099999.csv", "4.1M"), ("01002099999.csv", "3.3M")])
+        self.assertEqual(index.lookup("2022-02-07 14:06"), [])
+        self.assertEqual(index.lookup("2022-02-07 14:01"), [])
+
+    def test_json(self):
+        index = ListingIndex.from_json(ListingIndex("http://x/", ROWS, "\"abc\"", "Mon, 07 Feb 2022 14:03:00 GMT")
+                                       .to_json())
+        self.assertEqual((index.etag, index.last_modified), ("\"abc\"", "Mon, 07 Feb 2022 14:03:00 GMT"))
+        self.assertEqual(index.lookup("2022-02-07 14:05"), [("a b&c.csv", "10K")])
+
+
+class TestListingScraper(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmp_dir, "listing_index.json")
+        self.server = ListingServer(ROWS, files={"01001099999.csv": b"STATION,HourlyDryBulbTemperature\n1,23s\n"},
+                                    path="/2021/").start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmp_dir)
+
+    def scraper(self, **kwargs):
+        return ListingScraper(self.server.url, self.index_path, **kwargs)
+
+    def test_find(self):
+        with self.scraper() as scraper:
+            self.assertEqual(scraper.find("2022-02-07 14:03"), ["01001099999.csv", "01002099999.csv"])
+            path = scraper.download("01001099999.csv", self.tmp_dir)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"STATION,HourlyDryBulbTemperature\n1,23s\n")
+        with self.assertRaises(ScrapeError):
+            scraper.download("missing.csv", self.tmp_dir)
+
+    def test_revalidate(self):
+        with self.scraper() as scraper:
+            scraper.find("2022-02-07 14:03")
+        # a new run: the saved index is revalidated, not fetched and parsed again
+        with self.scraper() as scraper:
+            self.assertEqual(scraper.find("2022-02-07 14:04"), ["01008099999.csv"])
+            self.assertEqual((scraper.stats.requests, scraper.stats.not_modified, scraper.stats.rows), (1, 1, 0))
+        self.assertEqual(self.server.requests[0][1:], (None, None))
+        self.assertEqual(self.server.requests[1][1], self.server.etag)
+
+        self.server.set_rows(ROWS + [("99999999999.csv", "2022-03-01 00:00", "1K")])
+        with self.scraper() as scraper:
+            self.assertEqual(scraper.find("2022-03-01 00:00"), ["99999999999.csv"])
+            self.assertEqual((scraper.stats.requests, scraper.stats.not_modified, scraper.stats.rows), (1, 0, 6))
+
+    def test_if_modified_since(self):
+        # a server that only sends Last-Modified
+        with self.scraper() as scraper:
+            index = scraper.index()
+        index.etag = None
+        with open(self.index_path, "w") as f:
+            json.dump(index.to_json(), f)
+        with self.scraper() as scraper:
+            scraper.index()
+            self.assertEqual(scraper.stats.not_modified, 1)
+        self.assertEqual(self.server.requests[-1][1:], (None, index.last_modified))
+
+    def test_max_age(self):
+        with self.scraper(max_age=60) as scraper:
+            scraper.index()
+        with self.scraper(max_age=60) as scraper:
+            self.assertEqual(len(scraper.index()), len(ROWS))
+            self.assertEqual(scraper.stats.requests, 0)
+
+    def test_listing_error(self):
+        with ListingScraper(self.server.url + "missing/") as scraper:
+            with self.assertRaises(ScrapeError):
+                scraper.index()
+
+
+if __name__ == '__main__':
+    unittest.main()
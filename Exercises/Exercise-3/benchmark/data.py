@@ -0,0 +1,22 @@
+import gzip
+import random
+
+WORDS = ["data", "engineering", "crawl", "common", "python", "stream", "bucket", "object", "record", "lorem", "ipsum",
+         "dolor", "sit", "amet", "the", "of", "and", "to", "in", "is"]
+
+
+def generate_wet_gzip(target_mb: float, seed: int = 0):
+    # common crawl style WET data: one gzip member per WARC conversion record
+    rng = random.Random(seed)
+    members = []
+    size = 0
+    record_id = 0
+    while size < target_mb * 1e6:
+        text = "\n".join(" ".join(rng.choices(WORDS, k=rng.randrange(5, 30))) for _ in range(rng.randrange(5, 60)))
+        record = (f"WARC/1.0\r\nWARC-Type: conversion\r\nWARC-Target-URI: http://example.com/{record_id}\r\n"
+                  f"Content-Length: {len(text)}\r\n\r\n{text}\r\n\r\n")
+        member = gzip.compress(record.encode(), compresslevel=6)
+        members.append(member)
+        size += len(member)
+        record_id += 1
+    return b"".join(members)
@@ -0,0 +1,49 @@
+import argparse
+import gzip
+import logging
+import os
+
+from moto.server import ThreadedMotoServer
+
+from benchmark.data import generate_wet_gzip
+from src.s3.fanout import *
+
+BUCKET = "commoncrawl"
+PATHS_KEY = "crawl-data/CC-MAIN-2022-05/wet.paths.gz"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure manifest fan-out throughput with the number of workers")
+    parser.add_argument("--objects", type=int, default=48)
+    parser.add_argument("--mb", type=float, default=0.5, help="compressed size of each object")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        endpoint_url = f"http://{host}:{port}"
+        setup_client = make_client(1, region_name="us-east-1", endpoint_url=endpoint_url)
+        setup_client.create_bucket(Bucket=BUCKET)
+        body = generate_wet_gzip(args.mb)
+        keys = [f"crawl-data/CC-MAIN-2022-05/segments/{i}/wet/{i}.warc.wet.gz" for i in range(args.objects)]
+        for key in keys:
+            setup_client.put_object(Bucket=BUCKET, Key=key, Body=body)
+        setup_client.put_object(Bucket=BUCKET, Key=PATHS_KEY, Body=gzip.compress("\n".join(keys).encode()))
+
+        print(f"{args.objects} objects of {len(body) / 1e6:.1f}MB, streamed and line-counted")
+        for workers in args.workers:
+            client = make_client(workers, region_name="us-east-1", endpoint_url=endpoint_url)
+            stats = ManifestFetcher(client, BUCKET, workers=workers).fetch_manifest(PATHS_KEY)
+            assert stats.objects == args.objects
+            print(f"{workers:>3} workers: {stats}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import gzip
+import logging
+import os
+import tempfile
+import time
+
+import boto3
+
+from moto.server import ThreadedMotoServer
+
+from benchmark.data import generate_wet_gzip
+from src.s3.utils import *
+
+BUCKET = "commoncrawl"
+KEY = "crawl-data/CC-MAIN-2022-05/segments/benchmark.warc.wet.gz"
+
+
+def download_then_read(client):
+    # the straightforward solution: the whole object goes to a temporary file first
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "wet.gz")
+        client.download_file(BUCKET, KEY, path)
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as lines:
+            return sum(1 for _ in lines)
+
+
+def stream(client, **reader_options):
+    with S3LineReader(client, BUCKET, KEY, **reader_options) as lines:
+        return sum(1 for _ in lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streaming an s3 gzip file against downloading it first")
+    parser.add_argument("--mb", type=float, default=20, help="compressed size of the test object")
+    parser.add_argument("--chunk-mb", type=float, default=8)
+    parser.add_argument("--prefetch", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        client = boto3.client("s3", region_name="us-east-1", endpoint_url=f"http://{host}:{port}")
+        client.create_bucket(Bucket=BUCKET)
+        data = generate_wet_gzip(args.mb)
+        client.put_object(Bucket=BUCKET, Key=KEY, Body=data)
+        mb = len(data) / 1e6
+        print(f"{mb:.1f}MB compressed, {len(gzip.decompress(data)) / 1e6:.1f}MB of text, best of {args.repeat}")
+
+        runs = [("download_file + gzip.open", lambda: download_then_read(client))]
+        for prefetch in args.prefetch:
+            runs.append((f"stream, prefetch={prefetch}",
+                         lambda prefetch=prefetch: stream(client, prefetch=prefetch,
+                                                          chunk_size=int(args.chunk_mb * (1 << 20)))))
+        n_lines = None
+        print(f"{'':>28} {'seconds':>9} {'MB/s':>8}")
+        for name, run in runs:
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                lines = run()
+                best = min(best, time.perf_counter() - start)
+                assert n_lines is None or lines == n_lines
+                n_lines = lines
+            print(f"{name:>28} {best:>9.3f} {mb / best:>8.1f}")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
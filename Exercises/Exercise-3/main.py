@@ -1,9 +1,43 @@
 import boto3
 
+from src.s3.fanout import *
+from src.s3.utils import *
+
+bucket = "commoncrawl"
+paths_key = "crawl-data/CC-MAIN-2022-05/wet.paths.gz"
+
+# set fan_out to fetch the first max_objects WET files the paths file lists, rather than printing the first one
+fan_out = False
+max_objects = 100
+fetch_workers = 16
+download_dir = "downloads"
+checkpoint_path = "wet_done.txt"
+
+
+def print_first_wet_file():
+    client = boto3.client("s3")
+    # the paths file is small enough for a single GET
+    with S3LineReader(client, bucket, paths_key, prefetch=0) as paths:
+        wet_key = next(iter(paths))
+    with S3LineReader(client, bucket, wet_key) as wet_lines:
+        for line in wet_lines:
+            print(line)
+
+
+def fetch_wet_files():
+    fetcher = ManifestFetcher(make_client(fetch_workers), bucket, workers=fetch_workers, out_dir=download_dir,
+                              checkpoint_path=checkpoint_path)
+    stats = fetcher.fetch_manifest(paths_key, limit=max_objects)
+    print(stats)
+    for key, err in stats.failed.items():
+        print(f"{key}: {err}")
+
 
 def main():
-    # your code here
-    pass
+    if fan_out:
+        fetch_wet_files()
+    else:
+        print_first_wet_file()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+import gzip
+import math
+import os
+import time
+import zlib
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import boto3
+
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .utils import *
+
+
+def make_client(workers: int, max_attempts: int = 5, **client_options):
+    # one client shared by every worker: clients are thread-safe, and the connection pool needs a connection per
+    # worker or the workers queue up for one
+    config = Config(max_pool_connections=workers, retries={"max_attempts": max_attempts, "mode": "adaptive"})
+    return boto3.client("s3", config=config, **client_options)
+
+
+def read_manifest(client, bucket: str, key: str):
+    with S3LineReader(client, bucket, key, prefetch=0) as lines:
+        return [line for line in lines if line != ""]
+
+
+class Checkpoint:
+    # the keys already fetched, one per line, appended as each object finishes so an interrupted run picks up
+    # where it stopped
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip() != ""}
+
+    def __contains__(self, key: str):
+        return key in self.done
+
+    def add(self, key: str):
+        self.done.add(key)
+        if self.path is not None:
+            with open(self.path, "a") as f:
+                f.write(key + "\n")
+
+
+class FetchStats:
+    def __init__(self):
+        self.objects = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.retries = 0
+        self.seconds = 0.0
+        self.latencies = []
+        self.failed = {}
+
+    def record(self, n_bytes: int, seconds: float):
+        self.objects += 1
+        self.bytes += n_bytes
+        self.latencies.append(seconds)
+
+    @property
+    def mb_per_second(self):
+        return self.bytes / 1e6 / self.seconds if self.seconds > 0 else float("nan")
+
+    def latency_percentile(self, percentile: float):
+        if len(self.latencies) == 0:
+            return float("nan")
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+    def __repr__(self):
+        return (f"{self.objects} objects ({self.skipped} already done, {len(self.failed)} failed), "
+                f"{self.bytes / 1e6:.1f}MB in {self.seconds:.3f}s ({self.mb_per_second:.1f}MB/s), "
+                f"latency p50 {self.latency_percentile(50):.3f}s p95 {self.latency_percentile(95):.3f}s "
+                f"p99 {self.latency_percentile(99):.3f}s, {self.retries} retries")
+
+
+class ManifestFetcher:
+    # fetches the objects a manifest lists, `workers` at a time through one shared client. With out_dir each object
+    # is downloaded there; otherwise its lines are streamed to line_handler(key, lines), which returns anything
+    # (by default the lines are only counted). Only objects that finished are checkpointed, and failed ones are
+    # reported in the stats rather than stopping the run
+    def __init__(self, client, bucket: str, workers: int = 8, out_dir: str = None, line_handler=None,
+                 checkpoint_path: str = None, chunk_size: int = 1 << 20, retries: int = 2):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if out_dir is not None and line_handler is not None:
+            raise ValueError("Objects are either downloaded to out_dir or streamed to line_handler, not both")
+        self.client = client
+        self.bucket = bucket
+        self.workers = workers
+        self.out_dir = out_dir
+        self.line_handler = line_handler or ManifestFetcher.count_lines
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.results = {}
+        self.stats = FetchStats()
+
+    @staticmethod
+    def count_lines(key: str, lines):
+        return sum(1 for _ in lines)
+
+    def fetch_manifest(self, manifest_key: str, limit: int = None):
+        keys = read_manifest(self.client, self.bucket, manifest_key)
+        return self.fetch_all(keys[:limit] if limit is not None else keys)
+
+    def fetch_all(self, keys: list):
+        self.stats = FetchStats()
+        todo = [key for key in keys if key not in self.checkpoint]
+        self.stats.skipped = len(keys) - len(todo)
+        if self.out_dir is not None:
+            os.makedirs(self.out_dir, exist_ok=True)
+        start = time.perf_counter()
+        keys_left = iter(todo)
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # a bounded window of futures, rather than one per key in a manifest of tens of thousands
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    key = next(keys_left, None)
+                    if key is None:
+                        break
+                    in_flight[executor.submit(self.fetch, key)] = key
+                if len(in_flight) == 0:
+                    break
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key = in_flight.pop(future)
+                    result, error, n_bytes, seconds, retries = future.result()
+                    self.stats.retries += retries
+                    if error is not None:
+                        self.stats.failed[key] = error
+                        continue
+                    self.results[key] = result
+                    self.stats.record(n_bytes, seconds)
+                    self.checkpoint.add(key)
+        self.stats.seconds = time.perf_counter() - start
+        return self.stats
+
+    def fetch(self, key: str):
+        start = time.perf_counter()
+        reader = None
+        result, error = None, None
+        try:
+            reader = S3ObjectReader(self.client, self.bucket, key, prefetch=0, retries=self.retries)
+            if self.out_dir is not None:
+                result = self.download(key, reader)
+            else:
+                with open_text(reader) as text:
+                    result = self.line_handler(key, (line.rstrip("\n") for line in text))
+        except (BotoCoreError, ClientError, gzip.BadGzipFile, EOFError, zlib.error, OSError) as err:
+            # a corrupt or truncated object, or a local write failing, costs that object alone
+            error = str(err) or type(err).__name__
+        finally:
+            if reader is not None:
+                reader.close()
+        n_bytes, retries = (reader.bytes_read, reader.retried) if reader is not None else (0, 0)
+        return result, error, n_bytes, time.perf_counter() - start, retries
+
+    def download(self, key: str, reader: S3ObjectReader):
+        path = os.path.join(self.out_dir, os.path.basename(key))
+        try:
+            with open(path + ".part", "wb") as out:
+                while chunk := reader.read(self.chunk_size):
+                    out.write(chunk)
+        except BaseException:
+            if os.path.exists(path + ".part"):
+                os.remove(path + ".part")
+            raise
+        os.replace(path + ".part", path)
+        return path
@@ -0,0 +1,161 @@
+import gzip
+import io
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ConnectionClosedError, IncompleteReadError, ReadTimeoutError, ResponseStreamingError
+
+# failures part way through a response body; botocore already retries the requests themselves
+BODY_ERRORS = (ConnectionClosedError, IncompleteReadError, ReadTimeoutError, ResponseStreamingError)
+
+
+def split_s3_uri(uri: str):
+    if not uri.startswith("s3://"):
+        raise ValueError(f"Not an s3 uri: {uri}")
+    bucket, _, key = uri[len("s3://"):].partition("/")
+    if bucket == "" or key == "":
+        raise ValueError(f"s3 uri needs a bucket and a key: {uri}")
+    return bucket, key
+
+
+class S3ObjectReader(io.RawIOBase):
+    # a read-only file object over an s3 object. With prefetch > 0 the object is fetched as ranged GETs of
+    # chunk_size bytes, up to prefetch of them in flight while the caller works through the current one; with
+    # prefetch = 0 it is a single GET read straight off the response body. Either way at most (prefetch + 1) chunks
+    # are held in memory, and nothing is written to disk
+    def __init__(self, client, bucket: str, key: str, chunk_size: int = 8 << 20, prefetch: int = 2,
+                 executor: ThreadPoolExecutor = None, retries: int = 2):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative")
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.chunk_size = chunk_size
+        self.prefetch = prefetch
+        self.retries = retries
+        # broken bodies read again plus the retries botocore made on the requests themselves
+        self.retried = 0
+        self.bytes_read = 0
+        self.body = None
+        self.chunk = memoryview(b"")
+        self.pending = deque()
+        self.owns_executor = executor is None and prefetch > 0
+        self.executor = ThreadPoolExecutor(max_workers=prefetch) if self.owns_executor else executor
+
+        if prefetch == 0:
+            response = self.client.get_object(Bucket=bucket, Key=key)
+            self.count_retries(response)
+            self.body = response["Body"]
+            self.size = response["ContentLength"]
+            self.etag = response["ETag"]
+        else:
+            head = self.client.head_object(Bucket=bucket, Key=key)
+            self.count_retries(head)
+            self.size = head["ContentLength"]
+            # every range comes from the same version of the object, or the read fails
+            self.etag = head["ETag"]
+            self.next_offset = 0
+            self.fill_pending()
+
+    def count_retries(self, response: dict):
+        self.retried += response.get("ResponseMetadata", {}).get("RetryAttempts", 0)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.body is not None:
+            data = self.read_body(len(buffer))
+        else:
+            if len(self.chunk) == 0:
+                if len(self.pending) == 0:
+                    return 0
+                self.chunk = memoryview(self.pending.popleft().result())
+                self.fill_pending()
+            data = self.chunk[:len(buffer)]
+            self.chunk = self.chunk[len(data):]
+        buffer[:len(data)] = data
+        self.bytes_read += len(data)
+        return len(data)
+
+    def read_body(self, n_bytes: int):
+        for attempt in range(self.retries + 1):
+            try:
+                return self.body.read(n_bytes)
+            except BODY_ERRORS:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                # carry on from where the broken response stopped
+                response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.bytes_read}-",
+                                                  IfMatch=self.etag)
+                self.count_retries(response)
+                self.body.close()
+                self.body = response["Body"]
+
+    def fill_pending(self):
+        while len(self.pending) < self.prefetch and self.next_offset < self.size:
+            end = min(self.next_offset + self.chunk_size, self.size)
+            self.pending.append(self.executor.submit(self.fetch_range, self.next_offset, end))
+            self.next_offset = end
+
+    def fetch_range(self, start: int, end: int):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={start}-{end - 1}",
+                                                  IfMatch=self.etag)
+                self.count_retries(response)
+                return response["Body"].read()
+            except BODY_ERRORS:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+
+    def close(self):
+        if self.closed:
+            return
+        for future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        if self.body is not None:
+            self.body.close()
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+        super().close()
+
+
+def open_text(raw: S3ObjectReader, compressed: bool = None, encoding: str = "utf-8", errors: str = "replace",
+              buffer_size: int = 1 << 20):
+    # multi-member gzip files like the common crawl WET files are read through to the end
+    stream = io.BufferedReader(raw, buffer_size=buffer_size)
+    if compressed is None:
+        compressed = raw.key.endswith(".gz")
+    if compressed:
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding=encoding, errors=errors)
+
+
+class S3LineReader:
+    # yields the lines of an s3 object, without their line endings, decompressing it on the fly if it's gzipped
+    def __init__(self, client, bucket: str, key: str, compressed: bool = None, encoding: str = "utf-8",
+                 errors: str = "replace", buffer_size: int = 1 << 20, **reader_options):
+        self.raw = S3ObjectReader(client, bucket, key, **reader_options)
+        self.text = open_text(self.raw, compressed, encoding, errors, buffer_size)
+
+    def __iter__(self):
+        for line in self.text:
+            yield line.rstrip("\n")
+
+    def close(self):
+        self.text.close()
+        self.raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
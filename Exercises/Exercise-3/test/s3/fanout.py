@@ -0,0 +1,122 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+import boto3
+
+from moto import mock_aws
+
+from s3.fanout import *
+from test.s3.utils import FlakyClient, multi_member_gzip, wet_lines
+
+BUCKET = "commoncrawl"
+
+
+@mock_aws
+class TestManifestFetcher(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=BUCKET)
+        self.keys = [f"crawl-data/segments/{i}.warc.wet.gz" for i in range(12)]
+        self.bodies = {}
+        for i, key in enumerate(self.keys):
+            self.bodies[key] = multi_member_gzip(wet_lines(i + 1))
+            self.client.put_object(Bucket=BUCKET, Key=key, Body=self.bodies[key])
+        self.client.put_object(Bucket=BUCKET, Key="wet.paths.gz",
+                               Body=gzip.compress(("\n".join(self.keys) + "\n").encode()))
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def test_make_client(self):
+        client = make_client(16, region_name="us-east-1")
+        self.assertEqual(client.meta.config.max_pool_connections, 16)
+
+    def test_read_manifest(self):
+        self.assertEqual(read_manifest(self.client, BUCKET, "wet.paths.gz"), self.keys)
+
+    def test_stream_lines(self):
+        fetcher = ManifestFetcher(self.client, BUCKET, workers=3)
+        stats = fetcher.fetch_manifest("wet.paths.gz")
+        self.assertEqual(fetcher.results, {key: 6 * (i + 1) for i, key in enumerate(self.keys)})
+        self.assertEqual(stats.objects, len(self.keys))
+        self.assertEqual(stats.bytes, sum(len(body) for body in self.bodies.values()))
+        self.assertEqual(len(stats.latencies), len(self.keys))
+        self.assertLessEqual(stats.latency_percentile(50), stats.latency_percentile(99))
+        self.assertEqual(stats.retries, 0)
+
+    def test_line_handler(self):
+        fetcher = ManifestFetcher(self.client, BUCKET, workers=2,
+                                  line_handler=lambda key, lines: [line for line in lines if line.startswith("WARC-T")])
+        fetcher.fetch_all(self.keys[:2])
+        self.assertEqual(fetcher.results[self.keys[1]],
+                         ["WARC-Type: conversion", "WARC-Target-URI: http://example.com/0",
+                          "WARC-Type: conversion", "WARC-Target-URI: http://example.com/1"])
+
+    def test_download(self):
+        out_dir = os.path.join(self.tmp_dir, "wet")
+        fetcher = ManifestFetcher(self.client, BUCKET, workers=4, out_dir=out_dir)
+        fetcher.fetch_manifest("wet.paths.gz", limit=5)
+        self.assertEqual(sorted(os.listdir(out_dir)), sorted(os.path.basename(key) for key in self.keys[:5]))
+        with open(fetcher.results[self.keys[3]], "rb") as f:
+            self.assertEqual(f.read(), self.bodies[self.keys[3]])
+
+    def test_out_dir_or_line_handler(self):
+        with self.assertRaises(ValueError):
+            ManifestFetcher(self.client, BUCKET, out_dir=self.tmp_dir, line_handler=ManifestFetcher.count_lines)
+
+    def test_checkpoint_resume(self):
+        checkpoint_path = os.path.join(self.tmp_dir, "done.txt")
+        ManifestFetcher(self.client, BUCKET, checkpoint_path=checkpoint_path).fetch_all(self.keys[:4])
+        fetcher = ManifestFetcher(self.client, BUCKET, checkpoint_path=checkpoint_path)
+        stats = fetcher.fetch_all(self.keys)
+        self.assertEqual(stats.skipped, 4)
+        self.assertEqual(stats.objects, len(self.keys) - 4)
+        self.assertEqual(sorted(fetcher.results.keys()), sorted(self.keys[4:]))
+        with open(checkpoint_path) as f:
+            self.assertEqual(sorted(f.read().split()), sorted(self.keys))
+
+    def test_failures_not_checkpointed(self):
+        checkpoint_path = os.path.join(self.tmp_dir, "done.txt")
+        fetcher = ManifestFetcher(self.client, BUCKET, checkpoint_path=checkpoint_path)
+        stats = fetcher.fetch_all(self.keys[:2] + ["crawl-data/missing.warc.wet.gz"])
+        self.assertEqual(list(stats.failed.keys()), ["crawl-data/missing.warc.wet.gz"])
+        self.assertEqual(stats.objects, 2)
+        self.assertNotIn("crawl-data/missing.warc.wet.gz", Checkpoint(checkpoint_path))
+        self.assertIn(self.keys[0], Checkpoint(checkpoint_path))
+
+    def test_corrupt_objects_fail_alone(self):
+        checkpoint_path = os.path.join(self.tmp_dir, "done.txt")
+        truncated, not_gzip = "crawl-data/truncated.warc.wet.gz", "crawl-data/not_gzip.warc.wet.gz"
+        self.client.put_object(Bucket=BUCKET, Key=truncated, Body=self.bodies[self.keys[0]][:-20])
+        self.client.put_object(Bucket=BUCKET, Key=not_gzip, Body=b"\x1f\x8b" + b"junk" * 100)
+        fetcher = ManifestFetcher(self.client, BUCKET, workers=2, checkpoint_path=checkpoint_path)
+        stats = fetcher.fetch_all([truncated] + self.keys[:3] + [not_gzip])
+        self.assertEqual(sorted(stats.failed.keys()), sorted([truncated, not_gzip]))
+        self.assertEqual(stats.objects, 3)
+        self.assertEqual(sorted(Checkpoint(checkpoint_path).done), sorted(self.keys[:3]))
+
+    def test_retries_counted(self):
+        fetcher = ManifestFetcher(FlakyClient(self.client, failures=2), BUCKET, workers=1)
+        stats = fetcher.fetch_all(self.keys[:3])
+        self.assertEqual(stats.retries, 2)
+        self.assertEqual(fetcher.results, {key: 6 * (i + 1) for i, key in enumerate(self.keys[:3])})
+
+    def test_retries_exhausted(self):
+        fetcher = ManifestFetcher(FlakyClient(self.client, failures=3), BUCKET, workers=1, retries=2)
+        stats = fetcher.fetch_all(self.keys[:2])
+        self.assertEqual(list(stats.failed.keys()), self.keys[:1])
+        self.assertEqual(stats.retries, 2)
+        self.assertEqual(stats.objects, 1)
+
+    def test_latency_percentile(self):
+        stats = FetchStats()
+        self.assertTrue(math.isnan(stats.latency_percentile(50)))
+        for seconds in range(1, 101):
+            stats.record(1, seconds)
+        self.assertEqual(stats.latency_percentile(50), 50)
+        self.assertEqual(stats.latency_percentile(99), 99)
+        self.assertEqual(stats.latency_percentile(100), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
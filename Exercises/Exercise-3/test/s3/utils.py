@@ -0,0 +1,156 @@
+import gzip
+import unittest
+
+import boto3
+
+from botocore.exceptions import ClientError, ResponseStreamingError
+from moto import mock_aws
+
+from s3.utils import *
+
+BUCKET = "commoncrawl"
+
+
+def wet_lines(n_records: int):
+    lines = []
+    for i in range(n_records):
+        lines += ["WARC/1.0", "WARC-Type: conversion", f"WARC-Target-URI: http://example.com/{i}", "",
+                  f"page {i} " + "lorem ipsum " * (i % 50), ""]
+    return lines
+
+
+def multi_member_gzip(lines: list, lines_per_member: int = 6):
+    # one gzip member per record, as in the common crawl WET files
+    return b"".join(gzip.compress(("\n".join(lines[i:i + lines_per_member]) + "\n").encode())
+                    for i in range(0, len(lines), lines_per_member))
+
+
+class FlakyBody:
+    def __init__(self, body, fail_reads: list):
+        self.body = body
+        self.fail_reads = fail_reads
+
+    def read(self, *args):
+        if len(self.fail_reads) > 0:
+            self.fail_reads.pop()
+            raise ResponseStreamingError(error="connection reset")
+        return self.body.read(*args)
+
+    def close(self):
+        self.body.close()
+
+
+class FlakyClient:
+    # fails the first body reads, the way a dropped connection does part way through a response
+    def __init__(self, client, failures: int):
+        self.client = client
+        self.fail_reads = [None] * failures
+        self.get_object_calls = []
+
+    def head_object(self, **kwargs):
+        return self.client.head_object(**kwargs)
+
+    def get_object(self, **kwargs):
+        self.get_object_calls.append(kwargs)
+        response = self.client.get_object(**kwargs)
+        response["Body"] = FlakyBody(response["Body"], self.fail_reads)
+        return response
+
+
+@mock_aws
+class TestS3Reader(unittest.TestCase):
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=BUCKET)
+        self.lines = wet_lines(500)
+        self.text = ("\n".join(self.lines) + "\n").encode()
+        self.client.put_object(Bucket=BUCKET, Key="wet.gz", Body=multi_member_gzip(self.lines))
+        self.client.put_object(Bucket=BUCKET, Key="wet.txt", Body=self.text)
+
+    def read_all(self, key: str, **reader_options):
+        with S3ObjectReader(self.client, BUCKET, key, **reader_options) as reader:
+            return reader.read()
+
+    def test_split_s3_uri(self):
+        self.assertEqual(split_s3_uri("s3://commoncrawl/crawl-data/wet.paths.gz"),
+                         ("commoncrawl", "crawl-data/wet.paths.gz"))
+        with self.assertRaises(ValueError):
+            split_s3_uri("commoncrawl/crawl-data/wet.paths.gz")
+        with self.assertRaises(ValueError):
+            split_s3_uri("s3://commoncrawl/")
+
+    def test_ranged_read(self):
+        for chunk_size, prefetch in [(1000, 1), (999, 3), (len(self.text), 2), (len(self.text) * 2, 1)]:
+            self.assertEqual(self.read_all("wet.txt", chunk_size=chunk_size, prefetch=prefetch), self.text)
+
+    def test_single_get_read(self):
+        self.assertEqual(self.read_all("wet.txt", prefetch=0), self.text)
+
+    def test_small_reads(self):
+        with S3ObjectReader(self.client, BUCKET, "wet.txt", chunk_size=1000, prefetch=2) as reader:
+            parts = []
+            while part := reader.read(333):
+                parts.append(part)
+                self.assertLessEqual(len(reader.pending), 2)
+        self.assertEqual(b"".join(parts), self.text)
+
+    def test_empty_object(self):
+        self.client.put_object(Bucket=BUCKET, Key="empty", Body=b"")
+        self.assertEqual(self.read_all("empty"), b"")
+        self.assertEqual(self.read_all("empty", prefetch=0), b"")
+
+    def test_missing_object(self):
+        with self.assertRaises(ClientError):
+            S3ObjectReader(self.client, BUCKET, "missing.gz")
+
+    def test_object_changed_while_reading(self):
+        with S3ObjectReader(self.client, BUCKET, "wet.txt", chunk_size=1000, prefetch=1) as reader:
+            reader.read(1000)
+            self.client.put_object(Bucket=BUCKET, Key="wet.txt", Body=b"something else" * 1000)
+            with self.assertRaises(ClientError):
+                reader.read()
+
+    def test_ranged_retry(self):
+        client = FlakyClient(self.client, failures=2)
+        with S3ObjectReader(client, BUCKET, "wet.txt", chunk_size=10_000, prefetch=1) as reader:
+            self.assertEqual(reader.read(), self.text)
+            self.assertEqual(reader.retried, 2)
+
+    def test_single_get_retry(self):
+        client = FlakyClient(self.client, failures=1)
+        with S3ObjectReader(client, BUCKET, "wet.txt", prefetch=0) as reader:
+            start = reader.read(5000)
+            client.fail_reads.append(None)
+            self.assertEqual(start + reader.read(), self.text)
+            self.assertEqual(reader.retried, 2)
+        self.assertEqual(client.get_object_calls[-1]["Range"], "bytes=5000-")
+
+    def test_retries_exhausted(self):
+        client = FlakyClient(self.client, failures=3)
+        with self.assertRaises(ResponseStreamingError):
+            with S3ObjectReader(client, BUCKET, "wet.txt", chunk_size=10_000, prefetch=1, retries=2) as reader:
+                reader.read()
+
+    def test_gzip_lines(self):
+        for prefetch in [0, 1, 4]:
+            with S3LineReader(self.client, BUCKET, "wet.gz", chunk_size=2000, prefetch=prefetch) as reader:
+                self.assertEqual(list(reader), self.lines)
+
+    def test_plain_lines(self):
+        with S3LineReader(self.client, BUCKET, "wet.txt", chunk_size=2000) as reader:
+            self.assertEqual(list(reader), self.lines)
+
+    def test_compressed_override(self):
+        self.client.put_object(Bucket=BUCKET, Key="wet.paths", Body=gzip.compress(b"a.gz\nb.gz\n"))
+        with S3LineReader(self.client, BUCKET, "wet.paths", compressed=True) as reader:
+            self.assertEqual(list(reader), ["a.gz", "b.gz"])
+
+    def test_first_line_only(self):
+        with S3LineReader(self.client, BUCKET, "wet.gz", chunk_size=1000, prefetch=2) as reader:
+            self.assertEqual(next(iter(reader)), "WARC/1.0")
+            self.assertLess(reader.raw.bytes_read, len(multi_member_gzip(self.lines)))
+        self.assertTrue(reader.raw.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import argparse
+import csv
+import glob
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from benchmark.data import generate_tree
+from src.flatten.convert import *
+
+
+def convert_naively(root: str, out_dir: str):
+    # the straightforward solution: glob the tree, load each file whole and infer its columns from every record
+    for json_path in glob.glob(os.path.join(root, "**", "*.json"), recursive=True):
+        with open(json_path) as f:
+            text = f.read()
+        try:
+            data = json.loads(text)
+            records = data if isinstance(data, list) else [data]
+        except json.JSONDecodeError:
+            records = [json.loads(line) for line in text.splitlines() if line.strip() != ""]
+        rows = [flatten(record) for record in records]
+        columns = list({column: None for row in rows for column in row})
+        csv_path = csv_path_for(json_path, root, out_dir)
+        os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+        with open(csv_path, "w", newline="") as out:
+            writer = csv.DictWriter(out, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time JsonToCsvConverter on a generated ragged tree of json files")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        root = os.path.join(tmp_dir, "data")
+        start = time.perf_counter()
+        n_files, n_records = generate_tree(root, args.files)
+        print(f"generated {n_files} files, {n_records} records in {time.perf_counter() - start:.1f}s")
+
+        out_dir = os.path.join(tmp_dir, "naive")
+        start = time.perf_counter()
+        convert_naively(root, out_dir)
+        naive_secs = time.perf_counter() - start
+        print(f"{'naive':>10}: {naive_secs:.3f}s ({n_files / naive_secs:,.0f} files/s)")
+        shutil.rmtree(out_dir)
+        for workers in args.workers:
+            out_dir = os.path.join(tmp_dir, f"workers_{workers}")
+            stats = JsonToCsvConverter(workers=workers, out_dir=out_dir).convert_tree(root)
+            assert stats.files == n_files and stats.records == n_records
+            print(f"{workers:>2} workers: {stats} ({naive_secs / stats.seconds:.2f}x naive)")
+            shutil.rmtree(out_dir)
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
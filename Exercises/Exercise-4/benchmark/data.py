@@ -0,0 +1,57 @@
+import json
+import os
+import random
+
+RECCLASSES = ["L5", "H6", "EH4", "Acapulcoite", "LL6", "CM2", "Iron, IIAB"]
+
+
+def meteorite(rng: random.Random, record_id: int):
+    lat, long = rng.uniform(-90, 90), rng.uniform(-180, 180)
+    record = {
+        "name": f"Meteorite {record_id}", "id": str(record_id), "nametype": "Valid",
+        "recclass": rng.choice(RECCLASSES), "mass": str(rng.randrange(1, 100_000)),
+        "fall": rng.choice(["Fell", "Found"]),
+        "year": f"{rng.randrange(1800, 2020)}-01-01T00:00:00.000", "reclat": f"{lat:.6f}", "reclong": f"{long:.6f}",
+        "geolocation": {"type": "Point", "coordinates": [round(long, 5), round(lat, 5)]},
+    }
+    if rng.random() < 0.3:
+        record["finders"] = [{"name": f"finder {i}", "year": rng.randrange(1800, 2020)} for i in range(2)]
+    return record
+
+
+def write_json(path: str, records: list, form: str):
+    with open(path, "w") as f:
+        if form == "object":
+            json.dump(records[0], f)
+        elif form == "array":
+            json.dump(records, f)
+        else:
+            f.write("\n".join(json.dumps(record) for record in records) + "\n")
+
+
+def generate_tree(root: str, n_files: int, max_depth: int = 6, big_file_rate: float = 0.001,
+                  big_file_records: int = 20_000, seed: int = 0):
+    # a deep ragged tree: directories of very different sizes at depths up to max_depth, mostly single-object files
+    # with some ndjson and array files, and a few big ones
+    rng = random.Random(seed)
+    directories = [root]
+    record_id = 0
+    files_written = 0
+    while files_written < n_files:
+        parent = rng.choice(directories)
+        if parent.count(os.sep) - root.count(os.sep) < max_depth:
+            directory = os.path.join(parent, f"folder_{len(directories)}")
+            directories.append(directory)
+        else:
+            directory = parent
+        os.makedirs(directory, exist_ok=True)
+        for _ in range(min(int(rng.paretovariate(1.2) * 10), n_files - files_written)):
+            form = rng.choices(["object", "ndjson", "array"], weights=[8, 1, 1])[0]
+            n_records = 1 if form == "object" else rng.randrange(2, 50)
+            if rng.random() < big_file_rate:
+                form, n_records = rng.choice(["ndjson", "array"]), big_file_records
+            records = [meteorite(rng, record_id + i) for i in range(n_records)]
+            record_id += n_records
+            write_json(os.path.join(directory, f"file-{files_written}.json"), records, form)
+            files_written += 1
+    return files_written, record_id
@@ -1,9 +1,16 @@
-import boto3
+import os
+
+from src.flatten.convert import *
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+workers = os.cpu_count()
 
 
 def main():
-    # your code here
-    pass
+    stats = JsonToCsvConverter(workers=workers).convert_tree(data_dir)
+    print(stats)
+    for json_path, err in stats.failed.items():
+        print(f"{json_path}: {err}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,167 @@
+import csv
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+from .utils import *
+
+
+class SchemaMismatchError(Exception):
+    err_str = "{path} has columns missing from its directory's schema: {columns}"
+
+    def __init__(self, path: str, columns: list):
+        self.path = path
+        self.columns = columns
+        super().__init__(self.err_str.format(path=path, columns=", ".join(columns)))
+
+
+def infer_schema(json_path: str, sample_records: int = None, chunk_size: int = 1 << 20):
+    # the flattened columns, in the order they are first seen, of the first sample_records records (all of them
+    # when sample_records is None)
+    columns = {}
+    with open(json_path, encoding="utf-8") as f:
+        for i, record in enumerate(iter_json_records(f, chunk_size)):
+            if sample_records is not None and i >= sample_records:
+                break
+            columns.update(dict.fromkeys(flatten(record)))
+    return list(columns)
+
+
+def csv_path_for(json_path: str, root: str = None, out_dir: str = None):
+    csv_name = os.path.splitext(json_path)[0] + ".csv"
+    if out_dir is None:
+        return csv_name
+    return os.path.join(out_dir, os.path.relpath(csv_name, root))
+
+
+def write_csv(json_path: str, csv_path: str, columns: list, chunk_size: int = 1 << 20):
+    # streams the records into the csv; a record with a column the schema doesn't have fails the file rather than
+    # silently losing the value
+    known = set(columns)
+    n_records = 0
+    part_path = csv_path + ".part"
+    try:
+        with open(json_path, encoding="utf-8") as f, open(part_path, "w", newline="", encoding="utf-8") as out:
+            writer = csv.writer(out)
+            writer.writerow(columns)
+            for record in iter_json_records(f, chunk_size):
+                row = flatten(record)
+                if not known.issuperset(row):
+                    raise SchemaMismatchError(json_path, [column for column in row if column not in known])
+                writer.writerow([row.get(column, "") for column in columns])
+                n_records += 1
+        os.replace(part_path, csv_path)
+    finally:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+    return n_records
+
+
+def convert_file(json_path: str, csv_path: str, columns: list = None, chunk_size: int = 1 << 20):
+    # returns the number of records and the columns written; a file with columns its directory's schema doesn't
+    # have is written again with those columns added
+    if columns is None:
+        columns = infer_schema(json_path, chunk_size=chunk_size)
+    try:
+        return write_csv(json_path, csv_path, columns, chunk_size), columns
+    except SchemaMismatchError:
+        columns = list(dict.fromkeys(columns + infer_schema(json_path, chunk_size=chunk_size)))
+        return write_csv(json_path, csv_path, columns, chunk_size), columns
+
+
+def convert_directory(json_paths: list, root: str = None, out_dir: str = None, columns: list = None,
+                      sample_records: int = 100, chunk_size: int = 1 << 20):
+    # converts files from one directory, inferring their schema once from the first file unless it is given, and
+    # widening it whenever a file turns out to have more columns; returns (json_path, records, widened, error)
+    # for each
+    results = []
+    csv_dirs = set()
+    for json_path in json_paths:
+        try:
+            if columns is None:
+                columns = infer_schema(json_path, sample_records, chunk_size)
+            csv_path = csv_path_for(json_path, root, out_dir)
+            if os.path.dirname(csv_path) not in csv_dirs:
+                os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+                csv_dirs.add(os.path.dirname(csv_path))
+            n_records, file_columns = convert_file(json_path, csv_path, columns, chunk_size)
+            results.append((json_path, n_records, file_columns is not columns, None))
+            columns = file_columns
+        except (OSError, ValueError) as err:
+            results.append((json_path, 0, False, f"{type(err).__name__}: {err}"))
+    return results
+
+
+class ConvertStats:
+    def __init__(self):
+        self.files = 0
+        self.records = 0
+        self.directories = 0
+        self.widened = 0
+        self.failed = {}
+        self.seconds = 0.0
+
+    def record(self, json_path: str, n_records: int, widened: bool, error: str):
+        if error is not None:
+            self.failed[json_path] = error
+            return
+        self.files += 1
+        self.records += n_records
+        self.widened += widened
+
+    @property
+    def files_per_second(self):
+        return self.files / self.seconds if self.seconds > 0 else float("nan")
+
+    def __repr__(self):
+        return (f"{self.files} files ({len(self.failed)} failed) in {self.directories} directories, "
+                f"{self.records} records in {self.seconds:.3f}s ({self.files_per_second:,.0f} files/s), "
+                f"schema widened for {self.widened} files")
+
+
+class JsonToCsvConverter:
+    # converts every json file under a directory tree to a csv next to it (or in the same place under out_dir).
+    # Each directory's files share a schema, inferred from the first one and widened as needed, and directories are
+    # converted in parallel on a process pool; directories with more than batch_size files are split into batches
+    def __init__(self, workers: int = None, out_dir: str = None, batch_size: int = 1000, sample_records: int = 100,
+                 chunk_size: int = 1 << 20):
+        self.workers = workers or os.cpu_count() or 1
+        self.out_dir = out_dir
+        self.batch_size = batch_size
+        self.sample_records = sample_records
+        self.chunk_size = chunk_size
+
+    def tasks(self, root: str):
+        for directory, json_paths in find_json_files(root):
+            columns = None
+            if len(json_paths) > self.batch_size:
+                # split across workers, so the schema has to be known up front; if the first file can't be read,
+                # each batch infers its own
+                try:
+                    columns = infer_schema(json_paths[0], self.sample_records, self.chunk_size)
+                except (OSError, ValueError):
+                    pass
+            for start in range(0, len(json_paths), self.batch_size):
+                yield json_paths[start:start + self.batch_size], columns
+
+    def convert_tree(self, root: str):
+        stats = ConvertStats()
+        start = time.perf_counter()
+        tasks = list(self.tasks(root))
+        stats.directories = len({os.path.dirname(json_paths[0]) for json_paths, _ in tasks})
+        args = [[json_paths for json_paths, _ in tasks], [root] * len(tasks), [self.out_dir] * len(tasks),
+                [columns for _, columns in tasks], [self.sample_records] * len(tasks), [self.chunk_size] * len(tasks)]
+        if self.workers == 1 or len(tasks) <= 1:
+            for results in map(convert_directory, *args):
+                for result in results:
+                    stats.record(*result)
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                # several small directories per task, so a tree of tiny directories isn't one round trip per directory
+                chunksize = max(1, len(tasks) // (self.workers * 8))
+                for results in executor.map(convert_directory, *args, chunksize=chunksize):
+                    for result in results:
+                        stats.record(*result)
+        stats.seconds = time.perf_counter() - start
+        return stats
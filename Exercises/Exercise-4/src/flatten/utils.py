@@ -0,0 +1,97 @@
+import json
+import os
+import re
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def flatten(value, prefix: str = "", separator: str = "_", out: dict = None):
+    # {"geolocation": {"type": "Point", "coordinates": [6.08, 50.77]}} becomes
+    # {"geolocation_type": "Point", "geolocation_coordinates_0": 6.08, "geolocation_coordinates_1": 50.77}
+    if out is None:
+        out = {}
+    if type(value) is dict:
+        items = value.items()
+    elif type(value) is list:
+        items = enumerate(value)
+    else:
+        out[prefix or "value"] = value
+        return out
+    # only containers recurse, since most values are scalars
+    for key, item in items:
+        name = f"{prefix}{separator}{key}" if prefix else str(key)
+        if type(item) is dict or type(item) is list:
+            flatten(item, name, separator, out)
+        else:
+            out[name] = item
+    return out
+
+
+def iter_json_records(f, chunk_size: int = 1 << 20):
+    # the records of a json file read chunk by chunk: the elements of a top-level array, or each of a sequence of
+    # top-level values (a single object, or ndjson). Only the record being parsed is held in memory
+    decode = json.JSONDecoder().raw_decode
+    buffer, position, eof = "", 0, False
+    read_size = chunk_size
+    in_array = None
+    while True:
+        # skip whitespace and, inside a top-level array, the commas between elements
+        position = WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if not eof:
+                buffer, position, eof = read_more(f, buffer, position, read_size)
+                continue
+            if in_array:
+                raise ValueError("Unterminated json array")
+            return
+        if in_array is None:
+            in_array = buffer[position] == "["
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] in ",]":
+            in_array = buffer[position] == ","
+            position += 1
+            continue
+
+        try:
+            record, end = decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # the record runs past the end of the buffer; read on, twice as much each time so a large record isn't
+            # parsed again for every chunk
+            buffer, position, eof = read_more(f, buffer, position, read_size)
+            read_size *= 2
+            continue
+        if len(buffer) - end <= 2 and not eof and isinstance(record, (int, float)):
+            # a number at the end of the buffer may carry on in the next chunk, even past a trailing "e-" or "."
+            buffer, position, eof = read_more(f, buffer, position, read_size)
+            continue
+        read_size = chunk_size
+        position = end
+        yield record
+
+
+def read_more(f, buffer: str, position: int, read_size: int):
+    chunk = f.read(read_size)
+    return buffer[position:] + chunk, 0, chunk == ""
+
+
+def find_json_files(root: str, suffixes: tuple = (".json", ".ndjson")):
+    # (directory, sorted json file paths) for every directory under root holding any, found with one scandir per
+    # directory and without following symlinked directories
+    pending = [root]
+    while len(pending) > 0:
+        directory = pending.pop()
+        files = []
+        subdirectories = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirectories.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(suffixes):
+                    files.append(entry.path)
+        if len(files) > 0:
+            yield directory, sorted(files)
+        pending.extend(sorted(subdirectories, reverse=True))
@@ -0,0 +1,108 @@
+import csv
+import json
+import os
+import tempfile
+import unittest
+
+from flatten.convert import *
+
+
+def meteorite(i: int, **extra):
+    record = {"name": f"m{i}", "id": str(i), "geolocation": {"type": "Point", "coordinates": [i, -i]}}
+    record.update(extra)
+    return record
+
+
+class TestConvert(unittest.TestCase):
+    def setUp(self):
+        self.root = os.path.join(tempfile.mkdtemp(), "data")
+
+    def write(self, path: str, text: str):
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    @staticmethod
+    def read_csv(path: str):
+        with open(path, newline="") as f:
+            return list(csv.reader(f))
+
+    def test_infer_schema(self):
+        path = self.write("a.json", "\n".join(json.dumps(meteorite(i, **({"mass": "1"} if i == 5 else {})))
+                                              for i in range(10)))
+        self.assertEqual(infer_schema(path, sample_records=3),
+                         ["name", "id", "geolocation_type", "geolocation_coordinates_0", "geolocation_coordinates_1"])
+        self.assertEqual(infer_schema(path)[-1], "mass")
+
+    def test_csv_path_for(self):
+        self.assertEqual(csv_path_for("data/a/b.json"), "data/a/b.csv")
+        self.assertEqual(csv_path_for("data/a/b.json", "data", "out"), os.path.join("out", "a", "b.csv"))
+
+    def test_convert_file(self):
+        json_path = self.write("a.json", json.dumps([meteorite(1), meteorite(2)]))
+        csv_path = csv_path_for(json_path)
+        n_records, columns = convert_file(json_path, csv_path)
+        self.assertEqual(n_records, 2)
+        self.assertEqual(self.read_csv(csv_path), [
+            ["name", "id", "geolocation_type", "geolocation_coordinates_0", "geolocation_coordinates_1"],
+            ["m1", "1", "Point", "1", "-1"],
+            ["m2", "2", "Point", "2", "-2"],
+        ])
+
+    def test_convert_file_missing_columns(self):
+        json_path = self.write("a.json", json.dumps({"name": "m1"}))
+        csv_path = csv_path_for(json_path)
+        convert_file(json_path, csv_path, ["id", "name"])
+        self.assertEqual(self.read_csv(csv_path), [["id", "name"], ["", "m1"]])
+
+    def test_convert_file_widens_schema(self):
+        json_path = self.write("a.json", json.dumps(meteorite(1, mass="21")))
+        csv_path = csv_path_for(json_path)
+        n_records, columns = convert_file(json_path, csv_path, ["name", "id"])
+        self.assertEqual(columns, ["name", "id", "geolocation_type", "geolocation_coordinates_0",
+                                   "geolocation_coordinates_1", "mass"])
+        self.assertEqual(self.read_csv(csv_path)[1], ["m1", "1", "Point", "1", "-1", "21"])
+
+    def test_write_csv_mismatch(self):
+        json_path = self.write("a.json", json.dumps(meteorite(1)))
+        csv_path = csv_path_for(json_path)
+        with self.assertRaises(SchemaMismatchError):
+            write_csv(json_path, csv_path, ["name"])
+        self.assertEqual(os.listdir(self.root), ["a.json"])
+
+    def test_convert_directory(self):
+        paths = [self.write("a.json", json.dumps(meteorite(1))),
+                 self.write("b.json", json.dumps(meteorite(2, mass="5"))),
+                 self.write("c.json", json.dumps(meteorite(3))),
+                 self.write("d.json", "{not json")]
+        results = convert_directory(paths)
+        self.assertEqual([result[:3] for result in results],
+                         [(paths[0], 1, False), (paths[1], 1, True), (paths[2], 1, False), (paths[3], 0, False)])
+        self.assertIn("JSONDecodeError", results[3][3])
+        # once widened, the directory's schema carries the new column
+        self.assertEqual(self.read_csv(csv_path_for(paths[2]))[1], ["m3", "3", "Point", "3", "-3", ""])
+
+    def test_convert_tree(self):
+        self.write("file-1.json", json.dumps(meteorite(1)))
+        self.write("some_folder/other_folder/file-2.json", "\n".join(json.dumps(meteorite(i)) for i in range(5)))
+        self.write("some_folder/test.csv", "not a json file")
+        for i in range(7):
+            self.write(f"big/file-{i}.json", json.dumps([meteorite(i), meteorite(i + 1)]))
+        for workers in [1, 2]:
+            out_dir = os.path.join(os.path.dirname(self.root), f"out_{workers}")
+            stats = JsonToCsvConverter(workers=workers, out_dir=out_dir, batch_size=3).convert_tree(self.root)
+            self.assertEqual((stats.files, stats.records, stats.directories), (9, 20, 3))
+            self.assertEqual(len(self.read_csv(os.path.join(out_dir, "big", "file-6.csv"))), 3)
+            self.assertEqual(len(self.read_csv(os.path.join(out_dir, "some_folder", "other_folder", "file-2.csv"))), 6)
+
+    def test_convert_tree_in_place(self):
+        json_path = self.write("a/b.json", json.dumps(meteorite(1)))
+        stats = JsonToCsvConverter(workers=1).convert_tree(self.root)
+        self.assertEqual(stats.files, 1)
+        self.assertTrue(os.path.exists(csv_path_for(json_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from flatten.utils import *
+
+
+class TestFlatten(unittest.TestCase):
+    def test_flatten_point(self):
+        record = {"name": "Aachen", "geolocation": {"type": "Point", "coordinates": [6.08333, 50.775]}}
+        self.assertEqual(flatten(record), {"name": "Aachen", "geolocation_type": "Point",
+                                           "geolocation_coordinates_0": 6.08333,
+                                           "geolocation_coordinates_1": 50.775})
+
+    def test_flatten_nested_lists(self):
+        record = {"finders": [{"name": "a", "tags": ["x", "y"]}, {"name": "b", "tags": []}], "empty": {}}
+        self.assertEqual(flatten(record), {"finders_0_name": "a", "finders_0_tags_0": "x", "finders_0_tags_1": "y",
+                                           "finders_1_name": "b"})
+
+    def test_flatten_separator(self):
+        self.assertEqual(flatten({"a": {"b": 1}}, separator="."), {"a.b": 1})
+
+    def test_flatten_scalar(self):
+        self.assertEqual(flatten(3), {"value": 3})
+        self.assertEqual(flatten([1, None]), {"0": 1, "1": None})
+
+
+class TestIterJsonRecords(unittest.TestCase):
+    records = [{"id": i, "text": "x" * (i * 37 % 500), "nested": {"values": list(range(i % 5))}} for i in range(200)]
+
+    def assertRecords(self, text: str, expected: list):
+        for chunk_size in [1, 7, 64, 1 << 20]:
+            self.assertEqual(list(iter_json_records(io.StringIO(text), chunk_size)), expected)
+
+    def test_single_object(self):
+        self.assertRecords(json.dumps(self.records[3]), [self.records[3]])
+
+    def test_ndjson(self):
+        self.assertRecords("\n".join(json.dumps(record) for record in self.records) + "\n", self.records)
+
+    def test_array(self):
+        self.assertRecords(json.dumps(self.records, indent=2), self.records)
+
+    def test_empty(self):
+        self.assertRecords("", [])
+        self.assertRecords(" [ ] \n", [])
+
+    def test_numbers_across_chunks(self):
+        self.assertRecords("[1, 22222, 3.5e10]", [1, 22222, 3.5e10])
+        self.assertRecords("1 22222\n333", [1, 22222, 333])
+
+    def test_invalid(self):
+        for text in ['[{"a": 1}', '{"a": ', '{"a": 1}}', '{"a": 1} nope']:
+            with self.assertRaises(ValueError):
+                list(iter_json_records(io.StringIO(text), 4))
+
+    def test_reads_incrementally(self):
+        text = io.StringIO("\n".join(json.dumps(record) for record in self.records))
+        records = iter_json_records(text, chunk_size=256)
+        next(records)
+        self.assertLess(text.tell(), 1024)
+
+
+class TestFindJsonFiles(unittest.TestCase):
+    def test_find_json_files(self):
+        root = tempfile.mkdtemp()
+        for path in ["a.json", "b.ndjson", "c.csv", "x/y/z/d.json", "x/e.JSON", "empty/f.txt"]:
+            os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+            open(os.path.join(root, path), "w").close()
+        os.symlink(os.path.join(root, "x"), os.path.join(root, "link"))
+        self.assertEqual(list(find_json_files(root)), [
+            (root, [os.path.join(root, "a.json"), os.path.join(root, "b.ndjson")]),
+            (os.path.join(root, "x"), [os.path.join(root, "x", "e.JSON")]),
+            (os.path.join(root, "x", "y", "z"), [os.path.join(root, "x", "y", "z", "d.json")]),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import random
+
+STATES = ["Ohio", "Iowa", "Texas", "Maine", "Oregon", "Nevada"]
+CITIES = ["Middleton", "BigTown", "Springfield", "Riverside", "Fairview"]
+
+
+def generate_data(data_dir: str, n_transactions: int, n_accounts: int = None, n_products: int = 1000, seed: int = 0):
+    # the three exercise csv files at scale, in the same format: spaces after the commas, slashed dates and an
+    # empty address_2 on some rows
+    rng = random.Random(seed)
+    n_accounts = n_accounts or max(1, n_transactions // 50)
+    os.makedirs(data_dir, exist_ok=True)
+    with open(os.path.join(data_dir, "accounts.csv"), "w") as f:
+        f.write("customer_id, first_name, last_name, address_1, address_2, city, state, zip_code, join_date\n")
+        for customer_id in range(1, n_accounts + 1):
+            address_2 = f"PO BOX {customer_id % 100}" if customer_id % 3 == 0 else ""
+            f.write(f"{customer_id}, first{customer_id}, last{customer_id % 997}, {customer_id % 9999} Oak Rd.,"
+                    f"{address_2}, {rng.choice(CITIES)}, {rng.choice(STATES)}, {rng.randrange(10000, 99999)}, "
+                    f"{rng.randrange(2000, 2023)}/{rng.randrange(1, 13):02d}/{rng.randrange(1, 29):02d}\n")
+    with open(os.path.join(data_dir, "products.csv"), "w") as f:
+        f.write("product_id, product_code, product_description\n")
+        for product_id in range(1, n_products + 1):
+            f.write(f"{product_id}, {product_id:04d}, Widget {product_id}\n")
+    with open(os.path.join(data_dir, "transactions.csv"), "w") as f:
+        f.write("transaction_id, transaction_date, product_id, product_code, product_description, quantity, "
+                "account_id\n")
+        lines = []
+        for i in range(n_transactions):
+            product_id = rng.randrange(1, n_products + 1)
+            lines.append(f"T{i:012d}, 2022/{rng.randrange(1, 13):02d}/{rng.randrange(1, 29):02d}, {product_id}, "
+                         f"{product_id:04d}, Widget {product_id}, {rng.randrange(1, 10)}, "
+                         f"{rng.randrange(1, n_accounts + 1)}\n")
+            if len(lines) == 100_000:
+                f.writelines(lines)
+                lines = []
+        f.writelines(lines)
+    return n_accounts, n_products, n_transactions
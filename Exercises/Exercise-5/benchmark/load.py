@@ -0,0 +1,82 @@
+import argparse
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import time
+
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+from benchmark.data import generate_data
+from src.db.load import *
+from src.db.utils import *
+
+
+def insert_rows(pool: ThreadedConnectionPool, data_dir: str, table: TableSpec, max_rows: int, batched: bool):
+    # the row by row alternatives to COPY, into tables that already have their keys: executemany sends one INSERT
+    # per row, execute_values packs a page of rows into each INSERT
+    conn = pool.getconn()
+    try:
+        with open(os.path.join(data_dir, table.csv_name), newline="") as f, conn.cursor() as cur:
+            reader = csv.reader(f, skipinitialspace=True)
+            columns = [column.strip() for column in next(reader)]
+            date_indexes = [columns.index(column) for column in table.date_columns]
+            rows = []
+            for row in itertools.islice(reader, max_rows):
+                row = [value.strip() or None for value in row]
+                for i in date_indexes:
+                    row[i] = iso_date(row[i])
+                rows.append(row)
+            start = time.perf_counter()
+            if batched:
+                execute_values(cur, f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES %s", rows, page_size=1000)
+            else:
+                cur.executemany(f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES "
+                                f"({', '.join(['%s'] * len(columns))})", rows)
+            conn.commit()
+            return len(rows), time.perf_counter() - start
+    finally:
+        pool.putconn(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time COPY against INSERTs loading generated exercise csv files")
+    parser.add_argument("--transactions", type=int, default=10_000_000)
+    parser.add_argument("--insert-rows", type=int, default=100_000,
+                        help="transactions the INSERT methods load, since they can't do the whole file in good time")
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    pool = ThreadedConnectionPool(1, args.workers, **connection_params())
+    try:
+        start = time.perf_counter()
+        n_accounts, n_products, n_transactions = generate_data(tmp_dir, args.transactions)
+        size = os.path.getsize(os.path.join(tmp_dir, "transactions.csv"))
+        print(f"generated {n_accounts} accounts, {n_products} products, {n_transactions} transactions "
+              f"({size / 1e6:.0f}MB) in {time.perf_counter() - start:.1f}s")
+
+        transactions = TABLES[2]
+        for defer_constraints in [False, True]:
+            loader = BulkLoader(pool, tmp_dir, workers=args.workers, defer_constraints=defer_constraints)
+            start = time.perf_counter()
+            stats = loader.run()
+            total = time.perf_counter() - start
+            print(f"COPY, {'keys after' if defer_constraints else 'keys before'}: {stats[transactions.name]}; "
+                  f"all tables and keys in {total:.3f}s ({n_transactions / total:,.0f} transactions/s)")
+
+        for batched in [False, True]:
+            # every table and key is created, but only the accounts and products are loaded
+            BulkLoader(pool, tmp_dir, tables=TABLES[:2], defer_constraints=False).run()
+            rows, seconds = insert_rows(pool, tmp_dir, transactions, args.insert_rows, batched)
+            print(f"{'execute_values' if batched else 'executemany':>14}: {rows} transactions in {seconds:.3f}s "
+                  f"({rows / seconds:,.0f} rows/s)")
+    finally:
+        pool.closeall()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
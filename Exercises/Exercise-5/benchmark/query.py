@@ -0,0 +1,70 @@
+import argparse
+import datetime
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmark.data import generate_data
+from src.db.load import *
+from src.db.query import *
+from src.db.utils import *
+
+
+def drive(queries: TransactionQueries, n_accounts: int, n_products: int, deadline: float, seed: int):
+    # mostly account lookups, some product lookups and the odd week of transactions streamed through
+    rng = random.Random(seed)
+    n_queries = 0
+    while time.perf_counter() < deadline:
+        choice = rng.random()
+        if choice < 0.7:
+            queries.by_account(rng.randrange(1, n_accounts + 1))
+        elif choice < 0.95:
+            queries.by_product(rng.randrange(1, n_products + 1))
+        else:
+            start = datetime.date(2022, rng.randrange(1, 13), rng.randrange(1, 22))
+            for _ in queries.stream_by_date(start, start + datetime.timedelta(days=7)):
+                pass
+        n_queries += 1
+    return n_queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive concurrent transaction lookups against a local postgres")
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    pool = BlockingConnectionPool(1, args.connections, **connection_params())
+    try:
+        n_accounts, n_products, _ = generate_data(tmp_dir, args.transactions, n_products=args.products)
+        BulkLoader(pool, tmp_dir).run()
+        for prepared in [False, True]:
+            for n_threads in args.threads:
+                queries = TransactionQueries(pool, prepared=prepared)
+                deadline = time.perf_counter() + args.seconds
+                counts = [0] * n_threads
+
+                def worker(i: int):
+                    counts[i] = drive(queries, n_accounts, n_products, deadline, seed=i)
+
+                threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                print(f"{'prepared' if prepared else 'plain'}, {n_threads} threads on {args.connections} connections: "
+                      f"{sum(counts) / args.seconds:,.0f} queries/s")
+                print(queries.stats)
+    finally:
+        pool.closeall()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import argparse
+import shutil
+import tempfile
+import time
+
+from benchmark.data import generate_data
+from src.db.load import *
+from src.db.query import BlockingConnectionPool
+from src.db.star import *
+from src.db.utils import *
+
+
+def report(pool, label: str, table_name: str, n_transactions: int, seconds: float):
+    conn = pool.getconn()
+    try:
+        table, indexes = table_bytes(conn, table_name)
+    finally:
+        pool.putconn(conn)
+    print(f"{label:>24}: {table_name} {table / 1e6:,.0f}MB + {indexes / 1e6:,.0f}MB indexes "
+          f"({table / n_transactions:.0f} bytes/row), loaded with its keys in {seconds:.3f}s "
+          f"({n_transactions / seconds:,.0f} transactions/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the plain and star schema loads of generated exercise files")
+    parser.add_argument("--transactions", type=int, default=2_000_000)
+    parser.add_argument("--cache-sizes", type=int, nargs="+", default=[100_000, 1000])
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    pool = BlockingConnectionPool(1, 3, **connection_params())
+    try:
+        n_accounts, n_products, n_transactions = generate_data(tmp_dir, args.transactions)
+        print(f"{n_accounts} accounts, {n_products} products, {n_transactions} transactions")
+
+        start = time.perf_counter()
+        BulkLoader(pool, tmp_dir).run()
+        report(pool, "plain", "transactions", n_transactions, time.perf_counter() - start)
+        for cache_size in args.cache_sizes:
+            loader = StarLoader(pool, tmp_dir, cache_size=cache_size)
+            start = time.perf_counter()
+            loader.run()
+            report(pool, f"star, {cache_size} key cache", "fact_transactions", n_transactions,
+                   time.perf_counter() - start)
+            print(f"{'':>26}{loader.accounts}\n{'':>26}{loader.products}")
+    finally:
+        pool.closeall()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,40 @@
-import psycopg2
+import os
+
+from src.db.load import *
+from src.db.query import *
+from src.db.star import *
+from src.db.utils import *
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+load_workers = 2
+# set star_schema to load the files as dimensions and a fact table with surrogate keys instead
+star_schema = False
+
+
+def print_lookups(pool: BlockingConnectionPool):
+    queries = TransactionQueries(pool)
+    for account_id in [4321, 5677]:
+        print(f"account {account_id}: {queries.by_account(account_id)}")
+    print(f"june 2022: {list(queries.stream_by_date('2022-06-01', '2022-07-01'))}")
+    print(queries.stats)
 
 
 def main():
-    host = "postgres"
-    database = "postgres"
-    user = "postgres"
-    pas = "postgres"
-    conn = psycopg2.connect(host=host, database=database, user=user, password=pas)
-    # your code here
+    pool = BlockingConnectionPool(1, load_workers, **connection_params())
+    try:
+        if star_schema:
+            loader = StarLoader(pool, data_dir, workers=load_workers)
+        else:
+            loader = BulkLoader(pool, data_dir, workers=load_workers)
+        for table_stats in loader.run().values():
+            print(table_stats)
+        print(f"keys and indexes created in {loader.constraint_seconds:.3f}s")
+        if star_schema:
+            print(f"{loader.rejected} transactions rejected")
+        else:
+            print_lookups(pool)
+    finally:
+        pool.closeall()
 
 
 if __name__ == "__main__":
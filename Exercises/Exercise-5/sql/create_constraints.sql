@@ -0,0 +1,10 @@
+ALTER TABLE accounts ADD PRIMARY KEY (customer_id);
+
+ALTER TABLE products ADD PRIMARY KEY (product_id);
+
+ALTER TABLE transactions ADD PRIMARY KEY (transaction_id);
+ALTER TABLE transactions ADD FOREIGN KEY (product_id) REFERENCES products (product_id);
+ALTER TABLE transactions ADD FOREIGN KEY (account_id) REFERENCES accounts (customer_id);
+CREATE INDEX transactions_account_id_idx ON transactions (account_id);
+CREATE INDEX transactions_product_id_idx ON transactions (product_id);
+CREATE INDEX transactions_transaction_date_idx ON transactions (transaction_date);
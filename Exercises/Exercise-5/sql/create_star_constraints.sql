@@ -0,0 +1,6 @@
+ALTER TABLE fact_transactions ADD PRIMARY KEY (transaction_id);
+ALTER TABLE fact_transactions ADD FOREIGN KEY (account_key) REFERENCES dim_account (account_key);
+ALTER TABLE fact_transactions ADD FOREIGN KEY (product_key) REFERENCES dim_product (product_key);
+CREATE INDEX fact_transactions_account_key_idx ON fact_transactions (account_key);
+CREATE INDEX fact_transactions_product_key_idx ON fact_transactions (product_key);
+CREATE INDEX fact_transactions_transaction_date_idx ON fact_transactions (transaction_date);
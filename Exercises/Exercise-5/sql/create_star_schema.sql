@@ -0,0 +1,38 @@
+CREATE TABLE dim_account (
+    account_key INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    customer_id INTEGER NOT NULL UNIQUE,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    address_1 VARCHAR(200),
+    address_2 VARCHAR(200),
+    city VARCHAR(100),
+    state VARCHAR(100),
+    zip_code VARCHAR(10),
+    join_date DATE NOT NULL
+);
+
+CREATE TABLE dim_product (
+    product_key INTEGER GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    product_id INTEGER NOT NULL UNIQUE,
+    product_code VARCHAR(10) NOT NULL,
+    product_description VARCHAR(200)
+);
+
+CREATE TABLE fact_transactions (
+    transaction_id VARCHAR(50) NOT NULL,
+    transaction_date DATE NOT NULL,
+    account_key INTEGER NOT NULL,
+    product_key INTEGER NOT NULL,
+    quantity INTEGER NOT NULL
+);
+
+CREATE TABLE transaction_rejects (
+    transaction_id TEXT,
+    transaction_date TEXT,
+    product_id TEXT,
+    product_code TEXT,
+    product_description TEXT,
+    quantity TEXT,
+    account_id TEXT,
+    reason TEXT NOT NULL
+);
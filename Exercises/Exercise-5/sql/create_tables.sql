@@ -0,0 +1,27 @@
+CREATE TABLE accounts (
+    customer_id INTEGER NOT NULL,
+    first_name VARCHAR(100) NOT NULL,
+    last_name VARCHAR(100) NOT NULL,
+    address_1 VARCHAR(200),
+    address_2 VARCHAR(200),
+    city VARCHAR(100),
+    state VARCHAR(100),
+    zip_code VARCHAR(10),
+    join_date DATE NOT NULL
+);
+
+CREATE TABLE products (
+    product_id INTEGER NOT NULL,
+    product_code VARCHAR(10) NOT NULL,
+    product_description VARCHAR(200)
+);
+
+CREATE TABLE transactions (
+    transaction_id VARCHAR(50) NOT NULL,
+    transaction_date DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    product_code VARCHAR(10),
+    product_description VARCHAR(200),
+    quantity INTEGER NOT NULL,
+    account_id INTEGER NOT NULL
+);
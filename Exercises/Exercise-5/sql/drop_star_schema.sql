@@ -0,0 +1,4 @@
+DROP TABLE IF EXISTS transaction_rejects;
+DROP TABLE IF EXISTS fact_transactions;
+DROP TABLE IF EXISTS dim_product;
+DROP TABLE IF EXISTS dim_account;
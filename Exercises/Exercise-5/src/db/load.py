@@ -0,0 +1,180 @@
+import csv
+import io
+import os
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from .utils import *
+
+
+class TableSpec:
+    def __init__(self, name: str, csv_name: str, date_columns: tuple = (), depends_on: tuple = ()):
+        self.name = name
+        self.csv_name = csv_name
+        self.date_columns = date_columns
+        self.depends_on = depends_on
+
+
+TABLES = [
+    TableSpec("accounts", "accounts.csv", date_columns=("join_date",)),
+    TableSpec("products", "products.csv"),
+    TableSpec("transactions", "transactions.csv", date_columns=("transaction_date",),
+              depends_on=("accounts", "products")),
+]
+
+
+def load_order(tables: list):
+    # tables grouped into layers by their foreign keys: each layer only references the ones before it, so the
+    # tables within a layer can be loaded at the same time
+    names = {table.name for table in tables}
+    loaded = set()
+    layers = []
+    remaining = list(tables)
+    while len(remaining) > 0:
+        layer = [table for table in remaining if set(table.depends_on) & names <= loaded]
+        if len(layer) == 0:
+            raise ValueError(f"Circular foreign keys between {', '.join(table.name for table in remaining)}")
+        layers.append(layer)
+        loaded |= {table.name for table in layer}
+        remaining = [table for table in remaining if table.name not in loaded]
+    return layers
+
+
+def iso_date(value: str):
+    # 2022/01/16 -> 2022-01-16, so the load doesn't depend on the server's DateStyle
+    return value.replace("/", "-")
+
+
+class CsvCopyStream(io.RawIOBase):
+    # re-encodes one of the exercise csv files as COPY ... (FORMAT csv) input as it is read: the spaces after each
+    # comma, in the header too, are dropped, empty values become NULLs and dates are rewritten in ISO format. A
+    # transform, if set, then maps each row to the row to write, or to None to leave it out
+    def __init__(self, f, date_columns: tuple = (), rows_per_chunk: int = 10_000, transform=None):
+        super().__init__()
+        self.transform = transform
+        self.reader = csv.reader(f, skipinitialspace=True)
+        self.columns = [column.strip() for column in next(self.reader)]
+        self.date_indexes = [self.columns.index(column) for column in date_columns]
+        self.rows_per_chunk = rows_per_chunk
+        self.rows = 0
+        self.pending = b""
+        self.out = io.StringIO()
+        self.writer = csv.writer(self.out, lineterminator="\n")
+
+    def readable(self):
+        return True
+
+    def next_chunk(self):
+        self.out.seek(0)
+        self.out.truncate()
+        n_rows = 0
+        for row in self.reader:
+            if len(row) == 0:
+                continue
+            row = [value.strip() for value in row]
+            for i in self.date_indexes:
+                row[i] = iso_date(row[i])
+            if self.transform is not None:
+                row = self.transform(row)
+                if row is None:
+                    continue
+            self.writer.writerow(row)
+            n_rows += 1
+            if n_rows == self.rows_per_chunk:
+                break
+        self.rows += n_rows
+        return self.out.getvalue().encode()
+
+    def readinto(self, buffer):
+        if len(self.pending) == 0:
+            self.pending = self.next_chunk()
+        n_bytes = min(len(buffer), len(self.pending))
+        buffer[:n_bytes] = self.pending[:n_bytes]
+        self.pending = self.pending[n_bytes:]
+        return n_bytes
+
+
+class LoadStats:
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.rows = 0
+        self.seconds = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("nan")
+
+    def __repr__(self):
+        return f"{self.table_name}: {self.rows} rows in {self.seconds:.3f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+class BulkLoader:
+    # streams each csv into its table with COPY FROM STDIN, loading the tables in foreign key order and each layer of
+    # independent tables in parallel on the pool. With defer_constraints the keys and indexes are only created once
+    # the data is in, which is much cheaper than maintaining them row by row
+    drop_sql = "drop_tables.sql"
+    create_sql = "create_tables.sql"
+    constraints_sql = "create_constraints.sql"
+
+    def __init__(self, pool: ThreadedConnectionPool, data_dir: str, tables: list = None, workers: int = 2,
+                 defer_constraints: bool = True, sql_dir: str = SQL_DIR):
+        self.pool = pool
+        self.data_dir = data_dir
+        self.tables = tables or TABLES
+        self.workers = workers
+        self.defer_constraints = defer_constraints
+        self.sql_dir = sql_dir
+        self.stats = {}
+        self.constraint_seconds = 0.0
+
+    def run_sql(self, file_name: str):
+        conn = self.pool.getconn()
+        try:
+            run_sql_file(conn, file_name, self.sql_dir)
+        finally:
+            self.pool.putconn(conn)
+
+    def create_tables(self, drop_existing: bool = True):
+        if drop_existing:
+            self.run_sql(self.drop_sql)
+        self.run_sql(self.create_sql)
+        if not self.defer_constraints:
+            self.run_sql(self.constraints_sql)
+
+    def load_table(self, table: TableSpec):
+        stats = LoadStats(table.name)
+        start = time.perf_counter()
+        conn = self.pool.getconn()
+        try:
+            with open(os.path.join(self.data_dir, table.csv_name), newline="") as f, conn.cursor() as cur:
+                stream = CsvCopyStream(f, table.date_columns)
+                cur.copy_expert(f"COPY {table.name} ({', '.join(stream.columns)}) FROM STDIN WITH (FORMAT csv)",
+                                stream, size=1 << 16)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+        stats.rows = stream.rows
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def load_all(self):
+        self.stats = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for layer in load_order(self.tables):
+                for stats in executor.map(self.load_table, layer):
+                    self.stats[stats.table_name] = stats
+        if self.defer_constraints:
+            start = time.perf_counter()
+            self.run_sql(self.constraints_sql)
+            self.constraint_seconds = time.perf_counter() - start
+        return self.stats
+
+    def run(self, drop_existing: bool = True):
+        self.create_tables(drop_existing)
+        return self.load_all()
@@ -0,0 +1,216 @@
+import bisect
+import itertools
+import re
+import threading
+import time
+import weakref
+
+from contextlib import contextmanager
+
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+LATENCY_BOUNDS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+ROW_BOUNDS = (0, 1, 10, 100, 1000, 10_000, 100_000)
+
+# connections that have the statements prepared; PREPARE fails if the session already has them, whichever
+# TransactionQueries got there first
+PREPARED_CONNECTIONS = weakref.WeakSet()
+
+
+class Histogram:
+    # counts of values falling under each bound, plus one bucket for anything larger
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = float("nan")
+
+    def record(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = value if self.count == 1 else max(self.max, value)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count > 0 else float("nan")
+
+    def percentile(self, percentile: float):
+        # the bound of the bucket the percentile falls in, so an upper estimate
+        if self.count == 0:
+            return float("nan")
+        rank = max(1, round(percentile / 100 * self.count))
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def buckets(self):
+        # (upper bound, count) for the buckets that have anything in them
+        return [(bound, count) for bound, count in zip(self.bounds + (float("inf"),), self.counts) if count > 0]
+
+
+class QueryStats:
+    def __init__(self):
+        self.pool_wait = Histogram(LATENCY_BOUNDS)
+        self.latencies = {}
+        self.rows_per_fetch = Histogram(ROW_BOUNDS)
+        self.lock = threading.Lock()
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.pool_wait.record(seconds)
+
+    def record_query(self, query_name: str, seconds: float):
+        with self.lock:
+            if query_name not in self.latencies:
+                self.latencies[query_name] = Histogram(LATENCY_BOUNDS)
+            self.latencies[query_name].record(seconds)
+
+    def record_fetch(self, n_rows: int):
+        with self.lock:
+            self.rows_per_fetch.record(n_rows)
+
+    @staticmethod
+    def describe_latency(latency: Histogram):
+        return (f"mean {latency.mean * 1000:.2f}ms, p50 <= {latency.percentile(50) * 1000:g}ms, "
+                f"p99 <= {latency.percentile(99) * 1000:g}ms, max {latency.max * 1000:.1f}ms")
+
+    def __repr__(self):
+        lines = [f"pool wait: {self.pool_wait.count} checkouts, {self.describe_latency(self.pool_wait)}"]
+        for query_name, latency in sorted(self.latencies.items()):
+            lines.append(f"{query_name}: {latency.count} queries, {self.describe_latency(latency)}")
+        if self.rows_per_fetch.count > 0:
+            lines.append(f"rows per fetch: {self.rows_per_fetch.count} fetches, mean {self.rows_per_fetch.mean:,.0f}")
+        return "\n".join(lines)
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    # ThreadedConnectionPool raises PoolError as soon as every connection is checked out; this one makes the caller
+    # wait up to `timeout` seconds for a connection to come back instead
+    def __init__(self, minconn: int, maxconn: int, *args, timeout: float = 30.0, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.available = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+
+    def getconn(self, key=None):
+        if not self.available.acquire(timeout=self.timeout):
+            raise PoolError(f"No connection free after {self.timeout}s")
+        try:
+            return super().getconn(key)
+        except BaseException:
+            self.available.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self.available.release()
+
+
+class Query:
+    def __init__(self, name: str, param_types: tuple, where: str):
+        self.name = name
+        self.param_types = param_types
+        self.where = where
+
+    def prepare_sql(self, select: str):
+        return f"PREPARE {self.name} ({', '.join(self.param_types)}) AS {select} WHERE {self.where}"
+
+    def execute_sql(self):
+        return f"EXECUTE {self.name} ({', '.join(['%s'] * len(self.param_types))})"
+
+    def plain_sql(self, select: str):
+        # $1, $2... as psycopg2 placeholders; each parameter is used once, in order
+        return f"{select} WHERE {re.sub(r'[$][0-9]+', '%s', self.where)}"
+
+
+TRANSACTION_COLUMNS = ("transaction_id", "transaction_date", "product_id", "product_code", "product_description",
+                       "quantity", "account_id")
+
+QUERIES = {
+    query.name: query for query in [
+        Query("transactions_by_account", ("integer",), "account_id = $1"),
+        Query("transactions_by_product", ("integer",), "product_id = $1"),
+        # end exclusive, so consecutive ranges don't overlap
+        Query("transactions_by_date", ("date", "date"), "transaction_date >= $1 AND transaction_date < $2"),
+    ]
+}
+
+
+class TransactionQueries:
+    # the hot transaction lookups over a pool. Each connection prepares the statements the first time it is handed
+    # out, so they are planned once per connection rather than on every call. Postgres can't DECLARE a cursor over
+    # an EXECUTE, so large results are streamed through a named (server-side) cursor running the same query,
+    # fetch_size rows at a time
+    def __init__(self, pool: ThreadedConnectionPool, fetch_size: int = 2000, prepared: bool = True):
+        self.pool = pool
+        self.fetch_size = fetch_size
+        self.prepared = prepared
+        self.select = f"SELECT {', '.join(TRANSACTION_COLUMNS)} FROM transactions"
+        self.stats = QueryStats()
+        self.cursor_ids = itertools.count()
+
+    @contextmanager
+    def connection(self):
+        start = time.perf_counter()
+        conn = self.pool.getconn()
+        self.stats.record_wait(time.perf_counter() - start)
+        try:
+            if self.prepared and conn not in PREPARED_CONNECTIONS:
+                self.prepare(conn)
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def prepare(self, conn):
+        with conn.cursor() as cur:
+            for query in QUERIES.values():
+                cur.execute(query.prepare_sql(self.select))
+        # prepared statements outlive transactions, but not the session
+        conn.commit()
+        PREPARED_CONNECTIONS.add(conn)
+
+    def run(self, query_name: str, *params):
+        query = QUERIES[query_name]
+        start = time.perf_counter()
+        with self.connection() as conn, conn.cursor() as cur:
+            cur.execute(query.execute_sql() if self.prepared else query.plain_sql(self.select), params)
+            rows = cur.fetchall()
+        self.stats.record_query(query_name, time.perf_counter() - start)
+        return rows
+
+    def by_account(self, account_id: int):
+        return self.run("transactions_by_account", account_id)
+
+    def by_product(self, product_id: int):
+        return self.run("transactions_by_product", product_id)
+
+    def by_date(self, start_date, end_date):
+        return self.run("transactions_by_date", start_date, end_date)
+
+    def stream(self, query_name: str, *params):
+        # yields the rows of a query without holding more than fetch_size of them; the connection stays checked out
+        # until the generator is exhausted or closed
+        query = QUERIES[query_name]
+        start = time.perf_counter()
+        with self.connection() as conn, conn.cursor(name=f"stream_{next(self.cursor_ids)}") as cur:
+            cur.execute(query.plain_sql(self.select), params)
+            while True:
+                rows = cur.fetchmany(self.fetch_size)
+                self.stats.record_fetch(len(rows))
+                yield from rows
+                if len(rows) < self.fetch_size:
+                    break
+        self.stats.record_query(f"{query_name} (streamed)", time.perf_counter() - start)
+
+    def stream_by_date(self, start_date, end_date):
+        return self.stream("transactions_by_date", start_date, end_date)
@@ -0,0 +1,173 @@
+import csv
+import os
+import tempfile
+import time
+
+from collections import OrderedDict
+
+from .load import *
+from .utils import *
+
+
+class LruCache:
+    def __init__(self, max_size: int):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.items = OrderedDict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key, default=None):
+        value = self.items.get(key, default)
+        if key in self.items:
+            self.items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.max_size:
+            self.items.popitem(last=False)
+
+
+class SurrogateKeys:
+    # natural key -> surrogate key for one dimension. The cache is warm-loaded with as much of the dimension as fits,
+    # so a dimension that fits whole never needs a round trip; otherwise a miss is looked up in the table and cached.
+    # Natural keys are kept as the strings they appear as in the csv files, and parse turns one into a query parameter
+    def __init__(self, table_name: str, natural_key: str, surrogate_key: str, max_size: int = 100_000, parse=int):
+        self.table_name = table_name
+        self.natural_key = natural_key
+        self.surrogate_key = surrogate_key
+        self.cache = LruCache(max_size)
+        self.parse = parse
+        self.complete = False
+        self.hits = 0
+        self.misses = 0
+        self.round_trips = 0
+
+    def warm_load(self, conn):
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {self.natural_key}::text, {self.surrogate_key} FROM {self.table_name} "
+                        f"ORDER BY {self.surrogate_key} LIMIT %s", (self.cache.max_size + 1,))
+            rows = cur.fetchall()
+        for natural, surrogate in rows[:self.cache.max_size]:
+            self.cache.put(natural, surrogate)
+        self.complete = len(rows) <= self.cache.max_size
+
+    def lookup(self, conn, natural: str):
+        # the surrogate key, or None when the dimension doesn't have natural
+        surrogate = self.cache.get(natural)
+        if surrogate is not None:
+            self.hits += 1
+            return surrogate
+        self.misses += 1
+        if self.complete:
+            return None
+        try:
+            value = self.parse(natural)
+        except ValueError:
+            return None
+        self.round_trips += 1
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {self.surrogate_key} FROM {self.table_name} WHERE {self.natural_key} = %s", (value,))
+            row = cur.fetchone()
+        if row is None:
+            return None
+        self.cache.put(natural, row[0])
+        return row[0]
+
+    def __repr__(self):
+        return (f"{self.table_name}: {len(self.cache)} keys cached ({'the whole' if self.complete else 'part of the'} "
+                f"dimension), {self.hits} hits, {self.misses} misses, {self.round_trips} round trips")
+
+
+STAR_TABLES = [
+    TableSpec("dim_account", "accounts.csv", date_columns=("join_date",)),
+    TableSpec("dim_product", "products.csv"),
+    TableSpec("fact_transactions", "transactions.csv", date_columns=("transaction_date",),
+              depends_on=("dim_account", "dim_product")),
+]
+
+FACT_COLUMNS = ("transaction_id", "transaction_date", "account_key", "product_key", "quantity")
+REJECT_COLUMNS = ("transaction_id", "transaction_date", "product_id", "product_code", "product_description", "quantity",
+                  "account_id", "reason")
+
+
+class StarLoader(BulkLoader):
+    # loads the exercise files as a star schema: accounts and products into dimensions with surrogate keys, and
+    # transactions into a fact table holding only those keys, so product_code and product_description aren't
+    # repeated on every row. Keys are resolved in process through the dimensions' caches; transactions whose account
+    # or product is unknown go to transaction_rejects, with the reason, instead of failing the load
+    drop_sql = "drop_star_schema.sql"
+    create_sql = "create_star_schema.sql"
+    constraints_sql = "create_star_constraints.sql"
+
+    def __init__(self, pool, data_dir: str, cache_size: int = 100_000, workers: int = 2,
+                 defer_constraints: bool = True, sql_dir: str = SQL_DIR):
+        super().__init__(pool, data_dir, STAR_TABLES, workers, defer_constraints, sql_dir)
+        self.accounts = SurrogateKeys("dim_account", "customer_id", "account_key", cache_size)
+        self.products = SurrogateKeys("dim_product", "product_id", "product_key", cache_size)
+        self.rejected = 0
+
+    def load_table(self, table: TableSpec):
+        if table.name != "fact_transactions":
+            return super().load_table(table)
+        return self.load_facts(table)
+
+    def load_facts(self, table: TableSpec):
+        stats = LoadStats(table.name)
+        start = time.perf_counter()
+        self.rejected = 0
+        conn = self.pool.getconn()
+        lookup_conn = None
+        try:
+            self.accounts.warm_load(conn)
+            self.products.warm_load(conn)
+            if not (self.accounts.complete and self.products.complete):
+                # conn is busy with the COPY while keys are looked up
+                lookup_conn = self.pool.getconn()
+            with open(os.path.join(self.data_dir, table.csv_name), newline="") as f, \
+                    tempfile.TemporaryFile("w+", newline="") as rejects, conn.cursor() as cur:
+                stream = CsvCopyStream(f, table.date_columns)
+                stream.transform = self.fact_row_transform(lookup_conn, stream.columns, csv.writer(rejects))
+                cur.copy_expert(f"COPY {table.name} ({', '.join(FACT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)", stream,
+                                size=1 << 16)
+                rejects.seek(0)
+                cur.copy_expert(f"COPY transaction_rejects ({', '.join(REJECT_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                                rejects, size=1 << 16)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+            if lookup_conn is not None:
+                lookup_conn.rollback()
+                self.pool.putconn(lookup_conn)
+        stats.rows = stream.rows
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+    def fact_row_transform(self, conn, columns: list, rejects):
+        transaction_id, transaction_date, account_id, product_id, quantity = [
+            columns.index(column) for column in ["transaction_id", "transaction_date", "account_id", "product_id",
+                                                 "quantity"]]
+        reject_indexes = [columns.index(column) for column in REJECT_COLUMNS[:-1]]
+
+        def transform(row: list):
+            account_key = self.accounts.lookup(conn, row[account_id])
+            product_key = self.products.lookup(conn, row[product_id])
+            if account_key is None or product_key is None:
+                reasons = [reason for key, reason in [(account_key, "unknown account"),
+                                                      (product_key, "unknown product")] if key is None]
+                rejects.writerow([row[i] for i in reject_indexes] + [", ".join(reasons)])
+                self.rejected += 1
+                return None
+            return [row[transaction_id], row[transaction_date], account_key, product_key, row[quantity]]
+
+        return transform
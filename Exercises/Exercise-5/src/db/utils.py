@@ -0,0 +1,31 @@
+import os
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "sql")
+
+
+def connection_params(**overrides):
+    # the docker-compose postgres by default; the usual libpq environment variables point it elsewhere
+    params = {
+        "host": os.environ.get("PGHOST", "postgres"),
+        "port": int(os.environ.get("PGPORT", 5432)),
+        "dbname": os.environ.get("PGDATABASE", "postgres"),
+        "user": os.environ.get("PGUSER", "postgres"),
+        "password": os.environ.get("PGPASSWORD", "postgres"),
+    }
+    params.update(overrides)
+    return params
+
+
+def run_sql_file(conn, file_name: str, sql_dir: str = SQL_DIR):
+    with open(os.path.join(sql_dir, file_name)) as f:
+        sql = f.read()
+    with conn.cursor() as cur:
+        cur.execute(sql)
+    conn.commit()
+
+
+def table_bytes(conn, table_name: str):
+    # (table, indexes) on disk, the table including its toast
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_table_size(%s), pg_indexes_size(%s)", (table_name, table_name))
+        return cur.fetchone()
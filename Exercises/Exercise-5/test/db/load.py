@@ -0,0 +1,111 @@
+import io
+import os
+import unittest
+
+import psycopg2
+
+from psycopg2.pool import ThreadedConnectionPool
+
+from db.load import *
+from db.utils import *
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data")
+TEST_SCHEMA = "exercise_5_test"
+
+
+def make_test_pool(max_connections: int = 2, pool_class=ThreadedConnectionPool, **pool_options):
+    # a pool on a schema of its own, or None when there's no postgres to talk to
+    try:
+        conn = psycopg2.connect(**connection_params(connect_timeout=3))
+    except psycopg2.OperationalError:
+        return None
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE; CREATE SCHEMA {TEST_SCHEMA}")
+    conn.commit()
+    conn.close()
+    return pool_class(1, max_connections, **pool_options, **connection_params(options=f"-c search_path={TEST_SCHEMA}"))
+
+
+class TestCsvCopyStream(unittest.TestCase):
+    def test_clean(self):
+        f = io.StringIO("customer_id, first_name, address_1, address_2, join_date\n"
+                        "4321, john, \"1532 East Main St., Apt 1\", PO BOX 5, 2022/01/16\n"
+                        "5677, jane, 543 Oak Rd.,,2021/05/07\n\n")
+        stream = CsvCopyStream(f, date_columns=("join_date",))
+        self.assertEqual(stream.columns, ["customer_id", "first_name", "address_1", "address_2", "join_date"])
+        self.assertEqual(stream.read(), b'4321,john,"1532 East Main St., Apt 1",PO BOX 5,2022-01-16\n'
+                                        b'5677,jane,543 Oak Rd.,,2021-05-07\n')
+        self.assertEqual(stream.rows, 2)
+
+    def test_chunks(self):
+        f = io.StringIO("a, b\n" + "".join(f"{i}, {i * 2}\n" for i in range(1000)))
+        stream = CsvCopyStream(f, rows_per_chunk=7)
+        parts = []
+        while part := stream.read(100):
+            parts.append(part)
+        self.assertEqual(b"".join(parts), "".join(f"{i},{i * 2}\n" for i in range(1000)).encode())
+        self.assertEqual(stream.rows, 1000)
+
+
+class TestLoadOrder(unittest.TestCase):
+    def test_exercise_tables(self):
+        self.assertEqual([[table.name for table in layer] for layer in load_order(TABLES)],
+                         [["accounts", "products"], ["transactions"]])
+
+    def test_chain(self):
+        tables = [TableSpec("c", "c.csv", depends_on=("b",)), TableSpec("b", "b.csv", depends_on=("a", "external")),
+                  TableSpec("a", "a.csv")]
+        self.assertEqual([[table.name for table in layer] for layer in load_order(tables)], [["a"], ["b"], ["c"]])
+
+    def test_circular(self):
+        with self.assertRaises(ValueError):
+            load_order([TableSpec("a", "a.csv", depends_on=("b",)), TableSpec("b", "b.csv", depends_on=("a",))])
+
+
+class TestBulkLoader(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_test_pool()
+        if self.pool is None:
+            self.skipTest("no postgres to load into")
+
+    def tearDown(self):
+        self.pool.closeall()
+
+    def query(self, sql: str):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                return cur.fetchall()
+        finally:
+            conn.rollback()
+            self.pool.putconn(conn)
+
+    def test_load(self):
+        for defer_constraints in [True, False]:
+            loader = BulkLoader(self.pool, DATA_DIR, defer_constraints=defer_constraints)
+            stats = loader.run()
+            self.assertEqual({name: table_stats.rows for name, table_stats in stats.items()},
+                             {"accounts": 2, "products": 2, "transactions": 2})
+            self.assertEqual(self.query("SELECT customer_id, address_1, address_2, zip_code, join_date::text "
+                                        "FROM accounts ORDER BY customer_id"),
+                             [(4321, "1532 East Main St.", "PO BOX 5", "50045", "2022-01-16"),
+                              (5677, "543 Oak Rd.", None, "84432", "2021-05-07")])
+            self.assertEqual(self.query("SELECT product_code FROM products ORDER BY product_code"), [("01",), ("02",)])
+            self.assertEqual(self.query("SELECT transaction_id, transaction_date::text, quantity FROM transactions "
+                                        "ORDER BY transaction_date"),
+                             [("AS345-ASDF-31234-FDAAD-9345", "2022-06-01", 5),
+                              ("9234A-JFDA-87654-BFAEA-0932", "2022-06-02", 1)])
+            self.assertEqual(self.query("SELECT count(*) FROM pg_constraint WHERE conrelid = 'transactions'::regclass"),
+                             [(3,)])
+            self.assertEqual(self.query("SELECT count(*) FROM pg_indexes WHERE tablename = 'transactions' "
+                                        f"AND schemaname = '{TEST_SCHEMA}'"), [(4,)])
+
+    def test_foreign_keys_checked(self):
+        loader = BulkLoader(self.pool, DATA_DIR, tables=TABLES[:1] + TABLES[2:], defer_constraints=False)
+        with self.assertRaises(psycopg2.errors.ForeignKeyViolation):
+            loader.run()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import datetime
+import math
+import threading
+import time
+import unittest
+
+from db.load import *
+from db.query import *
+
+from .load import DATA_DIR, make_test_pool
+
+
+class TestHistogram(unittest.TestCase):
+    def test_record(self):
+        histogram = Histogram((1, 10, 100))
+        for value in [0.5, 1, 5, 50, 50, 500]:
+            histogram.record(value)
+        self.assertEqual(histogram.counts, [2, 1, 2, 1])
+        self.assertEqual(histogram.buckets(), [(1, 2), (10, 1), (100, 2), (float("inf"), 1)])
+        self.assertEqual(histogram.count, 6)
+        self.assertEqual(histogram.max, 500)
+        self.assertAlmostEqual(histogram.mean, 606.5 / 6)
+
+    def test_percentile(self):
+        histogram = Histogram((1, 10, 100))
+        self.assertTrue(math.isnan(histogram.percentile(50)))
+        for value in [0.5] * 90 + [5] * 9 + [500]:
+            histogram.record(value)
+        self.assertEqual(histogram.percentile(50), 1)
+        self.assertEqual(histogram.percentile(99), 10)
+        self.assertEqual(histogram.percentile(100), float("inf"))
+
+
+class TestQuery(unittest.TestCase):
+    def test_sql(self):
+        query = QUERIES["transactions_by_date"]
+        self.assertEqual(query.prepare_sql("SELECT * FROM t"), "PREPARE transactions_by_date (date, date) AS "
+                                                               "SELECT * FROM t WHERE transaction_date >= $1 AND "
+                                                               "transaction_date < $2")
+        self.assertEqual(query.execute_sql(), "EXECUTE transactions_by_date (%s, %s)")
+        self.assertEqual(query.plain_sql("SELECT * FROM t"),
+                         "SELECT * FROM t WHERE transaction_date >= %s AND transaction_date < %s")
+
+
+class TestBlockingConnectionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_test_pool(1, BlockingConnectionPool, timeout=0.1)
+        if self.pool is None:
+            self.skipTest("no postgres to query")
+
+    def tearDown(self):
+        self.pool.closeall()
+
+    def test_waits_for_connection(self):
+        conn = self.pool.getconn()
+        threading.Timer(0.05, self.pool.putconn, [conn]).start()
+        start = time.perf_counter()
+        self.assertIs(self.pool.getconn(), conn)
+        self.assertGreater(time.perf_counter() - start, 0.04)
+        self.pool.putconn(conn)
+
+    def test_timeout(self):
+        conn = self.pool.getconn()
+        with self.assertRaises(PoolError):
+            self.pool.getconn()
+        self.pool.putconn(conn)
+        self.pool.putconn(self.pool.getconn())
+
+
+class TestTransactionQueries(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_test_pool(2, BlockingConnectionPool)
+        if self.pool is None:
+            self.skipTest("no postgres to query")
+        BulkLoader(self.pool, DATA_DIR).run()
+
+    def tearDown(self):
+        self.pool.closeall()
+
+    def test_lookups(self):
+        for prepared in [True, False]:
+            queries = TransactionQueries(self.pool, prepared=prepared)
+            self.assertEqual([row[0] for row in queries.by_account(4321)], ["AS345-ASDF-31234-FDAAD-9345"])
+            self.assertEqual([row[0] for row in queries.by_product(241)], ["9234A-JFDA-87654-BFAEA-0932"])
+            self.assertEqual(queries.by_account(1), [])
+            rows = queries.by_date(datetime.date(2022, 6, 1), datetime.date(2022, 6, 2))
+            self.assertEqual(rows, [("AS345-ASDF-31234-FDAAD-9345", datetime.date(2022, 6, 1), 345, "01",
+                                     "Widget Medium", 5, 4321)])
+            self.assertEqual(queries.stats.latencies["transactions_by_account"].count, 2)
+            self.assertEqual(queries.stats.pool_wait.count, 4)
+
+    def test_prepared_once_per_connection(self):
+        queries = TransactionQueries(self.pool)
+        for account_id in [4321, 5677] * 3:
+            self.assertEqual(len(queries.by_account(account_id)), 1)
+        # another instance on the same connections doesn't prepare them again
+        self.assertEqual(len(TransactionQueries(self.pool).by_product(345)), 1)
+        conn = self.pool.getconn()
+        with conn.cursor() as cur:
+            cur.execute("SELECT name FROM pg_prepared_statements ORDER BY name")
+            self.assertEqual(cur.fetchall(), [(name,) for name in sorted(QUERIES)])
+        self.pool.putconn(conn)
+
+    def test_stream(self):
+        queries = TransactionQueries(self.pool, fetch_size=1)
+        rows = list(queries.stream_by_date("2022-01-01", "2023-01-01"))
+        self.assertEqual(sorted(row[0] for row in rows), ["9234A-JFDA-87654-BFAEA-0932", "AS345-ASDF-31234-FDAAD-9345"])
+        # a full last fetch takes one more to find the end
+        self.assertEqual(queries.stats.rows_per_fetch.counts[:3], [1, 2, 0])
+        self.assertEqual(queries.stats.latencies["transactions_by_date (streamed)"].count, 1)
+
+        # a stream closed part way through gives its connection back
+        for _ in range(3):
+            stream = queries.stream_by_date("2022-01-01", "2023-01-01")
+            next(stream)
+            stream.close()
+        self.assertEqual(len(queries.by_account(4321)), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from db.query import BlockingConnectionPool
+from db.star import *
+
+from .load import DATA_DIR, make_test_pool
+
+
+class TestLruCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LruCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertNotIn("b", cache)
+        self.assertEqual([cache.get(key) for key in "abc"], [1, None, 3])
+        cache.put("a", 4)
+        cache.put("d", 5)
+        self.assertEqual(list(cache.items.items()), [("a", 4), ("d", 5)])
+
+    def test_size(self):
+        with self.assertRaises(ValueError):
+            LruCache(0)
+
+
+class TestStarLoader(unittest.TestCase):
+    def setUp(self):
+        self.pool = make_test_pool(2, BlockingConnectionPool)
+        if self.pool is None:
+            self.skipTest("no postgres to load into")
+        self.data_dir = tempfile.mkdtemp()
+        for name in ["accounts.csv", "products.csv"]:
+            shutil.copy(os.path.join(DATA_DIR, name), self.data_dir)
+        with open(os.path.join(DATA_DIR, "transactions.csv")) as f:
+            transactions = f.read().rstrip("\n")
+        with open(os.path.join(self.data_dir, "transactions.csv"), "w") as f:
+            f.write(transactions + "\n"
+                    "X1, 2022/06/03, 345, 01, Widget Medium, 2, 9999\n"
+                    "X2, 2022/06/04, 999, 09, Widget Tiny, 3, 4321\n"
+                    "X3, 2022/06/05, abc, 09, Widget Tiny, 4, 1\n"
+                    "X4, 2022/06/05, 241, 02, Widget Large, 7, 4321\n")
+
+    def tearDown(self):
+        self.pool.closeall()
+        shutil.rmtree(self.data_dir)
+
+    def query(self, sql: str):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql)
+                return cur.fetchall()
+        finally:
+            conn.rollback()
+            self.pool.putconn(conn)
+
+    def check_load(self, loader: StarLoader):
+        stats = loader.run()
+        self.assertEqual({name: table_stats.rows for name, table_stats in stats.items()},
+                         {"dim_account": 2, "dim_product": 2, "fact_transactions": 3})
+        self.assertEqual(loader.rejected, 3)
+        self.assertEqual(self.query("SELECT f.transaction_id, f.transaction_date::text, a.customer_id, p.product_code, "
+                                    "f.quantity FROM fact_transactions f JOIN dim_account a USING (account_key) "
+                                    "JOIN dim_product p USING (product_key) ORDER BY transaction_id"),
+                         [("9234A-JFDA-87654-BFAEA-0932", "2022-06-02", 5677, "02", 1),
+                          ("AS345-ASDF-31234-FDAAD-9345", "2022-06-01", 4321, "01", 5),
+                          ("X4", "2022-06-05", 4321, "02", 7)])
+        self.assertEqual(self.query("SELECT transaction_id, product_id, account_id, reason FROM transaction_rejects "
+                                    "ORDER BY transaction_id"),
+                         [("X1", "345", "9999", "unknown account"), ("X2", "999", "4321", "unknown product"),
+                          ("X3", "abc", "1", "unknown account, unknown product")])
+
+    def test_warm_cache(self):
+        loader = StarLoader(self.pool, self.data_dir)
+        self.check_load(loader)
+        for keys in [loader.accounts, loader.products]:
+            self.assertTrue(keys.complete)
+            self.assertEqual(keys.round_trips, 0)
+        self.assertEqual(loader.accounts.hits, 4)
+        self.assertEqual(loader.accounts.misses, 2)
+
+    def test_partial_cache(self):
+        # one key cached at a time, so every other key is looked up in the table; unknown keys aren't cached, and abc
+        # can't be a product id at all
+        loader = StarLoader(self.pool, self.data_dir, cache_size=1, defer_constraints=False)
+        self.check_load(loader)
+        self.assertFalse(loader.accounts.complete)
+        self.assertEqual(loader.accounts.round_trips, 4)
+        self.assertEqual(loader.products.round_trips, 4)
+        self.assertEqual(loader.products.misses, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
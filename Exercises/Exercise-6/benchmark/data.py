@@ -0,0 +1,38 @@
+import datetime
+import os
+import random
+import zipfile
+
+STATIONS = ["Sheffield Ave & Kingsbury St", "Leavitt St & Armitage Ave", "Throop (Loomis) St & Taylor St",
+            "Morgan St & Polk St", "Clark St & Elm St", "Streeter Dr & Grand Ave", "Lake Shore Dr & Monroe St"]
+HEADER = ("trip_id,start_time,end_time,bikeid,tripduration,from_station_id,from_station_name,to_station_id,"
+          "to_station_name,usertype,gender,birthyear\n")
+
+
+def trip_lines(rng: random.Random, first_trip_id: int, n_trips: int, start: datetime.datetime):
+    for trip_id in range(first_trip_id, first_trip_id + n_trips):
+        started = start + datetime.timedelta(seconds=(trip_id - first_trip_id) * 30)
+        duration = rng.randrange(60, 5000)
+        from_station, to_station = rng.randrange(len(STATIONS)), rng.randrange(len(STATIONS))
+        gender, birthyear = rng.choice([("Male", rng.randrange(1940, 2004)), ("Female", rng.randrange(1940, 2004)),
+                                        ("", "")])
+        # durations over a thousand seconds are quoted with a thousands separator, as in the real files
+        duration_text = f"{duration}.0" if duration < 1000 else f'"{duration:,}.0"'
+        ended = started + datetime.timedelta(seconds=duration)
+        yield (f"{trip_id},{started:%Y-%m-%d %H:%M:%S},{ended:%Y-%m-%d %H:%M:%S},{rng.randrange(1, 6000)},"
+               f"{duration_text},"
+               f"{from_station},{STATIONS[from_station]},{to_station},{STATIONS[to_station]},"
+               f"{rng.choice(['Subscriber', 'Customer'])},{gender},{birthyear}\n")
+
+
+def generate_zips(data_dir: str, n_files: int, trips_per_file: int, seed: int = 0):
+    # quarterly Divvy-like trip files, each a zip holding one csv
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(n_files):
+        name = f"Divvy_Trips_{2019 + i // 4}_Q{i % 4 + 1}"
+        start = datetime.datetime(2019 + i // 4, (i % 4) * 3 + 1, 1)
+        with zipfile.ZipFile(os.path.join(data_dir, name + ".zip"), "w", zipfile.ZIP_DEFLATED) as archive:
+            lines = trip_lines(rng, i * trips_per_file, trips_per_file, start)
+            archive.writestr(name + ".csv", HEADER + "".join(lines))
+    return n_files * trips_per_file
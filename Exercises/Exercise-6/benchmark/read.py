@@ -0,0 +1,60 @@
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+
+import pandas as pd
+import pyspark.sql.functions as F
+
+from pyspark.sql import SparkSession
+
+from benchmark.data import generate_zips
+from src.spark.trips import *
+
+
+def read_on_driver(spark: SparkSession, data_dir: str):
+    # the obvious solution: unzip and parse every file in the driver with pandas, then hand the rows to spark
+    frames = []
+    for path in sorted(glob.glob(os.path.join(data_dir, "*.zip"))):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                with archive.open(name) as f:
+                    frames.append(pd.read_csv(f, thousands=",", parse_dates=["start_time", "end_time"]))
+    trips = pd.concat(frames, ignore_index=True)
+    return spark.createDataFrame(trips)
+
+
+def daily_durations(trips):
+    return trips.groupBy(F.to_date("start_time").alias("day")).agg(F.avg("tripduration"), F.count("*")).collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time reading zipped trip csv files on the driver and in executors")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--trips-per-file", type=int, default=250_000)
+    parser.add_argument("--master", default="local[*]")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    spark = SparkSession.builder.master(args.master).appName("zipcsv_benchmark").getOrCreate()
+    try:
+        n_trips = generate_zips(tmp_dir, args.files, args.trips_per_file)
+        size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(tmp_dir, "*.zip")))
+        print(f"{n_trips} trips in {args.files} zips ({size / 1e6:.0f}MB) on {spark.sparkContext.defaultParallelism} "
+              f"cores")
+        for name, read in [("driver", read_on_driver), ("executors", read_trips)]:
+            start = time.perf_counter()
+            days = daily_durations(read(spark, tmp_dir))
+            seconds = time.perf_counter() - start
+            assert sum(day[2] for day in days) == n_trips
+            print(f"{name:>9}: {seconds:.3f}s ({n_trips / seconds:,.0f} trips/s)")
+    finally:
+        spark.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pyspark.sql.functions as F
+
+from pyspark.sql import SparkSession, Window
+
+from benchmark.data import generate_zips
+from src.spark.reports import *
+from src.spark.trips import *
+
+
+def write_naively(trips, reports_dir: str):
+    # each report its own action straight off the zips, so the trips are read and parsed six times
+    def write(name: str, df):
+        df.coalesce(1).write.mode("overwrite").option("header", True).csv(os.path.join(reports_dir, name))
+
+    trips = prepare_trips(trips)
+    write("average_trip_duration_per_day", trips.groupBy("day").agg(F.round(F.avg("duration"), 2)).orderBy("day"))
+    write("trips_per_day", trips.groupBy("day").count().orderBy("day"))
+    monthly = trips.groupBy("month", "station").count()
+    write("most_popular_start_station_per_month", monthly.withColumn(
+        "rank", F.row_number().over(Window.partitionBy("month").orderBy(F.desc("count"), "station")))
+          .where(F.col("rank") == 1).orderBy("month"))
+    last_day = trips.agg(F.max("day")).first()[0]
+    daily = trips.where(F.col("day") > F.date_sub(F.lit(last_day), 14)).groupBy("day", "station").count()
+    write("top_3_start_stations_per_day_last_two_weeks", daily.withColumn(
+        "rank", F.row_number().over(Window.partitionBy("day").orderBy(F.desc("count"), "station")))
+          .where(F.col("rank") <= 3).orderBy("day", "rank"))
+    write("average_trip_duration_by_gender", trips.where(F.col("gender").isNotNull()).groupBy("gender")
+          .agg(F.round(F.avg("duration"), 2)))
+    ages = trips.where(F.col("age").isNotNull()).groupBy("age").agg(F.round(F.avg("duration"), 2).alias("average"))
+    write("top_10_ages_by_trip_duration", ages.orderBy(F.desc("average")).limit(10)
+          .unionByName(ages.orderBy("average").limit(10)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the six trip reports written naively and by the report engine")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--trips-per-file", type=int, default=100_000)
+    parser.add_argument("--master", default="local[*]")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    spark = SparkSession.builder.master(args.master).appName("reports_benchmark").getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    try:
+        data_dir = os.path.join(tmp_dir, "data")
+        n_trips = generate_zips(data_dir, args.files, args.trips_per_file)
+        print(f"{n_trips} trips in {args.files} zips on {spark.sparkContext.defaultParallelism} cores")
+
+        start = time.perf_counter()
+        write_naively(read_trips(spark, data_dir), os.path.join(tmp_dir, "naive"))
+        print(f"{'naive':>16}: {time.perf_counter() - start:.3f}s")
+        for single_job in [False, True]:
+            start = time.perf_counter()
+            engine = TripReportEngine(spark, read_trips(spark, data_dir), os.path.join(tmp_dir, f"engine_{single_job}"))
+            stats = engine.run(single_job=single_job)
+            print(f"{'engine, one job' if single_job else 'engine, six jobs':>16}: {time.perf_counter() - start:.3f}s")
+            for report_stats in stats.values():
+                print(f"{'':>18}{report_stats}")
+    finally:
+        spark.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 from pyspark.sql import SparkSession
 
+from src.spark.reports import *
+from src.spark.trips import *
+
+data_dir = "data"
+reports_dir = "reports"
+# parquet copies of the zips, made on the first run and read on later ones
+cache_dir = "cache"
+
 
 def main():
     spark = SparkSession.builder.appName("Exercise6").enableHiveSupport().getOrCreate()
-    # your code here
+    # parsed out of the zips by the executors, a task per csv inside them, on the first run only
+    trips = read_trips(spark, data_dir, cache_dir=cache_dir)
+    stats = TripReportEngine(spark, trips, reports_dir).run()
+    for report_stats in stats.values():
+        print(report_stats)
 
 
 if __name__ == "__main__":
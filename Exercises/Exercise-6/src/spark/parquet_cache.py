@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from pyspark.sql import DataFrame
+
+from .zipcsv import *
+
+
+def file_checksum(path: str, chunk_size: int = 1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CacheStats:
+    def __init__(self):
+        self.reused = 0
+        self.converted = 0
+        # zips read in full to check them, because their size or mtime changed or they weren't seen before
+        self.checksummed = 0
+        self.uncached = 0
+        self.seconds = 0.0
+
+    def record(self, converted: bool, checksummed: bool, seconds: float):
+        self.converted += converted
+        self.reused += not converted
+        self.checksummed += checksummed
+        self.seconds += seconds
+
+    def __repr__(self):
+        return (f"{self.converted} zips converted in {self.seconds:.3f}s, {self.reused} reused "
+                f"({self.checksummed} checksummed), {self.uncached} read without the cache")
+
+
+class ParquetCache:
+    # a parquet copy of each zip a ZippedCsvReader reads, written on first use and read instead of the zip from then
+    # on. Entries live in <cache_dir>/source=sha256_<checksum of the zip>/, so a zip that changes gets a new one and
+    # a copy of the same zip elsewhere shares it; the manifest keeps each zip's size and mtime next to its checksum,
+    # so an untouched zip isn't read again to hash it. Rows are partitioned by partition_by and sorted by sort_by
+    # within each file, so filters on either skip directories and row groups. Zips the driver can't open (not on a
+    # local or shared filesystem) are read straight from the zip every time
+    manifest_name = "manifest.json"
+
+    def __init__(self, reader: ZippedCsvReader, cache_dir: str, partition_by: list = None, sort_by: list = None):
+        self.reader = reader
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.partition_by = partition_by or []
+        self.sort_by = sort_by or []
+        self.manifest_path = os.path.join(self.cache_dir, self.manifest_name)
+        self.stats = CacheStats()
+
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest: dict):
+        part_path = self.manifest_path + ".part"
+        with open(part_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(part_path, self.manifest_path)
+
+    def entry_dir(self, checksum: str):
+        # prefixed, so partition discovery never reads a hex checksum like "12e45" as a number
+        return os.path.join(self.cache_dir, f"source=sha256_{checksum}")
+
+    def checksum(self, manifest: dict, path: str):
+        stat = os.stat(path)
+        known = manifest.get(path)
+        if known is not None and (known["size"], known["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return known["checksum"], False
+        manifest[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "checksum": file_checksum(path)}
+        return manifest[path]["checksum"], True
+
+    def convert(self, zip_path: str, checksum: str):
+        # written next to the entry and renamed into place, so a failed conversion never looks like a cached one
+        part_dir = os.path.join(self.cache_dir, f".part-{uuid.uuid4().hex}")
+        try:
+            df = self.reader.read(zip_path)
+            if len(self.sort_by) > 0:
+                df = df.sortWithinPartitions(*self.sort_by)
+            df.write.mode("overwrite").partitionBy(*self.partition_by).parquet(part_dir)
+            shutil.rmtree(self.entry_dir(checksum), ignore_errors=True)
+            os.replace(part_dir, self.entry_dir(checksum))
+        finally:
+            shutil.rmtree(part_dir, ignore_errors=True)
+
+    def prune(self, manifest: dict):
+        # entries no zip in the manifest points at any more
+        live = {os.path.basename(self.entry_dir(known["checksum"])) for known in manifest.values()}
+        for name in os.listdir(self.cache_dir):
+            if name.startswith("source=") and name not in live:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def update(self, zip_paths: list):
+        # the checksums of zip_paths, converting the ones not cached yet
+        os.makedirs(self.cache_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        checksums = []
+        for zip_path in zip_paths:
+            path = local_path(zip_path)
+            checksum, checksummed = self.checksum(manifest, path)
+            start = time.perf_counter()
+            converted = not os.path.isdir(self.entry_dir(checksum))
+            if converted:
+                self.convert(zip_path, checksum)
+            self.stats.record(converted, checksummed, time.perf_counter() - start if converted else 0.0)
+            checksums.append(checksum)
+        # zips that were deleted drop out of the manifest, and their entries with them
+        seen = {local_path(zip_path) for zip_path in zip_paths}
+        manifest = {path: known for path, known in manifest.items() if path in seen or os.path.exists(path)}
+        self.save_manifest(manifest)
+        self.prune(manifest)
+        return checksums
+
+    def read(self, path: str) -> DataFrame:
+        zip_paths = self.reader.list_zips(path)
+        cached = [zip_path for zip_path in zip_paths if local_path(zip_path) is not None]
+        uncached = [zip_path for zip_path in zip_paths if local_path(zip_path) is None]
+        self.stats.uncached += len(uncached)
+        spark, schema = self.reader.spark, self.reader.schema
+
+        dfs = []
+        if len(cached) > 0:
+            entry_dirs = sorted({self.entry_dir(checksum) for checksum in self.update(cached)})
+            # basePath keeps partition_by as columns; the source directory is dropped again
+            dfs.append(spark.read.schema(schema).option("basePath", self.cache_dir).parquet(*entry_dirs)
+                       .select(*schema.fieldNames()))
+        if len(uncached) > 0:
+            dfs.append(self.reader.read(uncached))
+        if len(dfs) == 0:
+            return spark.createDataFrame(spark.sparkContext.emptyRDD(), schema)
+        return dfs[0] if len(dfs) == 1 else dfs[0].unionByName(dfs[1])
@@ -0,0 +1,237 @@
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import pyspark.sql.functions as F
+
+from contextlib import contextmanager
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, Window
+
+# every aggregate the six reports need, from one scan of the trips: grouping sets compute them all in a single
+# aggregation, and each report is then read off its own set
+AGGREGATE_SQL = """
+SELECT
+    CASE
+        WHEN grouping(station) = 0 THEN 'station_day'
+        WHEN grouping(gender) = 0 THEN 'gender'
+        WHEN grouping(age) = 0 THEN 'age'
+        ELSE 'day'
+    END AS grouping_set,
+    day, month, station, gender, age,
+    count(*) AS trips,
+    sum(duration) AS total_duration,
+    count(duration) AS timed_trips
+FROM {view}
+GROUP BY GROUPING SETS ((day), (month, day, station), (gender), (age))
+"""
+
+
+def prepare_trips(trips: DataFrame):
+    # only the columns the reports use. Trips without a duration (the 2020 files only have start and end times)
+    # get theirs from those
+    return trips.where(F.col("start_time").isNotNull()).select(
+        F.to_date("start_time").alias("day"),
+        F.date_format("start_time", "yyyy-MM").alias("month"),
+        F.col("from_station_name").alias("station"),
+        F.col("gender"),
+        (F.year("start_time") - F.col("birthyear")).alias("age"),
+        F.coalesce(F.col("tripduration"),
+                   F.unix_timestamp("end_time") - F.unix_timestamp("start_time")).cast("double").alias("duration"),
+    )
+
+
+def average_duration(total: str = "total_duration", count: str = "timed_trips"):
+    return F.round(F.col(total) / F.col(count), 2).alias("average_duration")
+
+
+def count_shuffles(df: DataFrame):
+    # exchanges the plan would run, leaving out the ones inside an already cached relation
+    shuffles = 0
+    cached_indent = None
+    for line in df._jdf.queryExecution().executedPlan().toString().splitlines():
+        indent = len(line) - len(line.lstrip(" +-:"))
+        if cached_indent is not None:
+            if indent > cached_indent:
+                continue
+            cached_indent = None
+        if "InMemoryRelation" in line:
+            cached_indent = indent
+        elif "Exchange " in line:
+            shuffles += 1
+    return shuffles
+
+
+class ReportStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.jobs = 0
+        self.stages = 0
+        # only known for the reports themselves
+        self.shuffles = None
+        self.seconds = 0.0
+
+    def record(self, status_tracker, job_group: str, seconds: float):
+        # stages that ran; ones skipped because their shuffle output was reused don't count
+        for job_id in status_tracker.getJobIdsForGroup(job_group):
+            self.jobs += 1
+            job = status_tracker.getJobInfo(job_id)
+            for stage_id in job.stageIds if job is not None else []:
+                stage = status_tracker.getStageInfo(stage_id)
+                if stage is not None and stage.numCompletedTasks > 0:
+                    self.stages += 1
+        self.seconds += seconds
+
+    def __repr__(self):
+        parts = []
+        if self.jobs > 0:
+            parts.append(f"{self.jobs} jobs, {self.stages} stages in {self.seconds:.3f}s")
+        if self.shuffles is not None:
+            parts.append(f"{self.shuffles} shuffles in its plan")
+        return f"{self.name}: {', '.join(parts)}"
+
+
+class Report:
+    def __init__(self, name: str, df: DataFrame, order_by: list):
+        self.name = name
+        self.df = df
+        self.order_by = order_by
+
+
+class TripReportEngine:
+    # the six Exercise-6 reports from one pass over the trips. The trips are cached once, in Spark's columnar
+    # in-memory format, and aggregated once for every report with grouping sets; the per day station counts behind
+    # the two station reports are partitioned by month and cached, so neither needs another shuffle. With
+    # single_job, all six are written by a single write, partitioned by report; otherwise each has its own write, to
+    # see what each costs. Each report ends up as <reports_dir>/<name>.csv
+    def __init__(self, spark: SparkSession, trips: DataFrame, reports_dir: str = "reports", last_days: int = 14):
+        self.spark = spark
+        self.trips = trips
+        self.reports_dir = reports_dir
+        self.last_days = last_days
+        self.stats = {}
+        self.cached = []
+        self.job_groups = 0
+
+    @contextmanager
+    def track(self, name: str):
+        sc = self.spark.sparkContext
+        self.job_groups += 1
+        job_group = f"report_engine_{id(self)}_{self.job_groups}"
+        sc.setJobGroup(job_group, name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            sc.setLocalProperty("spark.jobGroup.id", None)
+            sc.setLocalProperty("spark.job.description", None)
+            self.stats.setdefault(name, ReportStats(name)).record(sc.statusTracker(), job_group, seconds)
+
+    def persist(self, df: DataFrame):
+        df = df.persist(StorageLevel.MEMORY_AND_DISK)
+        self.cached.append(df)
+        return df
+
+    def aggregate(self):
+        with self.track("cache trips"):
+            trips = self.persist(prepare_trips(self.trips))
+            trips.count()
+        view = f"report_trips_{id(self)}"
+        trips.createOrReplaceTempView(view)
+        with self.track("aggregate"):
+            aggregates = self.persist(self.spark.sql(AGGREGATE_SQL.format(view=view)))
+            aggregates.count()
+        self.spark.catalog.dropTempView(view)
+        with self.track("partition station days"):
+            station_days = self.persist(aggregates.where(F.col("grouping_set") == "station_day")
+                                        .select("month", "day", "station", "trips")
+                                        .repartition(self.spark.sparkContext.defaultParallelism, "month"))
+            station_days.count()
+        return aggregates, station_days
+
+    def reports(self):
+        aggregates, station_days = self.aggregate()
+        days = aggregates.where(F.col("grouping_set") == "day")
+        last_day = days.agg(F.max("day")).first()[0]
+
+        monthly = station_days.groupBy("month", "station").agg(F.sum("trips").alias("trips"))
+        month_rank = F.row_number().over(Window.partitionBy("month").orderBy(F.desc("trips"), "station"))
+        # partitioned by month and day rather than just day, so the month partitioning is reused
+        day_rank = F.row_number().over(Window.partitionBy("month", "day").orderBy(F.desc("trips"), "station"))
+        genders = aggregates.where((F.col("grouping_set") == "gender") & F.col("gender").isNotNull())
+        ages = aggregates.where((F.col("grouping_set") == "age") & F.col("age").isNotNull()) \
+            .select("age", average_duration())
+        longest = ages.withColumn("rank", F.row_number().over(Window.orderBy(F.desc("average_duration"), "age")))
+        shortest = ages.withColumn("rank", F.row_number().over(Window.orderBy("average_duration", "age")))
+
+        return [
+            Report("average_trip_duration_per_day", days.select("day", average_duration()), ["day"]),
+            Report("trips_per_day", days.select("day", "trips"), ["day"]),
+            Report("most_popular_start_station_per_month",
+                   monthly.withColumn("rank", month_rank).where(F.col("rank") == 1).select("month", "station", "trips"),
+                   ["month"]),
+            Report("top_3_start_stations_per_day_last_two_weeks",
+                   station_days.where(F.col("day") > F.date_sub(F.lit(last_day), self.last_days))
+                   .withColumn("rank", day_rank).where(F.col("rank") <= 3)
+                   .select("day", "rank", "station", "trips"), ["day", "rank"]),
+            Report("average_trip_duration_by_gender", genders.select("gender", "trips", average_duration()),
+                   ["gender"]),
+            Report("top_10_ages_by_trip_duration",
+                   longest.where(F.col("rank") <= 10).select(F.lit("longest").alias("ranked_by"), "rank", "age",
+                                                             "average_duration")
+                   .unionByName(shortest.where(F.col("rank") <= 10).select(F.lit("shortest").alias("ranked_by"),
+                                                                          "rank", "age", "average_duration")),
+                   ["ranked_by", "rank"]),
+        ]
+
+    def render(self, report: Report):
+        # the report as csv lines, each numbered so the header and rows can be put back in order after the write
+        columns = report.df.columns
+        line_number = F.row_number().over(Window.orderBy(*report.order_by))
+        header = self.spark.createDataFrame([(report.name, 0, ",".join(columns))],
+                                            "report string, line long, text string")
+        rows = report.df.select(F.lit(report.name).alias("report"), line_number.alias("line"),
+                                F.to_csv(F.struct(*columns)).alias("text"))
+        return header.unionByName(rows)
+
+    def write_lines(self, lines: DataFrame, out_dir: str):
+        lines.repartition("report").sortWithinPartitions("report", "line").select("report", "text") \
+            .write.mode("overwrite").partitionBy("report").text(out_dir)
+
+    def run(self, single_job: bool = True):
+        self.stats = {}
+        reports = self.reports()
+        for report in reports:
+            self.stats.setdefault(report.name, ReportStats(report.name)).shuffles = count_shuffles(report.df)
+        os.makedirs(self.reports_dir, exist_ok=True)
+        out_dir = tempfile.mkdtemp(dir=self.reports_dir)
+        try:
+            if single_job:
+                lines = self.render(reports[0])
+                for report in reports[1:]:
+                    lines = lines.unionByName(self.render(report))
+                with self.track("write reports"):
+                    self.write_lines(lines, out_dir)
+            else:
+                for report in reports:
+                    with self.track(report.name):
+                        self.write_lines(self.render(report), os.path.join(out_dir, report.name))
+            for report in reports:
+                self.move_report(out_dir, report.name)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+            for df in self.cached:
+                df.unpersist()
+            self.cached = []
+        return self.stats
+
+    def move_report(self, out_dir: str, name: str):
+        parts = glob.glob(os.path.join(out_dir, "**", f"report={name}", "part-*"), recursive=True)
+        with open(os.path.join(self.reports_dir, f"{name}.csv"), "w") as out:
+            for part in sorted(parts):
+                with open(part) as f:
+                    shutil.copyfileobj(f, out)
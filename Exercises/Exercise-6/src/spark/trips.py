@@ -0,0 +1,39 @@
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.types import *
+
+from .parquet_cache import *
+from .zipcsv import *
+
+TRIP_SCHEMA = StructType([
+    StructField("trip_id", IntegerType()),
+    StructField("start_time", TimestampType()),
+    StructField("end_time", TimestampType()),
+    StructField("bikeid", IntegerType()),
+    StructField("tripduration", DoubleType()),
+    StructField("from_station_id", IntegerType()),
+    StructField("from_station_name", StringType()),
+    StructField("to_station_id", IntegerType()),
+    StructField("to_station_name", StringType()),
+    StructField("usertype", StringType()),
+    StructField("gender", StringType()),
+    StructField("birthyear", IntegerType()),
+])
+
+# the 2020 files' names for the columns they share with the 2019 ones; they have no duration, gender or birth year
+TRIP_ALIASES = {
+    "started_at": "start_time",
+    "ended_at": "end_time",
+    "start_station_id": "from_station_id",
+    "start_station_name": "from_station_name",
+    "end_station_id": "to_station_id",
+    "end_station_name": "to_station_name",
+    "member_casual": "usertype",
+}
+
+
+def read_trips(spark: SparkSession, path: str, cache_dir: str = None, **options) -> DataFrame:
+    # with cache_dir, each zip is parsed once into parquet sorted by start time, and read from there after that
+    reader = ZippedCsvReader(spark, TRIP_SCHEMA, aliases=TRIP_ALIASES, **options)
+    if cache_dir is None:
+        return reader.read(path)
+    return ParquetCache(reader, cache_dir, sort_by=["start_time"]).read(path)
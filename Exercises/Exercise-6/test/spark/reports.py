@@ -0,0 +1,107 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from pyspark.sql import SparkSession
+
+from spark.reports import *
+from spark.trips import TRIP_SCHEMA
+
+
+def trip(trip_id: int, start: str, minutes: float, station: str, gender: str = None, birthyear: int = None,
+         with_duration: bool = True):
+    start_time = datetime.datetime.fromisoformat(start)
+    end_time = start_time + datetime.timedelta(minutes=minutes)
+    return (trip_id, start_time, end_time, 1, minutes * 60.0 if with_duration else None, 1, station, 2, "Elsewhere",
+            "Subscriber", gender, birthyear)
+
+
+TRIPS = [
+    trip(1, "2019-10-01 08:00:00", 10, "A", "Male", 1990),
+    trip(2, "2019-10-01 09:00:00", 20, "B", "Female", 1980),
+    trip(3, "2019-10-01 10:00:00", 30, "B", "Female", 1980),
+    trip(4, "2019-10-20 10:00:00", 40, "C", "Male", 1990),
+    trip(5, "2019-11-02 10:00:00", 5, "A"),
+    # the 2020 files have no duration, only start and end times
+    trip(6, "2019-11-02 11:00:00", 15, "C", with_duration=False),
+    trip(7, "2019-11-03 11:00:00", 25, "D", "Male", 2000),
+    trip(8, "2019-11-03 12:00:00", 35, "C", "Female", 1970),
+]
+
+
+class TestTripReportEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_reports") \
+            .config("spark.sql.shuffle.partitions", 4).getOrCreate()
+        # the age rankings are windows over the whole (tiny) age set, which spark warns about every time
+        cls.spark.sparkContext.setLogLevel("ERROR")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def setUp(self):
+        self.reports_dir = tempfile.mkdtemp()
+        self.trips = self.spark.createDataFrame(TRIPS, TRIP_SCHEMA).repartition(3)
+
+    def tearDown(self):
+        shutil.rmtree(self.reports_dir)
+
+    def read_report(self, name: str):
+        with open(os.path.join(self.reports_dir, f"{name}.csv")) as f:
+            return f.read().splitlines()
+
+    def check_reports(self):
+        self.assertEqual(sorted(os.listdir(self.reports_dir)), sorted(f"{name}.csv" for name in [
+            "average_trip_duration_per_day", "trips_per_day", "most_popular_start_station_per_month",
+            "top_3_start_stations_per_day_last_two_weeks", "average_trip_duration_by_gender",
+            "top_10_ages_by_trip_duration"]))
+        self.assertEqual(self.read_report("average_trip_duration_per_day"),
+                         ["day,average_duration", "2019-10-01,1200.0", "2019-10-20,2400.0", "2019-11-02,600.0",
+                          "2019-11-03,1800.0"])
+        self.assertEqual(self.read_report("trips_per_day"),
+                         ["day,trips", "2019-10-01,3", "2019-10-20,1", "2019-11-02,2", "2019-11-03,2"])
+        self.assertEqual(self.read_report("most_popular_start_station_per_month"),
+                         ["month,station,trips", "2019-10,B,2", "2019-11,C,2"])
+        # the last two weeks are the 14 days up to the last day with any trips, so the 20th is just outside them
+        self.assertEqual(self.read_report("top_3_start_stations_per_day_last_two_weeks"),
+                         ["day,rank,station,trips", "2019-11-02,1,A,1", "2019-11-02,2,C,1",
+                          "2019-11-03,1,C,1", "2019-11-03,2,D,1"])
+        self.assertEqual(self.read_report("average_trip_duration_by_gender"),
+                         ["gender,trips,average_duration", "Female,3,1700.0", "Male,3,1500.0"])
+        # ties go to the youngest either way
+        self.assertEqual(self.read_report("top_10_ages_by_trip_duration"),
+                         ["ranked_by,rank,age,average_duration", "longest,1,49,2100.0", "longest,2,19,1500.0",
+                          "longest,3,29,1500.0", "longest,4,39,1500.0", "shortest,1,19,1500.0",
+                          "shortest,2,29,1500.0", "shortest,3,39,1500.0", "shortest,4,49,2100.0"])
+
+    def test_single_job(self):
+        stats = TripReportEngine(self.spark, self.trips, self.reports_dir).run()
+        self.check_reports()
+        self.assertEqual(stats["cache trips"].jobs > 0, True)
+        self.assertGreater(stats["write reports"].stages, 0)
+        # the station reports read the month partitioned station days without shuffling them again
+        self.assertEqual(stats["most_popular_start_station_per_month"].shuffles, 0)
+        self.assertEqual(stats["top_3_start_stations_per_day_last_two_weeks"].shuffles, 0)
+
+    def test_job_per_report(self):
+        stats = TripReportEngine(self.spark, self.trips, self.reports_dir).run(single_job=False)
+        self.check_reports()
+        for name in ["trips_per_day", "top_10_ages_by_trip_duration"]:
+            self.assertGreater(stats[name].jobs, 0)
+            self.assertGreater(stats[name].seconds, 0)
+
+    def test_shuffles(self):
+        self.assertEqual(count_shuffles(self.trips), 1)
+        cached = self.trips.persist()
+        cached.count()
+        self.assertEqual(count_shuffles(cached.select("trip_id")), 0)
+        self.assertEqual(count_shuffles(cached.groupBy("gender").count()), 1)
+        cached.unpersist()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from pyspark.sql import SparkSession
+
+from spark.trips import *
+
+
+class TestReadTrips(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_trips").getOrCreate()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        with zipfile.ZipFile(os.path.join(self.tmp_dir, "Divvy_Trips_2019_Q4.zip"), "w",
+                             zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("Divvy_Trips_2019_Q4.csv",
+                             "trip_id,start_time,end_time,bikeid,tripduration,from_station_id,from_station_name,"
+                             "to_station_id,to_station_name,usertype,gender,birthyear\n"
+                             "25223640,2019-10-01 00:01:39,2019-10-01 00:17:20,2215,940.0,20,"
+                             "Sheffield Ave & Kingsbury St,309,Leavitt St & Armitage Ave,Subscriber,Male,1987\n"
+                             "25223641,2019-10-01 00:02:16,2019-10-01 00:26:34,6328,\"1,458.0\",19,"
+                             "Throop (Loomis) St & Taylor St,241,Morgan St & Polk St,Customer,,\n")
+        with zipfile.ZipFile(os.path.join(self.tmp_dir, "Divvy_Trips_2020_Q1.zip"), "w",
+                             zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("Divvy_Trips_2020_Q1.csv",
+                             "ride_id,rideable_type,started_at,ended_at,start_station_name,start_station_id,"
+                             "end_station_name,end_station_id,start_lat,start_lng,end_lat,end_lng,member_casual\n"
+                             "EACB19130B0CDA4A,docked_bike,2020-01-21 20:06:59,2020-01-21 20:14:30,"
+                             "Western Ave & Leland Ave,239,Clark St & Leland Ave,326,41.9665,-87.6884,41.9671,-87.6674,"
+                             "member\n")
+        trips = read_trips(self.spark, self.tmp_dir)
+        self.assertEqual(trips.schema, TRIP_SCHEMA)
+        self.assertEqual(sorted((tuple(row) for row in trips.collect()), key=lambda row: row[1]), [
+            (25223640, datetime.datetime(2019, 10, 1, 0, 1, 39), datetime.datetime(2019, 10, 1, 0, 17, 20), 2215, 940.0,
+             20, "Sheffield Ave & Kingsbury St", 309, "Leavitt St & Armitage Ave", "Subscriber", "Male", 1987),
+            (25223641, datetime.datetime(2019, 10, 1, 0, 2, 16), datetime.datetime(2019, 10, 1, 0, 26, 34), 6328,
+             1458.0, 19, "Throop (Loomis) St & Taylor St", 241, "Morgan St & Polk St", "Customer", None, None),
+            # matched up through the aliases; ride ids aren't numbers, and there's no duration
+            (None, datetime.datetime(2020, 1, 21, 20, 6, 59), datetime.datetime(2020, 1, 21, 20, 14, 30), None, None,
+             239, "Western Ave & Leland Ave", 326, "Clark St & Leland Ave", "member", None, None),
+        ])
+        cached = read_trips(self.spark, self.tmp_dir, cache_dir=os.path.join(self.tmp_dir, "cache"))
+        self.assertEqual(cached.schema, TRIP_SCHEMA)
+        self.assertEqual(sorted(cached.collect(), key=lambda row: row[1]),
+                         sorted(trips.collect(), key=lambda row: row[1]))
+
+
+if __name__ == '__main__':
+    unittest.main()
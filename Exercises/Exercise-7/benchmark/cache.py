@@ -0,0 +1,57 @@
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+import pyspark.sql.functions as F
+
+from pyspark.sql import SparkSession
+
+from benchmark.data import generate_zips
+from src.spark.drives import *
+
+
+def failures_by_model(drives):
+    # a handful of the ~180 columns, for the first two days
+    return drives.where(F.col("date") < datetime.date(2022, 1, 3)).groupBy("model") \
+        .agg(F.sum("failure").alias("failures"), F.count("*").alias("drive_days")).collect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time a query over the drive zips, read from the zips and from the "
+                                                 "parquet cache on its first and second run")
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--drives-per-day", type=int, default=50_000)
+    parser.add_argument("--master", default="local[*]")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    spark = SparkSession.builder.master(args.master).appName("cache_benchmark") \
+        .config("spark.ui.showConsoleProgress", False).getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    try:
+        data_dir = os.path.join(tmp_dir, "data")
+        cache_dir = os.path.join(tmp_dir, "cache")
+        n_rows = generate_zips(data_dir, args.days, args.drives_per_day)
+        print(f"{n_rows} drive days in {args.days} zips on {spark.sparkContext.defaultParallelism} cores")
+
+        start = time.perf_counter()
+        failures_by_model(read_drives(spark, data_dir))
+        print(f"{'zips':>14}: {time.perf_counter() - start:.3f}s")
+        for run in ["first cached", "second cached"]:
+            start = time.perf_counter()
+            failures_by_model(read_drives(spark, data_dir, cache_dir=cache_dir))
+            print(f"{run:>14}: {time.perf_counter() - start:.3f}s")
+        cache_bytes = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(cache_dir)
+                          for name in names)
+        zip_bytes = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir))
+        print(f"zips {zip_bytes / 1e6:.1f}MB, cache {cache_bytes / 1e6:.1f}MB")
+    finally:
+        spark.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import datetime
+import os
+import random
+import zipfile
+
+from src.spark.drives import SMART_IDS
+
+# skewed like the real fleet: a few models make up most of the drives
+MODELS = [("ST4000DM000", 4000787030016, 30), ("ST12000NM0008", 12000138625024, 20),
+          ("ST8000NM0055", 8001563222016, 12), ("TOSHIBA MG07ACA14TA", 14000519643136, 10),
+          ("HGST HUH721212ALE604", 12000138625024, 8), ("WDC WUH721816ALE6L4", 16000900661248, 4),
+          ("ST16000NM001G", 16000900661248, 6), ("Seagate BarraCuda 120 SSD ZA250CM10003", 250059350016, 1),
+          ("ST500LM030", 500107862016, 1)]
+HEADER = "date,serial_number,model,capacity_bytes,failure," + ",".join(
+    f"smart_{smart_id}_{kind}" for smart_id in SMART_IDS for kind in ["normalized", "raw"])
+
+
+def drive_lines(rng: random.Random, day: datetime.date, n_drives: int):
+    models = rng.choices(MODELS, weights=[weight for _, _, weight in MODELS], k=n_drives)
+    for i, (model, capacity, _) in enumerate(models):
+        # most smart attributes are empty for any one model
+        smart = [str(rng.randrange(1, 200)) if rng.random() < 0.3 else "" for _ in range(2 * len(SMART_IDS))]
+        # an unknown capacity is reported as -1
+        capacity = -1 if rng.random() < 0.001 else capacity
+        yield f"{day},SN{i:08d},{model},{capacity},{int(rng.random() < 0.0005)},{','.join(smart)}\n"
+
+
+def generate_zips(data_dir: str, n_days: int, drives_per_day: int, seed: int = 0):
+    # a zip holding one csv per day, named like Backblaze's files
+    rng = random.Random(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(n_days):
+        day = datetime.date(2022, 1, 1) + datetime.timedelta(days=i)
+        name = f"hard-drive-{day}-failures.csv"
+        with zipfile.ZipFile(os.path.join(data_dir, name + ".zip"), "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(name, HEADER + "\n" + "".join(drive_lines(rng, day, drives_per_day)))
+    return n_days * drives_per_day
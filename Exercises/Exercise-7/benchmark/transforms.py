@@ -0,0 +1,75 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pyspark.sql.functions as F
+
+from pyspark.sql import SparkSession, Window
+
+from benchmark.data import generate_zips
+from src.spark.drives import *
+from src.spark.transforms import *
+
+
+def enrich_naively(drives):
+    # one withColumn per answer, and the rankings joined back with a shuffle of the full drive rows
+    capacities = drives.select("model", "capacity_bytes").distinct()
+    rankings = capacities.withColumn("storage_ranking",
+                                     F.dense_rank().over(Window.orderBy(F.desc("capacity_bytes")))) \
+        .groupBy("model").agg(F.min("storage_ranking").alias("storage_ranking"))
+    return drives.withColumn("file_date", F.to_date(F.regexp_extract("source_file", DATE_PATTERN, 1))) \
+        .withColumn("brand", F.when(F.instr("model", " ") > 0, F.split("model", " ")[0]).otherwise("unknown")) \
+        .join(rankings, "model", "left") \
+        .withColumn("primary_key", F.sha2(F.concat_ws("|", F.col("date").cast("string"), "serial_number"), 256))
+
+
+def describe_plan(df):
+    # operators in the analyzed logical plan and in the physical plan, and what the physical plan shuffles
+    query_execution = df._jdf.queryExecution()
+    physical = query_execution.executedPlan().toString()
+    return (f"plan lines {len(query_execution.analyzed().toString().splitlines())} analyzed, "
+            f"{len(physical.splitlines())} physical; {physical.count('Exchange hashpartitioning')} hash shuffles, "
+            f"{physical.count('BroadcastExchange')} broadcasts")
+
+
+def write_all(df):
+    # the noop sink computes every column, where a count would let Spark drop the ones it doesn't need
+    df.write.format("noop").mode("overwrite").save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Exercise-7 columns added by chained withColumns and a "
+                                                 "shuffle join, and in one select with a broadcast join")
+    parser.add_argument("--days", type=int, default=4)
+    parser.add_argument("--drives-per-day", type=int, default=50_000)
+    parser.add_argument("--master", default="local[*]")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    spark = SparkSession.builder.master(args.master).appName("transforms_benchmark") \
+        .config("spark.ui.showConsoleProgress", False).getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    try:
+        data_dir = os.path.join(tmp_dir, "data")
+        n_rows = generate_zips(data_dir, args.days, args.drives_per_day)
+        print(f"{n_rows} drive days in {args.days} zips on {spark.sparkContext.defaultParallelism} cores")
+
+        start = time.perf_counter()
+        naive = enrich_naively(read_drives(spark, data_dir))
+        write_all(naive)
+        print(f"{'naive':>12}: {time.perf_counter() - start:.3f}s, {describe_plan(naive)}")
+        # including the rankings' own pass over the zips
+        start = time.perf_counter()
+        enriched, rankings = enrich_drives(spark, read_drives(spark, data_dir))
+        write_all(enriched)
+        print(f"{'one select':>12}: {time.perf_counter() - start:.3f}s, {describe_plan(enriched)}")
+        rankings.unpersist()
+    finally:
+        spark.stop()
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,20 @@
 from pyspark.sql import SparkSession
-import pyspark.sql.functions as F
+
+from src.spark.transforms import *
+
+data_dir = "data"
+# parquet copies of the zips, made on the first run and read on later ones
+cache_dir = "cache"
 
 
 def main():
     spark = SparkSession.builder.appName("Exercise7").enableHiveSupport().getOrCreate()
-    # your code here
+    # the zip and csv names in source_file
+    drives = read_drives(spark, data_dir, cache_dir=cache_dir)
+    enriched, rankings = enrich_drives(spark, drives)
+    enriched.select("source_file", "file_date", "model", "brand", "capacity_bytes", "storage_ranking",
+                    "primary_key").show(truncate=False)
+    rankings.unpersist()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.types import *
+
+from .parquet_cache import *
+from .zipcsv import *
+
+SMART_IDS = [1, 2, 3, 4, 5, 7, 8, 9, 10, 11, 12, 13, 15, 16, 17, 18, 22, 23, 24, 160, 161, 163, 164, 165, 166, 167,
+             168, 169, 170, 171, 172, 173, 174, 175, 176, 177, 178, 179, 180, 181, 182, 183, 184, 187, 188, 189, 190,
+             191, 192, 193, 194, 195, 196, 197, 198, 199, 200, 201, 202, 206, 210, 218, 220, 222, 223, 224, 225, 226,
+             230, 231, 232, 233, 234, 235, 240, 241, 242, 244, 245, 246, 247, 248, 250, 251, 252, 254, 255]
+
+DRIVE_SCHEMA = StructType([
+    StructField("date", DateType()),
+    StructField("serial_number", StringType()),
+    StructField("model", StringType()),
+    StructField("capacity_bytes", LongType()),
+    StructField("failure", IntegerType()),
+] + [StructField(f"smart_{smart_id}_{kind}", LongType()) for smart_id in SMART_IDS for kind in ["normalized", "raw"]])
+
+
+def read_drives(spark: SparkSession, path: str, source_column: str = "source_file", cache_dir: str = None,
+                **options) -> DataFrame:
+    # with cache_dir, each zip is parsed once into parquet partitioned by date and sorted by model, and read from
+    # there after that: only the columns a query uses are read, and filters on date and model skip what they can
+    reader = ZippedCsvReader(spark, DRIVE_SCHEMA, source_column=source_column, **options)
+    if cache_dir is None:
+        return reader.read(path)
+    return ParquetCache(reader, cache_dir, partition_by=["date"], sort_by=["model"]).read(path)
@@ -0,0 +1,67 @@
+import pyspark.sql.functions as F
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, Window
+
+from .drives import *
+
+# a drive is reported once a day
+KEY_COLUMNS = ["date", "serial_number"]
+DATE_PATTERN = r"(\d{4}-\d{2}-\d{2})"
+
+
+def file_date(source_column: str = "source_file"):
+    return F.to_date(F.regexp_extract(F.col(source_column), DATE_PATTERN, 1)).alias("file_date")
+
+
+def brand():
+    # "TOSHIBA MG07ACA14TA" -> TOSHIBA; "ST4000DM000" -> unknown
+    return F.when(F.instr(F.col("model"), " ") > 0, F.substring_index(F.col("model"), " ", 1)) \
+        .otherwise(F.lit("unknown")).alias("brand")
+
+
+def primary_key(columns: list = KEY_COLUMNS):
+    # sha2 rather than hash(), whose 32 bits collide well before a year of drive days
+    return F.sha2(F.concat_ws("|", *[F.col(column).cast("string") for column in columns]), 256).alias("primary_key")
+
+
+def storage_rankings(drives: DataFrame):
+    # model -> storage_ranking, 1 for the models with the most capacity. Only model and capacity_bytes are kept
+    # before the aggregation, so its shuffle moves a couple of columns per model per partition rather than the
+    # ~180 smart columns per drive; capacity_bytes is -1 when unknown, which max ignores as long as any day has it
+    capacities = drives.select("model", "capacity_bytes").where(F.col("model").isNotNull()) \
+        .groupBy("model").agg(F.max("capacity_bytes").alias("capacity_bytes"))
+    # a single window over a few hundred models
+    return capacities.select("model", F.dense_rank().over(Window.orderBy(F.desc("capacity_bytes")))
+                             .alias("storage_ranking"))
+
+
+def plan_size_in_bytes(df: DataFrame):
+    return df._jdf.queryExecution().optimizedPlan().stats().sizeInBytes()
+
+
+def broadcast_threshold(spark: SparkSession):
+    return spark._jsparkSession.sessionState().conf().autoBroadcastJoinThreshold()
+
+
+def fits_broadcast(spark: SparkSession, df: DataFrame):
+    # Spark only knows the size of a cached or file based relation; anything else reads as Long.MaxValue
+    threshold = broadcast_threshold(spark)
+    return 0 < plan_size_in_bytes(df) <= threshold
+
+
+def enrich_drives(spark: SparkSession, drives: DataFrame, rankings: DataFrame = None):
+    # the five Exercise-7 columns added in one select. The rankings are cached, so their real size is known and the
+    # join broadcasts them: the drives, skewed towards a few models, are never shuffled by model. Returns the
+    # enriched drives and the cached rankings, to unpersist once done
+    if rankings is None:
+        rankings = storage_rankings(drives)
+    rankings = rankings.persist(StorageLevel.MEMORY_AND_DISK)
+    rankings.count()
+    if "source_file" not in drives.columns:
+        # added before the join, so file_date can read it and it is taken from the scan the rows came from
+        drives = drives.withColumn("source_file", F.input_file_name())
+    joined = drives.join(F.broadcast(rankings) if fits_broadcast(spark, rankings) else rankings, "model", "left")
+    return joined.select(*[column for column in drives.columns if column != "source_file"], "source_file",
+                         file_date(), brand(), F.col("storage_ranking"), primary_key()), rankings
+
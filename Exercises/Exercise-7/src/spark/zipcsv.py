@@ -0,0 +1,187 @@
+import csv
+import datetime
+import io
+import os
+import zipfile
+
+from urllib.parse import unquote, urlparse
+
+from pyspark.sql import DataFrame, SparkSession
+from pyspark.sql.types import (BooleanType, DateType, DoubleType, FloatType, IntegerType, LongType, ShortType,
+                               StringType, StructField, StructType, TimestampType)
+
+
+def is_csv_member(name: str):
+    return name.lower().endswith(".csv") and not name.startswith("__MACOSX/") and not name.endswith("/")
+
+
+def local_path(uri: str):
+    # file:/data/a.zip -> /data/a.zip; None for anything a plain open() can't read
+    parsed = urlparse(uri)
+    if parsed.scheme in ("", "file"):
+        return unquote(parsed.path)
+    return None
+
+
+def parse_int(value: str):
+    # thousands separators, as in the Divvy trip durations, and integers written as floats ("1987.0")
+    value = value.replace(",", "")
+    try:
+        return int(value)
+    except ValueError:
+        return int(float(value))
+
+
+def parse_timestamp(value: str):
+    # the Divvy files' "2019-10-01 00:01:39", with or without fractional seconds or a T
+    return datetime.datetime.fromisoformat(value)
+
+
+def parse_bool(value: str):
+    lowered = value.lower()
+    if lowered in ("true", "t", "1", "yes"):
+        return True
+    if lowered in ("false", "f", "0", "no"):
+        return False
+    raise ValueError(f"Not a boolean: {value}")
+
+
+PARSERS = {
+    StringType: str,
+    IntegerType: parse_int,
+    LongType: parse_int,
+    ShortType: parse_int,
+    DoubleType: lambda value: float(value.replace(",", "")),
+    FloatType: lambda value: float(value.replace(",", "")),
+    BooleanType: parse_bool,
+    DateType: datetime.date.fromisoformat,
+    TimestampType: parse_timestamp,
+}
+
+
+def row_parser(schema: StructType, header: list, source: str = None, source_column: str = None, aliases: dict = None):
+    # a function turning a csv row into a tuple matching schema. Columns are matched by name, or through aliases
+    # ({header name: schema name}), so a file with its columns in another order, or missing some, still lines up; a
+    # value that doesn't parse becomes a null, like Spark's own PERMISSIVE mode
+    positions = {}
+    for i, name in enumerate(header):
+        positions.setdefault((aliases or {}).get(name.strip(), name.strip()), i)
+    columns = []
+    for field in schema.fields:
+        if field.name == source_column:
+            columns.append((None, None))
+        elif type(field.dataType) not in PARSERS:
+            raise ValueError(f"Can't parse {field.name} as {field.dataType.simpleString()}")
+        else:
+            columns.append((positions.get(field.name), PARSERS[type(field.dataType)]))
+
+    def parse(row: list):
+        values = []
+        for position, parser in columns:
+            if parser is None:
+                values.append(source)
+                continue
+            value = row[position].strip() if position is not None and position < len(row) else ""
+            if value == "":
+                values.append(None)
+                continue
+            try:
+                values.append(parser(value))
+            except ValueError:
+                values.append(None)
+        return tuple(values)
+
+    return parse
+
+
+def list_members(path: str, member_filter=is_csv_member):
+    # only the zip's central directory is read
+    with zipfile.ZipFile(local_path(path)) as archive:
+        return [(path, info.filename) for info in archive.infolist() if member_filter(info.filename)]
+
+
+class CsvMemberParser:
+    # parses csv members of zips into rows of schema, decompressing them as they're read, so only a buffer of each is
+    # in memory at a time. It is shipped to the executors, which do the reading
+    def __init__(self, schema: StructType, source_column: str = None, encoding: str = "utf-8", aliases: dict = None):
+        self.schema = schema
+        self.source_column = source_column
+        self.encoding = encoding
+        self.aliases = aliases
+
+    def member_rows(self, archive: zipfile.ZipFile, path: str, member: str):
+        with archive.open(member) as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding=self.encoding, errors="replace", newline=""))
+            header = next(reader, None)
+            if header is None:
+                return
+            # the BOM some exports start with would otherwise be part of the first column name
+            header[0] = header[0].lstrip("\ufeff")
+            parse = row_parser(self.schema, header, f"{os.path.basename(path)}/{member}", self.source_column,
+                               self.aliases)
+            for row in reader:
+                if len(row) > 0:
+                    yield parse(row)
+
+    def local_member_rows(self, path: str, member: str):
+        with zipfile.ZipFile(local_path(path)) as archive:
+            yield from self.member_rows(archive, path, member)
+
+    def zip_content_rows(self, path: str, content: bytes, member_filter=is_csv_member):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            for name in archive.namelist():
+                if member_filter(name):
+                    yield from self.member_rows(archive, path, name)
+
+
+class ZippedCsvReader:
+    # reads the csv files inside zip files into a DataFrame with an explicit schema, without unzipping them to disk
+    # or bringing any data to the driver. The zips are listed with Spark's binaryFile source, which doesn't read
+    # their content unless asked to. Zips the executors can open directly (a local or shared filesystem) are read one
+    # task per csv member, each decompressing and parsing its member as a stream; any others are read through
+    # binaryFile's content column, one task per zip. A deflated member can't be split, so a single big member is one
+    # task however it's read; partitions repartitions the parsed rows so the work after the read is spread out.
+    # With source_column, that column of the schema is filled with "<zip name>/<member name>", and aliases match
+    # differently named header columns to the schema
+    def __init__(self, spark: SparkSession, schema: StructType, member_filter=is_csv_member, source_column: str = None,
+                 encoding: str = "utf-8", aliases: dict = None, partitions: int = None):
+        if source_column is not None and source_column not in schema.fieldNames():
+            schema = StructType(schema.fields + [StructField(source_column, StringType())])
+        self.spark = spark
+        self.schema = schema
+        self.member_filter = member_filter
+        self.parser = CsvMemberParser(schema, source_column, encoding, aliases)
+        self.partitions = partitions
+
+    def list_zips(self, path: str):
+        files = self.spark.read.format("binaryFile").option("pathGlobFilter", "*.zip").load(path)
+        return [row.path for row in files.select("path").collect()]
+
+    def read(self, path: str):
+        zip_paths = self.list_zips(path)
+        local = [zip_path for zip_path in zip_paths if local_path(zip_path) is not None]
+        remote = [zip_path for zip_path in zip_paths if local_path(zip_path) is None]
+        sc = self.spark.sparkContext
+        # locals, so the lambdas don't drag the reader and its session along to the executors
+        parser, member_filter = self.parser, self.member_filter
+
+        rdds = []
+        if len(local) > 0:
+            # member names are the only thing that comes back to the driver, to give each member its own task
+            members = sc.parallelize(local, len(local)).flatMap(lambda p: list_members(p, member_filter)).collect()
+            if len(members) > 0:
+                rdds.append(sc.parallelize(members, len(members)).flatMap(
+                    lambda m: parser.local_member_rows(m[0], m[1])))
+        if len(remote) > 0:
+            contents = self.spark.read.format("binaryFile").load(remote).select("path", "content").rdd
+            rdds.append(contents.flatMap(lambda row: parser.zip_content_rows(row.path, row.content, member_filter)))
+        if len(rdds) == 0:
+            return self.spark.createDataFrame(sc.emptyRDD(), self.schema)
+        rows = rdds[0] if len(rdds) == 1 else sc.union(rdds)
+        if self.partitions is not None:
+            rows = rows.repartition(self.partitions)
+        return self.spark.createDataFrame(rows, self.schema, verifySchema=False)
+
+
+def read_zipped_csv(spark: SparkSession, path: str, schema: StructType, **options) -> DataFrame:
+    return ZippedCsvReader(spark, schema, **options).read(path)
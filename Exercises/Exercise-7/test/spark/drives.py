@@ -0,0 +1,47 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from pyspark.sql import SparkSession
+
+from spark.drives import *
+
+HEADER = "date,serial_number,model,capacity_bytes,failure," + ",".join(
+    f"smart_{smart_id}_{kind}" for smart_id in SMART_IDS for kind in ["normalized", "raw"])
+
+
+class TestReadDrives(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_drives").getOrCreate()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        smart = ["73", "20467240"] + [""] * (2 * len(SMART_IDS) - 2)
+        with zipfile.ZipFile(os.path.join(self.tmp_dir, "hard-drive-2022-01-01-failures.csv.zip"), "w",
+                             zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("hard-drive-2022-01-01-failures.csv",
+                             HEADER + "\n2022-01-01,ZLW18P9K,ST14000NM001G,14000519643136,0," + ",".join(smart) + "\n")
+        rows = read_drives(self.spark, self.tmp_dir).collect()
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual((row.date, row.serial_number, row.capacity_bytes, row.failure),
+                         (datetime.date(2022, 1, 1), "ZLW18P9K", 14000519643136, 0))
+        self.assertEqual((row.smart_1_normalized, row.smart_1_raw, row.smart_255_raw), (73, 20467240, None))
+        self.assertEqual(row.source_file, "hard-drive-2022-01-01-failures.csv.zip/hard-drive-2022-01-01-failures.csv")
+
+
+if __name__ == '__main__':
+    unittest.main()
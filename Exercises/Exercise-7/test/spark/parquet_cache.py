@@ -0,0 +1,98 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import pyspark.sql.functions as F
+
+from pyspark.sql import SparkSession
+from pyspark.sql.types import *
+
+from spark.parquet_cache import *
+
+SCHEMA = StructType([
+    StructField("date", DateType()),
+    StructField("model", StringType()),
+    StructField("failure", IntegerType()),
+])
+
+
+def write_zip(path: str, text: str):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(os.path.basename(path)[:-len(".zip")], text)
+
+
+class TestParquetCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_parquet_cache").getOrCreate()
+        cls.spark.sparkContext.setLogLevel("ERROR")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp_dir, "data")
+        self.cache_dir = os.path.join(self.tmp_dir, "cache")
+        os.makedirs(self.data_dir)
+        write_zip(os.path.join(self.data_dir, "a.csv.zip"), "date,model,failure\n2022-01-01,ST4000DM000,0\n"
+                                                            "2022-01-01,HGST HUH721212ALE604,1\n")
+        write_zip(os.path.join(self.data_dir, "b.csv.zip"), "date,model,failure\n2022-01-02,ST4000DM000,0\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def cache(self):
+        return ParquetCache(ZippedCsvReader(self.spark, SCHEMA), self.cache_dir, partition_by=["date"],
+                            sort_by=["model"])
+
+    def rows(self, df):
+        return sorted(tuple(row) for row in df.collect())
+
+    def test_convert_then_reuse(self):
+        cache = self.cache()
+        first = cache.read(self.data_dir)
+        self.assertEqual(first.schema, SCHEMA)
+        self.assertEqual(self.rows(first), [
+            (datetime.date(2022, 1, 1), "HGST HUH721212ALE604", 1),
+            (datetime.date(2022, 1, 1), "ST4000DM000", 0),
+            (datetime.date(2022, 1, 2), "ST4000DM000", 0),
+        ])
+        self.assertEqual((cache.stats.converted, cache.stats.reused, cache.stats.checksummed), (2, 0, 2))
+
+        cache = self.cache()
+        self.assertEqual(self.rows(cache.read(self.data_dir)), self.rows(first))
+        self.assertEqual((cache.stats.converted, cache.stats.reused, cache.stats.checksummed), (0, 2, 0))
+
+    def test_touched_and_changed(self):
+        self.cache().read(self.data_dir)
+        a_path = os.path.join(self.data_dir, "a.csv.zip")
+        b_path = os.path.join(self.data_dir, "b.csv.zip")
+        # a new mtime with the same content is checked, but not converted again
+        os.utime(a_path, ns=(0, 0))
+        write_zip(b_path, "date,model,failure\n2022-01-03,ST8000NM0055,1\n")
+        cache = self.cache()
+        rows = self.rows(cache.read(self.data_dir))
+        self.assertEqual((cache.stats.converted, cache.stats.reused, cache.stats.checksummed), (1, 1, 2))
+        self.assertIn((datetime.date(2022, 1, 3), "ST8000NM0055", 1), rows)
+        self.assertNotIn((datetime.date(2022, 1, 2), "ST4000DM000", 0), rows)
+        # b's old entry is gone
+        self.assertEqual(len([name for name in os.listdir(self.cache_dir) if name.startswith("source=")]), 2)
+
+    def test_pushdown(self):
+        df = self.cache().read(self.data_dir)
+        filtered = df.where((F.col("date") == datetime.date(2022, 1, 1)) & (F.col("model") == "ST4000DM000")) \
+            .select("failure")
+        plan = filtered._jdf.queryExecution().executedPlan().toString()
+        self.assertIn("PartitionFilters: [isnotnull(date", plan)
+        self.assertIn("PushedFilters: [IsNotNull(model), EqualTo(model,ST4000DM000)]", plan)
+        self.assertIn("ReadSchema: struct<model:string,failure:int>", plan)
+        self.assertEqual(self.rows(filtered), [(0,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
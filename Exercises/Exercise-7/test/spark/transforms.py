@@ -0,0 +1,80 @@
+import datetime
+import hashlib
+import os
+import tempfile
+import unittest
+
+from pyspark.sql import SparkSession
+
+from spark.transforms import *
+
+FILE = "hard-drive-2022-01-01-failures.csv.zip/hard-drive-2022-01-01-failures.csv"
+
+
+class TestTransforms(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_transforms") \
+            .config("spark.sql.shuffle.partitions", 4).getOrCreate()
+        cls.spark.sparkContext.setLogLevel("ERROR")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def drives(self, rows: list):
+        # rows of (date, serial_number, model, capacity_bytes), the smart columns left empty
+        values = [(date, serial, model, capacity, 0) + (None,) * (2 * len(SMART_IDS)) + (FILE,)
+                  for date, serial, model, capacity in rows]
+        schema = StructType(DRIVE_SCHEMA.fields + [StructField("source_file", StringType())])
+        return self.spark.createDataFrame(self.spark.sparkContext.parallelize(values, 2), schema)
+
+    def test_enrich(self):
+        day = datetime.date(2022, 1, 1)
+        drives = self.drives([(day, "A1", "ST4000DM000", 4000787030016),
+                              (day, "A2", "ST4000DM000", -1),
+                              (day, "B1", "TOSHIBA MG07ACA14TA", 14000519643136),
+                              (day, "C1", "HGST HUH721212ALE604", 12000138625024),
+                              (day, "C2", "WDC WUH721212ALE6L4", 12000138625024)])
+        enriched, rankings = enrich_drives(self.spark, drives)
+        try:
+            self.assertEqual(enriched.columns[-5:],
+                             ["source_file", "file_date", "brand", "storage_ranking", "primary_key"])
+            rows = {row.serial_number: row for row in enriched.collect()}
+        finally:
+            rankings.unpersist()
+        self.assertEqual({row.file_date for row in rows.values()}, {day})
+        self.assertEqual({serial: row.brand for serial, row in rows.items()},
+                         {"A1": "unknown", "A2": "unknown", "B1": "TOSHIBA", "C1": "HGST", "C2": "WDC"})
+        # the same capacity ranks the same, and a drive of unknown capacity ranks with its model
+        self.assertEqual({serial: row.storage_ranking for serial, row in rows.items()},
+                         {"A1": 3, "A2": 3, "B1": 1, "C1": 2, "C2": 2})
+        self.assertEqual(len({row.primary_key for row in rows.values()}), 5)
+        self.assertEqual(rows["A1"].primary_key, hashlib.sha256(b"2022-01-01|A1").hexdigest())
+
+    def test_enrich_without_source_file(self):
+        # drives read from files without a source_file column take it from the file each row was read from
+        day = datetime.date(2022, 1, 1)
+        path = os.path.join(tempfile.mkdtemp(), "hard-drive-2022-01-01")
+        self.drives([(day, "A1", "ST4000DM000", 4000787030016)]).drop("source_file").write.parquet(path)
+        enriched, rankings = enrich_drives(self.spark, self.spark.read.parquet(path))
+        try:
+            rows = enriched.collect()
+        finally:
+            rankings.unpersist()
+        self.assertEqual([row.file_date for row in rows], [day])
+        self.assertIn("hard-drive-2022-01-01", rows[0].source_file)
+
+    def test_rankings_broadcast(self):
+        drives = self.drives([(datetime.date(2022, 1, 1), "A1", "ST4000DM000", 4000787030016)])
+        enriched, rankings = enrich_drives(self.spark, drives)
+        try:
+            plan = enriched._jdf.queryExecution().executedPlan().toString()
+        finally:
+            rankings.unpersist()
+        self.assertIn("BroadcastHashJoin", plan)
+        self.assertNotIn("SortMergeJoin", plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from pyspark.sql import SparkSession
+from pyspark.sql.types import *
+
+from spark.zipcsv import *
+
+SCHEMA = StructType([
+    StructField("trip_id", IntegerType()),
+    StructField("start_time", TimestampType()),
+    StructField("tripduration", DoubleType()),
+    StructField("birthyear", IntegerType()),
+])
+
+
+def write_zip(path: str, members: dict, compression: int = zipfile.ZIP_DEFLATED):
+    with zipfile.ZipFile(path, "w", compression) as archive:
+        for name, text in members.items():
+            archive.writestr(name, text)
+
+
+class TestRowParser(unittest.TestCase):
+    def test_by_name(self):
+        parse = row_parser(SCHEMA, ["tripduration", "trip_id", "start_time"])
+        self.assertEqual(parse(["1,940.0", "25223640", "2019-10-01 00:01:39"]),
+                         (25223640, datetime.datetime(2019, 10, 1, 0, 1, 39), 1940.0, None))
+
+    def test_bad_values(self):
+        parse = row_parser(SCHEMA, ["trip_id", "start_time", "tripduration", "birthyear"])
+        self.assertEqual(parse(["x", "yesterday", "", "1987.0"]), (None, None, None, 1987))
+        self.assertEqual(parse(["1"]), (1, None, None, None))
+
+    def test_source(self):
+        schema = StructType(SCHEMA.fields[:1] + [StructField("source_file", StringType())])
+        parse = row_parser(schema, ["trip_id"], "a.zip/a.csv", "source_file")
+        self.assertEqual(parse(["7"]), (7, "a.zip/a.csv"))
+
+    def test_aliases(self):
+        parse = row_parser(SCHEMA, ["ride_id", "started_at", "trip_id"], aliases={"started_at": "start_time"})
+        self.assertEqual(parse(["x", "2020-01-21 20:06:59", "3"]),
+                         (3, datetime.datetime(2020, 1, 21, 20, 6, 59), None, None))
+
+    def test_unsupported_type(self):
+        with self.assertRaises(ValueError):
+            row_parser(StructType([StructField("tags", ArrayType(StringType()))]), ["tags"])
+
+
+class TestMembers(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_list_members(self):
+        path = os.path.join(self.tmp_dir, "trips.zip")
+        write_zip(path, {"a.csv": "trip_id\n1\n", "__MACOSX/._a.csv": "", "notes.txt": "", "b.CSV": "trip_id\n2\n"})
+        self.assertEqual(list_members(f"file:{path}"), [(f"file:{path}", "a.csv"), (f"file:{path}", "b.CSV")])
+
+    def test_read_member(self):
+        path = os.path.join(self.tmp_dir, "trips.zip")
+        write_zip(path, {"a.csv": "﻿trip_id,tripduration\r\n1,\"1,000.5\"\r\n\r\n2,3\r\n"}, zipfile.ZIP_STORED)
+        self.assertEqual(list(CsvMemberParser(SCHEMA).local_member_rows(path, "a.csv")),
+                         [(1, None, 1000.5, None), (2, None, 3.0, None)])
+
+    def test_local_path(self):
+        self.assertEqual(local_path("file:/data/my%20trips.zip"), "/data/my trips.zip")
+        self.assertEqual(local_path("/data/trips.zip"), "/data/trips.zip")
+        self.assertIsNone(local_path("s3a://bucket/trips.zip"))
+
+
+class TestZippedCsvReader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.spark = SparkSession.builder.master("local[2]").appName("test_zipcsv").getOrCreate()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.spark.stop()
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_read(self):
+        write_zip(os.path.join(self.tmp_dir, "q3.zip"),
+                  {"q3.csv": "trip_id,start_time,tripduration,birthyear\n1,2019-07-01 00:00:27,300.0,1990\n"
+                             "2,2019-07-01 00:01:16,\"1,200.0\",\n"})
+        write_zip(os.path.join(self.tmp_dir, "q4.zip"),
+                  {"q4_a.csv": "trip_id,tripduration\n3,1.5\n", "q4_b.csv": "trip_id\n4\n", "readme.txt": "hi"})
+        with open(os.path.join(self.tmp_dir, "other.csv"), "w") as f:
+            f.write("trip_id\n5\n")
+        df = ZippedCsvReader(self.spark, SCHEMA, source_column="source_file").read(self.tmp_dir)
+        self.assertEqual(df.schema, StructType(SCHEMA.fields + [StructField("source_file", StringType())]))
+        rows = sorted(tuple(row) for row in df.collect())
+        self.assertEqual(rows, [(1, datetime.datetime(2019, 7, 1, 0, 0, 27), 300.0, 1990, "q3.zip/q3.csv"),
+                                (2, datetime.datetime(2019, 7, 1, 0, 1, 16), 1200.0, None, "q3.zip/q3.csv"),
+                                (3, None, 1.5, None, "q4.zip/q4_a.csv"),
+                                (4, None, None, None, "q4.zip/q4_b.csv")])
+        # a task per member
+        self.assertEqual(df.rdd.getNumPartitions(), 3)
+
+    def test_zip_content(self):
+        write_zip(os.path.join(self.tmp_dir, "q3.zip"), {"q3.csv": "trip_id\n1\n2\n"})
+        content = self.spark.read.format("binaryFile").load(self.tmp_dir).select("path", "content").collect()[0]
+        self.assertEqual(list(CsvMemberParser(SCHEMA).zip_content_rows(content.path, content.content)),
+                         [(1, None, None, None), (2, None, None, None)])
+
+    def test_repartition(self):
+        write_zip(os.path.join(self.tmp_dir, "q3.zip"), {"q3.csv": "trip_id\n" + "".join(f"{i}\n" for i in range(100))})
+        df = read_zipped_csv(self.spark, self.tmp_dir, SCHEMA, partitions=4)
+        self.assertEqual(df.rdd.getNumPartitions(), 4)
+        self.assertEqual(df.count(), 100)
+
+    def test_empty(self):
+        self.assertEqual(read_zipped_csv(self.spark, self.tmp_dir, SCHEMA).count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
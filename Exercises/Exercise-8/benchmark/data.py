@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+CSV_COLUMNS = [
+    "VIN (1-10)", "County", "City", "State", "Postal Code", "Model Year", "Make", "Model", "Electric Vehicle Type",
+    "Clean Alternative Fuel Vehicle (CAFV) Eligibility", "Electric Range", "Base MSRP", "Legislative District",
+    "DOL Vehicle ID", "Vehicle Location", "Electric Utility", "2020 Census Tract"
+]
+
+PLACES = [
+    ("King", "Seattle", "WA", 98101, -122.33, 47.61),
+    ("King", "Bellevue", "WA", 98004, -122.20, 47.61),
+    ("Snohomish", "Everett", "WA", 98201, -122.20, 47.98),
+    ("Yakima", "Yakima", "WA", 98908, -120.57, 46.59),
+    ("Spokane", "Spokane", "WA", 99201, -117.43, 47.66),
+    ("San Diego", "San Diego", "CA", 92101, -117.16, 32.72),
+    ("Lane", "Eugene", "OR", 97404, -123.13, 44.10),
+]
+
+VEHICLES = [
+    ("TESLA", "MODEL 3", "Battery Electric Vehicle (BEV)", 220),
+    ("TESLA", "MODEL Y", "Battery Electric Vehicle (BEV)", 291),
+    ("NISSAN", "LEAF", "Battery Electric Vehicle (BEV)", 150),
+    ("CHEVROLET", "BOLT EV", "Battery Electric Vehicle (BEV)", 259),
+    ("TOYOTA", "PRIUS PLUG-IN", "Plug-in Hybrid Electric Vehicle (PHEV)", 25),
+    ("VOLVO", "S60", "Plug-in Hybrid Electric Vehicle (PHEV)", 22),
+    ("KIA", "NIRO", "Plug-in Hybrid Electric Vehicle (PHEV)", 26),
+]
+
+
+def generate_ev_data(n_rows: int, error_rate: float = 0.001, seed: int = 0):
+    # synthetic rows shaped like Electric_Vehicle_Population_Data.csv, with a sprinkling of values the processors reject
+    rng = np.random.default_rng(seed)
+    places = [PLACES[i] for i in rng.integers(0, len(PLACES), n_rows)]
+    vehicles = [VEHICLES[i] for i in rng.integers(0, len(VEHICLES), n_rows)]
+    lat_jitter = rng.uniform(-0.2, 0.2, n_rows)
+    long_jitter = rng.uniform(-0.2, 0.2, n_rows)
+    data = pd.DataFrame({
+        "VIN (1-10)": [f"5YJ3E{i:05d}" for i in rng.integers(0, 100_000, n_rows)],
+        "County": [p[0] for p in places],
+        "City": [p[1] for p in places],
+        "State": [p[2] for p in places],
+        "Postal Code": [p[3] for p in places],
+        "Model Year": rng.integers(2011, 2025, n_rows),
+        "Make": [v[0] for v in vehicles],
+        "Model": [v[1] for v in vehicles],
+        "Electric Vehicle Type": [v[2] for v in vehicles],
+        "Clean Alternative Fuel Vehicle (CAFV) Eligibility": "Clean Alternative Fuel Vehicle Eligible",
+        "Electric Range": [v[3] for v in vehicles],
+        "Base MSRP": 0,
+        "Legislative District": rng.integers(1, 50, n_rows).astype(float),
+        "DOL Vehicle ID": np.arange(100_000_000, 100_000_000 + n_rows),
+        "Vehicle Location": [f"POINT ({p[4] + dx:.5f} {p[5] + dy:.5f})"
+                             for p, dx, dy in zip(places, long_jitter, lat_jitter)],
+        "Electric Utility": "PUGET SOUND ENERGY INC",
+        "2020 Census Tract": rng.integers(53_000_000_000, 53_099_999_999, n_rows),
+    }, columns=CSV_COLUMNS)
+    bad = rng.random(n_rows) < error_rate
+    data["Vehicle Location"] = data["Vehicle Location"].where(~bad, "POINT (-122.3a 47.6)")
+    data["Postal Code"] = data["Postal Code"].astype(object).where(rng.random(n_rows) >= error_rate, "9810X")
+    return data
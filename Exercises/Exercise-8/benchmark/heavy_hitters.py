@@ -0,0 +1,75 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark.data import VEHICLES
+from src.db.analytics import EVAnalytics
+from src.db.utils import DuckDBUtils
+
+COLUMNS = ["postal_code", "make", "model"]
+PARTITIONS = ["postal_code"]
+
+
+def generate_registrations(conn, table_name: str, n_rows: int, n_postal_codes: int, n_models: int, seed: int = 0):
+    # national scale registrations, generated in DuckDB: postal codes drawn uniformly, models from a power law so a
+    # few dominate each postal code, as the real data's do
+    makes = ", ".join(f"'{make}'" for make, _, _, _ in VEHICLES)
+    conn.execute(f"SELECT setseed({seed / 10})")
+    conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS "
+                 f"SELECT 10000 + CAST(floor(random() * {n_postal_codes}) AS INTEGER) AS postal_code, "
+                 f"list_extract([{makes}], CAST(model % {len(VEHICLES)} AS INTEGER) + 1) AS make, "
+                 f"'MODEL ' || model AS model "
+                 f"FROM (SELECT CAST(floor(pow(random(), 3) * {n_models}) AS INTEGER) AS model FROM range({n_rows}))")
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the approximate (Space-Saving) top model per postal code "
+                                                 "against the exact rank")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--postal-codes", type=int, default=30_000)
+    parser.add_argument("--models", type=int, default=500)
+    parser.add_argument("--n", type=int, default=1)
+    parser.add_argument("--capacities", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--batch-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = DuckDBUtils(os.path.join(tmp_dir, "registrations.db")).conn
+        generate_registrations(conn, "registrations", args.rows, args.postal_codes, args.models)
+        analyser = EVAnalytics(conn, "registrations")
+        exact_secs, exact = timed(lambda: analyser.top_n(
+            analyser.ranked_counts(COLUMNS, PARTITIONS), args.n).df())
+        exact_keys = set(exact[COLUMNS].itertuples(index=False, name=None))
+        print(f"{args.rows} rows, {args.postal_codes} postal codes, top {args.n} per postal code")
+        n_keys = conn.execute(f"SELECT count(*) FROM (SELECT DISTINCT {','.join(COLUMNS)} FROM registrations)") \
+            .fetchone()[0]
+        print(f"exact GROUP BY and rank: {exact_secs:.3f}s, {len(exact)} rows, over {n_keys} distinct keys")
+        print(f"{'capacity':>8} {'seconds':>8} {'sketch KiB':>10} {'recall':>7} {'precision':>9} "
+              f"{'guaranteed':>10} {'max error':>9} {'bound':>7}")
+        for capacity in args.capacities:
+            secs, sketch = timed(lambda: analyser.approx_ranked_counts(
+                COLUMNS, PARTITIONS, capacity, batch_rows=args.batch_rows))
+            top = sketch.top_n(args.n)
+            keys = set(top[COLUMNS].itertuples(index=False, name=None))
+            guaranteed = top[top["guaranteed"]]
+            # a guaranteed value missing from the exact top n would be a broken bound
+            assert set(guaranteed[COLUMNS].itertuples(index=False, name=None)) <= exact_keys
+            bounds = sketch.error_bounds()
+            # what is kept between batches, however many rows go through
+            sketch_kib = sketch.counters.memory_usage(deep=True).sum() / 2 ** 10
+            print(f"{capacity:>8} {secs:>8.3f} {sketch_kib:>10.0f} "
+                  f"{len(keys & exact_keys) / len(exact_keys):>7.1%} {len(keys & exact_keys) / len(keys):>9.1%} "
+                  f"{len(guaranteed) / len(top):>10.1%} {bounds['max_error'].max():>9} "
+                  f"{bounds['error_bound'].max():>7.0f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
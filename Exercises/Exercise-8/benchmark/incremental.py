@@ -0,0 +1,88 @@
+import argparse
+import os
+import tempfile
+import time
+
+import main as ex8
+from benchmark.data import generate_ev_data
+from src.db.analytics import EVAnalytics
+from src.db.utils import DuckDBUtils
+
+GROUPINGS = [["state", "county", "city"], ["make", "model", "model_year"]]
+RANKINGS = [(["make", "model"], []), (["postal_code", "make", "model"], ["postal_code"])]
+
+
+def load(conn, csv_path, incremental):
+    load_options = {}
+    if incremental:
+        load_options = {"key_columns": ex8.key_columns, "delta_table_name": DuckDBUtils.delta_table(ex8.table_name)}
+    # both ways the tables are kept, with their ENUMs widened for whatever the csv adds
+    ex8.create_tables(conn, csv_path, incremental=True)
+    ex8.load_native(conn, csv_path, load_options)
+
+
+def full_rebuild(db_path, csv_paths):
+    conn = DuckDBUtils(db_path)
+    start = time.perf_counter()
+    for csv_path in csv_paths:
+        load(conn, csv_path, incremental=False)
+    conn.conn.execute(f"CREATE OR REPLACE TABLE deduped AS SELECT * FROM {ex8.table_name} "
+                      f"QUALIFY row_number() OVER (PARTITION BY {','.join(ex8.key_columns)}) = 1")
+    analyser = EVAnalytics(conn.conn, "deduped")
+    results = {}
+    for columns in GROUPINGS:
+        results[tuple(columns)] = analyser.group_and_count(columns).fetchall()
+    for columns, partition_columns in RANKINGS:
+        results[tuple(columns)] = analyser.ranked_counts(columns, partition_columns).fetchall()
+    return time.perf_counter() - start, results
+
+
+def incremental_run(conn, csv_path):
+    analyser = EVAnalytics(conn.conn, ex8.table_name)
+    start = time.perf_counter()
+    for columns in GROUPINGS:
+        analyser.maintain_counts(columns)
+    for columns, partition_columns in RANKINGS:
+        analyser.maintain_ranks(columns, partition_columns)
+    load(conn, csv_path, incremental=True)
+    analyser.apply_delta(DuckDBUtils.delta_table(ex8.table_name))
+    secs = time.perf_counter() - start
+    results = {}
+    for columns in GROUPINGS:
+        results[tuple(columns)] = analyser.group_and_count(columns).fetchall()
+    for columns, partition_columns in RANKINGS:
+        results[tuple(columns)] = analyser.ranked_counts(columns, partition_columns).fetchall()
+    return secs, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare an incremental delta load against a full rebuild")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--delta-fraction", type=float, default=0.01)
+    args = parser.parse_args()
+
+    n_delta = int(args.rows * args.delta_fraction)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data = generate_ev_data(args.rows + n_delta)
+        base_path = os.path.join(tmp_dir, "base.csv")
+        delta_path = os.path.join(tmp_dir, "delta.csv")
+        data.iloc[:args.rows].to_csv(base_path, index=False)
+        # the delta re-sends some vehicles that are already loaded
+        data.iloc[args.rows - n_delta // 10:].to_csv(delta_path, index=False)
+
+        conn = DuckDBUtils(os.path.join(tmp_dir, "incremental.db"))
+        ex8.create_tables(conn, base_path, incremental=True)
+        initial_secs, _ = incremental_run(conn, base_path)
+        delta_secs, incremental_results = incremental_run(conn, delta_path)
+        rebuild_secs, rebuild_results = full_rebuild(os.path.join(tmp_dir, "rebuild.db"), [base_path, delta_path])
+
+        for key, rows in rebuild_results.items():
+            assert sorted(rows, key=str) == sorted(incremental_results[key], key=str), key
+        print(f"{args.rows} base rows, {n_delta + n_delta // 10} delta rows ({n_delta // 10} already loaded)")
+        print(f"initial incremental load: {initial_secs:.3f}s")
+        print(f"full rebuild:             {rebuild_secs:.3f}s")
+        print(f"delta load and merge:     {delta_secs:.3f}s ({delta_secs / rebuild_secs:.1%} of a rebuild)")
+
+
+if __name__ == "__main__":
+    main()
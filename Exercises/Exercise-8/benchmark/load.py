@@ -0,0 +1,53 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import main as ex8
+from benchmark.data import generate_ev_data
+from src.db.utils import DuckDBUtils
+
+LOADERS = {
+    "whole_file": ex8.load_whole_file,
+    "streaming": ex8.load_streaming,
+    "duckdb": ex8.load_native,
+}
+
+
+def run_load(mode, csv_path, db_path, results):
+    conn = DuckDBUtils(db_path)
+    ex8.create_tables(conn, csv_path)
+    start = time.perf_counter()
+    LOADERS[mode](conn, csv_path, {})
+    secs = time.perf_counter() - start
+    # ru_maxrss is in KiB on linux
+    results.put((secs, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pandas and native DuckDB csv load paths")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", default=list(LOADERS.keys()), choices=list(LOADERS.keys()))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "ev.csv")
+        generate_ev_data(args.rows).to_csv(csv_path, index=False)
+        print(f"{args.rows} rows, {os.path.getsize(csv_path) / 2 ** 20:.0f} MiB csv")
+        print(f"{'mode':>12} {'seconds':>9} {'peak rss MiB':>13}")
+        # each load runs in a fresh process so peak memory isn't carried over
+        context = multiprocessing.get_context("spawn")
+        for mode in args.modes:
+            results = context.Queue()
+            process = context.Process(target=run_load,
+                                      args=(mode, csv_path, os.path.join(tmp_dir, f"{mode}.db"), results))
+            process.start()
+            secs, peak_mib = results.get()
+            process.join()
+            print(f"{mode:>12} {secs:>9.3f} {peak_mib:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+import main as ex8
+from benchmark.data import generate_ev_data
+from benchmark.load import LOADERS
+from src.data.report import RunReport
+from src.data.utils import ValueProcessor
+from src.db.utils import DuckDBUtils
+
+
+def run_load(mode, csv_path, db_path, record_metrics, results):
+    # off, nothing is timed or counted below the streaming stages
+    ValueProcessor.record_metrics = record_metrics
+    conn = DuckDBUtils(db_path, record_metrics=record_metrics)
+    ex8.create_tables(conn, csv_path)
+    start = time.perf_counter()
+    report = RunReport() if record_metrics else None
+    LOADERS[mode](conn, csv_path, {}, report)
+    if record_metrics:
+        report.add_loads(conn, ex8.table_name, ex8.err_table_name)
+        report.finish()
+        report.save(db_path + ".json")
+        report.write_table(conn.conn, ex8.metrics_table_name)
+    results.put(time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the overhead of the processor and load metrics")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--modes", nargs="+", default=list(LOADERS.keys()), choices=list(LOADERS.keys()))
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "ev.csv")
+        generate_ev_data(args.rows).to_csv(csv_path, index=False)
+        print(f"{args.rows} rows, median of {args.repeats} runs")
+        print(f"{'mode':>12} {'off s':>8} {'on s':>8} {'overhead':>9}")
+        context = multiprocessing.get_context("spawn")
+        for mode in args.modes:
+            timings = {False: [], True: []}
+            # alternated, so drift over the benchmark hits both the same
+            for i in range(args.repeats):
+                for record_metrics in [False, True]:
+                    results = context.Queue()
+                    db_path = os.path.join(tmp_dir, f"{mode}_{i}_{record_metrics}.db")
+                    process = context.Process(target=run_load, args=(mode, csv_path, db_path, record_metrics, results))
+                    process.start()
+                    timings[record_metrics].append(results.get())
+                    process.join()
+            off, on = statistics.median(timings[False]), statistics.median(timings[True])
+            print(f"{mode:>12} {off:>8.3f} {on:>8.3f} {on / off - 1:>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import os
+import time
+
+from benchmark.data import generate_ev_data
+from benchmark.processors import build_processors, run_batch
+from src.data.pipeline import *
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ProcessorPipeline scaling with the number of workers")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1))))
+    args = parser.parse_args()
+
+    data = generate_ev_data(args.rows)
+    start = time.perf_counter()
+    expected = run_batch(data)
+    serial_secs = time.perf_counter() - start
+    print(f"{os.cpu_count()} cpus, {args.rows} rows")
+    print(f"{'workers':>8} {'seconds':>9} {'vs serial':>10} {'efficiency':>11}")
+    print(f"{'serial':>8} {serial_secs:>9.3f} {1:>9.2f}x {'-':>11}")
+    for workers in args.workers:
+        with ProcessorPipeline(build_processors(), workers=workers) as pipeline:
+            # warm the pool up so process start-up isn't counted
+            pipeline.process_batch(data.iloc[:pipeline.min_partition_rows * workers])
+            start = time.perf_counter()
+            result = pipeline.process_batch(data)
+            secs = time.perf_counter() - start
+        assert result["errors"].fillna("").tolist() == expected["errors"].fillna("").tolist()
+        speedup = serial_secs / secs
+        print(f"{workers:>8} {secs:>9.3f} {speedup:>9.2f}x {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import time
+
+import pandas as pd
+
+from benchmark.data import generate_ev_data
+from src.data.utils import *
+
+
+def build_processors():
+    return [LatLongSplitter("Vehicle Location", "Vehicle Location Lat", "Vehicle Location Long"),
+            CheckInt("Postal Code"),
+            CheckInt("Model Year"),
+            CheckFloat("Legislative District")]
+
+
+def run_rows(data, chunk_rows: int = 100_000):
+    # apply(axis=1) builds a Series per row, which runs out of memory on a 6GB machine at 1M rows, so the rows go
+    # through in chunks; each is still processed a row at a time
+    chunks = []
+    for start in range(0, len(data), chunk_rows):
+        chunk = data.iloc[start:start + chunk_rows]
+        for processor in build_processors():
+            chunk = chunk.apply(processor.process_value, axis=1)
+        chunks.append(chunk)
+    return pd.concat(chunks)
+
+
+def run_batch(data):
+    for processor in build_processors():
+        data = processor.process_batch(data)
+    return data
+
+
+def time_it(func, data):
+    start = time.perf_counter()
+    result = func(data)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare row-at-a-time and batch ValueProcessor throughput")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    # the row path takes over 20 minutes at 1M rows; lower this for a quicker run
+    parser.add_argument("--max-row-path-rows", type=int, default=None,
+                        help="skip the (slow) row path above this many rows (default: run it at every size)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'row path s':>12} {'batch s':>10} {'speedup':>9} {'errors':>8}")
+    for n_rows in args.sizes:
+        data = generate_ev_data(n_rows)
+        batch_secs, batch_result = time_it(run_batch, data)
+        n_errors = int(batch_result["errors"].notna().sum()) if "errors" in batch_result.columns else 0
+        if args.max_row_path_rows is None or n_rows <= args.max_row_path_rows:
+            row_secs, row_result = time_it(run_rows, data)
+            assert (row_result["errors"].fillna("").tolist() == batch_result["errors"].fillna("").tolist())
+            print(f"{n_rows:>10} {row_secs:>12.3f} {batch_secs:>10.3f} {row_secs / batch_secs:>8.1f}x {n_errors:>8}")
+        else:
+            print(f"{n_rows:>10} {'skipped':>12} {batch_secs:>10.3f} {'-':>9} {n_errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+import main as ex8
+from benchmark.data import generate_ev_data
+from src.db.analytics import EVAnalytics
+from src.db.utils import DuckDBUtils, decimal_precision
+
+ANALYTICS = {
+    "vehicles by city": lambda analyser: analyser.group_and_count(["state", "county", "city"]),
+    "top 3 vehicles": lambda analyser: analyser.top_n(analyser.ranked_counts(["make", "model"], []), 3),
+    "top vehicle by postal code": lambda analyser: analyser.top_n(
+        analyser.ranked_counts(["postal_code", "make", "model"], ["postal_code"]), 1),
+    "counts by model year": lambda analyser: analyser.group_and_count(["make", "model", "model_year"]),
+}
+
+
+def plain_schema():
+    # the schema as it was: text as VARCHAR, the location as FLOAT
+    return {name: "VARCHAR" if dtype == "ENUM" else "FLOAT" if decimal_precision(dtype) else dtype
+            for name, dtype in ex8.db_schema.items()}
+
+
+def frame_mib(csv_path, schema):
+    # as load_whole_file reads it, so with the ENUM columns as categories
+    return pd.read_csv(csv_path, **ex8.read_options(schema)).memory_usage(deep=True).sum() / 2 ** 20
+
+
+def run(csv_path, db_path, schema, repeats):
+    conn = DuckDBUtils(db_path)
+    start = time.perf_counter()
+    schema = conn.derive_enums(schema, DuckDBUtils.csv_source(csv_path, ex8.csv_column_names))
+    derive_secs = time.perf_counter() - start
+    conn.create_table(ex8.table_name, schema)
+    conn.create_table(ex8.err_table_name, ex8.err_db_schema)
+    start = time.perf_counter()
+    ex8.load_native(conn, csv_path, {})
+    load_secs = time.perf_counter() - start
+    conn.conn.execute("CHECKPOINT")
+    # the table alone, without the error table: the blocks its columns are stored in
+    n_blocks = conn.conn.sql(f"SELECT count(DISTINCT block_id) FROM pragma_storage_info('{ex8.table_name}') "
+                             f"WHERE block_id >= 0").fetchone()[0]
+    block_size = conn.conn.sql("SELECT block_size FROM pragma_database_size()").fetchone()[0]
+    analyser = EVAnalytics(conn.conn, ex8.table_name)
+    timings, results = {}, {}
+    for name, query in ANALYTICS.items():
+        runs = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            results[name] = sorted(query(analyser).fetchall())
+            runs.append(time.perf_counter() - start)
+        timings[name] = statistics.median(runs) * 1000
+    conn.conn.close()
+    return {"schema": schema, "derive_secs": derive_secs, "load_secs": load_secs,
+            "table_mib": n_blocks * block_size / 2 ** 20, "file_mib": os.path.getsize(db_path) / 2 ** 20,
+            "timings": timings, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the VARCHAR/FLOAT and ENUM/DECIMAL schemas' table size and "
+                                                 "analytics latency")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "ev.csv")
+        generate_ev_data(args.rows).to_csv(csv_path, index=False)
+        schemas = {"VARCHAR": plain_schema(), "ENUM": dict(ex8.db_schema)}
+        runs = {name: run(csv_path, os.path.join(tmp_dir, f"{name}.db"), schema, args.repeats)
+                for name, schema in schemas.items()}
+        before, after = runs["VARCHAR"], runs["ENUM"]
+        print(f"{args.rows} rows, median of {args.repeats} runs per query")
+        print(f"{'':>28} {'VARCHAR':>9} {'ENUM':>9} {'change':>8}")
+        rows = [("db file MiB", before["file_mib"], after["file_mib"]),
+                ("table MiB", before["table_mib"], after["table_mib"]),
+                ("pandas frame MiB", frame_mib(csv_path, before["schema"]), frame_mib(csv_path, after["schema"])),
+                ("load s", before["load_secs"], after["load_secs"] + after["derive_secs"])]
+        rows += [(f"{name} ms", before["timings"][name], after["timings"][name]) for name in ANALYTICS]
+        for name, old, new in rows:
+            print(f"{name:>28} {old:>9.2f} {new:>9.2f} {new / old - 1:>7.1%}")
+        print(f"ENUM dictionaries derived in {after['derive_secs']:.3f}s (included in its load)")
+        print(f"results match: {before['results'] == after['results']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmark.data import PLACES
+from src.db.analytics import EVAnalytics, haversine_sql
+from src.db.utils import DuckDBUtils
+
+CHARGING = "EV_type = 'Battery Electric Vehicle (BEV)'"
+
+
+def generate_points(conn, table_name: str, n_rows: int, seed: int = 0):
+    # vehicles scattered up to 0.2 degrees around the benchmark places, generated in DuckDB so 10M rows don't go
+    # through pandas
+    places = ", ".join(f"({i}, {lat}, {long})" for i, (_, _, _, _, long, lat) in enumerate(PLACES))
+    conn.execute(f"SELECT setseed({seed / 10})")
+    conn.execute(f"CREATE OR REPLACE TABLE {table_name} AS "
+                 f"SELECT v.id, CASE WHEN random() < 0.7 THEN 'Battery Electric Vehicle (BEV)' "
+                 f"ELSE 'Plug-in Hybrid Electric Vehicle (PHEV)' END AS EV_type, "
+                 f"CAST(p.lat + (random() - 0.5) * 0.4 AS FLOAT) AS vehicle_location_lat, "
+                 f"CAST(p.long + (random() - 0.5) * 0.4 AS FLOAT) AS vehicle_location_long "
+                 f"FROM (SELECT range AS id, CAST(floor(random() * {len(PLACES)}) AS INTEGER) AS place "
+                 f"FROM range({n_rows})) v JOIN (VALUES {places}) p(place, lat, long) USING (place)")
+
+
+def brute_within(conn, table_name, lat, long, km):
+    distance = haversine_sql("vehicle_location_lat", "vehicle_location_long", lat, long)
+    return conn.sql(f"SELECT * FROM (SELECT *, {distance} AS distance_km FROM {table_name}) "
+                    f"WHERE distance_km <= {km}")
+
+
+def brute_counts(conn, table_name, lat_min, long_min, lat_max, long_max, cell_degrees):
+    # the same cells, worked out for every row
+    grid = EVAnalytics(conn, table_name)
+    grid.spatial = ("vehicle_location_lat", "vehicle_location_long", cell_degrees)
+    return conn.sql(f"SELECT cell, count(*) AS count FROM (SELECT {grid.cell_sql()} AS cell FROM {table_name}) "
+                    f"WHERE cell // {grid.cells_per_row} BETWEEN {grid.cell_y(lat_min)} AND {grid.cell_y(lat_max)} "
+                    f"AND cell % {grid.cells_per_row} BETWEEN {grid.cell_x(long_min)} AND {grid.cell_x(long_max)} "
+                    f"GROUP BY cell")
+
+
+def brute_nearest(conn, table_name, lat, long, k):
+    distance = haversine_sql("vehicle_location_lat", "vehicle_location_long", lat, long)
+    return conn.sql(f"SELECT *, {distance} AS distance_km FROM {table_name} WHERE {CHARGING} "
+                    f"ORDER BY distance_km LIMIT {k}")
+
+
+def timed(queries):
+    # mean ms per query, and the results to compare
+    start = time.perf_counter()
+    results = [query() for query in queries]
+    return (time.perf_counter() - start) / len(queries) * 1000, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare grid cell spatial queries against a brute force haversine "
+                                                 "scan")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--km", type=float, default=5)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--cell-degrees", type=float, default=0.01)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    centres = [PLACES[i] for i in rng.integers(0, len(PLACES), args.queries)]
+    points = [(place[5] + dy, place[4] + dx) for place, dy, dx in
+              zip(centres, rng.uniform(-0.15, 0.15, args.queries), rng.uniform(-0.15, 0.15, args.queries))]
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = DuckDBUtils(os.path.join(tmp_dir, "spatial.db")).conn
+            generate_points(conn, "vehicles", n_rows)
+            analyser = EVAnalytics(conn, "vehicles")
+            start = time.perf_counter()
+            analyser.build_spatial_index("vehicle_location_lat", "vehicle_location_long", args.cell_degrees)
+            build_ms = (time.perf_counter() - start) * 1000
+            print(f"{n_rows} points: spatial index built in {build_ms:.0f}ms")
+
+            def ids(relation):
+                return sorted(row[0] for row in relation.select("id").fetchall())
+
+            boxes = [(lat - 0.05, long - 0.05, lat + 0.05, long + 0.05) for lat, long in points]
+            suites = {
+                f"within {args.km:g}km": (
+                    [lambda p=p: ids(analyser.within_radius(*p, args.km)) for p in points],
+                    [lambda p=p: ids(brute_within(conn, "vehicles", *p, args.km)) for p in points]),
+                "counts per cell in a 0.1 degree box": (
+                    [lambda b=b: sorted(analyser.counts_per_cell(*b).select("cell", "count").fetchall())
+                     for b in boxes],
+                    [lambda b=b: sorted(brute_counts(conn, "vehicles", *b, args.cell_degrees).fetchall())
+                     for b in boxes]),
+                f"{args.k} nearest BEVs": (
+                    [lambda p=p: [row[0] for row in analyser.nearest(*p, args.k, CHARGING).select("id").fetchall()]
+                     for p in points],
+                    [lambda p=p: [row[0] for row in brute_nearest(conn, "vehicles", *p, args.k).select("id")
+                     .fetchall()] for p in points]),
+            }
+            for name, (indexed, brute) in suites.items():
+                indexed_ms, indexed_results = timed(indexed)
+                brute_ms, brute_results = timed(brute)
+                print(f"  {name}: {indexed_ms:.1f}ms indexed vs {brute_ms:.1f}ms brute force "
+                      f"({brute_ms / indexed_ms:.0f}x), results match: {indexed_results == brute_results}")
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,39 @@
 import os.path
 
+from src.data.pipeline import *
+from src.data.report import *
+from src.data.streaming import *
 from src.data.utils import *
 from src.db.analytics import *
 from src.db.utils import *
 
+# the low cardinality text columns are ENUMs, whose dictionaries are read from the csv before loading it (see
+# derive_enums): stored and grouped by as small integer codes rather than strings
 db_schema = {
     "VIN_1_10": "VARCHAR",
-    "county": "VARCHAR",
-    "city": "VARCHAR",
-    "state": "VARCHAR",
+    "county": "ENUM",
+    "city": "ENUM",
+    "state": "ENUM",
     "postal_code": "BIGINT",
     "model_year": "SMALLINT",
-    "make": "VARCHAR",
-    "model": "VARCHAR",
-    "EV_type":  "VARCHAR",
-    "CAFV_eligibility": "VARCHAR",
+    "make": "ENUM",
+    "model": "ENUM",
+    "EV_type":  "ENUM",
+    "CAFV_eligibility": "ENUM",
     "electric_range": "SMALLINT",
     "base_MSRP": "INTEGER",
     "legislative_district": "FLOAT",
     "DOL_vehicle_ID": "BIGINT",
-    "electric_utility": "VARCHAR",
+    "electric_utility": "ENUM",
     "census_tract_2020": "BIGINT",
-    "vehicle_location_lat": "FLOAT",
-    "vehicle_location_long": "FLOAT",
+    # to the micro-degree, in the 4 bytes a FLOAT takes but without its rounding (~1m at these longitudes)
+    "vehicle_location_lat": "DECIMAL(9,6)",
+    "vehicle_location_long": "DECIMAL(9,6)",
 }
 
+# the csv headers don't match the table, and the raw location gets split into lat/long
+csv_column_names = list(db_schema.keys())[:14] + ["vehicle_location", "electric_utility", "census_tract_2020"]
+
 err_db_schema = dict(zip(db_schema.keys(), ["varchar"]*len(db_schema.keys())))
 err_db_schema["errors"] = "VARCHAR"
 
@@ -33,44 +42,159 @@ table_name = "ev_population_data"
 err_table_name = "ev_population_errors"
 data_path = "/app/data"
 output_path = f"{data_path}/output"
+# "streaming" runs the processors over batches of the csv, "whole_file" over the whole csv in one go, and "duckdb" has
+# DuckDB read, check and divert the csv by itself without pandas
+load_mode = "streaming"
+# rows per batch when streaming the csv into the tables
+stream_batch_size = 100_000
+# batches queued between the read, transform and load stages; 0 runs the stages one after the other
+stream_prefetch = 2
+# processes the transform stage is split across
+transform_workers = os.cpu_count()
+# incremental runs append the csv (e.g. a daily delta) to the existing tables, skipping vehicles already loaded, and
+# bring the persistent aggregates up to date from the appended rows instead of rebuilding everything
+incremental = False
+key_columns = ["DOL_vehicle_ID"]
+# rows read from the start of the csv for the ENUM dictionaries; None reads every row, so no value is left out and
+# diverted to the error table
+enum_sample_rows = None
+# each run's throughput and error counts, checked against the previous run's and appended to a metrics table (None
+# to skip the table)
+report_path = f"{output_path}/run_report.json"
+metrics_table_name = "ev_load_metrics"
+# grid cells for the spatial queries, in degrees (0.01 is about 1.1km north to south)
+spatial_cell_degrees = 0.01
 
 
-def main():
-    data = pd.read_csv(f"{data_path}/Electric_Vehicle_Population_Data.csv")
-    data = data.apply(lambda row: LatLongSplitter("Vehicle Location", "Vehicle Location Lat", "Vehicle Location Long"
-                                                  ).process_value(row), axis=1)
-    data.drop("Vehicle Location", axis=1, inplace=True)
-    for int_col in [kv[0] for kv in db_schema.keys() if kv[1] in ["INTEGER", "BIGINT", "SMALLINT"]]:
-        data = data.apply(lambda row: CheckInt(int_col).process_value(row))
-    for float_col in [kv[0] for kv in db_schema.keys() if kv[1] in ["FLOAT", "DOUBLE"]]:
-        data = data.apply(lambda row: CheckFloat(float_col).process_value(row))
-    conn = DuckDBUtils(db_name)
-    conn.create_table(table_name, db_schema, drop_if_exists=True)
+def location_splitter():
+    # the csv has WKT points, "POINT (long lat)"
+    return LatLongSplitter("vehicle_location", "vehicle_location_lat", "vehicle_location_long", long_first=True)
+
+
+def build_processors(schema=db_schema):
+    # in the order DuckDBUtils.load_csv reports errors: the location, ints, floats, then the rest as they come
+    processors = [location_splitter()]
+    processors += [CheckInt(name) for name, dtype in schema.items() if dtype in ["INTEGER", "BIGINT", "SMALLINT"]]
+    processors += [CheckFloat(name) for name, dtype in schema.items() if dtype in ["FLOAT", "DOUBLE"]]
+    for name, dtype in schema.items():
+        if decimal_precision(dtype) is not None:
+            processors.append(CheckDecimal(name, *decimal_precision(dtype)))
+        elif is_enum(dtype):
+            processors.append(CheckCategory(name, enum_values(dtype)))
+    return processors
+
+
+def read_options(schema):
+    # ENUM columns are read as pandas categories, a code per row instead of a string object
+    return {"header": 0, "names": csv_column_names,
+            "dtype": {name: "category" for name, dtype in schema.items() if is_enum(dtype)}}
+
+
+def load_whole_file(conn, csv_path, load_options, report=None):
+    schema = conn.table_schema(table_name)
+    data = pd.read_csv(csv_path, **read_options(schema))
+    with ProcessorPipeline(build_processors(schema), workers=transform_workers) as pipeline:
+        data = pipeline.process_batch(data)
+    data.drop("vehicle_location", axis=1, inplace=True)
+    conn.load_data(data, table_name, err_table_name, **load_options)
+    if report is not None:
+        report.add_processors([pipeline])
+
+
+def load_streaming(conn, csv_path, load_options, report=None):
+    schema = conn.table_schema(table_name)
+    with ProcessorPipeline(build_processors(schema), workers=transform_workers) as pipeline:
+        ingest = StreamingIngest([pipeline], conn, table_name, err_table_name,
+                                 batch_size=stream_batch_size, prefetch=stream_prefetch,
+                                 drop_columns=["vehicle_location"],
+                                 read_options=read_options(schema),
+                                 load_options=load_options)
+        stats = ingest.run(csv_path)
+    for stage_stats in stats.values():
+        print(stage_stats)
+    if report is not None:
+        report.add_stages(stats)
+        report.add_processors([pipeline])
+
+
+def load_native(conn, csv_path, load_options, report=None):
+    # the checks run inside DuckDB, so only the tables' metrics are reported
+    lat_sql, long_sql, location_error_sql = location_splitter().sql_columns()
+    conn.load_csv(csv_path, table_name, err_table_name, csv_columns=csv_column_names,
+                  column_sql={"vehicle_location_lat": lat_sql, "vehicle_location_long": long_sql},
+                  checks=[location_error_sql], **load_options)
+
+
+def create_tables(conn, csv_path, incremental=False):
+    # an incremental run keeps the ENUM values the tables already have, and widens them for any new ones
+    schema = conn.derive_enums(db_schema, DuckDBUtils.csv_source(csv_path, csv_column_names),
+                               sample_rows=enum_sample_rows, table_name=table_name if incremental else None)
+    conn.create_table(table_name, schema, drop_if_exists=not incremental, if_not_exists=incremental)
+    if incremental:
+        conn.widen_enums(schema)
     # create an exceptions table of all-strings to hold records that fail processing for any reason
     conn.create_table(err_table_name, err_db_schema,
-                      drop_if_exists=True)
-    conn.load_data(data, table_name, err_table_name)
+                      drop_if_exists=not incremental, if_not_exists=incremental)
+    return schema
 
-    analyser = EVAnalytics(conn.conn, table_name)
+
+def main():
+    conn = DuckDBUtils(db_name)
+    csv_path = f"{data_path}/Electric_Vehicle_Population_Data.csv"
+    create_tables(conn, csv_path, incremental)
+    analyser = EVAnalytics(conn.conn, table_name, cache=True)
+    conn.add_write_listener(analyser.invalidate)
+
+    load_options = {}
+    if incremental:
+        # the persistent aggregates are built from the existing rows on the first run only
+        analyser.maintain_counts(["state", "county", "city"])
+        analyser.maintain_counts(["make", "model", "model_year"])
+        analyser.maintain_ranks(["make", "model"], [])
+        analyser.maintain_ranks(["postal_code", "make", "model"], ["postal_code"])
+        load_options = {"key_columns": key_columns, "delta_table_name": DuckDBUtils.delta_table(table_name)}
+
+    report = RunReport(load_mode=load_mode)
+    if load_mode == "duckdb":
+        load_native(conn, csv_path, load_options, report)
+    elif load_mode == "whole_file":
+        load_whole_file(conn, csv_path, load_options, report)
+    else:
+        load_streaming(conn, csv_path, load_options, report)
+    report.add_loads(conn, table_name, err_table_name)
+    report.finish()
+
+    if incremental:
+        analyser.apply_delta(load_options["delta_table_name"])
+    else:
+        # (make, model) is rolled up from one of the finer make/model groupings rather than the base table
+        analyser.materialize([["state", "county", "city"], ["make", "model"], ["postal_code", "make", "model"],
+                              ["make", "model", "model_year"]])
 
     if not os.path.isdir(output_path):
         os.mkdir(output_path)
 
+    for table_metrics in conn.load_metrics.values():
+        print(table_metrics)
+    for regression in report.regressions(RunReport.load(report_path)):
+        print(f"regression: {regression}")
+    report.save(report_path)
+    if metrics_table_name is not None:
+        report.write_table(conn.conn, metrics_table_name)
+
     # Output 1: count number of electric cars by city
     vehicles_by_city = analyser.group_and_count(["state", "county", "city"])
-    vehicles_by_city.sort(["state", "county", "city"]).to_csv(f"{output_path}/vehicles_by_city.csv")
+    vehicles_by_city.sort("state", "county", "city").to_csv(f"{output_path}/vehicles_by_city.csv")
 
     # Output 2: top 3 most popular EVs
-    vehicles_by_make_model = analyser.group_and_count(["make", "model"])
-    vehicle_make_model_ranks = analyser.rank_by_count(vehicles_by_make_model, [])
+    vehicle_make_model_ranks = analyser.ranked_counts(["make", "model"], [])
     top_3_vehicles = analyser.top_n(vehicle_make_model_ranks, 3)
     top_3_vehicles.to_csv(f"{output_path}/top_3_vehicles.csv")
 
     # Output 3: top vehicle by postal code
-    vehicle_types_by_postal_code = analyser.group_and_count(["postal_code", "make", "model"])
-    vehicle_ranks_by_postal_code = analyser.rank_by_count(vehicle_types_by_postal_code, ["postal_code"])
+    vehicle_ranks_by_postal_code = analyser.ranked_counts(["postal_code", "make", "model"], ["postal_code"])
     top_by_postal_code = analyser.top_n(vehicle_ranks_by_postal_code, 1)
-    top_by_postal_code.sort(["postal_code", EVAnalytics.rank_col_name]
+    top_by_postal_code.sort("postal_code", EVAnalytics.rank_col_name
                             ).to_csv(f"{output_path}/top_vehicle_by_postal_code.csv")
 
     # Output 4: count by model year, write partitions
@@ -80,6 +204,11 @@ def main():
     conn.conn.execute(f"COPY counts_by_year TO '{output_path}/counts_by_model_year.parquet' " +
                       "(FORMAT parquet, PARTITION_BY (model_year), OVERWRITE_OR_IGNORE)")
 
+    # Output 5: vehicles per grid cell, from the location index the radius and nearest vehicle queries use
+    analyser.build_spatial_index("vehicle_location_lat", "vehicle_location_long", spatial_cell_degrees)
+    analyser.counts_per_cell().sort("cell").to_csv(f"{output_path}/vehicles_per_grid_cell.csv")
+    print(f"analytics cache: {analyser.cache_stats}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,128 @@
+import multiprocessing
+import os
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .utils import ValueProcessor
+
+
+def run_processors(processors: list, data: pd.DataFrame, err_column_name: str = "errors"):
+    # one pass over the frame: every processor adds its columns to the same copy and the errors are joined once at
+    # the end, instead of each processor copying the frame and rewriting the errors column. Each processor's share
+    # is timed into its metrics
+    data = data.copy(deep=False)
+    pending = []
+    for processor in processors:
+        start = time.perf_counter()
+        if processor.has_batch_mode:
+            errors = processor.__process_batch__(data)
+        else:
+            data = ValueProcessor.merge_errors(data, join_errors(pending, len(data)), err_column_name)
+            pending = []
+            data = processor.apply_batch(data)
+            errors = None
+        if processor.record_metrics:
+            processor.record_batch(len(data), time.perf_counter() - start)
+        if errors is not None:
+            pending.append(errors)
+    return ValueProcessor.merge_errors(data, join_errors(pending, len(data)), err_column_name)
+
+
+def run_partition(processors: list, data: pd.DataFrame):
+    # run_processors in a worker process: the processors are copies, so their metrics for this partition are sent
+    # back with the result
+    for processor in processors:
+        processor.reset_metrics()
+    return run_processors(processors, data), [processor.metrics for processor in processors]
+
+
+def join_errors(error_arrays: list, n_rows: int):
+    if len(error_arrays) == 0:
+        return None
+    if len(error_arrays) == 1:
+        return error_arrays[0]
+    joined = np.full(n_rows, None, dtype=object)
+    for errors in error_arrays:
+        errors = np.asarray(errors, dtype=object)
+        failed = pd.notna(errors)
+        if not failed.any():
+            continue
+        first = failed & pd.isna(joined)
+        joined[first] = errors[first]
+        again = failed & ~first
+        joined[again] = joined[again] + ";" + errors[again]
+    return joined
+
+
+class ProcessorPipeline(ValueProcessor):
+    # fuses a chain of processors into a single pass, and splits large frames into row partitions that run on a
+    # process pool; results are concatenated back in row order. A frame is split into one partition per worker,
+    # unless that leaves fewer than min_partition_rows in each, where sending the rows over costs more than it saves
+    def __init__(self, processors: list, workers: int = None, min_partition_rows: int = 5_000, mp_context=None):
+        self.processors = processors
+        self.workers = workers or os.cpu_count() or 1
+        self.min_partition_rows = min_partition_rows
+        # the pool is started from whichever thread first needs it, e.g. StreamingIngest's transform thread while
+        # its reader thread runs, and forking a process with live threads can deadlock, so its workers come from a
+        # fork server (or are spawned where there is none) rather than forks of this process
+        self.mp_context = mp_context or multiprocessing.get_context(
+            "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        self.executor = None
+
+    def __process_value__(self, row):
+        for processor in self.processors:
+            processor.__process_value__(row)
+
+    def process_value(self, row):
+        # each processor records its own error, as when they are applied one after the other
+        for processor in self.processors:
+            row = processor.process_value(row)
+        return row
+
+    def partition_bounds(self, n_rows: int):
+        n_partitions = min(self.workers, max(1, n_rows // self.min_partition_rows))
+        bounds = np.linspace(0, n_rows, n_partitions + 1, dtype=int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def process_batch(self, data):
+        if hasattr(data, "to_pandas"):
+            data = data.to_pandas()
+        bounds = self.partition_bounds(len(data))
+        if len(bounds) == 1:
+            return run_processors(self.processors, data)
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.mp_context)
+        partitions = [data.iloc[start:end] for start, end in bounds]
+        results = list(self.executor.map(run_partition, [self.processors] * len(partitions), partitions))
+        for _, metrics in results:
+            for processor, partition_metrics in zip(self.processors, metrics):
+                processor.metrics.merge(partition_metrics)
+        return pd.concat([result for result, _ in results])
+
+    def collect_metrics(self):
+        return [metrics for processor in self.processors for metrics in processor.collect_metrics()]
+
+    def reset_metrics(self):
+        for processor in self.processors:
+            processor.reset_metrics()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __getstate__(self):
+        # the pool stays with the process that created it
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
@@ -0,0 +1,126 @@
+import datetime
+import json
+import math
+import os
+import uuid
+
+import pandas as pd
+
+
+def json_safe(value):
+    # NaN (e.g. the rows/s of a stage that never ran) isn't valid JSON
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    return value
+
+
+class RunReport:
+    # the throughput and data quality of one load: per processor (rows/s, errors by column and exception type), per
+    # streaming stage and per table written (rows, bytes, rows/s). Saved as JSON and optionally appended to a DuckDB
+    # metrics table, one row per metric, so a run can be checked against the previous one with regressions().
+    # load_mode is how the rows were loaded (main.py's load_mode): timings and byte counts only compare within a mode
+    metrics_schema = {"run_id": "VARCHAR", "started_at": "TIMESTAMP", "kind": "VARCHAR", "name": "VARCHAR",
+                      "metric": "VARCHAR", "value": "DOUBLE", "load_mode": "VARCHAR"}
+
+    def __init__(self, run_id: str = None, load_mode: str = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.load_mode = load_mode
+        self.started_at = datetime.datetime.now()
+        self.seconds = None
+        self.error_rate = None
+        self.processors = {}
+        self.stages = {}
+        self.loads = {}
+
+    def add_processors(self, processors: list):
+        for processor in processors:
+            for metrics in processor.collect_metrics():
+                self.processors[metrics.name] = json_safe(metrics.to_json())
+
+    def add_stages(self, stats: dict):
+        for name, stage_stats in stats.items():
+            self.stages[name] = json_safe(stage_stats.to_json())
+
+    def add_loads(self, loader, table_name: str, err_table_name: str):
+        # loader is a DuckDBUtils; the run's error rate is the share of rows diverted to err_table_name
+        for name, metrics in loader.load_metrics.items():
+            self.loads[name] = json_safe(metrics.to_json())
+        good = self.loads.get(table_name, {}).get("rows", 0)
+        failed = self.loads.get(err_table_name, {}).get("rows", 0)
+        self.error_rate = failed / (good + failed) if good + failed > 0 else None
+
+    def finish(self):
+        self.seconds = (datetime.datetime.now() - self.started_at).total_seconds()
+        return self
+
+    def to_json(self):
+        return {"run_id": self.run_id, "started_at": self.started_at.isoformat(), "load_mode": self.load_mode,
+                "seconds": self.seconds, "error_rate": self.error_rate, "processors": self.processors,
+                "stages": self.stages, "loads": self.loads}
+
+    def save(self, path: str):
+        part_path = path + ".part"
+        with open(part_path, "w") as f:
+            json.dump(self.to_json(), f, indent=1)
+        os.replace(part_path, path)
+
+    @staticmethod
+    def load(path: str):
+        # the JSON of an earlier run, or None if there wasn't one
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def metric_rows(self):
+        rows = [("run", "", "seconds", self.seconds), ("run", "", "error_rate", self.error_rate)]
+        for kind, entries in [("processor", self.processors), ("stage", self.stages), ("load", self.loads)]:
+            for name, entry in entries.items():
+                rows += [(kind, name, metric, value) for metric, value in entry.items()
+                         if isinstance(value, (int, float)) or value is None]
+        for name, entry in self.processors.items():
+            rows += [("error", name, f"{column}:{error_type}", count)
+                     for column, counts in entry["errors"].items() for error_type, count in counts.items()]
+        return [(self.run_id, self.started_at, kind, name, metric, value, self.load_mode)
+                for kind, name, metric, value in rows]
+
+    def write_table(self, conn, table_name: str):
+        columns = ",".join(f"{name} {dtype}" for name, dtype in self.metrics_schema.items())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({columns})")
+        # tables written before load_mode was recorded
+        conn.execute(f"ALTER TABLE {table_name} ADD COLUMN IF NOT EXISTS load_mode VARCHAR")
+        # one insert from a frame; executemany runs a statement per row
+        rows = pd.DataFrame(self.metric_rows(), columns=list(self.metrics_schema.keys()))
+        rows["value"] = rows["value"].astype(float)
+        conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM rows")
+
+    def regressions(self, previous: dict, max_slowdown: float = 0.25, max_error_rate_increase: float = 0.005,
+                    min_rows: int = 10_000):
+        # what got slower by more than max_slowdown, or failed more rows by more than max_error_rate_increase
+        # (absolute), than in the previous run's JSON. Anything that handled fewer than min_rows in either run is
+        # too noisy to compare, and so is a run loaded in a different mode, whose timings and byte counts measure
+        # different work
+        if previous is None or previous.get("load_mode") != self.load_mode:
+            return []
+        found = []
+        for kind in ["processors", "stages", "loads"]:
+            for name, entry in getattr(self, kind).items():
+                before = previous.get(kind, {}).get(name)
+                if before is None or min(entry["rows"], before["rows"]) < min_rows:
+                    continue
+                if entry["rows_per_second"] is not None and before["rows_per_second"] is not None and \
+                        entry["rows_per_second"] < before["rows_per_second"] * (1 - max_slowdown):
+                    found.append(f"{kind[:-1]} {name}: {entry['rows_per_second']:,.0f} rows/s, down from "
+                                 f"{before['rows_per_second']:,.0f}")
+                if kind == "processors" and entry["error_rate"] is not None and before["error_rate"] is not None \
+                        and entry["error_rate"] > before["error_rate"] + max_error_rate_increase:
+                    found.append(f"processor {name}: error rate {entry['error_rate']:.2%}, up from "
+                                 f"{before['error_rate']:.2%}")
+        if self.error_rate is not None and previous.get("error_rate") is not None and \
+                self.error_rate > previous["error_rate"] + max_error_rate_increase:
+            found.append(f"run: error rate {self.error_rate:.2%}, up from {previous['error_rate']:.2%}")
+        return found
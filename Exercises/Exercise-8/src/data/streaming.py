@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+
+import pandas as pd
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def record(self, rows: int, seconds: float):
+        self.rows += rows
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("nan")
+
+    def to_json(self):
+        return {"name": self.name, "rows": self.rows, "batches": self.batches, "seconds": self.seconds,
+                "rows_per_second": self.rows_per_second}
+
+    def __repr__(self):
+        return (f"{self.name}: {self.rows} rows in {self.batches} batches, {self.seconds:.3f}s "
+                f"({self.rows_per_second:,.0f} rows/s)")
+
+
+class StageFailure:
+    def __init__(self, err: BaseException):
+        self.err = err
+
+
+class StreamingIngest:
+    # reads a csv in fixed-size batches, runs the processor chain on each and appends it to the good/error tables,
+    # so only a handful of batches are ever held in memory
+    stage_names = ["read", "transform", "load"]
+
+    def __init__(self, processors: list, loader, table_name: str, err_table_name: str, batch_size: int = 100_000,
+                 prefetch: int = 2, drop_columns: list = None, read_options: dict = None, load_options: dict = None):
+        # prefetch is the number of batches queued between stages; 0 runs read, transform and load one after the
+        # other on the calling thread, anything higher runs read and transform on their own threads
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        if prefetch < 0:
+            raise ValueError("prefetch cannot be negative")
+        self.processors = processors
+        self.loader = loader
+        self.table_name = table_name
+        self.err_table_name = err_table_name
+        self.batch_size = batch_size
+        self.prefetch = prefetch
+        self.drop_columns = drop_columns or []
+        self.read_options = read_options or {}
+        self.load_options = load_options or {}
+        self.stats = {}
+
+    def read(self, csv_path: str):
+        with pd.read_csv(csv_path, chunksize=self.batch_size, **self.read_options) as reader:
+            while True:
+                start = time.perf_counter()
+                try:
+                    batch = next(reader)
+                except StopIteration:
+                    return
+                self.stats["read"].record(len(batch), time.perf_counter() - start)
+                yield batch
+
+    def transform(self, batch: pd.DataFrame):
+        start = time.perf_counter()
+        for processor in self.processors:
+            batch = processor.process_batch(batch)
+        batch = batch.drop(columns=self.drop_columns)
+        self.stats["transform"].record(len(batch), time.perf_counter() - start)
+        return batch
+
+    def load(self, batch: pd.DataFrame):
+        start = time.perf_counter()
+        self.loader.load_data(batch, self.table_name, self.err_table_name, **self.load_options)
+        self.stats["load"].record(len(batch), time.perf_counter() - start)
+
+    def run(self, csv_path: str):
+        self.stats = {name: StageStats(name) for name in self.stage_names}
+        stop = threading.Event()
+        try:
+            batches = self.read(csv_path)
+            if self.prefetch > 0:
+                batches = self.in_background(batches, stop)
+            transformed = map(self.transform, batches)
+            if self.prefetch > 0:
+                transformed = self.in_background(transformed, stop)
+            # the database connection stays on the calling thread
+            for batch in transformed:
+                self.load(batch)
+        finally:
+            stop.set()
+        return self.stats
+
+    def in_background(self, batches, stop: threading.Event):
+        buffer = queue.Queue(maxsize=self.prefetch)
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    buffer.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def produce():
+            try:
+                for batch in batches:
+                    if not put(batch):
+                        return
+            except BaseException as err:
+                put(StageFailure(err))
+            put(done)
+
+        threading.Thread(target=produce, daemon=True).start()
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, StageFailure):
+                raise item.err
+            yield item
@@ -1,8 +1,11 @@
+import decimal
 import numpy as np
 import pandas as pd
 import re
+import time
 
 from abc import ABC, abstractmethod
+from collections import Counter
 
 
 class InvalidLatLongFormatError(ValueError):
@@ -13,29 +16,199 @@ class InvalidLatLongFormatError(ValueError):
         super(InvalidLatLongFormatError, self).__init__(self.err_str.format(message))
 
 
+FLOAT_LITERAL = r"\s*[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?\s*"
+INT_LITERAL = r"\s*[+-]?\d+\s*"
+
+
+def full_match(values: pd.Series, pattern: str):
+    # non-string values never match, so they are left to the row-at-a-time fallback
+    try:
+        return values.str.fullmatch(pattern, na=False).astype(bool).to_numpy()
+    except AttributeError:
+        return np.zeros(len(values), dtype=bool)
+
+
+def check_each(values: pd.Series, candidates, converter, on_error=None):
+    # only values that the vectorized masks could not clear go through python; the error string is whatever the
+    # converter raises, so it is identical to the row path. on_error is called with each exception raised
+    errors = np.full(len(values), None, dtype=object)
+    raw = values.to_numpy()
+    for pos in np.flatnonzero(candidates):
+        try:
+            converter(raw[pos])
+        except Exception as err:
+            errors[pos] = str(err)
+            if on_error is not None:
+                on_error(err)
+    return errors
+
+
+class ProcessorMetrics:
+    # wall time, rows and errors of one processor's batches. Errors are counted by (column, exception type) where
+    # they are raised, which is only ever on the python path of the few failing rows, so counting them costs nothing
+    # on clean data. Under a ProcessorPipeline with several workers the seconds are summed across the workers
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.errors = Counter()
+
+    def record(self, rows: int, seconds: float, errors: Counter = None):
+        self.rows += rows
+        self.batches += 1
+        self.seconds += seconds
+        if errors:
+            self.errors.update(errors)
+
+    def merge(self, other: "ProcessorMetrics"):
+        self.rows += other.rows
+        self.batches += other.batches
+        self.seconds += other.seconds
+        self.errors.update(other.errors)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("nan")
+
+    @property
+    def error_count(self):
+        return sum(self.errors.values())
+
+    @property
+    def error_rate(self):
+        return self.error_count / self.rows if self.rows > 0 else float("nan")
+
+    def to_json(self):
+        errors = {}
+        for (column, error_type), count in sorted(self.errors.items()):
+            errors.setdefault(column, {})[error_type] = count
+        return {"name": self.name, "rows": self.rows, "batches": self.batches, "seconds": self.seconds,
+                "rows_per_second": self.rows_per_second, "error_count": self.error_count,
+                "error_rate": self.error_rate, "errors": errors}
+
+    def __repr__(self):
+        return (f"{self.name}: {self.rows} rows in {self.batches} batches, {self.seconds:.3f}s "
+                f"({self.rows_per_second:,.0f} rows/s), {self.error_count} errors")
+
+
 class ValueProcessor(ABC):
+    # batches are timed and their errors counted into self.metrics unless record_metrics is turned off
+    record_metrics = True
 
     @abstractmethod
     def __process_value__(self, row):
         pass
 
+    @property
+    def columns(self):
+        # the input columns errors are reported against
+        return []
+
+    @property
+    def name(self):
+        return f"{type(self).__name__}({','.join(self.columns)})"
+
+    @property
+    def metrics(self):
+        if self.__dict__.get("_metrics") is None:
+            self._metrics = ProcessorMetrics(self.name)
+        return self._metrics
+
+    def reset_metrics(self):
+        self._metrics = None
+        self._error_types = None
+
+    def collect_metrics(self):
+        return [self.metrics]
+
+    def count_error(self, err: Exception):
+        if not self.record_metrics:
+            return
+        if self.__dict__.get("_error_types") is None:
+            self._error_types = Counter()
+        self._error_types[(",".join(self.columns), type(err).__name__)] += 1
+
+    def take_error_types(self):
+        # the errors counted since the last call
+        error_types, self._error_types = self.__dict__.get("_error_types"), None
+        return error_types
+
+    def record_batch(self, rows: int, seconds: float):
+        self.metrics.record(rows, seconds, self.take_error_types())
+
+    @property
+    def has_batch_mode(self):
+        # subclasses with a column-at-a-time __process_batch__(data) return an array of error strings (None for
+        # success) from it, adding any parsed columns to data in place; the rest run process_value row by row
+        return hasattr(self, "__process_batch__")
+
     def process_value(self, row):
         try:
             self.__process_value__(row)
         except Exception as err:
-            if "errors" in row.keys():
+            self.count_error(err)
+            if "errors" in row.keys() and not pd.isna(row["errors"]):
                 row["errors"] = row["errors"] + f";{str(err)}"
             else:
                 row["errors"] = str(err)
         return row
 
+    def process_batch(self, data):
+        # column-at-a-time equivalent of data.apply(self.process_value, axis=1); accepts arrow tables/batches too
+        if not self.record_metrics:
+            return self.apply_batch(data)
+        start = time.perf_counter()
+        data = self.apply_batch(data)
+        self.record_batch(len(data), time.perf_counter() - start)
+        return data
+
+    def apply_batch(self, data):
+        if hasattr(data, "to_pandas"):
+            data = data.to_pandas()
+        data = data.copy(deep=False)
+        if not self.has_batch_mode:
+            return data.apply(self.process_value, axis=1)
+        return ValueProcessor.merge_errors(data, self.__process_batch__(data))
+
+    @staticmethod
+    def merge_errors(data: pd.DataFrame, errors, err_column_name: str = "errors"):
+        if errors is None:
+            return data
+        errors = pd.Series(errors, index=data.index, dtype=object)
+        failed = errors.notna()
+        if err_column_name not in data.columns:
+            if failed.any():
+                data[err_column_name] = errors.where(failed, np.nan)
+            return data
+        existing = data[err_column_name].astype(object)
+        prev_failed = existing.notna()
+        merged = existing.where(~failed, errors)
+        both = failed & prev_failed
+        merged[both] = existing[both] + ";" + errors[both]
+        data[err_column_name] = merged
+        return data
+
 
 class LatLongSplitter(ValueProcessor):
-    def __init__(self, input_col_name, lat_col_name, long_col_name, sep_char=" "):
+    def __init__(self, input_col_name, lat_col_name, long_col_name, sep_char=" ", long_first=False):
+        # long_first for WKT points, "POINT (long lat)"
         self.input_col_name = input_col_name
         self.lat_col_name = lat_col_name
         self.long_col_name = long_col_name
         self.sep_char = sep_char
+        self.long_first = long_first
+
+    @property
+    def columns(self):
+        return [self.input_col_name]
+
+    @property
+    def ordered_col_names(self):
+        # the columns the first and second numbers go to
+        if self.long_first:
+            return self.long_col_name, self.lat_col_name
+        return self.lat_col_name, self.long_col_name
 
     def __process_value__(self, row):
         # TODO: handle NESW as well as +/-
@@ -53,29 +226,209 @@ class LatLongSplitter(ValueProcessor):
                 raise InvalidLatLongFormatError(row[self.input_col_name])
             try:
                 parts = lat_long.split(self.sep_char)
-                row[self.lat_col_name] = float(parts[0].strip())
-                row[self.long_col_name] = float(parts[1].strip())
+                first_col_name, second_col_name = self.ordered_col_names
+                row[first_col_name] = float(parts[0].strip())
+                row[second_col_name] = float(parts[1].strip())
             except ValueError:
                 raise InvalidLatLongFormatError(row[self.input_col_name])
 
+    def __process_batch__(self, data: pd.DataFrame):
+        values = data[self.input_col_name]
+        lat = np.full(len(values), np.nan)
+        long = np.full(len(values), np.nan)
+        errors = np.full(len(values), None, dtype=object)
+
+        try:
+            cleaned = values.str.replace(r"\s+", " ", regex=True).astype(object)
+        except AttributeError:
+            cleaned = pd.Series(np.nan, index=values.index, dtype=object)
+        is_str = cleaned.notna().to_numpy()
+        # anything non-null that is not a string takes the row path below
+        odd = values.notna().to_numpy() & ~is_str
+
+        str_pos = np.flatnonzero(is_str)
+        if len(str_pos) > 0:
+            str_lat, str_long, parsed = self.split_strings(cleaned.iloc[str_pos])
+            if self.long_first:
+                str_lat, str_long = str_long, str_lat
+            lat[str_pos[parsed]] = str_lat[parsed]
+            long[str_pos[parsed]] = str_long[parsed]
+            # malformed values are rare, so the row path works out exactly which error they raise
+            odd[str_pos[~parsed]] = True
+
+        raw = values.to_numpy()
+        for pos in np.flatnonzero(odd):
+            row = pd.Series({self.input_col_name: raw[pos]}, dtype=object)
+            try:
+                self.__process_value__(row)
+            except Exception as err:
+                errors[pos] = str(err)
+                self.count_error(err)
+            lat[pos] = row[self.lat_col_name]
+            long[pos] = row[self.long_col_name]
+
+        data[self.lat_col_name] = lat
+        data[self.long_col_name] = long
+        return errors
+
+    def split_strings(self, lat_long: pd.Series):
+        lat = np.full(len(lat_long), np.nan)
+        long = np.full(len(lat_long), np.nan)
+        has_open = lat_long.str.contains("(", regex=False).to_numpy(dtype=bool)
+        # first '(' with no ')' before it, up to the first ')' after it
+        inner = lat_long.str.extract(r"^[^()]*\(([^)]*)\)", expand=False)
+        parsed = ~(has_open & inner.isna().to_numpy())
+        lat_long = lat_long.where(~has_open, inner).str.strip()
+        parsed &= (lat_long.str.count(re.escape(self.sep_char)) == 1).to_numpy(dtype=bool)
+
+        parts = lat_long[parsed].str.split(self.sep_char, n=1, expand=True).reindex(columns=[0, 1])
+        lat_str = parts[0].astype(object).str.strip()
+        long_str = parts[1].astype(object).str.strip()
+        numeric = full_match(lat_str, FLOAT_LITERAL) & full_match(long_str, FLOAT_LITERAL)
+        split_pos = np.flatnonzero(parsed)
+        lat[split_pos[numeric]] = lat_str[numeric].astype(float).to_numpy()
+        long[split_pos[numeric]] = long_str[numeric].astype(float).to_numpy()
+        parsed[split_pos[~numeric]] = False
+        return lat, long, parsed
+
+    def sql_columns(self, input_sql: str = None):
+        # DuckDB expressions for the lat, long and error values, for loading the csv without pandas; they accept the
+        # same plain decimal/exponent numbers as the vectorized path (not python extras like 'inf' or '1_0')
+        input_sql = input_sql or self.input_col_name
+        number = r"([+-]?(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?)"
+        # whitespace runs are collapsed before splitting on a space
+        sep = r"\s+" if self.sep_char == " " else r"\s*" + re.escape(self.sep_char) + r"\s*"
+        in_parens = rf"^[^()]*\(\s*{number}{sep}{number}\s*\)"
+        bare = rf"^\s*{number}{sep}{number}\s*$"
+
+        def part(group):
+            return (f"CASE WHEN contains({input_sql}, '(') THEN regexp_extract({input_sql}, '{in_parens}', {group}) "
+                    f"ELSE regexp_extract({input_sql}, '{bare}', {group}) END")
+
+        marker = "\x00"
+        prefix, found, suffix = str(InvalidLatLongFormatError(marker)).replace("'", "''").partition(marker)
+        message = f"'{prefix}' || {input_sql} || '{suffix}'" if found else f"'{prefix}'"
+        error = (f"CASE WHEN {input_sql} IS NOT NULL AND NOT (regexp_matches({input_sql}, '{in_parens}') "
+                 f"OR regexp_matches({input_sql}, '{bare}')) THEN {message} END")
+        first, second = f"NULLIF({part(1)}, '')", f"NULLIF({part(2)}, '')"
+        return (second, first, error) if self.long_first else (first, second, error)
+
 
 class CheckInt(ValueProcessor):
     def __init__(self, col_name):
         self.col_name = col_name
 
+    @property
+    def columns(self):
+        return [self.col_name]
+
     def __process_value__(self, row):
         # TODO: enhanced checks for different int lengths
         int(row[self.col_name])
 
+    def __process_batch__(self, data: pd.DataFrame):
+        values = data[self.col_name]
+        if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+            candidates = values.isna().to_numpy()
+        elif pd.api.types.is_float_dtype(values):
+            candidates = ~np.isfinite(values.to_numpy(dtype=float, na_value=np.nan))
+        else:
+            candidates = ~full_match(values, INT_LITERAL)
+        return check_each(values, candidates, int, self.count_error)
+
 
 class CheckFloat(ValueProcessor):
     def __init__(self, col_name):
         self.col_name = col_name
 
+    @property
+    def columns(self):
+        return [self.col_name]
+
     def __process_value__(self, row):
         # TODO: enhanced checks for float/double
         float(row[self.col_name])
 
+    def __process_batch__(self, data: pd.DataFrame):
+        values = data[self.col_name]
+        if pd.api.types.is_numeric_dtype(values) and isinstance(values.dtype, np.dtype):
+            return None
+        return check_each(values, ~full_match(values, FLOAT_LITERAL), float, self.count_error)
+
+
+class CheckDecimal(ValueProcessor):
+    # the values a DECIMAL(precision, scale) column takes: plain numbers (as for CheckFloat) that still fit the
+    # precision once rounded to scale digits, as DuckDB rounds them
+    def __init__(self, col_name, precision, scale):
+        self.col_name = col_name
+        self.scale = scale
+        self.dtype = f"DECIMAL({precision},{scale})"
+        self.limit = 10 ** (precision - scale)
+
+    @property
+    def columns(self):
+        return [self.col_name]
+
+    def check(self, value):
+        if not isinstance(value, str):
+            # numpy scalars as plain floats, in the number and the message
+            value = float(value)
+        elif re.fullmatch(FLOAT_LITERAL, value) is None:
+            raise ValueError(f"could not convert {value!r} to {self.dtype}")
+        number = decimal.Decimal(str(value).strip())
+        if not number.is_finite() or \
+                abs(number.quantize(decimal.Decimal(1).scaleb(-self.scale), decimal.ROUND_HALF_UP)) >= self.limit:
+            raise ValueError(f"could not convert {value!r} to {self.dtype}")
+
+    def __process_value__(self, row):
+        if not pd.isna(row[self.col_name]):
+            self.check(row[self.col_name])
+
+    def __process_batch__(self, data: pd.DataFrame):
+        values = data[self.col_name]
+        if pd.api.types.is_numeric_dtype(values) and isinstance(values.dtype, np.dtype):
+            numbers = values.to_numpy(dtype=float)
+        else:
+            numbers = pd.to_numeric(values.where(full_match(values, FLOAT_LITERAL)), errors="coerce").to_numpy()
+        # values within a unit of the last place of the limit may round up past it, and are left to the exact check,
+        # as are the ones that aren't plain numbers
+        candidates = values.notna().to_numpy() & ~(np.abs(numbers) < self.limit - 10.0 ** -self.scale)
+        return check_each(values, candidates, self.check, self.count_error)
+
+
+class CheckCategory(ValueProcessor):
+    # checks a column against a fixed dictionary (an ENUM column's values) and stores it as a pandas category with
+    # that dictionary, so every batch shares one and is loaded as codes. Values outside it are reported, and kept,
+    # as extra categories, for the error table
+    def __init__(self, col_name, categories):
+        self.col_name = col_name
+        self.categories = list(categories)
+        self.known = set(self.categories)
+
+    @property
+    def columns(self):
+        return [self.col_name]
+
+    def check(self, value):
+        if value not in self.known:
+            raise ValueError(f"{value!r} is not a known value")
+
+    def __process_value__(self, row):
+        if not pd.isna(row[self.col_name]):
+            self.check(row[self.col_name])
+
+    def __process_batch__(self, data: pd.DataFrame):
+        values = data[self.col_name]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # only the batch's own dictionary is compared, not every row
+            candidates = values.isin([c for c in values.cat.categories if c not in self.known]).to_numpy()
+        else:
+            candidates = (values.notna() & ~values.isin(self.categories)).to_numpy()
+        errors = check_each(values, candidates, self.check, self.count_error)
+        unknown = pd.unique(values.to_numpy(dtype=object)[candidates]).tolist()
+        data[self.col_name] = values.astype(pd.CategoricalDtype(self.categories + unknown))
+        return errors
+
 
 def split_lat_long(row, input_col_name, lat_col_name, long_col_name, sep_char=" "):
     # TODO: handle NESW as well as +/-
@@ -1,25 +1,207 @@
+import math
+import re
+
 import duckdb
 
 from duckdb.duckdb import DuckDBPyConnection, DuckDBPyRelation
 
+from .sketch import TopNSketch
+
+# mean earth radius
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_sql(lat_sql: str, long_sql: str, lat: float, long: float):
+    # great circle distance in km between each row's point and (lat, long)
+    return (f"2 * {EARTH_RADIUS_KM} * asin(sqrt(pow(sin(radians({lat_sql} - {float(lat)!r}) / 2), 2) + "
+            f"cos(radians({float(lat)!r})) * cos(radians({lat_sql})) * "
+            f"pow(sin(radians({long_sql} - {float(long)!r}) / 2), 2)))")
+
 
 class EVAnalytics:
     count_col_name = "count"
     rank_col_name = "count_rank"
 
-    def __init__(self, db_conn: DuckDBPyConnection, table_name: str):
+    def __init__(self, db_conn: DuckDBPyConnection, table_name: str, cache: bool = False):
+        # with cache=True each grouping is materialized once as a temp table, and coarser groupings are rolled up from
+        # the smallest finer one already cached instead of re-scanning the base table
         self.db_conn = db_conn
         self.table_name = table_name
+        self.cache = cache
+        self.cached = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_rollups = 0
+        # persistent aggregates kept up to date from appended deltas, see maintain_counts and maintain_ranks
+        self.maintained_counts = {}
+        self.maintained_ranks = {}
+        # (lat column, long column, cell size in degrees) once build_spatial_index is called, and whether the table
+        # has been written to since
+        self.spatial = None
+        self.spatial_stale = False
 
     def group_and_count(self, columns: list):
         if len(columns) > 0:
             cols_string = ",".join(columns)
-            return self.db_conn.sql(
-                f"SELECT {cols_string}, count(*) AS {self.count_col_name} FROM {self.table_name} GROUP BY {cols_string}"
-            )
+            key = frozenset(column.lower() for column in columns)
+            if key in self.maintained_counts:
+                return self.db_conn.sql(f"SELECT {cols_string}, {self.count_col_name} "
+                                        f"FROM {self.maintained_counts[key][1]}")
+            if not self.cache:
+                return self.db_conn.sql(
+                    f"SELECT {cols_string}, count(*) AS {self.count_col_name} FROM {self.table_name} "
+                    f"GROUP BY {cols_string}"
+                )
+            return self.cached_counts(columns)
         else:
             raise ValueError("At least on grouping column must be specified")
 
+    def cached_counts(self, columns: list):
+        # identifiers are case-insensitive, so the key is too
+        key = frozenset(column.lower() for column in columns)
+        cols_string = ",".join(columns)
+        if key in self.cached:
+            self.cache_hits += 1
+            cache_table, _ = self.cached[key]
+        else:
+            self.cache_misses += 1
+            finer = [(n_rows, cache_table) for cached_key, (cache_table, n_rows) in self.cached.items()
+                     if key < cached_key]
+            if len(finer) > 0:
+                self.cache_rollups += 1
+                source = min(finer)[1]
+                count_sql = f"CAST(sum({self.count_col_name}) AS BIGINT)"
+            else:
+                source = self.table_name
+                count_sql = "count(*)"
+            cache_table = "_".join([self.table_name, "counts"] + [re.sub(r"\W", "_", c) for c in sorted(key)])
+            self.db_conn.execute(
+                f"CREATE OR REPLACE TEMP TABLE {cache_table} AS "
+                f"SELECT {cols_string}, {count_sql} AS {self.count_col_name} FROM {source} GROUP BY {cols_string}"
+            )
+            n_rows = self.db_conn.execute(f"SELECT count(*) FROM {cache_table}").fetchone()[0]
+            self.cached[key] = (cache_table, n_rows)
+        return self.db_conn.sql(f"SELECT {cols_string}, {self.count_col_name} FROM {cache_table}")
+
+    def materialize(self, groupings: list):
+        # finest groupings first, so the coarser ones can be rolled up from them
+        for columns in sorted(groupings, key=len, reverse=True):
+            self.group_and_count(columns)
+
+    def invalidate(self, table_name: str = None):
+        if table_name is not None and table_name.lower() != self.table_name.lower():
+            return
+        for cache_table, _ in self.cached.values():
+            self.db_conn.execute(f"DROP TABLE IF EXISTS {cache_table}")
+        self.cached = {}
+        # rebuilt on the next spatial query rather than after every batch of a load
+        self.spatial_stale = self.spatial is not None
+
+    @property
+    def cache_stats(self):
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "rollups": self.cache_rollups,
+                "cached": len(self.cached)}
+
+    def table_exists(self, table_name: str):
+        return self.db_conn.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = ? AND NOT temporary",
+                                    [table_name]).fetchone()[0] > 0
+
+    def aggregate_name(self, kind: str, columns: list, partition_columns: list = None):
+        name = [self.table_name, kind] + [re.sub(r"\W", "_", c.lower()) for c in columns]
+        if partition_columns:
+            name += ["by"] + [re.sub(r"\W", "_", c.lower()) for c in partition_columns]
+        return "_".join(name)
+
+    def maintain_counts(self, columns: list):
+        # a persistent count table that apply_delta keeps up to date; it is only built from the base table the first
+        # time, later runs pick up the table left by the previous one
+        if len(columns) == 0:
+            raise ValueError("At least on grouping column must be specified")
+        counts_table = self.aggregate_name("live_counts", columns)
+        if not self.table_exists(counts_table):
+            cols_string = ",".join(columns)
+            self.db_conn.execute(f"CREATE TABLE {counts_table} AS SELECT {cols_string}, count(*) AS "
+                                 f"{self.count_col_name} FROM {self.table_name} GROUP BY {cols_string}")
+        self.maintained_counts[frozenset(column.lower() for column in columns)] = (columns, counts_table)
+        return counts_table
+
+    def maintain_ranks(self, columns: list, partition_columns: list[str]):
+        # a persistent rank_by_count table over maintain_counts; apply_delta only re-ranks the partitions a delta
+        # touched
+        counts_table = self.maintain_counts(columns)
+        ranks_table = self.aggregate_name("live_ranks", columns, partition_columns)
+        if not self.table_exists(ranks_table):
+            self.db_conn.execute(f"CREATE TABLE {ranks_table} AS "
+                                 f"SELECT *, {self.rank_sql(partition_columns)} FROM {counts_table}")
+        key = (frozenset(column.lower() for column in columns),
+               tuple(column.lower() for column in partition_columns))
+        self.maintained_ranks[key] = (partition_columns, counts_table, ranks_table)
+        return ranks_table
+
+    def rank_sql(self, partition_columns: list[str]):
+        partition_by = f"PARTITION BY {','.join(partition_columns)}" if len(partition_columns) > 0 else ""
+        return f"rank() over ({partition_by} ORDER BY {self.count_col_name} DESC) AS {self.rank_col_name}"
+
+    @staticmethod
+    def in_partitions(table_name: str, partition_columns: list[str], partitions_table: str):
+        matches = " AND ".join(f"{table_name}.{c} IS NOT DISTINCT FROM p.{c}" for c in partition_columns)
+        return f"EXISTS (SELECT 1 FROM {partitions_table} p WHERE {matches})"
+
+    def ranked_counts(self, columns: list, partition_columns: list[str]):
+        key = (frozenset(column.lower() for column in columns),
+               tuple(column.lower() for column in partition_columns))
+        if key in self.maintained_ranks:
+            return self.db_conn.table(self.maintained_ranks[key][2])
+        return self.rank_by_count(self.group_and_count(columns), partition_columns)
+
+    def apply_delta(self, delta_table_name: str):
+        # merge the counts of newly appended rows into every maintained count table, then re-rank only the
+        # partitions that appear in the delta. The delta is dropped in the same transaction, so its rows are counted
+        # exactly once even if the run dies part way through
+        if not self.table_exists(delta_table_name):
+            return
+        self.db_conn.begin()
+        try:
+            self.merge_delta(delta_table_name)
+            self.db_conn.execute(f"DROP TABLE {delta_table_name}")
+        except Exception:
+            self.db_conn.rollback()
+            raise
+        self.db_conn.commit()
+        self.invalidate()
+
+    def merge_delta(self, delta_table_name: str):
+        for columns, counts_table in self.maintained_counts.values():
+            cols_string = ",".join(columns)
+            matches = " AND ".join(f"{counts_table}.{c} IS NOT DISTINCT FROM d.{c}" for c in columns)
+            delta_counts = f"{counts_table}_delta"
+            self.db_conn.execute(f"CREATE OR REPLACE TEMP TABLE {delta_counts} AS SELECT {cols_string}, count(*) AS "
+                                 f"{self.count_col_name} FROM {delta_table_name} GROUP BY {cols_string}")
+            self.db_conn.execute(f"UPDATE {counts_table} SET {self.count_col_name} = "
+                                 f"{counts_table}.{self.count_col_name} + d.{self.count_col_name} "
+                                 f"FROM {delta_counts} d WHERE {matches}")
+            self.db_conn.execute(f"INSERT INTO {counts_table} SELECT * FROM {delta_counts} d "
+                                 f"WHERE NOT EXISTS (SELECT 1 FROM {counts_table} WHERE {matches})")
+            self.db_conn.execute(f"DROP TABLE {delta_counts}")
+
+        for partition_columns, counts_table, ranks_table in self.maintained_ranks.values():
+            if len(partition_columns) == 0:
+                # a single global ranking: any new row can move every rank
+                self.db_conn.execute(f"DELETE FROM {ranks_table}")
+                self.db_conn.execute(f"INSERT INTO {ranks_table} "
+                                     f"SELECT *, {self.rank_sql(partition_columns)} FROM {counts_table}")
+                continue
+            touched = f"{ranks_table}_touched"
+            self.db_conn.execute(f"CREATE OR REPLACE TEMP TABLE {touched} AS "
+                                 f"SELECT DISTINCT {','.join(partition_columns)} FROM {delta_table_name}")
+            self.db_conn.execute(f"DELETE FROM {ranks_table} "
+                                 f"WHERE {self.in_partitions(ranks_table, partition_columns, touched)}")
+            self.db_conn.execute(f"INSERT INTO {ranks_table} SELECT *, {self.rank_sql(partition_columns)} "
+                                 f"FROM {counts_table} "
+                                 f"WHERE {self.in_partitions(counts_table, partition_columns, touched)}")
+            self.db_conn.execute(f"DROP TABLE {touched}")
+
     def rank_by_count(self, counts_data: DuckDBPyRelation, columns: list[str]):
         if len(columns) > 0:
             cols_string = ",".join(columns)
@@ -32,3 +214,158 @@ class EVAnalytics:
 
     def top_n(self, ranked_data: DuckDBPyRelation, n: int):
         return ranked_data.filter(f"{self.rank_col_name} <= {n}")
+
+    def approx_ranked_counts(self, columns: list, partition_columns: list[str], capacity: int = 64,
+                             batch_rows: int = 1_000_000):
+        # a TopNSketch of the table, for rankings over more rows than an exact GROUP BY and window should be run on:
+        # DuckDB counts the rows batch_rows rowids at a time and each batch's largest counts are merged in, so
+        # memory is bounded by one batch's counts and capacity counters per partition rather than every distinct
+        # value. Sketches of other tables or streams can be merged into the result
+        sketch = TopNSketch(columns, partition_columns, capacity)
+        max_rowid = self.db_conn.execute(f"SELECT max(rowid) FROM {self.table_name}").fetchone()[0]
+        if max_rowid is None:
+            return sketch
+        cols_string = ",".join(columns)
+        count_col = TopNSketch.count_col_name
+        partition_by = f"PARTITION BY {','.join(partition_columns)}" if len(partition_columns) > 0 else ""
+        for start in range(0, max_rowid + 1, batch_rows):
+            # only the capacity largest counts of each partition could be kept, so only they and the next one, the
+            # most any of the rest was counted, leave DuckDB
+            counts = self.db_conn.execute(
+                f"SELECT *, sum({count_col}) OVER ({partition_by}) AS rows, "
+                f"row_number() OVER ({partition_by} ORDER BY {count_col} DESC) AS position "
+                f"FROM (SELECT {cols_string}, count(*) AS {count_col} FROM {self.table_name} "
+                f"WHERE rowid BETWEEN {start} AND {start + batch_rows - 1} GROUP BY {cols_string}) "
+                f"QUALIFY position <= {capacity + 1}").df()
+            cut = counts["position"] > capacity
+            partitions = counts.loc[counts["position"] == 1, partition_columns + ["rows"]]
+            floors = counts.loc[cut, partition_columns + [count_col]].rename(columns={count_col: "floor"})
+            if len(partition_columns) > 0:
+                partitions = partitions.merge(floors, on=partition_columns, how="left")
+            else:
+                partitions = partitions.assign(floor=floors["floor"].sum())
+            sketch.update_counts(counts[~cut], partitions.fillna({"floor": 0}))
+        return sketch
+
+    def approx_top_n(self, columns: list, partition_columns: list[str], n: int, capacity: int = 64, **options):
+        # the approximate counterpart of top_n(ranked_counts(columns, partition_columns), n), with each count's error
+        # and whether it is certainly in the top n; see TopNSketch.top_n
+        return self.approx_ranked_counts(columns, partition_columns, capacity, **options).top_n(n)
+
+    @property
+    def spatial_table_name(self):
+        return f"{self.table_name}_spatial"
+
+    def build_spatial_index(self, lat_column: str, long_column: str, cell_degrees: float = 0.01):
+        # a copy of the located rows with a grid cell column, sorted by cell. Cells number the grid row by row
+        # (cell = y * cells_per_row + x), so the cells of one row of the grid between two longitudes are a single
+        # cell range, and since the table is sorted DuckDB's min/max per row group skips every row group outside it.
+        # 0.01 degrees is about 1.1km north to south
+        self.spatial = (lat_column, long_column, cell_degrees)
+        self.db_conn.execute(f"CREATE OR REPLACE TEMP TABLE {self.spatial_table_name} AS "
+                             f"SELECT *, {self.cell_sql()} AS cell FROM {self.table_name} "
+                             f"WHERE {lat_column} IS NOT NULL AND {long_column} IS NOT NULL ORDER BY cell")
+        self.spatial_stale = False
+        return self.spatial_table_name
+
+    @property
+    def cells_per_row(self):
+        return math.ceil(360 / self.spatial[2]) + 1
+
+    def cell_x(self, long: float):
+        return math.floor((min(max(long, -180), 180) + 180) / self.spatial[2])
+
+    def cell_y(self, lat: float):
+        return math.floor((min(max(lat, -90), 90) + 90) / self.spatial[2])
+
+    def cell_sql(self):
+        lat_column, long_column, cell_degrees = self.spatial
+        # in double precision, as cell_x and cell_y work them out, whatever the columns are stored as
+        return (f"CAST(floor((CAST({lat_column} AS DOUBLE) + 90) / {cell_degrees!r}) AS BIGINT) * {self.cells_per_row}"
+                f" + CAST(floor((CAST({long_column} AS DOUBLE) + 180) / {cell_degrees!r}) AS BIGINT)")
+
+    def spatial_relation(self):
+        if self.spatial is None:
+            raise ValueError("build_spatial_index must be called before any spatial query")
+        if self.spatial_stale:
+            self.build_spatial_index(*self.spatial)
+        return self.spatial_table_name
+
+    def cell_ranges(self, lat_min: float, lat_max: float, long_ranges: list, max_ranges: int = 256):
+        # [(first cell, last cell)] covering the box: one range per row of the grid and longitude range, merged
+        # where they touch. Past max_ranges, neighbouring ones are merged anyway: the extra cells in between are
+        # read and filtered out, which beats a query with thousands of branches
+        ranges = sorted((y * self.cells_per_row + self.cell_x(long_min), y * self.cells_per_row + self.cell_x(long_max))
+                        for y in range(self.cell_y(lat_min), self.cell_y(lat_max) + 1)
+                        for long_min, long_max in long_ranges)
+        merged = []
+        for first, last in ranges:
+            if len(merged) > 0 and first <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+            else:
+                merged.append((first, last))
+        step = math.ceil(len(merged) / max_ranges)
+        return [(merged[i][0], merged[min(i + step, len(merged)) - 1][1]) for i in range(0, len(merged), step)]
+
+    def in_cells_sql(self, ranges: list, columns: str = "*", where: str = None):
+        # one branch per range: a single BETWEEN is pruned by the row group min/max, an OR or IN of several isn't
+        condition = f" AND ({where})" if where else ""
+        return " UNION ALL ".join(f"SELECT {columns} FROM {self.spatial_relation()} "
+                                  f"WHERE cell BETWEEN {first} AND {last}{condition}" for first, last in ranges)
+
+    def radius_ranges(self, lat: float, long: float, km: float):
+        # the bounding box of the circle: a great circle bulges towards the pole, so the longitudes it spans are
+        # asin(sin(r) / cos(lat)) either side rather than r / cos(lat) along the parallel
+        angle = km / EARTH_RADIUS_KM
+        lat_delta = math.degrees(angle)
+        lat_min, lat_max = lat - lat_delta, lat + lat_delta
+        if lat_min <= -90 or lat_max >= 90 or math.sin(angle) >= math.cos(math.radians(lat)):
+            long_ranges = [(-180, 180)]
+        else:
+            long_delta = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            long_min, long_max = long - long_delta, long + long_delta
+            # a circle over the antimeridian takes both ends of the grid
+            long_ranges = [(max(long_min, -180), min(long_max, 180))]
+            if long_min < -180:
+                long_ranges.append((long_min + 360, 180))
+            if long_max > 180:
+                long_ranges.append((-180, long_max - 360))
+        return self.cell_ranges(lat_min, lat_max, long_ranges)
+
+    def within_radius(self, lat: float, long: float, km: float, where: str = None):
+        # the rows within km of (lat, long), with their distance_km; only the cells of the circle's bounding box
+        # are read, and the exact distance is checked on those
+        self.spatial_relation()
+        lat_column, long_column, _ = self.spatial
+        candidates = self.in_cells_sql(self.radius_ranges(lat, long, km), where=where)
+        return self.db_conn.sql(f"SELECT * FROM (SELECT * EXCLUDE (cell), "
+                                f"{haversine_sql(lat_column, long_column, lat, long)} AS distance_km "
+                                f"FROM ({candidates})) WHERE distance_km <= {float(km)!r}")
+
+    def counts_per_cell(self, lat_min: float = None, long_min: float = None, lat_max: float = None,
+                        long_max: float = None):
+        # vehicles per grid cell with the cell's south west corner, for the cells touching the box if one is given
+        source = self.spatial_relation()
+        cell_degrees = self.spatial[2]
+        if lat_min is not None:
+            # merged ranges can take in cells either side of the box
+            in_box = (f"cell // {self.cells_per_row} BETWEEN {self.cell_y(lat_min)} AND {self.cell_y(lat_max)} AND "
+                      f"cell % {self.cells_per_row} BETWEEN {self.cell_x(long_min)} AND {self.cell_x(long_max)}")
+            ranges = self.cell_ranges(lat_min, lat_max, [(long_min, long_max)])
+            source = f"({self.in_cells_sql(ranges, 'cell', in_box)})"
+        return self.db_conn.sql(
+            f"SELECT cell, (cell // {self.cells_per_row}) * {cell_degrees!r} - 90 AS cell_lat, "
+            f"(cell % {self.cells_per_row}) * {cell_degrees!r} - 180 AS cell_long, "
+            f"count(*) AS {self.count_col_name} FROM {source} GROUP BY cell")
+
+    def nearest(self, lat: float, long: float, k: int, where: str = None):
+        # the k rows closest to (lat, long) matching where (e.g. "EV_type = 'Battery Electric Vehicle (BEV)'" for
+        # the ones that charge), by growing a radius from one cell until it holds k of them: every row closer than
+        # the k-th is then inside it too
+        self.spatial_relation()
+        km = self.spatial[2] * KM_PER_DEGREE
+        while True:
+            found = self.within_radius(lat, long, km, where).order("distance_km").limit(k)
+            if len(found.fetchall()) >= k or km >= math.pi * EARTH_RADIUS_KM:
+                return found
+            km *= 2
@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+# stands in for the partition columns of a single global ranking, so every partition is handled the same way
+GLOBAL_PARTITION = "__partition"
+
+
+class TopNSketch:
+    # approximate counts of the most frequent values of columns within each partition (a subset of columns, as for
+    # EVAnalytics.rank_by_count), in at most capacity counters per partition however many rows are seen. It is
+    # Space-Saving (Metwally et al.), fed pre-aggregated batches: a value with no counter may have been seen at most
+    # as often as its partition's smallest counter (the partition's floor), so a new one starts from the floor and
+    # carries it as its error, and only the capacity largest counters are kept. Every count is an upper bound, count
+    # minus error a lower bound, and a partition's floor is at most its rows / capacity. Sketches over different
+    # rows are merged the same way, so batches can be counted by separate workers
+    count_col_name = "count"
+    error_col_name = "error"
+    rank_col_name = "count_rank"
+    guaranteed_col_name = "guaranteed"
+
+    def __init__(self, columns: list, partition_columns: list, capacity: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        missing = [column for column in partition_columns if column not in columns]
+        if len(missing) > 0:
+            raise ValueError(f"Partition columns {missing} are not counted")
+        self.columns = list(columns)
+        self.partition_columns = list(partition_columns)
+        self.capacity = capacity
+        self.group_columns = self.partition_columns or [GLOBAL_PARTITION]
+        self.key_columns = self.columns + ([] if self.partition_columns else [GLOBAL_PARTITION])
+        self.counters = pd.DataFrame({**{column: [] for column in self.key_columns},
+                                      self.count_col_name: np.array([], dtype=np.int64),
+                                      self.error_col_name: np.array([], dtype=np.int64)})
+        # rows seen per partition, for the error bounds
+        self.partition_rows = pd.DataFrame({**{column: [] for column in self.group_columns},
+                                            "rows": np.array([], dtype=np.int64)})
+        self.rows = 0
+
+    def update(self, batch: pd.DataFrame):
+        # counts a batch of rows exactly, then merges the counts in
+        if len(batch) == 0:
+            return self
+        counts = batch.groupby(self.columns, dropna=False, observed=True, sort=False).size()
+        return self.update_counts(counts.rename(self.count_col_name).reset_index())
+
+    def update_counts(self, counts: pd.DataFrame, partitions: pd.DataFrame = None):
+        # the counts of a batch, one row per value of columns, e.g. from a GROUP BY. They may be only the largest of
+        # each partition, with partitions giving each partition's "rows" and "floor", the largest count left out;
+        # without it the counts are taken to be all of them
+        if len(counts) == 0:
+            return self
+        counts = counts[self.columns + [self.count_col_name]].copy()
+        counts[self.error_col_name] = 0
+        if not self.partition_columns:
+            counts[GLOBAL_PARTITION] = 0
+            if partitions is not None:
+                partitions = partitions.assign(**{GLOBAL_PARTITION: 0})
+        if partitions is None:
+            partitions = self.partition_counts(counts).assign(floor=0)
+        self.merge_counts(counts, partitions[self.group_columns + ["rows"]], partitions[self.group_columns + ["floor"]])
+        return self
+
+    def merge(self, other: "TopNSketch"):
+        if (other.columns, other.partition_columns, other.capacity) != \
+                (self.columns, self.partition_columns, self.capacity):
+            raise ValueError("Only sketches of the same columns, partitions and capacity can be merged")
+        self.merge_counts(other.counters, other.partition_rows, other.floors())
+        return self
+
+    def partition_counts(self, counts: pd.DataFrame):
+        return (counts.groupby(self.group_columns, dropna=False, observed=True, sort=False)[self.count_col_name]
+                .sum().rename("rows").reset_index())
+
+    def floors(self):
+        # per partition, the most a value without a counter can have been seen: the smallest counter once the
+        # partition is full, as one may have been dropped, 0 before then
+        groups = self.counters.groupby(self.group_columns, dropna=False, observed=True, sort=False)[self.count_col_name]
+        full = groups.size() >= self.capacity
+        return groups.min().where(full, 0).rename("floor").reset_index()
+
+    def merge_counts(self, counts: pd.DataFrame, partition_rows: pd.DataFrame, other_floors: pd.DataFrame):
+        # counts may have more than capacity counters in a partition, all of them above its floor
+        if self.rows == 0:
+            merged = counts.copy()
+        else:
+            merged = self.counters.merge(counts, on=self.key_columns, how="outer", suffixes=("", "_other"))
+            merged = merged.merge(self.floors(), on=self.group_columns, how="left")
+            merged = merged.merge(other_floors, on=self.group_columns, how="left", suffixes=("", "_other"))
+            # a partition one side hasn't seen has nothing to add from it
+            merged[["floor", "floor_other"]] = merged[["floor", "floor_other"]].fillna(0)
+            for column in [self.count_col_name, self.error_col_name]:
+                merged[column] = (merged[column].fillna(merged["floor"]) +
+                                  merged[f"{column}_other"].fillna(merged["floor_other"])).astype(np.int64)
+            partition_rows = pd.concat([self.partition_rows, partition_rows], ignore_index=True)
+        merged = merged.sort_values(self.count_col_name, ascending=False, kind="stable")
+        kept = merged.groupby(self.group_columns, dropna=False, observed=True, sort=False).cumcount() < self.capacity
+        self.counters = merged.loc[kept, self.key_columns + [self.count_col_name, self.error_col_name]] \
+            .reset_index(drop=True)
+        self.partition_rows = (partition_rows.groupby(self.group_columns, dropna=False, observed=True, sort=False)
+                               ["rows"].sum().reset_index())
+        self.rows = int(self.partition_rows["rows"].sum())
+
+    def error_bounds(self):
+        # per partition: rows seen, the most any count is over by (its floor), and the Space-Saving bound on that
+        bounds = self.partition_rows.merge(self.floors(), on=self.group_columns, how="left")
+        bounds = bounds.rename(columns={"floor": "max_error"})
+        bounds["max_error"] = bounds["max_error"].fillna(0).astype(np.int64)
+        bounds["error_bound"] = bounds["rows"] / self.capacity
+        return bounds.drop(columns=[GLOBAL_PARTITION], errors="ignore")
+
+    def ranked_counts(self):
+        # every counter, ranked within its partition as rank() over (... ORDER BY count DESC) would
+        ranked = self.counters.copy()
+        ranked[self.rank_col_name] = ranked.groupby(self.group_columns, dropna=False, observed=True)[
+            self.count_col_name].rank(method="min", ascending=False).astype(np.int64)
+        return ranked
+
+    def top_n(self, n: int):
+        # the counters ranked n or better, each flagged guaranteed when even its lower bound beats the upper bound
+        # of everything ranked below n (the (n+1)th counter, or the floor for a value that has none), so it belongs
+        # in the exact top n whatever the error
+        if n > self.capacity:
+            raise ValueError(f"Only the top {self.capacity} values of a partition are counted")
+        ranked = self.ranked_counts()
+        ordered = ranked.sort_values(self.count_col_name, ascending=False, kind="stable")
+        position = ordered.groupby(self.group_columns, dropna=False, observed=True, sort=False).cumcount()
+        nth = ordered.loc[position == n, self.group_columns + [self.count_col_name]] \
+            .rename(columns={self.count_col_name: "nth"})
+        bounds = ranked[self.group_columns].merge(nth, on=self.group_columns, how="left") \
+            .merge(self.floors(), on=self.group_columns, how="left")
+        threshold = np.maximum(bounds["nth"].fillna(0).to_numpy(), bounds["floor"].fillna(0).to_numpy())
+        ranked[self.guaranteed_col_name] = \
+            (ranked[self.count_col_name] - ranked[self.error_col_name]).to_numpy() >= threshold
+        top = ranked[ranked[self.rank_col_name] <= n]
+        top = top.sort_values(self.group_columns + [self.rank_col_name], kind="stable").reset_index(drop=True)
+        return top.drop(columns=[GLOBAL_PARTITION], errors="ignore")
+
+    def __repr__(self):
+        return (f"TopNSketch({','.join(self.columns)} by {','.join(self.partition_columns) or 'all'}): "
+                f"{len(self.counters)} counters over {self.rows} rows")
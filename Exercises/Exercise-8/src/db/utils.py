@@ -1,7 +1,12 @@
+import os
+import re
+import time
+
 import duckdb
+import numpy as np
 import pandas as pd
 
-from duckdb.duckdb import CatalogException
+from duckdb.duckdb import CatalogException, DuckDBPyRelation
 
 VALID_DATA_TYPES = [
     "BIGINT",
@@ -33,25 +38,206 @@ VALID_DATA_TYPES = [
     "VARCHAR"
 ]
 
+INT_DATA_TYPES = ["BIGINT", "HUGEINT", "INTEGER", "SMALLINT", "TINYINT",
+                  "UBIGINT", "UHUGEINT", "UINTEGER", "USMALLINT", "UTINYINT"]
+FLOAT_DATA_TYPES = ["DOUBLE", "FLOAT"]
+
+# the same literal python's int() accepts, so strings like '1.5' are rejected rather than rounded by the cast
+INT_LITERAL_SQL = r"^\s*[+-]?[0-9]+\s*$"
+# plain numbers, as CheckDecimal takes them; the cast alone would also take '1_0'
+DECIMAL_LITERAL_SQL = r"^\s*[+-]?([0-9]+(\.[0-9]*)?|\.[0-9]+)([eE][+-]?[0-9]+)?\s*$"
+
+# DECIMAL(precision, scale); DuckDB allows a precision of up to 38
+DECIMAL_TYPE = re.compile(r"^(?:DECIMAL|NUMERIC)\s*\(\s*(\d+)\s*,\s*(\d+)\s*\)$", re.IGNORECASE)
+# ENUM('a', 'b', ...) with its dictionary inline, or a bare ENUM for derive_enums to fill in
+ENUM_TYPE = re.compile(r"^ENUM\s*\(.*\)$", re.IGNORECASE | re.DOTALL)
+DERIVED_ENUM = "ENUM"
+
+
+def normalize_dtype(dtype: str):
+    # the dtype as create_table writes it, or None if it isn't supported; an ENUM's values keep their case
+    dtype = dtype.strip()
+    if ENUM_TYPE.match(dtype):
+        return "ENUM" + dtype[dtype.index("("):]
+    decimal = DECIMAL_TYPE.match(dtype)
+    if decimal:
+        precision, scale = int(decimal.group(1)), int(decimal.group(2))
+        return f"DECIMAL({precision},{scale})" if 1 <= precision <= 38 and scale <= precision else None
+    return dtype.upper() if dtype.upper() in VALID_DATA_TYPES else None
+
+
+def decimal_precision(dtype: str):
+    # (precision, scale) of a DECIMAL dtype, None for anything else
+    decimal = DECIMAL_TYPE.match(dtype.strip())
+    return (int(decimal.group(1)), int(decimal.group(2))) if decimal else None
+
+
+def is_enum(dtype: str):
+    return ENUM_TYPE.match(dtype.strip()) is not None
+
+
+def sql_string(value):
+    # a quoted SQL string literal, for values such as file paths that can't be passed as parameters
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def enum_sql(values):
+    return "ENUM(" + ", ".join(sql_string(value) for value in values) + ")"
+
+
+def enum_values(dtype: str):
+    # the dictionary of an ENUM(...) dtype, as enum_sql or DESCRIBE write it
+    return [value.replace("''", "'") for value in re.findall(r"'((?:[^']|'')*)'", dtype[dtype.index("("):])]
+
+
+def row_bytes(data: pd.DataFrame, columns: list = None, sample_rows: int = 256):
+    # the mean size of a row's values: exact for fixed width columns, from an evenly spaced sample of rows for the
+    # rest, since measuring every string of every batch would cost more than loading it
+    if len(data) == 0:
+        return 0.0
+    sample = data.iloc[::max(1, len(data) // sample_rows)]
+    n_bytes = 0.0
+    for name in columns or data.columns:
+        values = data[name]
+        if isinstance(values.dtype, np.dtype) and values.dtype.kind in "biufcmM":
+            n_bytes += values.dtype.itemsize
+        elif isinstance(values.dtype, pd.CategoricalDtype):
+            # stored as its codes, as an ENUM is
+            n_bytes += values.cat.codes.dtype.itemsize
+        else:
+            n_bytes += sample[name].map(lambda value: 0 if pd.isna(value) else len(str(value).encode())).mean()
+    return n_bytes
+
+
+class LoadMetrics:
+    # rows and (estimated) bytes written to one table, and the time spent writing them
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.rows = 0
+        self.bytes = 0
+        self.batches = 0
+        self.seconds = 0.0
+
+    def record(self, rows: int, n_bytes: float, seconds: float):
+        self.rows += int(rows)
+        self.bytes += int(round(n_bytes))
+        self.batches += 1
+        self.seconds += seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float("nan")
+
+    def to_json(self):
+        return {"table_name": self.table_name, "rows": self.rows, "bytes": self.bytes, "batches": self.batches,
+                "seconds": self.seconds, "rows_per_second": self.rows_per_second}
+
+    def __repr__(self):
+        return (f"{self.table_name}: {self.rows} rows ({self.bytes:,} bytes) in {self.batches} batches, "
+                f"{self.seconds:.3f}s ({self.rows_per_second:,.0f} rows/s)")
+
 
 class DuckDBUtils:
-    def __init__(self, db_name):
+    def __init__(self, db_name, record_metrics: bool = True):
         self.conn = duckdb.connect(db_name)
+        # callbacks taking a table name, run after every write to that table (e.g. EVAnalytics.invalidate)
+        self.write_listeners = []
+        # table name -> LoadMetrics, for the rows load_data and load_csv write
+        self.record_metrics = record_metrics
+        self.load_metrics = {}
+
+    def record_load(self, table_name: str, rows: int, n_bytes: float, seconds: float):
+        if not self.record_metrics:
+            return
+        if table_name not in self.load_metrics:
+            self.load_metrics[table_name] = LoadMetrics(table_name)
+        self.load_metrics[table_name].record(rows, n_bytes, seconds)
+
+    def add_write_listener(self, listener):
+        self.write_listeners.append(listener)
+
+    def notify_write(self, *table_names: str):
+        for table_name in table_names:
+            for listener in self.write_listeners:
+                listener(table_name)
 
     @staticmethod
     def format_schema(json_schema: dict):
-        # TODO: handle decimal precision, scale; compound types
-        invalid_dtypes = list(filter(lambda name_dtype: name_dtype[1].upper() not in VALID_DATA_TYPES,
+        # TODO: compound types
+        # a bare ENUM has no dictionary yet, see derive_enums
+        invalid_dtypes = list(filter(lambda name_dtype: normalize_dtype(name_dtype[1]) is None,
                                      json_schema.items()))
         if len(invalid_dtypes) > 0:
             raise TypeError(f"One or more unsupported column data types specified")
 
-        return ",".join(list(map(lambda name_dtype: f"{name_dtype[0]} {name_dtype[1].upper()}",
+        return ",".join(list(map(lambda name_dtype: f"{name_dtype[0]} {normalize_dtype(name_dtype[1])}",
                                  json_schema.items())))
 
-    def create_table(self, table_name: str, schema: dict, drop_if_exists: bool = False):
+    def table_exists(self, table_name: str):
+        return self.conn.execute("SELECT count(*) FROM duckdb_tables() WHERE table_name = ?",
+                                 [table_name]).fetchone()[0] > 0
+
+    @staticmethod
+    def csv_source(csv_path: str, csv_columns: list = None):
+        # the csv as strings, for a FROM clause
+        read_options = "header=true, all_varchar=true"
+        if csv_columns is not None:
+            read_options += ", names=[" + ",".join(sql_string(name) for name in csv_columns) + "]"
+        return f"read_csv({sql_string(csv_path)}, {read_options})"
+
+    def derive_enums(self, schema: dict, source: str, column_sql: dict = None, sample_rows: int = None,
+                     table_name: str = None):
+        # the schema with every bare ENUM given a dictionary: the distinct values of the column in source (a FROM
+        # clause such as csv_source), plus those it already has in table_name so a dictionary only ever grows. All
+        # the columns are read in one pass; with sample_rows only the first sample_rows rows are, and any value
+        # missed is diverted to the error table on load like any other invalid one. A column with no values at all
+        # is left as VARCHAR
+        column_sql = column_sql or {}
+        columns = [name for name, dtype in schema.items() if dtype.strip().upper() == DERIVED_ENUM]
+        derived = dict(schema)
+        if len(columns) == 0:
+            return derived
+        existing = self.table_schema(table_name) if table_name is not None and self.table_exists(table_name) else {}
+        limit = f" LIMIT {int(sample_rows)}" if sample_rows is not None else ""
+        # a DISTINCT aggregate hashes the values as they're read rather than listing every row first
+        select_clause = ", ".join(f"list(DISTINCT {column_sql.get(name, name)}) "
+                                  f"FILTER (WHERE {column_sql.get(name, name)} IS NOT NULL)" for name in columns)
+        distinct = self.conn.execute(f"SELECT {select_clause} FROM (SELECT * FROM {source}{limit})").fetchone()
+        for name, values in zip(columns, distinct):
+            values = set(values or [])
+            if is_enum(existing.get(name, "")):
+                values |= set(enum_values(existing[name]))
+            derived[name] = enum_sql(sorted(values)) if len(values) > 0 else "VARCHAR"
+        return derived
+
+    def widen_enums(self, schema: dict):
+        # ENUMs can't be altered in place, so every column in the database named like one of schema's ENUM columns
+        # and holding a smaller dictionary (the table itself, the aggregate tables built from it) is moved to the
+        # wider one; the column is rewritten, but only when a new value has turned up
+        widened = set()
+        for name, dtype in schema.items():
+            if not is_enum(dtype):
+                continue
+            values = set(enum_values(dtype))
+            for database, schema_name, table, current in self.conn.execute(
+                    "SELECT database_name, schema_name, table_name, data_type FROM duckdb_columns() "
+                    "WHERE lower(column_name) = lower(?) AND data_type LIKE 'ENUM(%'", [name]).fetchall():
+                if current == normalize_dtype(dtype) or not set(enum_values(current)) < values:
+                    continue
+                self.conn.execute(f"ALTER TABLE {database}.{schema_name}.{table} ALTER {name} TYPE {dtype}")
+                widened.add(table)
+        self.notify_write(*sorted(widened))
+        return sorted(widened)
+
+    def create_table(self, table_name: str, schema: dict, drop_if_exists: bool = False, if_not_exists: bool = False):
         formatted_schema = DuckDBUtils.format_schema(schema)
+        if if_not_exists and not drop_if_exists:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} ({formatted_schema})")
+            return
         if drop_if_exists:
+            # whatever was kept up to date from the old rows would otherwise carry on from them
+            for derived_name in self.derived_tables(table_name):
+                self.conn.execute(f"DROP TABLE {derived_name}")
             try:
                 self.conn.execute(f"DROP TABLE {table_name}")
             except CatalogException as err:
@@ -61,13 +247,176 @@ class DuckDBUtils:
                     raise err
         self.conn.execute(f"CREATE TABLE {table_name} ({formatted_schema})")
 
-    def load_data(self, data: pd.DataFrame, table_name: str, err_table_name: str, err_column_name: str = "errors"):
+    def load_data(self, data: pd.DataFrame, table_name: str, err_table_name: str, err_column_name: str = "errors",
+                  key_columns: list = None, delta_table_name: str = None):
         # TODO: consider checking column names, order
         # TODO: does duckdb support diverting failed records to error table?
+        # with key_columns the good rows are appended via append_new_rows instead, skipping keys already loaded
         select_clause = "*"
         where_clause = ""
+        n_good = len(data)
+        good_columns = list(data.columns)
         if "errors" in data.columns:
-            self.conn.sql(f"INSERT INTO {err_table_name} SELECT * FROM data WHERE {err_column_name} IS NOT NULL")
-            select_clause = ",".join([c for c in data.columns if c != err_column_name])
+            start = time.perf_counter()
+            err_rows = f"SELECT * FROM data WHERE {err_column_name} IS NOT NULL"
+            if key_columns:
+                err_rows = DuckDBUtils.new_error_rows(err_rows, table_name, err_table_name, key_columns)
+            n_err = self.conn.execute(f"INSERT INTO {err_table_name} {err_rows}").fetchone()[0]
+            if self.record_metrics:
+                failed = data[err_column_name].notna().to_numpy()
+                n_good -= int(failed.sum())
+                self.record_load(err_table_name, n_err, row_bytes(data[failed]) * n_err, time.perf_counter() - start)
+            good_columns = [c for c in data.columns if c != err_column_name]
+            select_clause = ",".join(good_columns)
             where_clause = f"WHERE {err_column_name} IS NULL"
-        self.conn.sql(f"INSERT INTO {table_name} SELECT {select_clause} FROM data {where_clause}")
+        start = time.perf_counter()
+        if key_columns:
+            n_good = self.append_new_rows(self.conn.sql(f"SELECT {select_clause} FROM data {where_clause}"),
+                                          table_name, key_columns, delta_table_name)
+        else:
+            self.conn.sql(f"INSERT INTO {table_name} SELECT {select_clause} FROM data {where_clause}")
+        if self.record_metrics:
+            self.record_load(table_name, n_good, row_bytes(data, good_columns) * n_good, time.perf_counter() - start)
+        self.notify_write(table_name, err_table_name)
+
+    @staticmethod
+    def delta_table(table_name: str):
+        return f"{table_name}_delta"
+
+    def derived_tables(self, table_name: str):
+        # the persistent tables built from table_name's rows and kept up to date from its appends: its delta, and the
+        # live aggregates of EVAnalytics.maintain_counts and maintain_ranks ("<table>_live_...")
+        return [name for name, in self.conn.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE NOT temporary AND (lower(table_name) = lower(?) OR "
+            "starts_with(lower(table_name), lower(?)))", [DuckDBUtils.delta_table(table_name), f"{table_name}_live_"]
+        ).fetchall()]
+
+    @staticmethod
+    def new_error_rows(err_rows: str, table_name: str, err_table_name: str, key_columns: list):
+        # the rows of the err_rows query whose key is in neither table yet, one per key, so an incremental load that
+        # re-sends a rejected (or since loaded) row doesn't divert it again. Keys are compared as text, as the error
+        # table holds them, and NULL keys as equal, as in append_new_rows
+        def keys_match(alias: str):
+            return " AND ".join(f"CAST({alias}.{key} AS VARCHAR) IS NOT DISTINCT FROM CAST(i.{key} AS VARCHAR)"
+                                for key in key_columns)
+
+        return (f"SELECT * FROM ({err_rows}) i "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {keys_match('t')}) "
+                f"AND NOT EXISTS (SELECT 1 FROM {err_table_name} e WHERE {keys_match('e')}) "
+                f"QUALIFY row_number() OVER (PARTITION BY {','.join(key_columns)}) = 1")
+
+    def append_new_rows(self, new_rows: DuckDBPyRelation, table_name: str, key_columns: list,
+                        delta_table_name: str = None):
+        # append-only load: rows whose key is already in the table are skipped, and one row is kept per new key. NULL
+        # keys are compared as equal, so a row without a key is loaded once rather than again on every call. This
+        # call's new rows are staged on their own, then appended to the table and to a persistent delta table in one
+        # transaction, so aggregates can be brought up to date from the delta alone (EVAnalytics.apply_delta) and a
+        # run that dies before applying it leaves a delta that still matches the table, for the next run to apply
+        delta_table_name = delta_table_name or DuckDBUtils.delta_table(table_name)
+        incoming_name, staged_name = f"{table_name}_incoming", f"{table_name}_staged"
+        keys_match = " AND ".join(f"t.{key} IS NOT DISTINCT FROM i.{key}" for key in key_columns)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {delta_table_name} AS SELECT * FROM {table_name} LIMIT 0")
+        new_rows.create_view(incoming_name, replace=True)
+        try:
+            self.conn.execute(f"CREATE OR REPLACE TEMP TABLE {staged_name} AS SELECT * FROM {incoming_name} i "
+                              f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} t WHERE {keys_match}) "
+                              f"QUALIFY row_number() OVER (PARTITION BY {','.join(key_columns)}) = 1")
+        finally:
+            self.conn.execute(f"DROP VIEW {incoming_name}")
+        try:
+            self.conn.begin()
+            try:
+                self.conn.execute(f"INSERT INTO {table_name} SELECT * FROM {staged_name}")
+                self.conn.execute(f"INSERT INTO {delta_table_name} SELECT * FROM {staged_name}")
+            except Exception:
+                self.conn.rollback()
+                raise
+            self.conn.commit()
+            return self.conn.execute(f"SELECT count(*) FROM {staged_name}").fetchone()[0]
+        finally:
+            self.conn.execute(f"DROP TABLE {staged_name}")
+
+    def table_schema(self, table_name: str):
+        return {name: dtype for name, dtype, *_ in self.conn.execute(f"DESCRIBE {table_name}").fetchall()}
+
+    @staticmethod
+    def quoted_sql(expr: str):
+        # the value as python would show it in an error message
+        return f"'''' || {expr} || ''''"
+
+    @staticmethod
+    def check_sql(expr: str, dtype: str):
+        # mirrors the CheckInt/CheckFloat/CheckDecimal/CheckCategory errors, so both load paths divert the same rows
+        # with the same reasons
+        if is_enum(dtype):
+            return (f"CASE WHEN {expr} IS NOT NULL AND TRY_CAST({expr} AS {dtype}) IS NULL "
+                    f"THEN {DuckDBUtils.quoted_sql(expr)} || ' is not a known value' END")
+        dtype = dtype.upper()
+        if dtype in INT_DATA_TYPES:
+            return (f"CASE WHEN {expr} IS NULL THEN 'cannot convert float NaN to integer' "
+                    f"WHEN NOT regexp_matches({expr}, '{INT_LITERAL_SQL}') "
+                    f"OR TRY_CAST({expr} AS {dtype}) IS NULL "
+                    f"THEN 'invalid literal for int() with base 10: ' || {DuckDBUtils.quoted_sql(expr)} END")
+        if decimal_precision(dtype) is not None:
+            return (f"CASE WHEN {expr} IS NOT NULL AND (NOT regexp_matches({expr}, '{DECIMAL_LITERAL_SQL}') "
+                    f"OR TRY_CAST({expr} AS {dtype}) IS NULL) "
+                    f"THEN 'could not convert ' || {DuckDBUtils.quoted_sql(expr)} || ' to {dtype}' END")
+        if dtype in FLOAT_DATA_TYPES:
+            return (f"CASE WHEN {expr} IS NOT NULL AND TRY_CAST({expr} AS {dtype}) IS NULL "
+                    f"THEN 'could not convert string to float: ' || {DuckDBUtils.quoted_sql(expr)} END")
+        if dtype != "VARCHAR":
+            return (f"CASE WHEN {expr} IS NOT NULL AND TRY_CAST({expr} AS {dtype}) IS NULL "
+                    f"THEN 'could not convert ' || {DuckDBUtils.quoted_sql(expr)} || ' to {dtype}' END")
+        return None
+
+    def load_csv(self, csv_path: str, table_name: str, err_table_name: str, csv_columns: list = None,
+                 column_sql: dict = None, checks: list = None, err_column_name: str = "errors",
+                 key_columns: list = None, delta_table_name: str = None):
+        # DuckDB reads the csv itself, as strings, against the target table's schema; every row is checked and cast
+        # in a single scan of the file, then split between the good and error tables without going through pandas.
+        # csv_columns renames the csv columns positionally, column_sql gives the (VARCHAR) expression for any table
+        # column that isn't simply the csv column of the same name, and checks are extra expressions that evaluate
+        # to an error string or NULL. key_columns and delta_table_name work as for load_data
+        schema = self.table_schema(table_name)
+        column_sql = column_sql or {}
+        select_clause = ",".join(f"{column_sql.get(name, name)} AS {name}" for name in schema.keys())
+        checks = list(checks or [])
+        check_names = [f"check_{i}" for i in range(len(checks))]
+        select_clause += "".join(f",{check} AS {name}" for check, name in zip(checks, check_names))
+
+        # errors are listed in the order main.py runs its processors: custom checks, then ints, then floats
+        ordered = sorted(schema.items(), key=lambda name_dtype: (name_dtype[1] not in INT_DATA_TYPES,
+                                                                  name_dtype[1] not in FLOAT_DATA_TYPES))
+        error_sql = check_names + [sql for sql in (DuckDBUtils.check_sql(name, dtype) for name, dtype in ordered)
+                                   if sql is not None]
+        errors = f"NULLIF(concat_ws(';', {', '.join(error_sql)}), '')" if len(error_sql) > 0 else "NULL"
+
+        staging_name = f"{table_name}_csv_staging"
+        start = time.perf_counter()
+        self.conn.execute(f"CREATE OR REPLACE TEMP TABLE {staging_name} AS "
+                          f"SELECT {','.join(schema.keys())}, {errors} AS {err_column_name} "
+                          f"FROM (SELECT {select_clause} FROM {DuckDBUtils.csv_source(csv_path, csv_columns)})")
+        try:
+            cast_clause = ",".join(f"CAST({name} AS {dtype}) AS {name}" for name, dtype in schema.items())
+            good_rows = f"SELECT {cast_clause} FROM {staging_name} WHERE {err_column_name} IS NULL"
+            if key_columns:
+                n_good = self.append_new_rows(self.conn.sql(good_rows), table_name, key_columns, delta_table_name)
+            else:
+                n_good = self.conn.execute(f"INSERT INTO {table_name} {good_rows}").fetchone()[0]
+            # reading and checking the csv counts towards the good rows
+            good_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            err_rows = f"SELECT * FROM {staging_name} WHERE {err_column_name} IS NOT NULL"
+            if key_columns:
+                err_rows = DuckDBUtils.new_error_rows(err_rows, table_name, err_table_name, key_columns)
+            n_err = self.conn.execute(f"INSERT INTO {err_table_name} {err_rows}").fetchone()[0]
+            if self.record_metrics:
+                # the csv's size shared out by rows, rather than another scan to measure the values
+                n_read = self.conn.execute(f"SELECT count(*) FROM {staging_name}").fetchone()[0]
+                csv_size = os.path.getsize(csv_path) if os.path.isfile(csv_path) else 0
+                row_size = csv_size / max(1, n_read)
+                self.record_load(table_name, n_good, row_size * n_good, good_seconds)
+                self.record_load(err_table_name, n_err, row_size * n_err, time.perf_counter() - start)
+        finally:
+            self.conn.execute(f"DROP TABLE {staging_name}")
+        self.notify_write(table_name, err_table_name)
@@ -0,0 +1,114 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data.pipeline import *
+from data.utils import *
+
+
+def records(data):
+    return data.replace({np.nan: None}).astype(object).to_dict("records")
+
+
+class RowOnlyChecker(ValueProcessor):
+    def __init__(self, col_name):
+        self.col_name = col_name
+
+    def __process_value__(self, row):
+        if row[self.col_name] == "b":
+            raise RuntimeError("no b")
+
+
+class TestProcessorPipeline(unittest.TestCase):
+
+    data = pd.DataFrame({"id": range(8),
+                         "latlong": ["POINT (1 2)", "POINT (3 4", "POINT (5 6)", "x",
+                                     "POINT (7 8)", "POINT (9 10)", np.nan, "POINT (11 12)"],
+                         "int_col": ["1", "a", "3", "4", "b", "6", np.nan, "8"],
+                         "float_col": ["1.1", "c", "2.2", "3.3", "4.4", "d", "5.5", "6.6"]})
+
+    @staticmethod
+    def processors():
+        return [LatLongSplitter("latlong", "lat", "long"), CheckInt("int_col"), CheckFloat("float_col")]
+
+    def serial(self, processors=None):
+        data = self.data
+        for processor in processors or self.processors():
+            data = processor.process_batch(data)
+        return data
+
+    def test_join_errors(self):
+        joined = join_errors([np.array([None, "a", "b"], dtype=object), np.array(["c", None, "d"], dtype=object)], 3)
+        self.assertEqual(list(joined), ["c", "a", "b;d"])
+
+    def test_join_errors_empty(self):
+        self.assertIsNone(join_errors([], 3))
+
+    def test_fused_matches_serial(self):
+        actual = ProcessorPipeline(self.processors(), workers=1).process_batch(self.data)
+        expected = self.serial()
+        self.assertEqual(list(actual.columns), list(expected.columns))
+        self.assertEqual(records(actual), records(expected))
+
+    def test_fused_matches_rows(self):
+        pipeline = ProcessorPipeline(self.processors(), workers=1)
+        expected = self.data.apply(pipeline.process_value, axis=1)
+        actual = pipeline.process_batch(self.data)
+        self.assertEqual(records(actual[expected.columns]), records(expected))
+
+    def test_fused_row_only_processor(self):
+        processors = [CheckInt("int_col"), RowOnlyChecker("int_col"), CheckFloat("float_col")]
+        actual = ProcessorPipeline(processors, workers=1).process_batch(self.data)
+        expected = self.serial(processors)
+        self.assertEqual(records(actual[expected.columns]), records(expected))
+
+    def test_partition_bounds(self):
+        pipeline = ProcessorPipeline([], workers=3, min_partition_rows=2)
+        self.assertEqual(pipeline.partition_bounds(8), [(0, 2), (2, 5), (5, 8)])
+        self.assertEqual(pipeline.partition_bounds(3), [(0, 3)])
+
+    def test_partition_bounds_use_every_worker(self):
+        # a streamed batch is split across all the workers, not just as many as fit whole default partitions
+        bounds = ProcessorPipeline([], workers=8).partition_bounds(100_000)
+        self.assertEqual(len(bounds), 8)
+        self.assertEqual(bounds[-1], (87_500, 100_000))
+
+    def test_pool_not_forked(self):
+        self.assertIn(ProcessorPipeline([]).mp_context.get_start_method(), ["forkserver", "spawn"])
+
+    def test_parallel_matches_serial(self):
+        with ProcessorPipeline(self.processors(), workers=3, min_partition_rows=2) as pipeline:
+            actual = pipeline.process_batch(self.data)
+        expected = self.serial()
+        self.assertEqual(list(actual.index), list(expected.index))
+        self.assertEqual(records(actual[expected.columns]), records(expected))
+
+    def test_metrics(self):
+        pipeline = ProcessorPipeline(self.processors(), workers=1)
+        pipeline.process_batch(self.data)
+        pipeline.process_batch(self.data)
+        metrics = {m.name: m for m in pipeline.collect_metrics()}
+        self.assertEqual(list(metrics), ["LatLongSplitter(latlong)", "CheckInt(int_col)", "CheckFloat(float_col)"])
+        self.assertEqual([(m.rows, m.batches) for m in metrics.values()], [(16, 2)] * 3)
+        self.assertEqual(metrics["LatLongSplitter(latlong)"].errors,
+                         {("latlong", "InvalidLatLongFormatError"): 4})
+        self.assertEqual(metrics["CheckInt(int_col)"].errors, {("int_col", "ValueError"): 6})
+        self.assertEqual(metrics["CheckFloat(float_col)"].error_rate, 0.25)
+
+    def test_metrics_row_only_processor(self):
+        processors = [CheckInt("int_col"), RowOnlyChecker("int_col")]
+        ProcessorPipeline(processors, workers=1).process_batch(self.data)
+        self.assertEqual(processors[1].metrics.errors, {("", "RuntimeError"): 1})
+        self.assertEqual(processors[1].metrics.rows, 8)
+
+    def test_parallel_metrics(self):
+        with ProcessorPipeline(self.processors(), workers=3, min_partition_rows=2) as pipeline:
+            pipeline.process_batch(self.data)
+            pipeline.process_batch(self.data)
+        serial = ProcessorPipeline(self.processors(), workers=1)
+        serial.process_batch(self.data)
+        serial.process_batch(self.data)
+        self.assertEqual([(m.name, m.rows, m.errors) for m in pipeline.collect_metrics()],
+                         [(m.name, m.rows, m.errors) for m in serial.collect_metrics()])
+        self.assertEqual(pipeline.collect_metrics()[0].batches, 6)
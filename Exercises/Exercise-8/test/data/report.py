@@ -0,0 +1,96 @@
+import json
+import os
+import tempfile
+import unittest
+
+import duckdb
+import pandas as pd
+
+from data.pipeline import *
+from data.report import *
+from data.streaming import StageStats
+from data.utils import *
+from db.utils import DuckDBUtils
+
+
+class TestRunReport(unittest.TestCase):
+
+    data = pd.DataFrame({"latlong": ["POINT (1 2)", "x", "POINT (3 4)", "POINT (5 6)"],
+                         "int_col": ["1", "a", "3", "b"]})
+
+    def run_load(self, data=None, load_mode=None):
+        data = self.data if data is None else data
+        loader = DuckDBUtils(":memory:")
+        loader.create_table("my_table", {"latlong": "VARCHAR", "int_col": "INTEGER", "lat": "DOUBLE",
+                                         "long": "DOUBLE"})
+        loader.create_table("my_err_table", {"latlong": "VARCHAR", "int_col": "VARCHAR", "lat": "VARCHAR",
+                                             "long": "VARCHAR", "errors": "VARCHAR"})
+        pipeline = ProcessorPipeline([LatLongSplitter("latlong", "lat", "long"), CheckInt("int_col")], workers=1)
+        loader.load_data(pipeline.process_batch(data), "my_table", "my_err_table")
+        stages = {"read": StageStats("read"), "transform": StageStats("transform")}
+        stages["read"].record(len(data), 0.5)
+        report = RunReport(load_mode=load_mode)
+        report.add_processors([pipeline])
+        report.add_stages(stages)
+        report.add_loads(loader, "my_table", "my_err_table")
+        return report.finish()
+
+    def test_report(self):
+        report = self.run_load().to_json()
+        self.assertEqual(report["processors"]["CheckInt(int_col)"]["errors"], {"int_col": {"ValueError": 2}})
+        self.assertEqual(report["processors"]["LatLongSplitter(latlong)"]["error_count"], 1)
+        self.assertEqual((report["loads"]["my_table"]["rows"], report["loads"]["my_err_table"]["rows"]), (2, 2))
+        self.assertEqual(report["error_rate"], 0.5)
+        # a stage that never ran has no rows/s
+        self.assertIsNone(report["stages"]["transform"]["rows_per_second"])
+
+    def test_save_load(self):
+        report = self.run_load()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "report.json")
+            self.assertIsNone(RunReport.load(path))
+            report.save(path)
+            self.assertEqual(RunReport.load(path), json.loads(json.dumps(report.to_json())))
+            self.assertEqual(os.listdir(tmp_dir), ["report.json"])
+
+    def test_write_table(self):
+        conn = duckdb.connect()
+        first, second = self.run_load(), self.run_load()
+        first.write_table(conn, "metrics")
+        second.write_table(conn, "metrics")
+        self.assertEqual(conn.sql("SELECT count(DISTINCT run_id) FROM metrics").fetchone()[0], 2)
+        self.assertEqual(conn.sql("SELECT name, metric, value FROM metrics WHERE kind = 'error' AND run_id = ? "
+                                  "ORDER BY name", params=[first.run_id]).fetchall(),
+                         [("CheckInt(int_col)", "int_col:ValueError", 2.0),
+                          ("LatLongSplitter(latlong)", "latlong:InvalidLatLongFormatError", 1.0)])
+        self.assertEqual(conn.sql("SELECT value FROM metrics WHERE kind = 'load' AND name = 'my_err_table' "
+                                  "AND metric = 'rows'").fetchall(), [(2.0,), (2.0,)])
+
+    def test_regressions(self):
+        previous = self.run_load().to_json()
+        # timings this small are noise
+        for entry in previous["processors"].values():
+            entry["rows_per_second"] = 0
+        current = self.run_load(pd.DataFrame({"latlong": ["x"] * 4, "int_col": ["1"] * 4}))
+        self.assertEqual(current.regressions(None), [])
+        self.assertEqual(current.regressions(previous, min_rows=1),
+                         ["processor LatLongSplitter(latlong): error rate 100.00%, up from 25.00%",
+                          "run: error rate 100.00%, up from 50.00%"])
+        previous["stages"]["read"]["rows_per_second"] = 100
+        self.assertIn("stage read: 8 rows/s, down from 100", current.regressions(previous, min_rows=1))
+        self.assertEqual(len(current.regressions(previous)), 1)
+
+    def test_regressions_same_load_mode_only(self):
+        previous = self.run_load(load_mode="duckdb").to_json()
+        current = self.run_load(pd.DataFrame({"latlong": ["x"] * 4, "int_col": ["1"] * 4}), load_mode="streaming")
+        self.assertEqual(current.regressions(previous, min_rows=1), [])
+        previous["load_mode"] = "streaming"
+        self.assertIn("run: error rate 100.00%, up from 50.00%", current.regressions(previous, min_rows=1))
+
+    def test_write_table_adds_load_mode(self):
+        # a metrics table from before load_mode was recorded
+        conn = duckdb.connect()
+        conn.execute("CREATE TABLE metrics (run_id VARCHAR, started_at TIMESTAMP, kind VARCHAR, name VARCHAR, "
+                     "metric VARCHAR, value DOUBLE)")
+        self.run_load(load_mode="duckdb").write_table(conn, "metrics")
+        self.assertEqual(conn.sql("SELECT DISTINCT load_mode FROM metrics").fetchall(), [("duckdb",)])
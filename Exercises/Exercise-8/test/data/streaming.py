@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from data.streaming import *
+from data.utils import *
+
+
+class RecordingLoader:
+    def __init__(self, fail_after: int = None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    def load_data(self, data, table_name, err_table_name):
+        if self.fail_after is not None and len(self.batches) >= self.fail_after:
+            raise RuntimeError("load failed")
+        self.batches.append(data)
+
+
+class FailingProcessor(ValueProcessor):
+    def __process_value__(self, row):
+        pass
+
+    def __process_batch__(self, data):
+        raise RuntimeError("transform failed")
+
+
+class TestStreamingIngest(unittest.TestCase):
+
+    data = pd.DataFrame({"id": range(10),
+                         "latlong": ["POINT (1 2)", "POINT (3 4", "POINT (5 6)", "x", "POINT (7 8)",
+                                     "POINT (9 10)", np.nan, "POINT (11 12)", "POINT (13 14)", "POINT (15 16)"],
+                         "int_col": ["1", "2", "a", "4", "5", "6", "7", "8", "9", "b"]})
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.csv_path = os.path.join(self.tmp_dir.name, "data.csv")
+        self.data.to_csv(self.csv_path, index=False)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @staticmethod
+    def processors():
+        return [LatLongSplitter("latlong", "lat", "long"), CheckInt("int_col")]
+
+    def run_ingest(self, loader, processors=None, batch_size=3, prefetch=0):
+        ingest = StreamingIngest(processors or self.processors(), loader, "good", "bad",
+                                 batch_size=batch_size, prefetch=prefetch, drop_columns=["latlong"])
+        return ingest.run(self.csv_path)
+
+    def expected(self):
+        data = pd.read_csv(self.csv_path)
+        for processor in self.processors():
+            data = processor.process_batch(data)
+        return data.drop(columns=["latlong"])
+
+    def assert_matches_whole_file(self, loader):
+        # dtypes are inferred per batch, so compare the values as the error table would store them
+        actual = pd.concat(loader.batches, ignore_index=True)
+        expected = self.expected()
+        self.assertEqual(actual[expected.columns].astype(str).to_dict("records"),
+                         expected.astype(str).to_dict("records"))
+
+    def test_batches_bounded(self):
+        loader = RecordingLoader()
+        self.run_ingest(loader, batch_size=3)
+        self.assertEqual([len(batch) for batch in loader.batches], [3, 3, 3, 1])
+        self.assertTrue(all("latlong" not in batch.columns for batch in loader.batches))
+
+    def test_serial_matches_whole_file(self):
+        loader = RecordingLoader()
+        self.run_ingest(loader, prefetch=0)
+        self.assert_matches_whole_file(loader)
+
+    def test_overlapped_matches_whole_file(self):
+        loader = RecordingLoader()
+        self.run_ingest(loader, prefetch=2)
+        self.assert_matches_whole_file(loader)
+
+    def test_parallel_pipeline_overlapped(self):
+        # the pool is first started from the transform thread while the reader thread runs
+        from data.pipeline import ProcessorPipeline
+        loader = RecordingLoader()
+        with ProcessorPipeline(self.processors(), workers=2, min_partition_rows=2) as pipeline:
+            self.run_ingest(loader, processors=[pipeline], batch_size=4, prefetch=2)
+        self.assert_matches_whole_file(loader)
+
+    def test_stats(self):
+        stats = self.run_ingest(RecordingLoader(), prefetch=1)
+        self.assertEqual(list(stats.keys()), StreamingIngest.stage_names)
+        self.assertEqual([stage.rows for stage in stats.values()], [10, 10, 10])
+        self.assertEqual([stage.batches for stage in stats.values()], [4, 4, 4])
+
+    def test_transform_error_propagates(self):
+        with self.assertRaises(RuntimeError):
+            self.run_ingest(RecordingLoader(), processors=[FailingProcessor()], prefetch=2)
+
+    def test_load_error_propagates(self):
+        with self.assertRaises(RuntimeError):
+            self.run_ingest(RecordingLoader(fail_after=1), prefetch=2)
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(ValueError):
+            StreamingIngest([], RecordingLoader(), "good", "bad", batch_size=0)
+
+    def test_duckdb_load(self):
+        from db.utils import DuckDBUtils
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("good", {"id": "INTEGER", "int_col": "INTEGER", "lat": "FLOAT", "long": "FLOAT"})
+        db_conn.create_table("bad", {"id": "VARCHAR", "int_col": "VARCHAR", "lat": "VARCHAR", "long": "VARCHAR",
+                                     "errors": "VARCHAR"})
+        self.run_ingest(db_conn, prefetch=2)
+        self.assertEqual(db_conn.conn.sql("SELECT count(*) FROM good").fetchone()[0], 6)
+        self.assertEqual(db_conn.conn.sql("SELECT count(*) FROM bad").fetchone()[0], 4)
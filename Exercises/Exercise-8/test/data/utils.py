@@ -26,6 +26,13 @@ def run_check_float_test(input_row, expected):
     dict_compare(float_checker.process_value(input_row), expected)
 
 
+def run_batch_test(processor, data):
+    # the batch path should give the same values and error strings as applying the row path
+    expected = data.apply(processor.process_value, axis=1)
+    actual = processor.process_batch(data)
+    dict_compare(actual[expected.columns], expected)
+
+
 class TestChecker(ValueProcessor):
     def __init__(self, should_fail: bool):
         self.should_fail = should_fail
@@ -103,6 +110,15 @@ class TestDataUtils(unittest.TestCase):
         expected = pd.Series([1, lat_long_string, float(lat), float(long)], ["id", "latlong", "lat", "long"])
         run_split_lat_long_test(row, " ", expected)
 
+    def test_split_lat_long_point_long_first(self):
+        lat = "47.61"
+        long = "-122.33"
+        lat_long_string = f"POINT ({long} {lat})"
+        row = pd.Series([1, lat_long_string], ["id", "latlong"])
+        expected = pd.Series([1, lat_long_string, float(lat), float(long)], ["id", "latlong", "lat", "long"])
+        latlong_processor = LatLongSplitter("latlong", "lat", "long", " ", long_first=True)
+        dict_compare(latlong_processor.process_value(row), expected)
+
     def test_split_lat_long_invalid_number(self):
         lat = "0.002a"
         long = "44.201"
@@ -168,3 +184,141 @@ class TestDataUtils(unittest.TestCase):
         row = pd.Series([1, float_val], ["id", "float_col"])
         expected = pd.Series([1, float_val, err_val], ["id", "float_col", "errors"])
         run_check_float_test(row, expected)
+
+    def test_abstract_batch_falls_back_to_rows(self):
+        data = pd.DataFrame({"id": [1, 2], "val": ["a", "b"]})
+        checker = TestChecker(should_fail=True)
+        assert not checker.has_batch_mode
+        assert CheckInt("val").has_batch_mode
+        result = checker.process_batch(data)
+        assert result["errors"].tolist() == ["uh-oh", "uh-oh"]
+
+    def test_merge_errors_appends(self):
+        data = pd.DataFrame({"id": [1, 2, 3], "errors": ["o noes!", np.nan, np.nan]})
+        result = ValueProcessor.merge_errors(data, [None, "uh-oh", None])
+        dict_compare(result["errors"], pd.Series(["o noes!", "uh-oh", np.nan], name="errors"))
+
+    def test_merge_errors_appends_prev_err(self):
+        data = pd.DataFrame({"id": [1, 2], "errors": ["o noes!", np.nan]})
+        result = ValueProcessor.merge_errors(data, ["uh-oh", None])
+        dict_compare(result["errors"], pd.Series(["o noes!;uh-oh", np.nan], name="errors"))
+
+    def test_merge_errors_no_errors_no_column(self):
+        data = pd.DataFrame({"id": [1, 2]})
+        assert "errors" not in ValueProcessor.merge_errors(data, [None, None]).columns
+
+    def test_split_lat_long_batch_matches_rows(self):
+        lat_longs = ["POINT (-120.56916 46.58514)", " 0.002  44.201", "POINT 0.002 44.201)", "a)b(1 2)",
+                     "POINT (0.002a 44.201)", "POINT (0.002 44.201a)", "POINT (0.00244.201)", "1 2 3",
+                     "POINT (1e5 -.5)", "POINT (1_0 2)", np.nan, None, ""]
+        data = pd.DataFrame({"id": range(len(lat_longs)), "latlong": lat_longs})
+        run_batch_test(LatLongSplitter("latlong", "lat", "long", " "), data)
+
+    def test_split_lat_long_batch_comma(self):
+        data = pd.DataFrame({"id": [1, 2, 3], "latlong": ["0.002,44.201", "0.002 , 44.201", "0.002, 44, 201"]})
+        run_batch_test(LatLongSplitter("latlong", "lat", "long", ","), data)
+
+    def test_split_lat_long_batch_all_nan(self):
+        data = pd.DataFrame({"id": [1, 2], "latlong": [np.nan, np.nan]})
+        run_batch_test(LatLongSplitter("latlong", "lat", "long", " "), data)
+
+    def test_check_int_batch_matches_rows(self):
+        data = pd.DataFrame({"id": range(8), "int_col": ["1", "a", " 2 ", np.nan, "1.0", "1_000", "-5", None]})
+        run_batch_test(CheckInt("int_col"), data)
+
+    def test_check_int_batch_float_column(self):
+        data = pd.DataFrame({"id": [1, 2, 3], "int_col": [1.0, np.nan, np.inf]})
+        run_batch_test(CheckInt("int_col"), data)
+
+    def test_check_int_batch_int_column(self):
+        data = pd.DataFrame({"id": [1, 2], "int_col": [1, 2]})
+        assert "errors" not in CheckInt("int_col").process_batch(data).columns
+
+    def test_check_float_batch_matches_rows(self):
+        data = pd.DataFrame({"id": range(8), "float_col": ["1.1", "a", "1e5", np.nan, "inf", ".5", "5.", None]})
+        run_batch_test(CheckFloat("float_col"), data)
+
+    def test_batch_chain_matches_rows(self):
+        data = pd.DataFrame({"id": [1, 2, 3],
+                             "latlong": ["POINT (1 2)", "POINT (1 2", "POINT (1 2)"],
+                             "int_col": ["1", "a", "b"],
+                             "float_col": ["1.1", "c", "2.2"]})
+        processors = [LatLongSplitter("latlong", "lat", "long"), CheckInt("int_col"), CheckFloat("float_col")]
+        by_row = data
+        by_batch = data
+        for processor in processors:
+            by_row = by_row.apply(processor.process_value, axis=1)
+            by_batch = processor.process_batch(by_batch)
+        dict_compare(by_batch[by_row.columns], by_row)
+        assert by_batch["errors"].tolist()[1].count(";") == 2
+
+    def test_split_lat_long_sql_matches_batch(self):
+        import duckdb
+        lat_longs = ["POINT (-120.56916 46.58514)", " 0.002  44.201", "POINT 0.002 44.201)", "a)b(1 2)",
+                     "POINT (0.002a 44.201)", "POINT (0.002 44.201a)", "POINT (0.00244.201)", "1 2 3",
+                     "POINT (1e5 -.5)", "POINT (1\t2)", None]
+        data = pd.DataFrame({"latlong": lat_longs})
+        processor = LatLongSplitter("latlong", "lat", "long", " ")
+        lat_sql, long_sql, error_sql = processor.sql_columns()
+        actual = duckdb.sql(f"SELECT TRY_CAST({lat_sql} AS DOUBLE) AS lat, TRY_CAST({long_sql} AS DOUBLE) AS long, "
+                            f"{error_sql} AS errors FROM data").df()
+        expected = processor.process_batch(data)
+        # rows with errors are diverted whole, so only their error strings have to match
+        failed = expected["errors"].notna()
+        dict_compare(actual["errors"], expected["errors"])
+        dict_compare(actual[~failed][["lat", "long"]], expected[~failed][["lat", "long"]])
+
+    def test_split_lat_long_long_first_all_paths(self):
+        import duckdb
+        lat_longs = ["POINT (-122.33 47.61)", "POINT (-122.3a 47.61)", "POINT (-122.33 47.6a)", None]
+        data = pd.DataFrame({"id": range(len(lat_longs)), "latlong": lat_longs})
+        processor = LatLongSplitter("latlong", "lat", "long", " ", long_first=True)
+        run_batch_test(processor, data)
+        by_batch = processor.process_batch(data)
+        assert (by_batch["lat"][0], by_batch["long"][0]) == (47.61, -122.33)
+        lat_sql, long_sql, _ = processor.sql_columns()
+        assert duckdb.sql(f"SELECT CAST({lat_sql} AS DOUBLE), CAST({long_sql} AS DOUBLE) FROM data LIMIT 1"
+                          ).fetchall() == [(47.61, -122.33)]
+
+    def test_process_batch_metrics(self):
+        checker = CheckInt("int_col")
+        checker.process_batch(pd.DataFrame({"int_col": ["1", "a", None]}))
+        checker.process_batch(pd.DataFrame({"int_col": ["2"]}))
+        assert (checker.metrics.name, checker.metrics.rows, checker.metrics.batches) == ("CheckInt(int_col)", 4, 2)
+        assert checker.metrics.errors == {("int_col", "ValueError"): 1, ("int_col", "TypeError"): 1}
+        assert checker.metrics.to_json()["errors"] == {"int_col": {"TypeError": 1, "ValueError": 1}}
+
+    def test_process_batch_no_metrics(self):
+        checker = CheckFloat("float_col")
+        checker.record_metrics = False
+        checker.process_batch(pd.DataFrame({"float_col": ["a"]}))
+        assert (checker.metrics.rows, checker.metrics.error_count) == (0, 0)
+
+    def test_check_decimal_batch_matches_rows(self):
+        data = pd.DataFrame({"id": range(10), "dec_col": ["1.5", "a", "999.9994", "999.9995", "-999.9995", "1e2",
+                                                          "1_0", np.nan, " 2 ", "inf"]})
+        run_batch_test(CheckDecimal("dec_col", 6, 3), data)
+        result = CheckDecimal("dec_col", 6, 3).process_batch(data)
+        assert result["errors"].dropna().tolist() == ["could not convert 'a' to DECIMAL(6,3)",
+                                                      "could not convert '999.9995' to DECIMAL(6,3)",
+                                                      "could not convert '-999.9995' to DECIMAL(6,3)",
+                                                      "could not convert '1_0' to DECIMAL(6,3)",
+                                                      "could not convert 'inf' to DECIMAL(6,3)"]
+
+    def test_check_decimal_batch_float_column(self):
+        data = pd.DataFrame({"id": [1, 2, 3], "dec_col": [47.6, np.nan, 1000.0]})
+        run_batch_test(CheckDecimal("dec_col", 5, 2), data)
+
+    def test_check_category_batch_matches_rows(self):
+        data = pd.DataFrame({"id": range(5), "cat_col": ["King", "Yakima", "Kitsap", np.nan, "King"]})
+        expected = data.apply(CheckCategory("cat_col", ["King", "Yakima"]).process_value, axis=1)
+        actual = CheckCategory("cat_col", ["King", "Yakima"]).process_batch(data.copy())
+        # a categorical's missing values don't replace with None
+        dict_compare(actual.astype(object)[expected.columns], expected)
+
+    def test_check_category_batch_categorical(self):
+        data = pd.DataFrame({"cat_col": pd.Series(["Kitsap", "King", None], dtype="category")})
+        result = CheckCategory("cat_col", ["King", "Yakima"]).process_batch(data)
+        assert result["errors"].fillna("").tolist() == ["'Kitsap' is not a known value", "", ""]
+        # the dictionary is the same whatever the batch held, with the unknown values after it
+        assert result["cat_col"].cat.categories.tolist() == ["King", "Yakima", "Kitsap"]
@@ -1,5 +1,6 @@
 import unittest
 import duckdb
+import numpy as np
 import pandas as pd
 
 from db.analytics import *
@@ -28,7 +29,10 @@ class TestEVAnalytics(unittest.TestCase):
         }
         db_conn.create_table(self.table_name, schema)
         db_conn.load_data(self.data_no_ties, self.table_name, "")
+        self.db_conn = db_conn
         self.ev_analytics = EVAnalytics(db_conn.conn, self.table_name)
+        self.cached_analytics = EVAnalytics(db_conn.conn, self.table_name, cache=True)
+        db_conn.add_write_listener(self.cached_analytics.invalidate)
 
     @staticmethod
     def get_expected(data, columns, sort_by):
@@ -114,3 +118,310 @@ class TestEVAnalytics(unittest.TestCase):
                                           ["country", "city"]),
             expected
         )
+
+    def test_cached_group_and_count(self):
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.cached_analytics.group_and_count(["country", "city"]),
+                                          ["country", "city"]),
+            TestEVAnalytics.format_result(self.ev_analytics.group_and_count(["country", "city"]),
+                                          ["country", "city"])
+        )
+
+    def test_cache_hit(self):
+        self.cached_analytics.group_and_count(["country", "city"])
+        self.cached_analytics.group_and_count(["City", "Country"])
+        self.assertEqual(self.cached_analytics.cache_stats, {"hits": 1, "misses": 1, "rollups": 0, "cached": 1})
+
+    def test_cache_rollup(self):
+        self.cached_analytics.materialize([["country"], ["country", "city"]])
+        self.assertEqual(self.cached_analytics.cache_stats, {"hits": 0, "misses": 2, "rollups": 1, "cached": 2})
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.cached_analytics.group_and_count(["country"]), ["country"]),
+            TestEVAnalytics.get_expected([["UK", 5], ["France", 3]],
+                                         ["country", self.ev_analytics.count_col_name], ["country"])
+        )
+
+    def test_cached_rank_and_top_n(self):
+        count_data = self.cached_analytics.group_and_count(["country", "city"])
+        ranked_data = self.cached_analytics.rank_by_count(count_data, ["country"])
+        expected = TestEVAnalytics.get_expected(
+            [["UK", "London", 3, 1],
+             ["France", "Paris", 2, 1]],
+            ["country", "city", self.ev_analytics.count_col_name, self.ev_analytics.rank_col_name],
+            ["country", "city"])
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.cached_analytics.top_n(ranked_data, 1), ["country", "city"]),
+            expected
+        )
+
+    def test_cache_invalidated_on_load(self):
+        self.cached_analytics.group_and_count(["country"])
+        self.db_conn.load_data(pd.DataFrame(data=[['Spain', 'Madrid', 'Prado']], columns=['country', 'city', 'museum']),
+                               self.table_name, "")
+        self.assertEqual(self.cached_analytics.cache_stats["cached"], 0)
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.cached_analytics.group_and_count(["country"]), ["country"]),
+            TestEVAnalytics.get_expected([["UK", 5], ["France", 3], ["Spain", 1]],
+                                         ["country", self.ev_analytics.count_col_name], ["country"])
+        )
+
+    def test_cache_ignores_other_tables(self):
+        self.cached_analytics.group_and_count(["country"])
+        self.cached_analytics.invalidate("some_other_table")
+        self.assertEqual(self.cached_analytics.cache_stats["cached"], 1)
+
+    def append(self, rows):
+        data = pd.DataFrame(data=rows, columns=['country', 'city', 'museum'])
+        self.db_conn.load_data(data, self.table_name, "", key_columns=["museum"])
+        self.ev_analytics.apply_delta(DuckDBUtils.delta_table(self.table_name))
+
+    def test_maintained_counts_apply_delta(self):
+        self.ev_analytics.maintain_counts(["country", "city"])
+        self.append([['Spain', 'Madrid', 'Prado'], ['UK', 'Edinburgh', 'Royal Museum'], ['UK', 'London', 'Science']])
+        expected = TestEVAnalytics.get_expected(
+            [["UK", "London", 3],
+             ["UK", "Edinburgh", 3],
+             ["France", "Paris", 2],
+             ["France", "Marseilles", 1],
+             ["Spain", "Madrid", 1]],
+            ["country", "city", self.ev_analytics.count_col_name],
+            ["country", "city"])
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.ev_analytics.group_and_count(["country", "city"]), ["country", "city"]),
+            expected
+        )
+
+    def test_apply_delta_drops_delta(self):
+        self.ev_analytics.maintain_counts(["country"])
+        self.append([['Spain', 'Madrid', 'Prado']])
+        self.assertFalse(self.ev_analytics.table_exists(DuckDBUtils.delta_table(self.table_name)))
+        # nothing left to apply, so a second call changes nothing
+        self.ev_analytics.apply_delta(DuckDBUtils.delta_table(self.table_name))
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.ev_analytics.group_and_count(["country"]), ["country"]),
+            TestEVAnalytics.get_expected([["UK", 5], ["France", 3], ["Spain", 1]],
+                                         ["country", self.ev_analytics.count_col_name], ["country"]))
+
+    def test_maintained_counts_after_rebuild(self):
+        # full, incremental, full, incremental: the rebuild starts the live counts and any delta over from its rows
+        schema = {"country": "VARCHAR", "city": "VARCHAR", "museum": "VARCHAR"}
+        rows = [["UK", "London", f"museum {i}"] for i in range(10)]
+
+        def run(data, incremental):
+            self.db_conn.create_table(self.table_name, schema, drop_if_exists=not incremental,
+                                      if_not_exists=incremental)
+            analytics = EVAnalytics(self.db_conn.conn, self.table_name)
+            if incremental:
+                analytics.maintain_counts(["country"])
+            self.db_conn.load_data(pd.DataFrame(data, columns=list(schema)), self.table_name, "",
+                                   key_columns=["museum"] if incremental else None)
+            if incremental:
+                analytics.apply_delta(DuckDBUtils.delta_table(self.table_name))
+            return analytics
+
+        run(rows[:5], False)
+        run(rows[5:], True)
+        # a delta left behind by an incremental run that died before applying it
+        self.db_conn.conn.execute(f"CREATE TABLE {DuckDBUtils.delta_table(self.table_name)} AS "
+                                  f"SELECT * FROM {self.table_name}")
+        run(rows[:4], False)
+        analytics = run(rows[2:7], True)
+        counts_table = analytics.maintain_counts(["country"])
+        self.assertEqual(self.db_conn.conn.sql(f"SELECT sum(count) FROM {counts_table}").fetchone()[0], 7)
+        self.assertEqual(self.db_conn.conn.sql(f"SELECT count(*) FROM {self.table_name}").fetchone()[0], 7)
+
+    def test_maintained_ranks_apply_delta(self):
+        self.ev_analytics.maintain_ranks(["country", "city"], ["country"])
+        self.append([['UK', 'Edinburgh', 'Royal Museum'], ['UK', 'Edinburgh', 'Surgeons Hall']])
+        expected = TestEVAnalytics.get_expected(
+            [["UK", "London", 3, 2],
+             ["UK", "Edinburgh", 4, 1],
+             ["France", "Paris", 2, 1],
+             ["France", "Marseilles", 1, 2]],
+            ["country", "city", self.ev_analytics.count_col_name, self.ev_analytics.rank_col_name],
+            ["country", "city"])
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.ev_analytics.ranked_counts(["country", "city"], ["country"]),
+                                          ["country", "city"]),
+            expected
+        )
+
+    def test_maintained_ranks_no_partition(self):
+        self.ev_analytics.maintain_ranks(["country"], [])
+        self.append([['Spain', 'Madrid', 'Prado'], ['Spain', 'Madrid', 'Reina Sofia'],
+                     ['Spain', 'Madrid', 'Thyssen'], ['Spain', 'Bilbao', 'Guggenheim']])
+        expected = TestEVAnalytics.get_expected(
+            [["UK", 5, 1],
+             ["Spain", 4, 2],
+             ["France", 3, 3]],
+            ["country", self.ev_analytics.count_col_name, self.ev_analytics.rank_col_name],
+            ["country"])
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.ev_analytics.ranked_counts(["country"], []), ["country"]),
+            expected
+        )
+
+    def test_maintained_counts_reused(self):
+        counts_table = self.ev_analytics.maintain_counts(["country"])
+        self.db_conn.conn.execute(f"UPDATE {counts_table} SET count = 100")
+        self.assertEqual(EVAnalytics(self.db_conn.conn, self.table_name).maintain_counts(["country"]), counts_table)
+        self.assertEqual(self.db_conn.conn.sql(f"SELECT DISTINCT count FROM {counts_table}").fetchall(), [(100,)])
+
+    def test_ranked_counts_unmaintained(self):
+        expected = TestEVAnalytics.format_result(
+            self.ev_analytics.rank_by_count(self.ev_analytics.group_and_count(["country", "city"]), ["country"]),
+            ["country", "city"])
+        self.assertEqual(
+            TestEVAnalytics.format_result(self.ev_analytics.ranked_counts(["country", "city"], ["country"]),
+                                          ["country", "city"]),
+            expected
+        )
+
+
+def haversine_km(lat1, long1, lat2, long2):
+    lat1, long1, lat2, long2 = map(np.radians, (lat1, long1, lat2, long2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((long2 - long1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+
+class TestEVAnalyticsSpatial(unittest.TestCase):
+
+    table_name = "vehicles"
+    schema = {"id": "INTEGER", "ev_type": "VARCHAR", "lat": "DOUBLE", "long": "DOUBLE"}
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 2000
+        # around Seattle, a few over the antimeridian and one without a location
+        data = pd.DataFrame({"id": range(n_rows), "ev_type": rng.choice(["BEV", "PHEV"], n_rows),
+                             "lat": 47.61 + rng.uniform(-0.5, 0.5, n_rows),
+                             "long": -122.33 + rng.uniform(-0.5, 0.5, n_rows)})
+        data.loc[:9, "lat"] = rng.uniform(-0.05, 0.05, 10)
+        data.loc[:9, "long"] = np.where(np.arange(10) % 2 == 0, 179.99, -179.99)
+        data.loc[10, ["lat", "long"]] = np.nan
+        self.data = data
+        db_conn = DuckDBUtils(":memory:")
+        db_conn.create_table(self.table_name, self.schema)
+        db_conn.load_data(data, self.table_name, "")
+        self.db_conn = db_conn
+        self.analytics = EVAnalytics(db_conn.conn, self.table_name)
+        db_conn.add_write_listener(self.analytics.invalidate)
+        self.analytics.build_spatial_index("lat", "long", cell_degrees=0.01)
+
+    def brute_force(self, lat, long, data=None):
+        data = self.data if data is None else data
+        data = data.dropna(subset=["lat"]).copy()
+        data["distance_km"] = haversine_km(data["lat"].to_numpy(), data["long"].to_numpy(), lat, long)
+        return data
+
+    def test_within_radius(self):
+        for lat, long, km in [(47.61, -122.33, 5), (47.2, -121.9, 20), (47.61, -122.33, 500)]:
+            expected = self.brute_force(lat, long)
+            expected = sorted(expected[expected["distance_km"] <= km]["id"].tolist())
+            actual = sorted(row[0] for row in self.analytics.within_radius(lat, long, km).select("id").fetchall())
+            self.assertEqual(actual, expected)
+            self.assertGreater(len(actual), 0)
+
+    def test_within_radius_antimeridian(self):
+        actual = self.analytics.within_radius(0, 179.995, 15).select("id").fetchall()
+        self.assertEqual(sorted(row[0] for row in actual), list(range(10)))
+
+    def test_within_radius_where(self):
+        expected = self.brute_force(47.61, -122.33)
+        expected = expected[(expected["distance_km"] <= 10) & (expected["ev_type"] == "BEV")]
+        actual = self.analytics.within_radius(47.61, -122.33, 10, where="ev_type = 'BEV'").select("id").fetchall()
+        self.assertEqual(sorted(row[0] for row in actual), sorted(expected["id"].tolist()))
+
+    def test_counts_per_cell(self):
+        counts = self.analytics.counts_per_cell().df()
+        self.assertEqual(counts[EVAnalytics.count_col_name].sum(), len(self.data) - 1)
+        # every point falls in the cell whose south west corner is within a cell of it
+        corners = counts.set_index("cell")[["cell_lat", "cell_long"]]
+        cells = self.db_conn.conn.sql(f"SELECT cell, lat, long FROM {self.analytics.spatial_table_name}").df()
+        offsets = cells[["lat", "long"]].to_numpy() - corners.loc[cells["cell"]].to_numpy()
+        self.assertTrue(((offsets > -1e-9) & (offsets < 0.01 + 1e-9)).all())
+
+    def test_counts_per_cell_box(self):
+        counts = self.analytics.counts_per_cell(47.5, -122.4, 47.7, -122.2).df()
+        located = self.data.dropna(subset=["lat"])
+        in_cells = located[(np.floor((located["lat"] + 90) / 0.01) >= np.floor((47.5 + 90) / 0.01)) &
+                           (np.floor((located["lat"] + 90) / 0.01) <= np.floor((47.7 + 90) / 0.01)) &
+                           (np.floor((located["long"] + 180) / 0.01) >= np.floor((-122.4 + 180) / 0.01)) &
+                           (np.floor((located["long"] + 180) / 0.01) <= np.floor((-122.2 + 180) / 0.01))]
+        self.assertEqual(counts[EVAnalytics.count_col_name].sum(), len(in_cells))
+        self.assertTrue(((counts["cell_lat"] > 47.49) & (counts["cell_lat"] < 47.71)).all())
+
+    def test_nearest(self):
+        expected = self.brute_force(47.61, -122.33)
+        expected = expected[expected["ev_type"] == "BEV"].sort_values("distance_km")["id"].head(7).tolist()
+        actual = self.analytics.nearest(47.61, -122.33, 7, where="ev_type = 'BEV'").select("id").fetchall()
+        self.assertEqual([row[0] for row in actual], expected)
+
+    def test_nearest_across_antimeridian(self):
+        actual = self.analytics.nearest(0, 179.99, 12).select("id").fetchall()
+        self.assertEqual(sorted(row[0] for row in actual[:10]), list(range(10)))
+
+    def test_nearest_fewer_than_k(self):
+        self.assertEqual(len(self.analytics.nearest(47.61, -122.33, 5000).fetchall()), len(self.data) - 1)
+
+    def test_rebuilt_after_write(self):
+        self.db_conn.load_data(pd.DataFrame({"id": [5000], "ev_type": ["BEV"], "lat": [47.61], "long": [-122.33]}),
+                               self.table_name, "")
+        self.assertTrue(self.analytics.spatial_stale)
+        actual = self.analytics.nearest(47.61, -122.33, 1).select("id").fetchall()
+        self.assertEqual(actual, [(5000,)])
+        self.assertFalse(self.analytics.spatial_stale)
+
+    def test_no_spatial_index_error(self):
+        with self.assertRaises(ValueError):
+            EVAnalytics(self.db_conn.conn, self.table_name).within_radius(47.61, -122.33, 5)
+
+
+class TestEVAnalyticsApprox(unittest.TestCase):
+
+    table_name = "vehicles"
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 50_000
+        # a few models much more popular than the rest, as with real registrations
+        self.conn = duckdb.connect()
+        self.conn.execute(f"CREATE TABLE {self.table_name} (postal_code INTEGER, make VARCHAR, model VARCHAR)")
+        models = rng.zipf(1.3, n_rows) % 100
+        data = pd.DataFrame({"postal_code": rng.integers(0, 20, n_rows), "make": [f"make {m % 7}" for m in models],
+                             "model": [f"model {m}" for m in models]})
+        self.conn.execute(f"INSERT INTO {self.table_name} SELECT * FROM data")
+        self.analytics = EVAnalytics(self.conn, self.table_name)
+
+    def exact_top_n(self, columns, partition_columns, n):
+        ranked = self.analytics.rank_by_count(self.analytics.group_and_count(columns), partition_columns)
+        return self.analytics.top_n(ranked, n).df()
+
+    def test_matches_exact_with_room(self):
+        columns, partitions = ["postal_code", "make", "model"], ["postal_code"]
+        approx = self.analytics.approx_top_n(columns, partitions, 3, capacity=128, batch_rows=4096)
+        exact = self.exact_top_n(columns, partitions, 3)
+        assert (approx["error"] == 0).all() and approx["guaranteed"].all()
+        assert (sorted(approx[columns + ["count", "count_rank"]].itertuples(index=False, name=None)) ==
+                sorted(exact[columns + ["count", "count_rank"]].itertuples(index=False, name=None)))
+
+    def test_guaranteed_in_exact(self):
+        columns, partitions = ["postal_code", "make", "model"], ["postal_code"]
+        approx = self.analytics.approx_top_n(columns, partitions, 1, capacity=8, batch_rows=4096)
+        exact = self.exact_top_n(columns, partitions, 1).rename(columns={"count": "true_count"})
+        checked = approx.merge(exact[columns + ["true_count"]], on=columns, how="left")
+        assert checked[checked["guaranteed"]]["true_count"].notna().all()
+        # upper and lower bounds on the exact counts
+        assert (checked["count"] >= checked["true_count"]).all()
+        assert (checked["count"] - checked["error"] <= checked["true_count"]).all()
+
+    def test_no_partition(self):
+        columns = ["make", "model"]
+        sketch = self.analytics.approx_ranked_counts(columns, [], capacity=16, batch_rows=4096)
+        assert sketch.rows == 50_000
+        assert (sketch.top_n(3)["model"].tolist() ==
+                self.exact_top_n(columns, [], 3).sort_values("count_rank")["model"].tolist())
+
+    def test_empty_table(self):
+        self.conn.execute(f"DELETE FROM {self.table_name}")
+        assert len(self.analytics.approx_top_n(["make"], [], 3)) == 0
@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from db.sketch import *
+
+
+def skewed_data(n_rows, n_partitions=10, seed=0):
+    # zipf distributed models, so a few are far more frequent than the rest, as with real registrations
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"postal_code": rng.integers(0, n_partitions, n_rows),
+                         "model": rng.zipf(1.3, n_rows) % 200})
+
+
+def exact_counts(data, columns):
+    return data.groupby(columns).size().rename("true_count").reset_index()
+
+
+def sketch_batches(data, capacity, batch_rows, columns=("postal_code", "model"), partition_columns=("postal_code",)):
+    sketch = TopNSketch(list(columns), list(partition_columns), capacity)
+    for start in range(0, len(data), batch_rows):
+        sketch.update(data.iloc[start:start + batch_rows])
+    return sketch
+
+
+class TestTopNSketch(unittest.TestCase):
+
+    def assert_bounds(self, sketch, data):
+        counted = sketch.counters.merge(exact_counts(data, sketch.columns), on=sketch.columns)
+        assert len(counted) == len(sketch.counters)
+        assert (counted["count"] >= counted["true_count"]).all()
+        assert (counted["count"] - counted["error"] <= counted["true_count"]).all()
+        bounds = sketch.error_bounds()
+        assert bounds["rows"].sum() == len(data) == sketch.rows
+        assert (bounds["max_error"] <= bounds["error_bound"]).all()
+
+    def test_exact_under_capacity(self):
+        data = pd.DataFrame({"postal_code": [1, 1, 1, 2, 2, None], "model": ["a", "b", "a", "a", "c", "a"]})
+        sketch = sketch_batches(data, capacity=4, batch_rows=2)
+        ranked = sketch.ranked_counts().sort_values(["postal_code", "model"]).replace({np.nan: None})
+        assert (ranked[["postal_code", "model", "count", "error", "count_rank"]].values.tolist() ==
+                [[1, "a", 2, 0, 1], [1, "b", 1, 0, 2], [2, "a", 1, 0, 1], [2, "c", 1, 0, 1], [None, "a", 1, 0, 1]])
+        # ties share a rank, as with rank(), so both are in the top 1
+        assert sketch.top_n(1)["guaranteed"].tolist() == [True, True, True, True]
+
+    def test_not_guaranteed(self):
+        sketch = TopNSketch(["model"], [], 2).update(pd.DataFrame({"model": ["a", "a", "b", "c"]}))
+        # c only has b's count to go on, so it may have been seen as often as a
+        sketch.update(pd.DataFrame({"model": ["c"]}))
+        top = sketch.top_n(1)
+        assert dict(zip(top["model"], zip(top["count"], top["error"], top["guaranteed"]))) == \
+            {"a": (2, 0, True), "c": (2, 1, False)}
+
+    def test_bounds(self):
+        data = skewed_data(100_000)
+        sketch = sketch_batches(data, capacity=16, batch_rows=7_000)
+        assert sketch.counters.groupby("postal_code").size().max() == 16
+        assert sketch.counters["error"].max() > 0
+        self.assert_bounds(sketch, data)
+
+    def test_guaranteed_in_exact_top_n(self):
+        data = skewed_data(100_000)
+        top = sketch_batches(data, capacity=16, batch_rows=7_000).top_n(3)
+        exact = exact_counts(data, ["postal_code", "model"])
+        exact["rank"] = exact.groupby("postal_code")["true_count"].rank(method="min", ascending=False)
+        exact = exact[exact["rank"] <= 3]
+        guaranteed = top[top["guaranteed"]].merge(exact, on=["postal_code", "model"], how="left")
+        assert guaranteed["true_count"].notna().all()
+        # the heavy hitters stand far enough above the rest to be certain
+        assert top["guaranteed"].mean() > 0.9
+
+    def test_merge(self):
+        data = skewed_data(100_000)
+        whole = sketch_batches(data, capacity=16, batch_rows=10_000)
+        halves = [sketch_batches(data.iloc[:40_000], 16, 10_000), sketch_batches(data.iloc[40_000:], 16, 10_000)]
+        merged = halves[0].merge(halves[1])
+        self.assert_bounds(merged, data)
+        assert merged.top_n(1)["model"].tolist() == whole.top_n(1)["model"].tolist()
+
+    def test_merge_exact(self):
+        data = skewed_data(1_000, n_partitions=3)
+        merged = sketch_batches(data.iloc[:500], 256, 100).merge(sketch_batches(data.iloc[500:], 256, 100))
+        counts = merged.counters.merge(exact_counts(data, ["postal_code", "model"]), on=["postal_code", "model"])
+        assert len(counts) == len(merged.counters)
+        assert (counts["count"] == counts["true_count"]).all() and (counts["error"] == 0).all()
+
+    def test_no_partition(self):
+        data = skewed_data(50_000)
+        sketch = sketch_batches(data, capacity=8, batch_rows=5_000, columns=["model"], partition_columns=[])
+        self.assert_bounds(sketch, data)
+        top = sketch.top_n(2)
+        assert list(top.columns) == ["model", "count", "error", "count_rank", "guaranteed"]
+        assert top["model"].tolist() == data["model"].value_counts().index[:2].tolist()
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            TopNSketch(["model"], ["postal_code"], 8)
+        with self.assertRaises(ValueError):
+            TopNSketch(["model"], [], 0)
+        with self.assertRaises(ValueError):
+            TopNSketch(["model"], [], 8).merge(TopNSketch(["model"], [], 16))
+        with self.assertRaises(ValueError):
+            TopNSketch(["model"], [], 8).top_n(9)
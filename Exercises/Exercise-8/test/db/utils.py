@@ -1,8 +1,11 @@
+import os
+import tempfile
 import unittest
 
 import numpy as np
 import pandas as pd
 
+from data.utils import CheckCategory, CheckDecimal, CheckFloat, CheckInt, InvalidLatLongFormatError, LatLongSplitter
 from db.utils import *
 
 
@@ -67,3 +70,260 @@ class TestDbUtils(unittest.TestCase):
                  expected_success.to_dict()) and
                 (db_conn.conn.sql(f"SELECT * FROM {err_table_name}").df().to_dict() ==
                  expected_errors.to_dict()))
+
+    def test_table_schema(self):
+        input_schema = {"col1": "VARCHAR", "col2": "INTEGER"}
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", input_schema)
+        assert db_conn.table_schema("my_table") == input_schema
+
+    def test_check_sql_varchar(self):
+        assert DuckDBUtils.check_sql("col1", "VARCHAR") is None
+
+    def write_csv(self, text, file_name="data.csv"):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        csv_path = os.path.join(tmp_dir.name, file_name)
+        with open(csv_path, "w") as csv_file:
+            csv_file.write(text)
+        return csv_path
+
+    def create_csv_tables(self, db_conn):
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER", "col3": "FLOAT"})
+        db_conn.create_table("my_err_table", {"col1": "VARCHAR", "col2": "VARCHAR", "col3": "VARCHAR",
+                                              "errors": "VARCHAR"})
+
+    def test_load_csv_happy(self):
+        csv_path = self.write_csv("Col 1,Col 2,Col 3\na,1,1.5\nb,2,\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table", csv_columns=["col1", "col2", "col3"])
+        assert db_conn.conn.sql("SELECT * FROM my_table").fetchall() == [("a", 1, 1.5), ("b", 2, None)]
+        assert db_conn.conn.sql("SELECT count(*) FROM my_err_table").fetchone()[0] == 0
+
+    def test_load_csv_quoted_path(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\n", file_name="driver's data.csv")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table")
+        assert db_conn.conn.sql("SELECT * FROM my_table").fetchall() == [("a", 1, 1.5)]
+
+    def test_load_csv_errors(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\nb,x,1.5\nc,,y\nd,1.5,2\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table")
+        assert db_conn.conn.sql("SELECT * FROM my_table").fetchall() == [("a", 1, 1.5)]
+        assert (db_conn.conn.sql("SELECT * FROM my_err_table").fetchall() ==
+                [("b", "x", "1.5", "invalid literal for int() with base 10: 'x'"),
+                 ("c", None, "y", "cannot convert float NaN to integer;could not convert string to float: 'y'"),
+                 ("d", "1.5", "2", "invalid literal for int() with base 10: '1.5'")])
+
+    def test_load_csv_matches_processors(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\nb,x,1.5\nc,,y\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table")
+        data = pd.read_csv(csv_path)
+        for processor in [CheckInt("col2"), CheckFloat("col3")]:
+            data = processor.process_batch(data)
+        assert (db_conn.conn.sql("SELECT errors FROM my_err_table").df()["errors"].tolist() ==
+                data["errors"].dropna().tolist())
+
+    def test_load_csv_derived_columns(self):
+        csv_path = self.write_csv("id,location\n1,POINT (1.5 2.5)\n2,POINT (1.5 2.5\n3,\n")
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"id": "INTEGER", "lat": "FLOAT", "long": "FLOAT"})
+        db_conn.create_table("my_err_table", {"id": "VARCHAR", "lat": "VARCHAR", "long": "VARCHAR",
+                                              "errors": "VARCHAR"})
+        lat_sql, long_sql, error_sql = LatLongSplitter("location", "lat", "long").sql_columns()
+        db_conn.load_csv(csv_path, "my_table", "my_err_table",
+                         column_sql={"lat": lat_sql, "long": long_sql}, checks=[error_sql])
+        assert db_conn.conn.sql("SELECT * FROM my_table").fetchall() == [(1, 1.5, 2.5), (3, None, None)]
+        assert (db_conn.conn.sql("SELECT id, errors FROM my_err_table").fetchall() ==
+                [("2", InvalidLatLongFormatError.err_str.format("POINT (1.5 2.5"))])
+
+    def test_create_table_if_not_exists(self):
+        input_schema = {"col1": "VARCHAR", "col2": "INTEGER"}
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", input_schema)
+        db_conn.conn.execute("INSERT INTO my_table VALUES ('a', 1)")
+        db_conn.create_table("my_table", input_schema, if_not_exists=True)
+        assert db_conn.conn.sql("SELECT count(*) FROM my_table").fetchone()[0] == 1
+
+    def test_load_data_keyed_append(self):
+        input_schema = {"col1": "VARCHAR", "col2": "INTEGER"}
+        err_schema = {"col1": "VARCHAR", "col2": "VARCHAR", "errors": "VARCHAR"}
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", input_schema)
+        db_conn.create_table("my_err_table", err_schema)
+        db_conn.load_data(pd.DataFrame.from_dict({"col1": ["a", "b"], "col2": [1, 2]}), "my_table", "my_err_table",
+                          key_columns=["col1"])
+        db_conn.conn.execute(f"DROP TABLE {DuckDBUtils.delta_table('my_table')}")
+        data = pd.DataFrame.from_dict({"col1": ["b", "c", "c", "d"], "col2": [20, 3, 3, 4],
+                                       "errors": [np.nan, np.nan, np.nan, "o noes"]})
+        db_conn.load_data(data, "my_table", "my_err_table", key_columns=["col1"])
+        assert (sorted(db_conn.conn.sql("SELECT * FROM my_table").fetchall()) ==
+                [("a", 1), ("b", 2), ("c", 3)])
+        assert db_conn.conn.sql(f"SELECT * FROM {DuckDBUtils.delta_table('my_table')}").fetchall() == [("c", 3)]
+        assert db_conn.conn.sql("SELECT col1 FROM my_err_table").fetchall() == [("d",)]
+
+    def test_load_data_keyed_batches(self):
+        # each batch appends only its own new rows, and a row without a key is loaded once
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER"})
+        for batch in [{"col1": ["a", None], "col2": [1, 2]}, {"col1": ["b", None], "col2": [3, 4]},
+                      {"col1": ["a", "c", None], "col2": [5, 6, 7]}]:
+            db_conn.load_data(pd.DataFrame.from_dict(batch), "my_table", "", key_columns=["col1"])
+        expected = [("a", 1), ("b", 3), ("c", 6), (None, 2)]
+        assert sorted(db_conn.conn.sql("SELECT * FROM my_table").fetchall(), key=str) == sorted(expected, key=str)
+        delta = db_conn.conn.sql(f"SELECT * FROM {DuckDBUtils.delta_table('my_table')}").fetchall()
+        assert sorted(delta, key=str) == sorted(expected, key=str)
+
+    def test_load_data_keyed_errors_once(self):
+        # a rejected row re-sent by a later incremental load isn't diverted again, nor is one whose key has loaded
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER"})
+        db_conn.create_table("my_err_table", {"col1": "VARCHAR", "col2": "VARCHAR", "errors": "VARCHAR"})
+        data = pd.DataFrame.from_dict({"col1": ["a", "b", "b", None], "col2": [1, 2, 2, 3],
+                                       "errors": [np.nan, "o noes", "o noes", "o noes"]})
+        for _ in range(3):
+            db_conn.load_data(data, "my_table", "my_err_table", key_columns=["col1"])
+        db_conn.load_data(pd.DataFrame.from_dict({"col1": ["a"], "col2": [1], "errors": ["o noes"]}),
+                          "my_table", "my_err_table", key_columns=["col1"])
+        assert sorted(db_conn.conn.sql("SELECT col1 FROM my_err_table").fetchall(), key=str) == [("b",), (None,)]
+
+    def test_load_csv_keyed_errors_once(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\nb,x,2.5\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        for _ in range(2):
+            db_conn.load_csv(csv_path, "my_table", "my_err_table", key_columns=["col1"])
+        assert db_conn.conn.sql("SELECT col1 FROM my_err_table").fetchall() == [("b",)]
+        assert db_conn.conn.sql("SELECT col1 FROM my_table").fetchall() == [("a",)]
+
+    def test_drop_if_exists_drops_derived(self):
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"col1": "VARCHAR"})
+        for name in ["my_table_delta", "my_table_live_counts_col1", "my_table_2"]:
+            db_conn.conn.execute(f"CREATE TABLE {name} (col1 VARCHAR)")
+        assert sorted(db_conn.derived_tables("my_table")) == ["my_table_delta", "my_table_live_counts_col1"]
+        db_conn.create_table("my_table", {"col1": "VARCHAR"}, drop_if_exists=True)
+        assert db_conn.derived_tables("my_table") == []
+        assert db_conn.table_exists("my_table_2")
+
+    def test_load_csv_keyed_append(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\nb,2,2.5\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.conn.execute("INSERT INTO my_table VALUES ('a', 1, 1.5)")
+        db_conn.load_csv(csv_path, "my_table", "my_err_table", key_columns=["col1"], delta_table_name="new_rows")
+        assert sorted(db_conn.conn.sql("SELECT * FROM my_table").fetchall()) == [("a", 1, 1.5), ("b", 2, 2.5)]
+        assert db_conn.conn.sql("SELECT * FROM new_rows").fetchall() == [("b", 2, 2.5)]
+
+    def test_load_data_metrics(self):
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER"})
+        db_conn.create_table("my_err_table", {"col1": "VARCHAR", "col2": "VARCHAR", "errors": "VARCHAR"})
+        data = pd.DataFrame.from_dict({"col1": ["ab", "b", "c"], "col2": [1, 2, 3],
+                                       "errors": [np.nan, "o noes", np.nan]})
+        db_conn.load_data(data, "my_table", "my_err_table")
+        db_conn.load_data(data, "my_table", "my_err_table")
+        good, failed = db_conn.load_metrics["my_table"], db_conn.load_metrics["my_err_table"]
+        assert (good.rows, good.batches, failed.rows, failed.batches) == (4, 2, 2, 2)
+        # 1.5 characters and an 8 byte int per good row, one character, an int and "o noes" per failed one
+        assert (good.bytes, failed.bytes) == (38, 30)
+
+    def test_load_data_metrics_keyed(self):
+        db_conn = DuckDBUtils("")
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER"})
+        db_conn.conn.execute("INSERT INTO my_table VALUES ('a', 1)")
+        db_conn.load_data(pd.DataFrame.from_dict({"col1": ["a", "b"], "col2": [1, 2]}), "my_table", "",
+                          key_columns=["col1"])
+        assert db_conn.load_metrics["my_table"].rows == 1
+
+    def test_load_data_no_metrics(self):
+        db_conn = DuckDBUtils("", record_metrics=False)
+        db_conn.create_table("my_table", {"col1": "VARCHAR", "col2": "INTEGER"})
+        db_conn.load_data(pd.DataFrame.from_dict({"col1": ["a"], "col2": [1]}), "my_table", "")
+        assert db_conn.load_metrics == {}
+
+    def test_load_csv_metrics(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1,1.5\nb,x,1.5\n")
+        db_conn = DuckDBUtils("")
+        self.create_csv_tables(db_conn)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table")
+        good, failed = db_conn.load_metrics["my_table"], db_conn.load_metrics["my_err_table"]
+        # the 31 byte csv, header and all, split between the two rows
+        assert (good.rows, good.bytes, failed.rows, failed.bytes) == (1, 16, 1, 16)
+
+    def test_format_schema_decimal_enum(self):
+        input_schema = {"col1": "decimal(9, 6)", "col2": "ENUM('a', 'it''s')"}
+        assert DuckDBUtils.format_schema(input_schema) == "col1 DECIMAL(9,6),col2 ENUM('a', 'it''s')"
+        for dtype in ["DECIMAL(39,2)", "DECIMAL(2,3)", "ENUM"]:
+            with self.assertRaises(TypeError):
+                DuckDBUtils.format_schema({"col1": dtype})
+
+    def test_enum_values(self):
+        assert enum_values(enum_sql(["a", "it's", "b, c"])) == ["a", "it's", "b, c"]
+
+    def create_enum_tables(self, db_conn, csv_path, table_name=None):
+        schema = db_conn.derive_enums({"col1": "ENUM", "col2": "DECIMAL(5,2)", "col3": "ENUM"},
+                                      DuckDBUtils.csv_source(csv_path), table_name=table_name)
+        db_conn.create_table("my_table", schema, if_not_exists=True)
+        db_conn.create_table("my_err_table", {"col1": "VARCHAR", "col2": "VARCHAR", "col3": "VARCHAR",
+                                              "errors": "VARCHAR"}, if_not_exists=True)
+        return schema
+
+    def test_derive_enums(self):
+        csv_path = self.write_csv("col1,col2,col3\nb,1,\na,2,\nb,3,\n")
+        db_conn = DuckDBUtils("")
+        schema = self.create_enum_tables(db_conn, csv_path)
+        # a column with no values is left as VARCHAR
+        assert schema == {"col1": "ENUM('a', 'b')", "col2": "DECIMAL(5,2)", "col3": "VARCHAR"}
+        assert db_conn.table_schema("my_table") == schema
+        sampled = db_conn.derive_enums({"col1": "ENUM"}, DuckDBUtils.csv_source(csv_path), sample_rows=1)
+        assert sampled == {"col1": "ENUM('b')"}
+
+    def test_load_csv_enum_decimal(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1.5,x\nb,1000,x\n")
+        db_conn = DuckDBUtils("")
+        schema = self.create_enum_tables(db_conn, csv_path)
+        schema["col1"] = enum_sql(["a"])
+        db_conn.create_table("my_table", schema, drop_if_exists=True)
+        db_conn.load_csv(csv_path, "my_table", "my_err_table")
+        assert db_conn.conn.sql("SELECT col1, col2::VARCHAR, col3 FROM my_table").fetchall() == [("a", "1.50", "x")]
+        errors = db_conn.conn.sql("SELECT errors FROM my_err_table").fetchall()
+        assert errors == [("'b' is not a known value;could not convert '1000' to DECIMAL(5,2)",)]
+        # the same as the processors give
+        data = pd.read_csv(csv_path, dtype=str)
+        for processor in [CheckCategory("col1", ["a"]), CheckDecimal("col2", 5, 2), CheckCategory("col3", ["x"])]:
+            data = processor.process_batch(data)
+        assert data["errors"].dropna().tolist() == [errors[0][0]]
+
+    def test_load_data_categorical(self):
+        csv_path = self.write_csv("col1,col2,col3\na,1.5,x\nb,1,x\n")
+        db_conn = DuckDBUtils("")
+        self.create_enum_tables(db_conn, csv_path)
+        data = pd.DataFrame({"col1": ["b", "c"], "col2": [1.5, 2], "col3": ["x", "x"]})
+        for processor in [CheckCategory("col1", ["a", "b"]), CheckDecimal("col2", 5, 2), CheckCategory("col3", ["x"])]:
+            data = processor.process_batch(data)
+        db_conn.load_data(data, "my_table", "my_err_table")
+        assert db_conn.conn.sql("SELECT col1, col3 FROM my_table").fetchall() == [("b", "x")]
+        assert (db_conn.conn.sql("SELECT col1, errors FROM my_err_table").fetchall() ==
+                [("c", "'c' is not a known value")])
+
+    def test_widen_enums(self):
+        db_conn = DuckDBUtils("")
+        schema = self.create_enum_tables(db_conn, self.write_csv("col1,col2,col3\nb,1,x\n"))
+        db_conn.conn.execute("INSERT INTO my_table VALUES ('b', 1, 'x')")
+        db_conn.conn.execute("CREATE TABLE my_counts AS SELECT col1, count(*) AS count FROM my_table GROUP BY col1")
+        written = []
+        db_conn.add_write_listener(written.append)
+        schema = self.create_enum_tables(db_conn, self.write_csv("col1,col2,col3\na,1,x\n"), table_name="my_table")
+        assert schema["col1"] == "ENUM('a', 'b')" and schema["col3"] == "ENUM('x')"
+        assert db_conn.widen_enums(schema) == written == ["my_counts", "my_table"]
+        assert db_conn.table_schema("my_counts")["col1"] == "ENUM('a', 'b')"
+        assert db_conn.conn.sql("SELECT col1 FROM my_table").fetchall() == [("b",)]
+        # already wide enough
+        assert db_conn.widen_enums(schema) == []
@@ -0,0 +1,32 @@
+import os
+
+import polars as pl
+
+from src.divvy.rides import RIDE_SCHEMA
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "202306-divvy-tripdata.csv")
+
+
+def replicate_sample(out_dir: str, n_rows: int, n_files: int = 12, sample_path: str = SAMPLE_PATH,
+                     chunk_rows: int = 1_000_000):
+    # n_rows rides in n_files monthly files named like Divvy's, copies of the sample with each file moved on a month
+    # and the ride ids made unique. Written a chunk at a time, so generating 100M rows takes no more memory than 1M
+    sample = pl.read_csv(sample_path, schema=RIDE_SCHEMA)
+    copies = max(1, chunk_rows // len(sample))
+    chunk = pl.concat([sample.with_columns(pl.col("ride_id") + f"-{copy}") for copy in range(copies)])
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for month in range(n_files):
+        file_rows = n_rows // n_files + (month < n_rows % n_files)
+        moved = chunk.with_columns(pl.col("ride_id") + f"-{month}", pl.col("started_at").dt.offset_by(f"{month}mo"),
+                                   pl.col("ended_at").dt.offset_by(f"{month}mo"))
+        first_day = moved["started_at"].min()
+        path = os.path.join(out_dir, f"{first_day:%Y%m}-divvy-tripdata.csv")
+        with open(path, "wb") as f:
+            written = 0
+            while written < file_rows:
+                part = moved.head(file_rows - written).with_columns(pl.col("ride_id") + f"-{written}")
+                part.write_csv(f, include_header=written == 0, datetime_format="%Y-%m-%d %H:%M:%S")
+                written += len(part)
+        paths.append(path)
+    return paths
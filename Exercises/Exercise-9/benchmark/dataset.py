@@ -0,0 +1,56 @@
+import argparse
+import datetime
+import os
+import shutil
+import tempfile
+import time
+
+import polars as pl
+
+from benchmark.data import replicate_sample
+from src.divvy.dataset import *
+
+
+def one_month_per_day(rides: pl.LazyFrame):
+    return rides_per_day(rides).collect(engine="streaming")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time rides per day for one month of a year of monthly files, "
+                                                 "scanned by glob and through the pruned dataset")
+    parser.add_argument("--rows", type=int, default=12_000_000)
+    parser.add_argument("--files", type=int, default=12)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        data_dir = os.path.join(tmp_dir, "data")
+        replicate_sample(data_dir, args.rows, args.files)
+        # the sample is June 2023, so the files run from 202306
+        start, end = datetime.date(2023, 9, 1), datetime.date(2023, 10, 1)
+
+        began = time.perf_counter()
+        glob_rides = scan_rides(os.path.join(data_dir, "*-divvy-tripdata.csv"))
+        glob_rides = glob_rides.filter((pl.col("started_at") >= datetime.datetime(2023, 9, 1)) &
+                                       (pl.col("started_at") < datetime.datetime(2023, 10, 1)))
+        expected = one_month_per_day(glob_rides)
+        print(f"{'glob':>16}: {time.perf_counter() - began:.3f}s")
+        for run in ["dataset, first", "dataset, second"]:
+            dataset = DivvyDataset(data_dir)
+            began = time.perf_counter()
+            planned = dataset.scan(start, end)
+            planning = time.perf_counter() - began
+            result = one_month_per_day(planned)
+            assert result.equals(expected)
+            print(f"{run:>16}: {time.perf_counter() - began:.3f}s ({planning:.3f}s planning), {dataset.stats}")
+        # another range only reads the files it needs that weren't indexed yet
+        dataset = DivvyDataset(data_dir)
+        began = time.perf_counter()
+        dataset.scan(datetime.date(2024, 1, 1), None)
+        print(f"{'another range':>16}: {time.perf_counter() - began:.3f}s planning, {dataset.stats}")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import polars as pl
+
+from benchmark.data import replicate_sample
+from src.divvy.rides import *
+
+
+def eager_reports(source: str, out_dir: str):
+    # every column of every file read into memory, then the reports. With the schema inferred instead, the station
+    # ids that aren't numbers fail the read
+    rides = pl.read_csv(source, schema=RIDE_SCHEMA)
+    daily = rides_per_day(rides.lazy()).collect()
+    os.makedirs(out_dir, exist_ok=True)
+    daily.write_parquet(os.path.join(out_dir, "rides_per_day.parquet"))
+    weekly_rides(daily.lazy()).collect().write_parquet(os.path.join(out_dir, "weekly_rides.parquet"))
+    rides_vs_last_week(daily.lazy()).collect().write_parquet(os.path.join(out_dir, "rides_vs_last_week.parquet"))
+
+
+def peak_rss():
+    # this process's own high water mark, in bytes. ru_maxrss would carry over the parent's peak from before the
+    # spawn, data generation and all, and report the same for every mode
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:")) * 1024
+
+
+def run_mode(mode: str, source: str, out_dir: str, results):
+    # in its own process, so each mode's peak RSS is its own
+    start = time.perf_counter()
+    if mode == "eager":
+        eager_reports(source, out_dir)
+    else:
+        write_reports(source, out_dir, streaming=mode == "streaming")
+    seconds = time.perf_counter() - start
+    results.put((seconds, peak_rss()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the Exercise-9 reports and their peak memory, streamed and "
+                                                 "collected in memory")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--files", type=int, default=12)
+    parser.add_argument("--modes", nargs="+", default=["streaming", "in_memory", "eager"])
+    parser.add_argument("--data-dir", default=None, help="reuse or keep the generated files here")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    data_dir = args.data_dir or os.path.join(tmp_dir, "data")
+    try:
+        if not os.path.isdir(data_dir) or len(os.listdir(data_dir)) == 0:
+            start = time.perf_counter()
+            replicate_sample(data_dir, args.rows, args.files)
+            print(f"generated {args.rows:,} rides in {args.files} files in {time.perf_counter() - start:.1f}s")
+        csv_bytes = sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir))
+        print(f"{csv_bytes / 1e9:.2f}GB of csv")
+        source = os.path.join(data_dir, "*-divvy-tripdata.csv")
+
+        context = multiprocessing.get_context("spawn")
+        for mode in args.modes:
+            results = context.Queue()
+            process = context.Process(target=run_mode, args=(mode, source, os.path.join(tmp_dir, mode), results))
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                print(f"{mode:>10}: failed with exit code {process.exitcode}")
+                continue
+            seconds, peak_rss = results.get()
+            print(f"{mode:>10}: {seconds:.3f}s, peak RSS {peak_rss / 1e6:,.0f}MB")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == "__main__":
+    main()
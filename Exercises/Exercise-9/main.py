@@ -1,8 +1,29 @@
 import polars as pl
 
+from src.divvy.dataset import *
+from src.divvy.rides import *
+
+data_dir = "data"
+output_dir = f"{data_dir}/output"
+# the rides started in [start_date, end_date); None leaves that end open. Monthly files outside the range are
+# skipped without being read, e.g. start_date = datetime.date(2023, 1, 1)
+start_date = None
+end_date = None
+# "parquet" or "csv"
+output_format = "csv"
+# Polars' streaming engine, so a year of trip files is processed in bounded memory
+streaming = True
+
 
 def main():
-    pass
+    dataset = DivvyDataset(data_dir)
+    rides = dataset.scan(start_date, end_date)
+    paths = write_reports(rides, output_dir, output_format, streaming)
+    print(dataset.stats)
+    with pl.Config(tbl_rows=10):
+        for report, path in paths.items():
+            print(report)
+            print(scan_output(path).collect())
 
 
 if __name__ == "__main__":
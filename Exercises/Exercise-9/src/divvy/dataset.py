@@ -0,0 +1,142 @@
+import datetime
+import glob
+import json
+import os
+import re
+
+import polars as pl
+
+from .rides import *
+
+# 202306-divvy-tripdata.csv
+MONTH_PATTERN = re.compile(r"(\d{4})(\d{2})-divvy-tripdata")
+# rides that start late on the last day of a month can be in the next month's file, and the other way round
+MONTH_SLACK = datetime.timedelta(days=1)
+
+
+def file_month(path: str):
+    match = MONTH_PATTERN.search(os.path.basename(path))
+    if match is None:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    return datetime.date(year, month, 1) if 1 <= month <= 12 else None
+
+
+def next_month(month: datetime.date):
+    return datetime.date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def as_datetime(value):
+    # dates are taken as midnight
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.combine(value, datetime.time())
+
+
+class ScanStats:
+    def __init__(self):
+        self.files = 0
+        # skipped on their name alone, without being opened
+        self.pruned_by_name = 0
+        # skipped on the started_at range in the index
+        self.pruned_by_index = 0
+        # read to (re)build their index entry
+        self.indexed = 0
+
+    def __repr__(self):
+        return (f"{self.files} files scanned, {self.pruned_by_name} pruned by name, {self.pruned_by_index} by index, "
+                f"{self.indexed} indexed")
+
+
+class DivvyDataset:
+    # a directory of monthly Divvy trip files scanned lazily as one LazyFrame, with a month column from each file's
+    # name. A query's date range prunes files before any is opened: first by the month in their names, then by the
+    # started_at range in a sidecar index (<directory>/_divvy_index.json) holding each file's row count and
+    # min/max started_at. Entries are keyed on the file's size and mtime, so a file is only read for its index entry
+    # the first time it's needed or after it changes
+    index_name = "_divvy_index.json"
+
+    def __init__(self, directory: str, pattern: str = "*-divvy-tripdata.csv", schema: dict = RIDE_SCHEMA,
+                 index_path: str = None):
+        self.directory = directory
+        self.pattern = pattern
+        self.schema = schema
+        self.index_path = index_path or os.path.join(directory, self.index_name)
+        self.stats = ScanStats()
+
+    def paths(self):
+        return sorted(glob.glob(os.path.join(self.directory, self.pattern)))
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def save_index(self, index: dict):
+        part_path = self.index_path + ".part"
+        with open(part_path, "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+        os.replace(part_path, self.index_path)
+
+    def index_entry(self, index: dict, path: str):
+        # (rows, min started_at, max started_at) of a file, read once with only started_at projected
+        stat = os.stat(path)
+        name = os.path.basename(path)
+        known = index.get(name)
+        if known is None or (known["size"], known["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns):
+            rows, first, last = pl.scan_csv(path, schema=self.schema).select(
+                pl.len(), pl.col("started_at").min().alias("first"), pl.col("started_at").max().alias("last")
+            ).collect(engine="streaming").row(0)
+            known = index[name] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": rows,
+                                   "min_started_at": first.isoformat() if first is not None else None,
+                                   "max_started_at": last.isoformat() if last is not None else None}
+            self.stats.indexed += 1
+        return known
+
+    def prune(self, start=None, end=None):
+        # (path, month) of the files that can hold rides started in [start, end); either end may be open
+        start, end = as_datetime(start), as_datetime(end)
+        index = self.load_index()
+        n_indexed = self.stats.indexed
+        kept = []
+        for path in self.paths():
+            month = file_month(path)
+            if month is not None and ((end is not None and as_datetime(month) - MONTH_SLACK >= end) or
+                                      (start is not None and as_datetime(next_month(month)) + MONTH_SLACK <= start)):
+                self.stats.pruned_by_name += 1
+                continue
+            if start is not None or end is not None:
+                entry = self.index_entry(index, path)
+                if entry["rows"] == 0 or entry["min_started_at"] is None or \
+                        (end is not None and datetime.datetime.fromisoformat(entry["min_started_at"]) >= end) or \
+                        (start is not None and datetime.datetime.fromisoformat(entry["max_started_at"]) < start):
+                    self.stats.pruned_by_index += 1
+                    continue
+            kept.append((path, month))
+        if self.stats.indexed > n_indexed:
+            self.save_index(index)
+        self.stats.files += len(kept)
+        return kept
+
+    def scan(self, start=None, end=None) -> pl.LazyFrame:
+        # the rides started in [start, end) from the files that can hold any, with their file's month
+        frames = [scan_rides(path, self.schema).with_columns(pl.lit(month, pl.Date).alias("month"))
+                  for path, month in self.prune(start, end)]
+        if len(frames) == 0:
+            return pl.LazyFrame(schema={**self.schema, "month": pl.Date})
+        rides = pl.concat(frames, how="vertical")
+        if start is not None:
+            rides = rides.filter(pl.col("started_at") >= as_datetime(start))
+        if end is not None:
+            rides = rides.filter(pl.col("started_at") < as_datetime(end))
+        return rides
+
+    def row_counts(self):
+        # {file name: rows} from the index, reading only the files it doesn't have yet
+        index = self.load_index()
+        n_indexed = self.stats.indexed
+        counts = {os.path.basename(path): self.index_entry(index, path)["rows"] for path in self.paths()}
+        if self.stats.indexed > n_indexed:
+            self.save_index(index)
+        return counts
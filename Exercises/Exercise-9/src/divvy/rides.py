@@ -0,0 +1,90 @@
+import os
+
+import polars as pl
+
+# the columns of the Divvy trip files since 2020, typed up front so the csv isn't read once more to infer them
+RIDE_SCHEMA = {
+    "ride_id": pl.String,
+    "rideable_type": pl.Categorical,
+    "started_at": pl.Datetime("us"),
+    "ended_at": pl.Datetime("us"),
+    "start_station_name": pl.String,
+    # mostly numbers, but not all ("TA1307000039")
+    "start_station_id": pl.String,
+    "end_station_name": pl.String,
+    "end_station_id": pl.String,
+    "start_lat": pl.Float64,
+    "start_lng": pl.Float64,
+    "end_lat": pl.Float64,
+    "end_lng": pl.Float64,
+    "member_casual": pl.Categorical,
+}
+
+DAILY_SCHEMA = {"date": pl.Date, "rides": pl.UInt32}
+REPORTS = ["rides_per_day", "weekly_rides", "rides_vs_last_week"]
+
+
+def scan_rides(source, schema: dict = RIDE_SCHEMA) -> pl.LazyFrame:
+    # source is a path, a glob ("data/2023*-divvy-tripdata.csv") or a list of them
+    return pl.scan_csv(source, schema=schema)
+
+
+def rides_per_day(rides: pl.LazyFrame) -> pl.LazyFrame:
+    # only started_at is read from the csv
+    return rides.group_by(pl.col("started_at").dt.date().alias("date")).agg(pl.len().alias("rides")).sort("date")
+
+
+def weekly_rides(daily: pl.LazyFrame) -> pl.LazyFrame:
+    # weeks start on Monday; the first and last may be partial
+    return daily.group_by(pl.col("date").dt.truncate("1w").alias("week")).agg(
+        pl.col("rides").sum().alias("rides"),
+        pl.col("rides").mean().round(2).alias("average_daily_rides"),
+        pl.col("rides").max().alias("max_daily_rides"),
+        pl.col("rides").min().alias("min_daily_rides"),
+    ).sort("week")
+
+
+def rides_vs_last_week(daily: pl.LazyFrame) -> pl.LazyFrame:
+    # joined on the date a week before rather than shifted by 7 rows, so a day missing from the data doesn't pair
+    # every later day with the wrong one; the first week has nothing to compare with
+    last_week = daily.select((pl.col("date") + pl.duration(days=7)).alias("date"),
+                             pl.col("rides").alias("rides_last_week"))
+    return daily.join(last_week, on="date", how="left").with_columns(
+        (pl.col("rides").cast(pl.Int64) - pl.col("rides_last_week")).alias("change_from_last_week")).sort("date")
+
+
+def sink(lf: pl.LazyFrame, path: str, streaming: bool = True):
+    # streamed to the file in batches, or collected first
+    if streaming:
+        if path.endswith(".csv"):
+            lf.sink_csv(path)
+        else:
+            lf.sink_parquet(path)
+    else:
+        df = lf.collect(engine="in-memory")
+        if path.endswith(".csv"):
+            df.write_csv(path)
+        else:
+            df.write_parquet(path)
+
+
+def scan_output(path: str, schema: dict = None):
+    if path.endswith(".csv"):
+        return pl.scan_csv(path, schema=schema, try_parse_dates=schema is None)
+    return pl.scan_parquet(path)
+
+
+def write_reports(source, out_dir: str, file_format: str = "parquet", streaming: bool = True,
+                  schema: dict = RIDE_SCHEMA):
+    # the three reports as <out_dir>/<report>.<file_format>, from csv files or an already scanned LazyFrame of
+    # rides. The rides are read once, for the rides per day, whose few hundred rows the other two are built from.
+    # With streaming, Polars' streaming engine reads the csv in batches, so memory stays flat however many files
+    # source covers; otherwise each report is collected in memory
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {report: os.path.join(out_dir, f"{report}.{file_format}") for report in REPORTS}
+    rides = source if isinstance(source, pl.LazyFrame) else scan_rides(source, schema)
+    sink(rides_per_day(rides), paths["rides_per_day"], streaming)
+    daily = scan_output(paths["rides_per_day"], DAILY_SCHEMA)
+    sink(weekly_rides(daily), paths["weekly_rides"], streaming)
+    sink(rides_vs_last_week(daily), paths["rides_vs_last_week"], streaming)
+    return paths
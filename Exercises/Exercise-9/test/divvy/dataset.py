@@ -0,0 +1,82 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import polars as pl
+
+from divvy.dataset import *
+
+HEADER = ",".join(f'"{name}"' for name in RIDE_SCHEMA) + "\n"
+
+
+def ride(ride_id: str, started_at: str):
+    return f'"{ride_id}","electric_bike","{started_at}","{started_at}",,,,,41.91,-87.69,41.91,-87.7,"member"\n'
+
+
+class TestDivvyDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.write("202305-divvy-tripdata.csv", [ride("a", "2023-05-10 10:00:00"), ride("b", "2023-05-31 23:50:00")])
+        # a ride started the night before the month
+        self.write("202306-divvy-tripdata.csv", [ride("c", "2023-05-31 23:59:00"), ride("d", "2023-06-15 10:00:00")])
+        self.write("202307-divvy-tripdata.csv", [ride("e", "2023-07-01 08:00:00")])
+        # no month in its name, so only its index entry can prune it
+        self.write("extra-divvy-tripdata.csv", [ride("f", "2023-07-20 08:00:00")])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write(self, name: str, rides: list):
+        with open(os.path.join(self.tmp_dir, name), "w") as f:
+            f.write(HEADER + "".join(rides))
+
+    def ride_ids(self, rides: pl.LazyFrame):
+        return sorted(rides.collect()["ride_id"].to_list())
+
+    def test_scan_all(self):
+        dataset = DivvyDataset(self.tmp_dir)
+        rides = dataset.scan().collect()
+        self.assertEqual(sorted(rides["ride_id"].to_list()), ["a", "b", "c", "d", "e", "f"])
+        self.assertEqual(rides.filter(pl.col("ride_id") == "c")["month"][0], datetime.date(2023, 6, 1))
+        self.assertIsNone(rides.filter(pl.col("ride_id") == "f")["month"][0])
+        # nothing to prune, so nothing is opened to plan the scan
+        self.assertEqual(dataset.stats.indexed, 0)
+        self.assertFalse(os.path.exists(dataset.index_path))
+
+    def test_prune(self):
+        dataset = DivvyDataset(self.tmp_dir)
+        rides = dataset.scan(datetime.date(2023, 5, 31), datetime.date(2023, 6, 1))
+        self.assertEqual(self.ride_ids(rides), ["b", "c"])
+        # July's file by its name; the unnamed one by its index entry
+        self.assertEqual((dataset.stats.files, dataset.stats.pruned_by_name, dataset.stats.pruned_by_index), (2, 1, 1))
+        self.assertEqual(dataset.stats.indexed, 3)
+
+        dataset = DivvyDataset(self.tmp_dir)
+        rides = dataset.scan(datetime.datetime(2023, 6, 2), None)
+        self.assertEqual(self.ride_ids(rides), ["d", "e", "f"])
+        # May's file by its name. Only July's is read for its index entry: the first scan never opened it
+        self.assertEqual((dataset.stats.files, dataset.stats.pruned_by_name, dataset.stats.pruned_by_index), (3, 1, 0))
+        self.assertEqual(dataset.stats.indexed, 1)
+
+    def test_changed_file(self):
+        dataset = DivvyDataset(self.tmp_dir)
+        self.assertEqual(dataset.row_counts(), {"202305-divvy-tripdata.csv": 2, "202306-divvy-tripdata.csv": 2,
+                                                "202307-divvy-tripdata.csv": 1, "extra-divvy-tripdata.csv": 1})
+        self.write("extra-divvy-tripdata.csv", [ride("f", "2023-05-20 08:00:00"), ride("g", "2023-05-21 08:00:00")])
+        dataset = DivvyDataset(self.tmp_dir)
+        self.assertEqual(dataset.row_counts()["extra-divvy-tripdata.csv"], 2)
+        self.assertEqual(dataset.stats.indexed, 1)
+        self.assertEqual(self.ride_ids(dataset.scan(datetime.date(2023, 5, 20), datetime.date(2023, 5, 22))),
+                         ["f", "g"])
+
+    def test_reports(self):
+        rides = DivvyDataset(self.tmp_dir).scan(datetime.date(2023, 6, 1), None)
+        paths = write_reports(rides, os.path.join(self.tmp_dir, "output"))
+        self.assertEqual(scan_output(paths["rides_per_day"]).collect().rows(), [
+            (datetime.date(2023, 6, 15), 1), (datetime.date(2023, 7, 1), 1), (datetime.date(2023, 7, 20), 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import polars as pl
+
+from divvy.rides import *
+
+HEADER = ",".join(f'"{name}"' for name in RIDE_SCHEMA) + "\n"
+
+
+def ride(ride_id: str, started_at: str):
+    return f'"{ride_id}","electric_bike","{started_at}","{started_at}",,,,,41.91,-87.69,41.91,-87.7,"member"\n'
+
+
+class TestRides(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        # three rides on Monday 2023-06-05, one on the Tuesday, none on the Wednesday and two a week after each
+        rides = [ride("a", "2023-06-05 13:34:12"), ride("b", "2023-06-05 01:30:22"), ride("c", "2023-06-05 23:59:59"),
+                 ride("d", "2023-06-06 08:00:00")]
+        with open(os.path.join(self.tmp_dir, "202306-divvy-tripdata.csv"), "w") as f:
+            f.write(HEADER + "".join(rides))
+        with open(os.path.join(self.tmp_dir, "202307-divvy-tripdata.csv"), "w") as f:
+            f.write(HEADER + "".join([ride("e", "2023-06-12 00:00:00"), ride("f", "2023-06-12 10:00:00"),
+                                      ride("g", "2023-06-13 10:00:00"), ride("h", "2023-06-13 11:00:00"),
+                                      ride("i", "2023-06-14 09:00:00")]))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_types(self):
+        rides = scan_rides(os.path.join(self.tmp_dir, "202306-divvy-tripdata.csv")).collect()
+        self.assertEqual(dict(rides.schema), RIDE_SCHEMA)
+        self.assertEqual(rides["started_at"][0], datetime.datetime(2023, 6, 5, 13, 34, 12))
+
+    def test_projection(self):
+        plan = rides_per_day(scan_rides(os.path.join(self.tmp_dir, "*-divvy-tripdata.csv"))).explain()
+        self.assertIn("PROJECT 1/13 COLUMNS", plan)
+
+    def check_reports(self, paths: dict):
+        self.assertEqual(scan_output(paths["rides_per_day"], DAILY_SCHEMA).collect().rows(), [
+            (datetime.date(2023, 6, 5), 3), (datetime.date(2023, 6, 6), 1), (datetime.date(2023, 6, 12), 2),
+            (datetime.date(2023, 6, 13), 2), (datetime.date(2023, 6, 14), 1)])
+        self.assertEqual(scan_output(paths["weekly_rides"]).collect().rows(), [
+            (datetime.date(2023, 6, 5), 4, 2.0, 3, 1), (datetime.date(2023, 6, 12), 5, 1.67, 2, 1)])
+        self.assertEqual(scan_output(paths["rides_vs_last_week"]).collect().rows(), [
+            (datetime.date(2023, 6, 5), 3, None, None), (datetime.date(2023, 6, 6), 1, None, None),
+            (datetime.date(2023, 6, 12), 2, 3, -1), (datetime.date(2023, 6, 13), 2, 1, 1),
+            # there were no rides the Wednesday before, so nothing to compare with
+            (datetime.date(2023, 6, 14), 1, None, None)])
+
+    def test_write_reports(self):
+        source = os.path.join(self.tmp_dir, "*-divvy-tripdata.csv")
+        for file_format in ["parquet", "csv"]:
+            for streaming in [True, False]:
+                with self.subTest(file_format=file_format, streaming=streaming):
+                    out_dir = os.path.join(self.tmp_dir, f"{file_format}_{streaming}")
+                    self.check_reports(write_reports(source, out_dir, file_format, streaming))
+
+
+if __name__ == '__main__':
+    unittest.main()
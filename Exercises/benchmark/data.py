@@ -0,0 +1,110 @@
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+
+# the columns of Electric_Vehicle_Population_Data.csv (Exercise-8) and of the Divvy trip files since 2020
+# (Exercise-9), so every engine reads the same shape of file the exercises do
+EV_COLUMNS = [
+    "VIN (1-10)", "County", "City", "State", "Postal Code", "Model Year", "Make", "Model", "Electric Vehicle Type",
+    "Clean Alternative Fuel Vehicle (CAFV) Eligibility", "Electric Range", "Base MSRP", "Legislative District",
+    "DOL Vehicle ID", "Vehicle Location", "Electric Utility", "2020 Census Tract"
+]
+RIDE_COLUMNS = [
+    "ride_id", "rideable_type", "started_at", "ended_at", "start_station_name", "start_station_id",
+    "end_station_name", "end_station_id", "start_lat", "start_lng", "end_lat", "end_lng", "member_casual"
+]
+EV_TYPES = ["Battery Electric Vehicle (BEV)", "Plug-in Hybrid Electric Vehicle (PHEV)"]
+RIDEABLE_TYPES = ["classic_bike", "electric_bike", "docked_bike"]
+
+
+def skewed(rng: np.random.Generator, n_values: int, n_rows: int):
+    # indexes into n_values, a few far more common than the rest, as makes, models and stations are
+    return np.minimum(rng.zipf(1.5, n_rows) - 1, n_values - 1)
+
+
+def write_chunks(path: str, n_rows: int, chunk, chunk_rows: int = 500_000):
+    # written a chunk at a time, so the largest scales take no more memory than one chunk
+    with open(path, "w", newline="") as f:
+        for start in range(0, n_rows, chunk_rows):
+            chunk(start, min(chunk_rows, n_rows - start)).to_csv(f, header=start == 0, index=False)
+    return path
+
+
+def generate_ev_csv(path: str, n_rows: int, n_postal_codes: int = 5_000, n_models: int = 150, seed: int = 0):
+    # counties, cities and states follow from the postal code, makes from the model, as in the real data
+    places = np.random.default_rng(seed).integers(0, 1_000, (n_postal_codes, 3))
+    postal_states = places[:, 0] % 50
+    postal_counties = postal_states * 100 + places[:, 1] % 40
+    postal_cities = postal_counties * 100 + places[:, 2] % 25
+
+    def chunk(start: int, n: int):
+        rng = np.random.default_rng([seed, start])
+        postal = rng.integers(0, n_postal_codes, n)
+        model = skewed(rng, n_models, n)
+        return pd.DataFrame({
+            "VIN (1-10)": pd.Series(rng.integers(0, 10 ** 10, n)).map("{:010d}".format),
+            "County": pd.Series(postal_counties[postal]).map("County {}".format),
+            "City": pd.Series(postal_cities[postal]).map("City {}".format),
+            "State": pd.Series(postal_states[postal]).map("S{:02d}".format),
+            "Postal Code": 10_000 + postal,
+            "Model Year": rng.integers(2011, 2025, n),
+            "Make": pd.Series(model % 40).map("MAKE {}".format),
+            "Model": pd.Series(model).map("MODEL {}".format),
+            "Electric Vehicle Type": np.array(EV_TYPES)[model % 2],
+            "Clean Alternative Fuel Vehicle (CAFV) Eligibility": "Clean Alternative Fuel Vehicle Eligible",
+            "Electric Range": rng.integers(0, 350, n),
+            "Base MSRP": 0,
+            "Legislative District": rng.integers(1, 50, n).astype(float),
+            "DOL Vehicle ID": np.arange(100_000_000 + start, 100_000_000 + start + n),
+            "Vehicle Location": [f"POINT ({long:.5f} {lat:.5f})" for long, lat in
+                                 zip(rng.uniform(-124, -117, n), rng.uniform(45.5, 49, n))],
+            "Electric Utility": "PUGET SOUND ENERGY INC",
+            "2020 Census Tract": rng.integers(53_000_000_000, 53_099_999_999, n),
+        }, columns=EV_COLUMNS)
+
+    return write_chunks(path, n_rows, chunk)
+
+
+def generate_rides_csv(path: str, n_rows: int, n_days: int = 365, n_stations: int = 1_000, seed: int = 0):
+    # rides spread over n_days from the start of 2023, with more of them in the summer as in the real files
+    first_day = datetime.datetime(2023, 1, 1)
+    day_weights = 1.5 + np.sin(np.linspace(-np.pi / 2, 3 * np.pi / 2, n_days))
+    day_weights /= day_weights.sum()
+
+    def chunk(start: int, n: int):
+        rng = np.random.default_rng([seed, start])
+        started = (pd.Timestamp(first_day) + pd.to_timedelta(rng.choice(n_days, n, p=day_weights), unit="D") +
+                   pd.to_timedelta(rng.integers(0, 86_400, n), unit="s"))
+        ended = started + pd.to_timedelta(rng.integers(60, 3_600, n), unit="s")
+        from_station, to_station = skewed(rng, n_stations, n), skewed(rng, n_stations, n)
+        return pd.DataFrame({
+            "ride_id": pd.Series(np.arange(start, start + n)).map("{:016X}".format),
+            "rideable_type": np.array(RIDEABLE_TYPES)[rng.integers(0, len(RIDEABLE_TYPES), n)],
+            "started_at": started.strftime("%Y-%m-%d %H:%M:%S"),
+            "ended_at": ended.strftime("%Y-%m-%d %H:%M:%S"),
+            "start_station_name": pd.Series(from_station).map("Station {}".format),
+            "start_station_id": from_station,
+            "end_station_name": pd.Series(to_station).map("Station {}".format),
+            "end_station_id": to_station,
+            "start_lat": 41.8 + from_station / n_stations * 0.2,
+            "start_lng": -87.7 + from_station / n_stations * 0.1,
+            "end_lat": 41.8 + to_station / n_stations * 0.2,
+            "end_lng": -87.7 + to_station / n_stations * 0.1,
+            "member_casual": np.where(rng.random(n) < 0.6, "member", "casual"),
+        }, columns=RIDE_COLUMNS)
+
+    return write_chunks(path, n_rows, chunk)
+
+
+def generate(data_dir: str, n_rows: int):
+    # the files for one scale, reused when they're already there
+    os.makedirs(data_dir, exist_ok=True)
+    paths = {"ev": os.path.join(data_dir, f"ev_{n_rows}.csv"), "rides": os.path.join(data_dir, f"rides_{n_rows}.csv")}
+    generators = {"ev": generate_ev_csv, "rides": generate_rides_csv}
+    for name, path in paths.items():
+        if not os.path.exists(path):
+            generators[name](path + ".part", n_rows)
+            os.replace(path + ".part", path)
+    return paths
@@ -0,0 +1,166 @@
+import pandas as pd
+
+# the fixed query set, each answered from the csv by every engine, read and all:
+#   group_count    vehicles per (state, county, city), as EVAnalytics.group_and_count (Exercise-8)
+#   top_n          the top make and model per postal code, ranked with ties as rank() (Exercise-8's top_n)
+#   week_over_week rides per day beside the rides a week earlier, joined on the date rather than shifted by 7 rows
+#                  (Exercise-9's rides_vs_last_week)
+# and each returned as a pandas DataFrame with the same columns, so the engines' answers can be compared
+QUERIES = {
+    "group_count": "ev",
+    "top_n": "ev",
+    "week_over_week": "rides",
+}
+TOP_N = 1
+# the column each query's checksum sums, with its row count
+CHECKSUM_COLUMNS = {"group_count": "count", "top_n": "count", "week_over_week": "rides_last_week"}
+
+
+class PandasEngine:
+    # Exercise-2's engine: everything in memory on one core
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def group_count(self, ev_path: str):
+        data = pd.read_csv(ev_path, usecols=["State", "County", "City"])
+        counts = data.groupby(["State", "County", "City"], sort=False).size().rename("count").reset_index()
+        return counts.rename(columns=str.lower)
+
+    def top_n(self, ev_path: str, n: int = TOP_N):
+        data = pd.read_csv(ev_path, usecols=["Postal Code", "Make", "Model"])
+        counts = data.groupby(["Postal Code", "Make", "Model"], sort=False).size().rename("count").reset_index()
+        counts["count_rank"] = counts.groupby("Postal Code")["count"].rank(method="min", ascending=False)
+        counts = counts[counts["count_rank"] <= n].astype({"count_rank": "int64"})
+        return counts.rename(columns={"Postal Code": "postal_code", "Make": "make", "Model": "model"})
+
+    def week_over_week(self, rides_path: str):
+        rides = pd.read_csv(rides_path, usecols=["started_at"], parse_dates=["started_at"])
+        daily = rides["started_at"].dt.normalize().value_counts().rename("rides").rename_axis("date").reset_index()
+        last_week = daily.assign(date=daily["date"] + pd.Timedelta(days=7)).rename(columns={"rides": "rides_last_week"})
+        daily = daily.merge(last_week, on="date", how="left").sort_values("date")
+        daily["change_from_last_week"] = daily["rides"] - daily["rides_last_week"]
+        return daily.reset_index(drop=True)
+
+
+class DuckDBEngine:
+    # Exercise-8's engine: SQL straight over the csv, on every core
+
+    def start(self):
+        import duckdb
+        self.conn = duckdb.connect()
+
+    def close(self):
+        self.conn.close()
+
+    def group_count(self, ev_path: str):
+        return self.conn.sql(f"SELECT State AS state, County AS county, City AS city, count(*) AS count "
+                             f"FROM read_csv('{ev_path}', header=true) GROUP BY ALL").df()
+
+    def top_n(self, ev_path: str, n: int = TOP_N):
+        return self.conn.sql(f"SELECT *, rank() OVER (PARTITION BY postal_code ORDER BY count DESC) AS count_rank "
+                             f"FROM (SELECT \"Postal Code\" AS postal_code, Make AS make, Model AS model, "
+                             f"count(*) AS count FROM read_csv('{ev_path}', header=true) GROUP BY ALL) "
+                             f"QUALIFY count_rank <= {n}").df()
+
+    def week_over_week(self, rides_path: str):
+        return self.conn.sql(f"WITH daily AS (SELECT CAST(started_at AS DATE) AS date, count(*) AS rides "
+                             f"FROM read_csv('{rides_path}', header=true) GROUP BY ALL) "
+                             f"SELECT d.date, d.rides, w.rides AS rides_last_week, "
+                             f"d.rides - w.rides AS change_from_last_week FROM daily d "
+                             f"LEFT JOIN daily w ON w.date + INTERVAL 7 DAY = d.date ORDER BY d.date").df()
+
+
+class PolarsEngine:
+    # Exercise-9's engine: lazy scans run on the streaming engine
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def group_count(self, ev_path: str):
+        import polars as pl
+        return (pl.scan_csv(ev_path).group_by(state="State", county="County", city="City")
+                .agg(pl.len().alias("count")).collect(engine="streaming").to_pandas())
+
+    def top_n(self, ev_path: str, n: int = TOP_N):
+        import polars as pl
+        counts = pl.scan_csv(ev_path).group_by(postal_code="Postal Code", make="Make", model="Model") \
+            .agg(pl.len().alias("count"))
+        ranked = counts.with_columns(
+            pl.col("count").rank("min", descending=True).over("postal_code").cast(pl.Int64).alias("count_rank"))
+        return ranked.filter(pl.col("count_rank") <= n).collect(engine="streaming").to_pandas()
+
+    def week_over_week(self, rides_path: str):
+        import polars as pl
+        daily = pl.scan_csv(rides_path, schema_overrides={"started_at": pl.Datetime("us")}) \
+            .group_by(pl.col("started_at").dt.date().alias("date")).agg(pl.len().alias("rides"))
+        last_week = daily.select((pl.col("date") + pl.duration(days=7)).alias("date"),
+                                 pl.col("rides").alias("rides_last_week"))
+        return daily.join(last_week, on="date", how="left").with_columns(
+            (pl.col("rides").cast(pl.Int64) - pl.col("rides_last_week")).alias("change_from_last_week")) \
+            .sort("date").collect(engine="streaming").to_pandas()
+
+
+class SparkEngine:
+    # Exercises 6 and 7's engine, in local mode on every core. The JVM is a child process, so its CPU time and
+    # peak memory only reach getrusage(RUSAGE_CHILDREN) once close has waited for it to exit
+    driver_memory = "4g"
+
+    def start(self):
+        from pyspark.sql import SparkSession
+        self.spark = SparkSession.builder.master("local[*]").appName("EngineBenchmark") \
+            .config("spark.driver.memory", self.driver_memory).config("spark.ui.enabled", "false") \
+            .config("spark.sql.shuffle.partitions", "8").getOrCreate()
+
+    def close(self):
+        gateway = self.spark.sparkContext._gateway
+        self.spark.stop()
+        gateway.shutdown()
+        if getattr(gateway, "proc", None) is not None:
+            gateway.proc.stdin.close()
+            gateway.proc.wait()
+
+    def read_csv(self, path: str):
+        return self.spark.read.csv(path, header=True, inferSchema=False)
+
+    def group_count(self, ev_path: str):
+        import pyspark.sql.functions as F
+        return self.read_csv(ev_path).groupBy(F.col("State").alias("state"), F.col("County").alias("county"),
+                                              F.col("City").alias("city")).count().toPandas()
+
+    def top_n(self, ev_path: str, n: int = TOP_N):
+        import pyspark.sql.functions as F
+        from pyspark.sql import Window
+        counts = self.read_csv(ev_path).groupBy(F.col("Postal Code").cast("int").alias("postal_code"),
+                                                F.col("Make").alias("make"), F.col("Model").alias("model")).count()
+        ranked = counts.withColumn("count_rank", F.rank().over(Window.partitionBy("postal_code")
+                                                               .orderBy(F.col("count").desc())))
+        return ranked.where(F.col("count_rank") <= n).toPandas().astype({"count_rank": "int64"})
+
+    def week_over_week(self, rides_path: str):
+        import pyspark.sql.functions as F
+        daily = self.read_csv(rides_path).groupBy(F.to_date("started_at").alias("date")).agg(
+            F.count("*").alias("rides"))
+        last_week = daily.select(F.date_add("date", 7).alias("date"), F.col("rides").alias("rides_last_week"))
+        return daily.join(last_week, "date", "left") \
+            .withColumn("change_from_last_week", F.col("rides") - F.col("rides_last_week")) \
+            .orderBy("date").toPandas()
+
+
+ENGINES = {
+    "pandas": PandasEngine,
+    "duckdb": DuckDBEngine,
+    "polars": PolarsEngine,
+    "spark": SparkEngine,
+}
+
+
+def checksum(query: str, result: pd.DataFrame):
+    # the answer's size and the total of one column, the same from every engine that got it right
+    return len(result), int(pd.to_numeric(result[CHECKSUM_COLUMNS[query]]).fillna(0).sum())
@@ -0,0 +1,139 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import resource
+import time
+import traceback
+import uuid
+
+import duckdb
+import pandas as pd
+
+from benchmark.data import generate
+from benchmark.engines import ENGINES, QUERIES, SparkEngine, checksum
+
+RESULT_COLUMNS = {
+    "run_id": "VARCHAR",
+    "started_at": "TIMESTAMP",
+    "engine": "VARCHAR",
+    "query": "VARCHAR",
+    "dataset": "VARCHAR",
+    "rows": "BIGINT",
+    "repeat": "INTEGER",
+    "startup_seconds": "DOUBLE",
+    "seconds": "DOUBLE",
+    "cpu_seconds": "DOUBLE",
+    "cpu_utilisation": "DOUBLE",
+    "peak_rss_mib": "DOUBLE",
+    "result_rows": "BIGINT",
+    "checksum": "BIGINT",
+    "matches": "BOOLEAN",
+    "error": "VARCHAR",
+}
+
+
+def cpu_seconds():
+    # this process and any it has waited for, e.g. Spark's JVM
+    usages = [resource.getrusage(who) for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)]
+    return sum(usage.ru_utime + usage.ru_stime for usage in usages)
+
+
+def peak_rss_mib():
+    # this process's own high water mark: ru_maxrss would carry over the parent's from before the spawn, data
+    # generation and all. For the children ru_maxrss is the largest one's, not their sum; both are in KiB
+    with open("/proc/self/status") as f:
+        own = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+    return max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 2 ** 10
+
+
+def measure(engine_name: str, query: str, path: str, spark_driver_memory: str, results):
+    # run in a fresh process, so peak RSS is this engine and query's alone and nothing is cached from a previous run
+    measured = {}
+    try:
+        SparkEngine.driver_memory = spark_driver_memory
+        engine = ENGINES[engine_name]()
+        start = time.perf_counter()
+        engine.start()
+        measured["startup_seconds"] = time.perf_counter() - start
+        cpu_start, start = cpu_seconds(), time.perf_counter()
+        result = getattr(engine, query)(path)
+        engine.close()
+        measured["seconds"] = time.perf_counter() - start
+        measured["cpu_seconds"] = cpu_seconds() - cpu_start
+        measured["cpu_utilisation"] = measured["cpu_seconds"] / measured["seconds"] / os.cpu_count()
+        measured["result_rows"], measured["checksum"] = checksum(query, result)
+    except Exception:
+        measured["error"] = traceback.format_exc(limit=1).strip().splitlines()[-1]
+    measured["peak_rss_mib"] = peak_rss_mib()
+    results.put(measured)
+
+
+def run_one(engine_name: str, query: str, path: str, spark_driver_memory: str):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=measure, args=(engine_name, query, path, spark_driver_memory, results))
+    process.start()
+    process.join()
+    if results.empty():
+        # killed, most likely for running out of memory, before it could report
+        return {"error": f"exited with code {process.exitcode}"}
+    return results.get()
+
+
+def save(results_path: str, rows: list):
+    columns = ", ".join(f"{name} {dtype}" for name, dtype in RESULT_COLUMNS.items())
+    results = pd.DataFrame(rows, columns=list(RESULT_COLUMNS))
+    with duckdb.connect(results_path) as conn:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS engine_results ({columns})")
+        conn.execute("INSERT INTO engine_results BY NAME SELECT * FROM results")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the EV and Divvy queries on pandas, DuckDB, Polars and Spark "
+                                                 "over synthetic data, recording wall time, CPU and peak memory")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES), default=list(ENGINES))
+    parser.add_argument("--queries", nargs="+", choices=list(QUERIES), default=list(QUERIES))
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--data-dir", default="benchmark_data")
+    parser.add_argument("--results", default="benchmark_results.duckdb")
+    parser.add_argument("--spark-driver-memory", default=SparkEngine.driver_memory)
+    args = parser.parse_args()
+
+    run_id, started_at = uuid.uuid4().hex, datetime.datetime.now()
+    rows = []
+    for n_rows in args.rows:
+        start = time.perf_counter()
+        paths = generate(args.data_dir, n_rows)
+        print(f"{n_rows} rows ready in {time.perf_counter() - start:.1f}s")
+        for query in args.queries:
+            dataset = QUERIES[query]
+            # the first engine to answer is the one the rest are checked against
+            expected = None
+            for engine_name in args.engines:
+                for repeat in range(args.repeats):
+                    measured = run_one(engine_name, query, paths[dataset], args.spark_driver_memory)
+                    answer = (measured.get("result_rows"), measured.get("checksum"))
+                    if "error" not in measured and expected is None:
+                        expected = answer
+                    rows.append({"run_id": run_id, "started_at": started_at, "engine": engine_name, "query": query,
+                                 "dataset": dataset, "rows": n_rows, "repeat": repeat, **measured,
+                                 "matches": None if "error" in measured else answer == expected})
+                    if "error" in measured:
+                        print(f"{engine_name} {query} failed: {measured['error']}")
+                        break
+    save(args.results, rows)
+
+    summary = pd.DataFrame(rows)
+    summary = summary[summary["error"].isna()] if "error" in summary else summary
+    summary = summary.groupby(["rows", "query", "engine"], sort=False).agg(
+        seconds=("seconds", "median"), cpu_utilisation=("cpu_utilisation", "median"),
+        peak_rss_mib=("peak_rss_mib", "max"), matches=("matches", "all"))
+    print(f"run {run_id}, median of {args.repeats} runs, saved to {args.results}")
+    with pd.option_context("display.width", 120, "display.float_format", "{:.3f}".format):
+        print(summary)
+
+
+if __name__ == "__main__":
+    main()